@@ -6,26 +6,83 @@ import json
 import logging
 import os
 import sys
-from datetime import datetime, timezone
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta, timezone
 
+from shared.cassette import authorize_replay, recording, replaying
 from shared.client import AuthenticationError, RateLimitError, SaxoAPIError
 from shared.domain import (
+    ROLL_SORT_KEYS,
     first,
     normalize_account,
     normalize_balance,
-    normalize_position,
     normalize_quote,
     portfolio_summary,
+    to_json,
 )
-from shared.runtime import AuthenticationSession, create_client, load_runtime_config
+from shared.history import OrderActivityStore, day_start, parse_bound
+from shared.history import default_path as default_history_path
+from shared.logs import install_queue_logging
+from shared.profiling import MODES, Profiler
+from shared.runtime import (
+    AuthenticationSession,
+    ClientManager,
+    create_client,
+    load_runtime_config,
+)
+from shared.snapshots import (
+    SnapshotStore,
+    capture,
+    fetch_balance,
+    normalized_positions,
+    parse_duration,
+)
+from shared.snapshots import default_directory as default_snapshot_directory
+from shared.symbols import SymbolCache, resolve, resolve_many
+from shared.symbols import default_path as default_symbol_cache
+from shared.tracing import exporter_from_env, trace
 
 
 def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if "--profile" in argv:
+        index = argv.index("--profile")
+        following = argv[index + 1] if index + 1 < len(argv) else None
+        if following not in MODES:
+            # A bare --profile would otherwise swallow the command name.
+            argv[index] = "--profile=cpu"
     parser = argparse.ArgumentParser(prog="saxo")
     parser.add_argument("--env", choices=["sim", "live"])
     parser.add_argument("--params", default="params.json")
     parser.add_argument("--verbose", action="store_true")
     parser.add_argument("--json", action="store_true", dest="json_output")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="CASSETTE", help="Record Saxo HTTP traffic")
+    cassette.add_argument(
+        "--replay", metavar="CASSETTE", help="Serve Saxo HTTP traffic from a recording"
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiply replayed latencies (0 replays without delay)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=os.getenv("SAXO_TRACE_FILE"),
+        help="Append tracing spans to FILE (.jsonl, otherwise Chrome trace format)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=MODES,
+        help="Profile the command: cpu (cProfile, the default) or mem (tracemalloc)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="PREFIX",
+        help="Profile file prefix (default saxo-<command>-<mode>-<time>)",
+    )
     sub = parser.add_subparsers(dest="command", required=True)
     for name in ("account", "balances", "portfolio", "positions", "orders"):
         p = sub.add_parser(name)
@@ -37,12 +94,81 @@ def parse_args(argv=None):
                 action="store_true",
                 help="Show order activities instead of working orders",
             )
+        if name == "portfolio":
+            stress = p.add_subparsers(dest="portfolio_action").add_parser(
+                "stress", help="P&L of the portfolio under a grid of shock scenarios"
+            )
+            stress.add_argument(
+                "--price",
+                action="append",
+                default=[],
+                metavar="[TARGET=]PERCENTS",
+                help="Underlying price shocks for all, stocks, options, other or a symbol, "
+                "e.g. -20,0,20 or stocks=-30:30:10 (repeatable)",
+            )
+            stress.add_argument(
+                "--fx",
+                action="append",
+                default=[],
+                metavar="CURRENCY=PERCENTS",
+                help="Moves of a position currency against the base currency (repeatable)",
+            )
+            stress.add_argument(
+                "--vol",
+                action="append",
+                default=[],
+                metavar="POINTS",
+                help="Implied-volatility shocks for options in points, e.g. -10,0,10",
+            )
+            stress.add_argument("--json", action="store_true", dest="json_output")
     history = sub.add_parser(
-        "order-history", aliases=["orderhistory"], help="Show today’s order activities"
+        "order-history",
+        aliases=["orderhistory"],
+        help="Show order activities from the local history store (default: today)",
     )
     history.add_argument("--limit", type=int, default=200)
+    history.add_argument("--from", dest="from_date", help="Start date (YYYY-MM-DD) or ISO time")
+    history.add_argument("--to", dest="to_date", help="End date (inclusive) or ISO time")
+    history.add_argument("--days", type=int, help="The last N local days, including today")
+    history.add_argument("--uic", type=int)
+    history.add_argument("--order-id")
+    history.add_argument("--status", help="e.g. Filled, Cancelled, Placed")
+    history.add_argument(
+        "--offline", action="store_true", help="Query the local store without syncing"
+    )
     history.add_argument("--format", choices=["json", "text"], default=None)
     history.add_argument("--json", action="store_true", dest="json_output")
+    p = sub.add_parser("snapshot", help="Record a portfolio snapshot in the local store")
+    p.add_argument("--json", action="store_true", dest="json_output")
+    history_sub = sub.add_parser(
+        "history", help="Read locally recorded history without contacting Saxo"
+    ).add_subparsers(dest="history_kind", required=True)
+    p = history_sub.add_parser("portfolio", help="Portfolio snapshots, oldest first")
+    p.add_argument("--from", dest="from_date", help="Start date (YYYY-MM-DD) or ISO time")
+    p.add_argument("--to", dest="to_date", help="End date (inclusive) or ISO time")
+    p.add_argument("--every", help="Keep the last snapshot per interval, e.g. 1h or 1d")
+    p.add_argument("--positions", action="store_true", help="Include position rows")
+    p.add_argument("--json", action="store_true", dest="json_output")
+    p = sub.add_parser("bars", help="Historical OHLC bars, kept in the local bar store")
+    p.add_argument("symbol")
+    p.add_argument("--asset-type")
+    p.add_argument("--horizon", default="1d", help="Bar length, e.g. 5m, 1h, 1d or 1w")
+    p.add_argument("--from", dest="from_date", help="Start date (YYYY-MM-DD) or ISO time")
+    p.add_argument("--to", dest="to_date", help="End date (inclusive) or ISO time")
+    p.add_argument(
+        "--offline", action="store_true", help="Read stored bars without fetching newer ones"
+    )
+    p.add_argument("--json", action="store_true", dest="json_output")
+    p = sub.add_parser("risk", help="Historical and parametric VaR of the current positions")
+    p.add_argument("--window", type=int, help="Daily returns used (default 250)")
+    p.add_argument(
+        "--confidence",
+        action="append",
+        help="Confidence level, e.g. 0.99 (repeatable; default 0.95 and 0.99)",
+    )
+    p.add_argument("--horizon-days", type=float, default=1.0)
+    p.add_argument("--offline", action="store_true", help="Use stored bars without fetching")
+    p.add_argument("--json", action="store_true", dest="json_output")
     p = sub.add_parser("position")
     p.add_argument("symbol")
     p.add_argument("--json", action="store_true", dest="json_output")
@@ -50,8 +176,10 @@ def parse_args(argv=None):
     p.add_argument("query")
     p.add_argument("--asset-type")
     p.add_argument("--json", action="store_true", dest="json_output")
-    p = sub.add_parser("quote")
-    p.add_argument("symbol")
+    p = sub.add_parser("quote", help="Quote one or more symbols")
+    p.add_argument("symbols", nargs="*", metavar="symbol")
+    p.add_argument("--from-file", help="Watchlist file of symbols ('-' reads stdin)")
+    p.add_argument("--ndjson", action="store_true", help="One JSON quote per line")
     p.add_argument("--json", action="store_true", dest="json_output")
     order = sub.add_parser("order")
     order_sub = order.add_subparsers(dest="order_action", required=True)
@@ -76,12 +204,44 @@ def parse_args(argv=None):
     p.add_argument("--type", choices=["call", "put"])
     p.add_argument("--min-strike", type=float)
     p.add_argument("--max-strike", type=float)
+    p.add_argument("--refresh", action="store_true", help="Refetch the cached option chain")
+    p.add_argument(
+        "--asset-type",
+        default="StockOption",
+        help="Option root asset type, e.g. StockIndexOption (default StockOption)",
+    )
+    p.add_argument("--json", action="store_true", dest="json_output")
+    p = sub.add_parser("roll", help="Screen rolls of a short option across its chain")
+    p.add_argument("symbol")
+    p.add_argument("--expiry", required=True, help="Expiry of the existing short option")
+    p.add_argument("--strike", required=True, type=float)
+    p.add_argument("--type", required=True, choices=["call", "put"])
+    p.add_argument("--contracts", type=int, default=1)
+    p.add_argument("--multiplier", type=float, default=100)
+    p.add_argument("--min-strike", type=float)
+    p.add_argument("--max-strike", type=float)
+    p.add_argument("--max-expiry", help="Latest expiry to roll to (YYYY-MM-DD)")
+    p.add_argument("--min-credit", type=float, help="Minimum conservative net credit")
+    p.add_argument("--sort", choices=ROLL_SORT_KEYS, default="annualized")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--refresh", action="store_true", help="Refetch the cached option chain")
+    p.add_argument(
+        "--asset-type",
+        default="StockOption",
+        help="Option root asset type, e.g. StockIndexOption (default StockOption)",
+    )
     p.add_argument("--json", action="store_true", dest="json_output")
     p = sub.add_parser("option")
     p.add_argument("symbol")
     p.add_argument("--expiry", required=True)
     p.add_argument("--strike", required=True, type=float)
     p.add_argument("--type", required=True, choices=["call", "put"])
+    p.add_argument("--refresh", action="store_true", help="Refetch the cached option chain")
+    p.add_argument(
+        "--asset-type",
+        default="StockOption",
+        help="Option root asset type, e.g. StockIndexOption (default StockOption)",
+    )
     p.add_argument("--json", action="store_true", dest="json_output")
     auth = sub.add_parser("auth")
     auth.add_argument("action", choices=["status", "login", "logout"])
@@ -91,6 +251,15 @@ def parse_args(argv=None):
     serve.add_argument(
         "--dev", action="store_true", help="Disable the web secret (local development only)"
     )
+    serve.add_argument(
+        "--snapshot-interval",
+        type=float,
+        help="Seconds between portfolio snapshots (default SAXO_SNAPSHOT_INTERVAL or 300; 0 disables)",
+    )
+    serve.add_argument(
+        "--environments",
+        help="Comma-separated environments to serve side by side, e.g. sim,live",
+    )
     return parser.parse_args(argv)
 
 
@@ -99,58 +268,247 @@ def _data(value):
 
 
 def build_positions_payload(client, environment="sim"):
-    accounts = _data(client.get_accounts())
-    currencies = {a.get("AccountId"): a.get("Currency") for a in accounts}
-    result = []
-    for raw in _data(client.get_positions()):
-        base = raw.get("PositionBase", raw)
-        uic, asset = first(base, "Uic", "UIN"), first(base, "AssetType", default="Stock")
-        instrument = {}
-        if uic:
-            try:
-                instrument = client.get_instrument_by_uic(uic, asset_type=asset) or {}
-            except Exception:
-                pass
-        result.append(normalize_position(raw, instrument, currencies.get(base.get("AccountId"))))
     return {
         "environment": environment,
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "positions": result,
+        "positions": normalized_positions(client),
     }
 
 
-def _resolve(client, query, asset_type=None):
-    matches = _data(client.search_instruments(query, asset_type))
-    if not matches:
-        raise LookupError(f"No instrument matching {query} was found.")
-    query_key = query.strip().casefold()
-    exact = [
-        match
-        for match in matches
-        if any(
-            str(match.get(field) or "").strip().casefold() == query_key
-            for field in ("Symbol", "Identifier")
-        )
-    ]
-    if exact:
-        stock_matches = [
-            match for match in exact if str(match.get("AssetType") or "").casefold() == "stock"
-        ]
-        if len(stock_matches) == 1:
-            return stock_matches[0]
-        if len(exact) == 1:
-            return exact[0]
-    stock_description_matches = [
-        match
-        for match in matches
-        if str(match.get("AssetType") or "").casefold() == "stock"
-        and query_key in str(match.get("Description") or "").casefold()
+def portfolio_history(config, args):
+    """Read recorded portfolio snapshots; this never contacts Saxo."""
+    store = SnapshotStore(default_snapshot_directory(config.token_file), config.base_url)
+    start = parse_bound(args.from_date).timestamp() if args.from_date else None
+    end = parse_bound(args.to_date, end=True).timestamp() if args.to_date else None
+    every = parse_duration(args.every) if args.every else None
+    return {
+        "environment": "sim" if config.simulation_mode else "live",
+        "snapshots": store.query(start, end, every, positions=args.positions),
+    }
+
+
+def order_history(client, config, args):
+    """Answer order-history queries from the local store after syncing it."""
+    if getattr(args, "days", None):
+        start = day_start(date.today() - timedelta(days=max(args.days, 1) - 1))
+    elif getattr(args, "from_date", None):
+        start = parse_bound(args.from_date)
+    else:
+        start = day_start(date.today())
+    end = parse_bound(args.to_date, end=True) if getattr(args, "to_date", None) else None
+    store = OrderActivityStore(default_history_path(config.token_file), config.base_url)
+    if not getattr(args, "offline", False):
+        store.refresh(client, start, end)
+    return store.query(
+        start,
+        end,
+        uic=getattr(args, "uic", None),
+        order_id=getattr(args, "order_id", None),
+        status=getattr(args, "status", None),
+        limit=getattr(args, "limit", 200),
+    )
+
+
+def portfolio_stress(client, config, args, env):
+    """Revalue the current positions under the ``--price``/``--fx``/``--vol`` grid."""
+    from shared.fx import FxRates
+    from shared.stress import ScenarioGrid, stress
+
+    grid = ScenarioGrid.parse(args.price, args.fx, args.vol)
+    balance = fetch_balance(client, env)
+    positions = normalized_positions(client)
+    return {
+        "environment": env,
+        **stress(
+            positions,
+            grid,
+            base_currency=balance.currency,
+            net_value=balance.net_equity,
+            client=client,
+            rates=FxRates(client).rates({p.currency for p in positions}, balance.currency),
+        ),
+    }
+
+
+def chart_bars(client, config, args):
+    """Bars of one instrument from the local store after bringing it up to date."""
+    from shared.bars import BarStore, bar_rows, parse_horizon
+    from shared.bars import default_directory as default_bar_directory
+
+    horizon = parse_horizon(args.horizon)
+    match = resolve(client, args.symbol, args.asset_type)
+    uic, asset_type = first(match, "Identifier", "Uic"), first(match, "AssetType", default="Stock")
+    start = parse_bound(args.from_date).timestamp() if args.from_date else None
+    end = parse_bound(args.to_date, end=True).timestamp() if args.to_date else None
+    store = BarStore(default_bar_directory(config.token_file), config.base_url)
+    fetched = 0 if args.offline else store.refresh(client, uic, asset_type, horizon, start, end)
+    return {
+        "symbol": first(match, "Symbol", default=args.symbol),
+        "uic": uic,
+        "asset_type": asset_type,
+        "horizon": horizon,
+        "fetched": fetched,
+        "bars": bar_rows(store.read(uic, asset_type, horizon, start, end)),
+    }
+
+
+def risk(client, config, args, env):
+    """VaR and correlations of the current positions over locally stored daily bars."""
+    from shared.bars import BarStore
+    from shared.bars import default_directory as default_bar_directory
+    from shared.fx import FxRates
+    from shared.risk import (
+        DEFAULT_CONFIDENCE,
+        DEFAULT_WINDOW,
+        CovarianceCache,
+        parse_confidence,
+        portfolio_risk,
+    )
+
+    window = DEFAULT_WINDOW if args.window is None else args.window
+    if window < 2:
+        raise ValueError("--window must be at least 2 days.")
+    store = BarStore(default_bar_directory(config.token_file), config.base_url)
+    payload = build_positions_payload(client, env)
+    currency = fetch_balance(client, env).currency
+    rates = FxRates(client).rates({p.currency for p in payload["positions"]}, currency)
+    return {
+        "environment": env,
+        "timestamp": payload["timestamp"],
+        **portfolio_risk(
+            payload["positions"],
+            store,
+            client=None if args.offline else client,
+            window=window,
+            confidence=tuple(map(parse_confidence, args.confidence or DEFAULT_CONFIDENCE)),
+            horizon_days=args.horizon_days,
+            cache=CovarianceCache(store.path / "covariance"),
+            rates=rates,
+            base_currency=currency,
+        ),
+    }
+
+
+def read_symbols(path):
+    """Symbols from a watchlist file (``-`` for stdin): whitespace or comma separated.
+
+    Text after ``#`` on a line is a comment.
+    """
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(os.path.expanduser(path), encoding="utf-8") as handle:
+            text = handle.read()
+    return [
+        symbol
+        for line in text.splitlines()
+        for symbol in line.partition("#")[0].replace(",", " ").split()
     ]
-    if len(stock_description_matches) == 1:
-        return stock_description_matches[0]
-    if len(matches) > 1:
-        raise ValueError(f"Instrument query {query!r} is ambiguous.")
-    return matches[0]
+
+
+def quotes(client, config, args):
+    """Quote every symbol: cached, concurrent resolution and one bulk request per asset type.
+
+    One symbol without ``--from-file`` returns its quote (and fails like any
+    lookup); otherwise a list in input order, with an ``error`` row for each
+    symbol that did not resolve.
+    """
+    symbols = list(args.symbols)
+    if args.from_file:
+        symbols += read_symbols(args.from_file)
+    if not symbols:
+        raise ValueError("quote needs at least one symbol or --from-file.")
+    single = len(symbols) == 1 and not args.from_file
+    cache = SymbolCache(default_symbol_cache(config.token_file), config.base_url)
+    matches = resolve_many(client, symbols, cache=cache)
+
+    uics = {}
+    for match in matches.values():
+        if isinstance(match, dict):
+            asset_type = first(match, "AssetType", default="Stock")
+            uics.setdefault(asset_type, set()).add(first(match, "Identifier", "Uic"))
+    raws = {}
+    for asset_type, group in uics.items():
+        for row in client.get_quotes(sorted(group, key=str), asset_type):
+            raws[asset_type, str(row.get("Uic"))] = row
+
+    rows = []
+    for symbol in symbols:
+        match = matches[symbol]
+        if not isinstance(match, dict):
+            if single:
+                raise match
+            code = (
+                "instrument_not_found" if isinstance(match, LookupError) else "ambiguous_instrument"
+            )
+            rows.append({"symbol": symbol, "error": {"code": code, "message": str(match)}})
+            continue
+        key = (first(match, "AssetType", default="Stock"), str(first(match, "Identifier", "Uic")))
+        raw = raws.get(key) or {}
+        rows.append(
+            normalize_quote(
+                raw.get("Quote", raw),
+                first(match, "Symbol", default=symbol),
+                first(match, "Currency", "CurrencyCode"),
+            )
+        )
+    return rows[0] if single else rows
+
+
+def option_chain(client, config, args):
+    """Quote part of an option chain, one contract (``option``) or roll candidates (``roll``).
+
+    The chain's contracts come from the on-disk cache while it is fresh; the
+    selected contracts are then quoted in bulk and analyzed (implied
+    volatility and greeks) against one underlying quote.
+    """
+    from shared.options import OptionChainCache, roll_candidates, screen_rolls
+    from shared.options import default_directory as default_option_directory
+
+    root = resolve(client, args.symbol, args.asset_type)
+    cache = OptionChainCache(default_option_directory(config.token_file), config.base_url)
+    chain = cache.get(
+        client,
+        first(root, "Identifier", "OptionRootId"),
+        refresh=getattr(args, "refresh", False),
+        asset_type=first(root, "AssetType", default=args.asset_type),
+    )
+    if args.command == "roll":
+        existing = chain.contract(args.expiry, args.strike, args.type)
+        bounds = (args.min_strike, args.max_strike, args.max_expiry)
+        indices = roll_candidates(chain, existing, *bounds)
+    elif args.command == "option":
+        indices = [chain.contract(args.expiry, args.strike, args.type)]
+    else:
+        indices = chain.select(args.expiry, args.type, args.min_strike, args.max_strike)
+    cache.save(chain.quote(client, indices).quote_underlying(client).analyze(indices))
+    result = {
+        "symbol": first(root, "Symbol", default=args.symbol),
+        "option_root_id": chain.root_id,
+        "asset_type": chain.asset_type,
+        "underlying_uic": chain.underlying_uic,
+        "currency": chain.currency,
+    }
+    if args.command == "roll":
+        evaluated, rolls = screen_rolls(
+            chain,
+            existing,
+            args.contracts,
+            args.multiplier,
+            *bounds,
+            min_credit=args.min_credit,
+            sort=args.sort,
+            limit=args.limit,
+        )
+        return {
+            **result,
+            "existing_option": chain.rows([existing])[0],
+            "evaluated": evaluated,
+            "rolls": rolls,
+        }
+    if args.command == "option":
+        return {**result, **chain.rows(indices)[0]}
+    return {**result, "expiries": chain.expiries, "contracts": chain.rows(indices)}
 
 
 def run(args, config, client):
@@ -175,20 +533,36 @@ def run(args, config, client):
                 p for p in payload["positions"] if str(p.get("symbol") or "").upper() == needle
             ],
         }
+    if args.command == "portfolio" and getattr(args, "portfolio_action", None) == "stress":
+        return portfolio_stress(client, config, args, env)
     if args.command == "portfolio":
-        return portfolio_summary(
-            build_positions_payload(client, env)["positions"],
-            run(argparse.Namespace(command="balances", env=None), config, client),
-        )
+        from shared.fx import FxRates
+        from shared.options import position_greeks
+
+        positions = build_positions_payload(client, env)["positions"]
+        balance = run(argparse.Namespace(command="balances", env=None), config, client)
+        rates = FxRates(client).rates({p.currency for p in positions}, balance.currency)
+        return {
+            **portfolio_summary(positions, balance, rates),
+            "option_greeks": position_greeks(client, positions),
+        }
     if args.command == "orders" and getattr(args, "history", False):
-        return {"environment": env, "order_history": _data(client.get_order_history(today=True))}
+        return {"environment": env, "order_history": order_history(client, config, args)}
     if args.command == "orders":
         return {"environment": env, "orders": _data(client.get_orders())}
     if args.command in {"order-history", "orderhistory"}:
         return {
             "environment": env,
-            "order_history": _data(client.get_order_history(args.limit, today=True)),
+            "order_history": order_history(client, config, args),
         }
+    if args.command == "snapshot":
+        from shared.fx import FxRates
+
+        snapshot = capture(client, env, fx=FxRates(client))
+        store = SnapshotStore(default_snapshot_directory(config.token_file), config.base_url)
+        return {"environment": env, "snapshots": store.append(snapshot), **snapshot["summary"]}
+    if args.command == "history":
+        return portfolio_history(config, args)
     if args.command == "instrument":
         matches = _data(client.search_instruments(args.query, args.asset_type))
         return {
@@ -206,21 +580,14 @@ def run(args, config, client):
             ],
         }
     if args.command == "quote":
-        match = _resolve(client, args.symbol)
-        raw = client.get_quote(
-            first(match, "Identifier", "Uic"), first(match, "AssetType", default="Stock")
-        )
-        raw = raw.get("Quote", raw) if isinstance(raw, dict) else raw
-        return normalize_quote(
-            raw, first(match, "Symbol", default=args.symbol), first(match, "Currency")
-        )
+        return quotes(client, config, args)
     if args.command == "order":
         if args.order_action == "place":
             if args.type == "limit" and args.limit is None:
                 raise ValueError("--limit is required for limit orders")
             if args.type == "market" and args.limit is not None:
                 raise ValueError("--limit is only valid for limit orders")
-            match = _resolve(client, args.symbol, "Stock")
+            match = resolve(client, args.symbol, "Stock")
             account = (_data(client.get_accounts()) or [{}])[0]
             account_key = args.account_key or first(account, "AccountKey", "AccountId")
             order_payload = {
@@ -265,21 +632,58 @@ def run(args, config, client):
             "will_execute": True,
             "response": client.cancel_orders(args.order_ids, args.account_key),
         }
+    if args.command == "risk":
+        return risk(client, config, args, env)
+    if args.command == "bars":
+        return {"environment": env, **chart_bars(client, config, args)}
+    if args.command in {"options", "option", "roll"}:
+        return {"environment": env, **option_chain(client, config, args)}
     raise ValueError(f"Unsupported command: {args.command}")
 
 
+def _configure_logging(verbose):
+    """Like ``logging.basicConfig``, but stderr is written by a queue listener."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    install_queue_logging(root, [handler], level=logging.INFO if verbose else logging.WARNING)
+
+
+def _start_profile(stack, args):
+    """Profile the rest of the command and write the files when it exits."""
+    prefix = args.profile_output or (
+        f"saxo-{args.command}-{args.profile}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    )
+    profiler = Profiler(args.profile)
+
+    def write():
+        for path in profiler.write(prefix):
+            print(f"Profile written to {path}", file=sys.stderr)
+
+    stack.callback(write)
+    stack.enter_context(profiler)
+
+
 def main(argv=None):
     args = parse_args(argv)
-    logging.basicConfig(
-        level=logging.INFO if args.verbose else logging.WARNING,
-        format="[%(levelname)s] %(message)s",
-    )
+    _configure_logging(args.verbose)
     session = None
+    resources = ExitStack()
     try:
+        if args.profile:
+            _start_profile(resources, args)
+        if args.record:
+            resources.enter_context(recording(args.record))
+        elif args.replay:
+            resources.enter_context(replaying(args.replay, args.latency_scale))
         config = load_runtime_config(args.params, environment=args.env)
         if getattr(config, "trading_enabled", False):
             logging.warning("WARNING: TRADING_ENABLED is true. Live order execution is enabled.")
         client = create_client(config)
+        if args.replay:
+            authorize_replay(client)
         if args.command == "auth":
             environment = "sim" if config.simulation_mode else "live"
             if args.action == "status":
@@ -294,6 +698,29 @@ def main(argv=None):
                 if os.path.exists(token_path):
                     os.remove(token_path)
                 result = {"environment": environment, "authenticated": False}
+        elif args.command == "serve" and args.environments:
+            from web.app import startSaxoServer
+
+            names = [name.strip() for name in args.environments.split(",") if name.strip()]
+            session = ClientManager.from_params(names, args.params)
+            if args.replay:
+                for entry in session:
+                    authorize_replay(entry.client)
+            session.authenticate()
+            session.start_refresh()
+            return (
+                startSaxoServer(
+                    client=None,
+                    runtime_config=None,
+                    host=args.host,
+                    port=args.port,
+                    dev=args.dev,
+                    manager=session,
+                    trace_file=args.trace,
+                    snapshot_interval=args.snapshot_interval,
+                )
+                or 0
+            )
         elif args.command == "serve":
             session = AuthenticationSession(client, config.token_refresh_interval_seconds)
             session.authenticate()
@@ -306,13 +733,21 @@ def main(argv=None):
                 "host": args.host,
                 "port": args.port,
                 "dev": args.dev,
+                "trace_file": args.trace,
+                "snapshot_interval": args.snapshot_interval,
             }
             return startSaxoServer(**server_args) or 0
         else:
-            session = AuthenticationSession(client, config.token_refresh_interval_seconds)
-            session.authenticate()
-            result = run(args, config, client)
-        print(json.dumps(result, indent=2, default=str))
+            if args.command != "history":  # History reads local snapshots only.
+                session = AuthenticationSession(client, config.token_refresh_interval_seconds)
+                session.authenticate()
+            with trace(f"cli {args.command}", exporter_from_env(args.trace)):
+                result = run(args, config, client)
+        if getattr(args, "ndjson", False):
+            for row in result if isinstance(result, list) else [result]:
+                print(json.dumps(row, default=to_json))
+        else:
+            print(json.dumps(result, indent=2, default=to_json))
         return 0
     except LookupError as exc:
         code, name = 3, "instrument_not_found"
@@ -338,6 +773,7 @@ def main(argv=None):
     finally:
         if session is not None:
             session.close()
+        resources.close()
     print(json.dumps({"error": {"code": name, "message": error_message}}), file=sys.stdout)
     return code
 
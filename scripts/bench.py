@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Benchmark dashboard and domain hot paths against the in-process fake gateway.
+
+Each case runs at several portfolio sizes and reports p50/p95/p99 latency,
+throughput and peak traced memory as JSON. ``--compare`` checks the results
+against a stored baseline and exits non-zero when a metric regresses beyond its
+threshold::
+
+    python scripts/bench.py --output bench-baseline.json
+    python scripts/bench.py --compare bench-baseline.json --threshold 0.25
+
+The same cases run under pytest with ``python -m pytest -m bench``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.fake_saxo import FakeSaxo  # noqa: E402
+from shared.cassette import use_transport  # noqa: E402
+from shared.domain import (  # noqa: E402
+    normalize_position,
+    normalize_positions,
+    portfolio_summary,
+)
+from shared.runtime import SaxoRuntimeConfig, create_client  # noqa: E402
+
+SIZES = (10, 1000, 10000)
+DEFAULT_BUDGET_SECONDS = 2.0
+DEFAULT_THRESHOLD = 0.2
+# Metrics compared against a baseline, and whether larger values are better.
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_per_s": True,
+    "peak_memory_kb": False,
+}
+
+
+class BenchEnvironment:
+    """A fake portfolio of ``size`` positions wired to a real ``SaxoClient``.
+
+    The instrument cache file is pre-populated, so cases measure steady-state
+    dashboard work rather than first-visit instrument lookups.
+    """
+
+    def __init__(self, size: int, seed: int = 0, trading_enabled: bool = False, **fake_options):
+        self.size = size
+        self.trading_enabled = trading_enabled
+        options = {"positions": size, "orders": size, "activities": size, "seed": seed}
+        self.fake = FakeSaxo(**{**options, **fake_options})
+        self._stack = ExitStack()
+
+    def __enter__(self) -> BenchEnvironment:
+        import web.app as web_app
+
+        self.web = web_app
+        directory = Path(self._stack.enter_context(tempfile.TemporaryDirectory()))
+        token_file = self.fake.write_token_file(str(directory / "tokens.json"))
+        self.config = SaxoRuntimeConfig(
+            redirect_uri="https://example.invalid/callback",
+            simulation_mode=True,
+            auth_endpoint="https://fake/authorize",
+            token_endpoint="https://fake/token",
+            token_file=token_file,
+            client_id="bench",
+            base_url="https://fake/sim/openapi",
+            trading_enabled=self.trading_enabled,
+        )
+        self._stack.enter_context(use_transport(self.fake.transport()))
+        self.client = create_client(self.config)
+        self.cache_path = directory / "instrument-cache.json"
+        now = time.time()
+        self.cache_path.write_text(
+            json.dumps(
+                {
+                    web_app._instrument_cache_key(self.client, uic, row["AssetType"]): {
+                        "name": row["Symbol"],
+                        "symbol": row["Symbol"],
+                        "company_name": row["Description"],
+                        "cached_at": now,
+                    }
+                    for uic, row in self.fake.instruments.items()
+                }
+            )
+        )
+        self.instruments = web_app.InstrumentCache(self.cache_path)
+        self.executor = ThreadPoolExecutor(
+            max_workers=web_app.EXECUTOR_MAX_WORKERS, thread_name_prefix="bench"
+        )
+        self._stack.callback(self.executor.shutdown)
+        self.raw_positions = self.client.get_positions()
+        self.order_rows = [
+            {key: value for key, value in row.items() if key != "DisplayAndFormat"}
+            for row in self.client.get_order_history(limit=self.size, today=False)["Data"]
+        ]
+        self.balance = {"net_equity": 0, "cash": 0, "environment": "sim"}
+        self.normalized = [
+            normalize_position(raw, self.fake.instruments[raw["PositionBase"]["Uic"]], "EUR")
+            for raw in self.raw_positions["Data"]
+        ]
+        self.app = web_app.create_app(
+            self.client, self.config, dev=True, log_file=str(directory / "app.log")
+        )
+        logging.getLogger(web_app.__name__).setLevel(logging.WARNING)
+        self.app.extensions["saxo"].environment().instruments = self.instruments
+        self._stack.callback(self.app.extensions["saxo"].close)
+        self.http = self.app.test_client()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stack.close()
+
+
+def _positions(env):
+    return lambda: env.web._positions(env.client, env.raw_positions, env.executor, env.instruments)
+
+
+def _enrich_order_rows(env):
+    return lambda: env.web._enrich_order_rows(
+        env.client, env.order_rows, env.executor, env.instruments
+    )
+
+
+def _compact_order(env):
+    rows = env.web._enrich_order_rows(env.client, env.order_rows, env.executor, env.instruments)
+    return lambda: env.web._compact_orders(rows)
+
+
+def _normalize_position(env):
+    rows = [
+        (raw, env.fake.instruments[raw["PositionBase"]["Uic"]]) for raw in env.raw_positions["Data"]
+    ]
+    return lambda: [normalize_position(raw, instrument, "EUR") for raw, instrument in rows]
+
+
+def _normalize_positions(env):
+    raws = env.raw_positions["Data"]
+    instruments = [env.fake.instruments[raw["PositionBase"]["Uic"]] for raw in raws]
+    currencies = ["EUR"] * len(raws)
+    return lambda: normalize_positions(raws, instruments, currencies)
+
+
+def _portfolio_summary(env):
+    return lambda: portfolio_summary(env.normalized, env.balance)
+
+
+def _instrument_cache_read(env):
+    uic, row = next(iter(env.fake.instruments.items()))
+    key = env.web._instrument_cache_key(env.client, uic, row["AssetType"])
+    # A new cache object has a cold memory layer and must read the shared file.
+    return lambda: env.web.InstrumentCache(env.cache_path).get(key)
+
+
+def _instrument_cache_write(env):
+    cache = env.web.InstrumentCache(env.cache_path)
+    metadata = {"symbol": "BENCH:xams", "company_name": "Bench"}
+    return lambda: cache.put("bench|Stock|0", metadata)
+
+
+def _api_dashboard(env):
+    def request():
+        response = env.http.get("/api/dashboard")
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/dashboard returned HTTP {response.status_code}")
+
+    return request
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[BenchEnvironment], Callable[[], object]]
+
+
+CASES = [
+    Case("positions", _positions),
+    Case("enrich_order_rows", _enrich_order_rows),
+    Case("compact_order", _compact_order),
+    Case("normalize_position", _normalize_position),
+    Case("normalize_positions", _normalize_positions),
+    Case("portfolio_summary", _portfolio_summary),
+    Case("instrument_cache_read", _instrument_cache_read),
+    Case("instrument_cache_write", _instrument_cache_write),
+    Case("api_dashboard", _api_dashboard),
+]
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted ``samples``."""
+    index = max(0, min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def measure(
+    function: Callable[[], object],
+    budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+    min_iterations: int = 5,
+    max_iterations: int = 10000,
+) -> dict:
+    function()  # Warm caches and lazy imports outside the timed loop.
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_iterations and (
+        len(samples) < min_iterations or time.perf_counter() - started < budget_seconds
+    ):
+        begin = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    # Tracing slows every allocation, so memory is measured on a separate run.
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+        "throughput_per_s": round(len(samples) / elapsed, 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run(
+    sizes=SIZES,
+    cases=None,
+    budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+    min_iterations: int = 5,
+) -> dict:
+    selected = [case for case in CASES if cases is None or case.name in cases]
+    results = {}
+    for size in sizes:
+        with BenchEnvironment(size) as env:
+            for case in selected:
+                metrics = measure(case.setup(env), budget_seconds, min_iterations)
+                metrics["items_per_s"] = round(metrics["throughput_per_s"] * size, 1)
+                results[f"{case.name}[{size}]"] = metrics
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "budget_seconds": budget_seconds,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: dict,
+    baseline: dict,
+    threshold: float = DEFAULT_THRESHOLD,
+    metric_thresholds: dict[str, float] | None = None,
+) -> list[str]:
+    """Return a description of every metric that regressed beyond its threshold."""
+    metric_thresholds = metric_thresholds or {}
+    regressions = []
+    for name, metrics in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            limit = metric_thresholds.get(metric, threshold)
+            if change > limit:
+                regressions.append(
+                    f"{name} {metric}: {old} -> {new} ({change:+.0%} worse, limit {limit:.0%})"
+                )
+    return regressions
+
+
+def _metric_threshold(value: str) -> tuple[str, float]:
+    metric, separator, fraction = value.partition("=")
+    if not separator or metric not in COMPARED_METRICS:
+        raise argparse.ArgumentTypeError(f"expected METRIC=FRACTION, got {value!r}")
+    return metric, float(fraction)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Saxo dashboard hot paths")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="Comma-separated portfolio sizes",
+    )
+    parser.add_argument(
+        "--cases",
+        help="Comma-separated cases: " + ", ".join(case.name for case in CASES),
+    )
+    parser.add_argument(
+        "--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Seconds per case"
+    )
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail on regressions vs baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed relative regression, e.g. 0.2 for 20%%",
+    )
+    parser.add_argument(
+        "--metric-threshold",
+        type=_metric_threshold,
+        action="append",
+        default=[],
+        metavar="METRIC=FRACTION",
+        help="Per-metric threshold override, e.g. p99_ms=0.5",
+    )
+    args = parser.parse_args(argv)
+
+    cases = {name.strip() for name in args.cases.split(",")} if args.cases else None
+    unknown = (cases or set()) - {case.name for case in CASES}
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = run(sizes, cases, args.budget)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.threshold, dict(args.metric_threshold))
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
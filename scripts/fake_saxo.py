@@ -0,0 +1,1215 @@
+#!/usr/bin/env python3
+"""Offline fake of the Saxo OpenAPI endpoints used by the CLI and dashboard.
+
+The fake generates a reproducible portfolio (accounts, balances, positions,
+working orders, order activities, instruments and prices) from a seed and
+serves it either over HTTP or in-process through an ``httpx`` transport. It can
+inject latency, session rate limits (429 with ``X-RateLimit-*`` headers) and
+5xx faults, so benchmarks and load tests run without network access.
+
+Run it next to the CLI::
+
+    python scripts/fake_saxo.py --positions 1000 --orders 200 --latency lognormal:40,0.5
+
+and export the printed ``SAXO_BASE_URL``/``SAXO_TOKEN_ENDPOINT``/``TOKEN_FILE``
+values. Tests use the ``fake_saxo`` pytest fixture from ``tests/conftest.py``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+DEFAULT_TOKEN = "fake-access-token"
+DEFAULT_REFRESH_TOKEN = "fake-refresh-token"
+TOKEN_LIFETIME_SECONDS = 1200
+REFRESH_TOKEN_LIFETIME_SECONDS = 3600
+
+EXCHANGES = [
+    ("xams", "AMS", "EUR"),
+    ("xpar", "PAR", "EUR"),
+    ("xetr", "FSE", "EUR"),
+    ("xnas", "NASDAQ", "USD"),
+    ("xnys", "NYSE", "USD"),
+    ("xlon", "LSE", "GBP"),
+]
+ASSET_TYPES = ["Stock"] * 8 + ["Etf", "Bond"]
+SYLLABLES = ["ar", "bel", "cor", "dan", "el", "fin", "gra", "hol", "ion", "kal", "lum", "mer"]
+SUFFIXES = ["Holding", "Group", "Industries", "Technologies", "Capital", "Energy", "Pharma"]
+# FxSpot crosses between the exchange currencies: symbol -> (UIC, mid).
+FX_SPOTS = {"EURUSD": (21, 1.0850), "EURGBP": (17, 0.8550), "GBPUSD": (31, 1.2690)}
+# Chart bars per instrument and horizon, ending with the current (forming) bar.
+CHART_BARS = 2500
+CHART_MAX_COUNT = 1200
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Per-request latency distribution in milliseconds.
+
+    ``spec`` strings look like ``constant:20``, ``uniform:5,50``,
+    ``normal:30,10`` or ``lognormal:40,0.5`` (median and sigma).
+    """
+
+    distribution: str = "none"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str | None) -> Latency:
+        if not spec or spec == "none":
+            return cls()
+        name, _, values = spec.partition(":")
+        numbers = [float(value) for value in values.split(",") if value.strip()]
+        if name not in {"constant", "uniform", "normal", "lognormal"} or not numbers:
+            raise ValueError(f"Unsupported latency specification: {spec!r}")
+        return cls(name, numbers[0], numbers[1] if len(numbers) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        """Return one latency in seconds."""
+        if self.distribution == "constant":
+            millis = self.a
+        elif self.distribution == "uniform":
+            millis = rng.uniform(self.a, self.b)
+        elif self.distribution == "normal":
+            millis = rng.gauss(self.a, self.b)
+        elif self.distribution == "lognormal":
+            millis = self.a * math.exp(rng.gauss(0.0, self.b))
+        else:
+            return 0.0
+        return max(millis, 0.0) / 1000
+
+
+@dataclass
+class FakeSaxoConfig:
+    positions: int = 25
+    orders: int = 10
+    activities: int = 50
+    # Activities are spread over this many local days, ending now.
+    activity_days: int = 1
+    instruments: int = 0
+    # Stocks that get an option root, each with expiries x strikes x call/put.
+    option_roots: int = 0
+    option_expiries: int = 4
+    option_strikes: int = 21
+    # Short option positions on random contracts of those roots.
+    option_positions: int = 0
+    seed: int = 0
+    currency: str = "EUR"
+    token: str = DEFAULT_TOKEN
+    latency: Latency = field(default_factory=Latency)
+    # Route name (for example ``positions``) to a latency overriding ``latency``.
+    route_latency: dict[str, Latency] = field(default_factory=dict)
+    # Requests allowed per ``rate_limit_window`` seconds; ``None`` disables it.
+    rate_limit: int | None = None
+    rate_limit_window: float = 60.0
+    fault_rate: float = 0.0
+    fault_statuses: tuple[int, ...] = (500, 502, 503)
+
+
+@dataclass
+class FakeResponse:
+    status: int
+    payload: object = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def body(self) -> bytes:
+        return b"" if self.payload is None else json.dumps(self.payload).encode()
+
+
+def _iso(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _third_friday(month):
+    first_friday = month + timedelta(days=(4 - month.weekday()) % 7)
+    return first_friday + timedelta(days=14)
+
+
+def _strike_step(price: float) -> float:
+    for step in (0.5, 1, 2.5, 5, 10, 25, 50):
+        if price / step <= 40:
+            return step
+    return 100
+
+
+def _black_scholes(spot, strike, years, volatility, put_call):
+    """Undiscounted Black-Scholes price; enough for plausible option quotes."""
+    if years <= 0 or volatility <= 0:
+        intrinsic = spot - strike if put_call == "Call" else strike - spot
+        return max(intrinsic, 0.0)
+    deviation = volatility * math.sqrt(years)
+    d1 = (math.log(spot / strike) + 0.5 * deviation**2) / deviation
+    d2 = d1 - deviation
+
+    def cdf(value):
+        return 0.5 * (1 + math.erf(value / math.sqrt(2)))
+
+    if put_call == "Call":
+        return spot * cdf(d1) - strike * cdf(d2)
+    return strike * cdf(-d2) - spot * cdf(-d1)
+
+
+class FakeSaxo:
+    """In-memory Saxo OpenAPI gateway.
+
+    ``handle`` is transport independent; ``transport()`` and ``FakeSaxoServer``
+    adapt it to in-process ``httpx`` clients and real HTTP respectively.
+    """
+
+    def __init__(self, config: FakeSaxoConfig | None = None, **options):
+        self.config = config or FakeSaxoConfig(**options)
+        self.requests: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed + 1)
+        self._forced_faults: list[int] = []
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._next_order_id = 76000000
+        self._bars: dict[tuple[int, int], tuple[list[float], list[dict]]] = {}
+        self._bars_until = time.time()
+        self._routes = [
+            ("GET", re.compile(r"/port/v1/accounts/me"), "accounts", self._accounts),
+            ("GET", re.compile(r"/port/v1/balances/me"), "balances", self._balances),
+            ("GET", re.compile(r"/port/v1/positions/me"), "positions", self._positions),
+            ("GET", re.compile(r"/port/v1/orders/me"), "orders", self._orders),
+            (
+                "GET",
+                re.compile(r"/cs/v1/audit/orderactivities"),
+                "order_activities",
+                self._order_activities,
+            ),
+            (
+                "GET",
+                re.compile(r"/ref/v1/instruments/details/(?P<uic>\d+)/(?P<asset_type>\w+)"),
+                "instrument_details",
+                self._instrument_details,
+            ),
+            (
+                "GET",
+                re.compile(r"/ref/v1/instruments/contractoptionspaces/(?P<root_id>\d+)"),
+                "option_space",
+                self._option_space,
+            ),
+            ("GET", re.compile(r"/ref/v1/instruments"), "instrument_search", self._search),
+            ("GET", re.compile(r"/chart/v3/charts"), "chart", self._chart),
+            ("GET", re.compile(r"/trade/v1/infoprices/list"), "infoprices_list", self._infoprices),
+            ("GET", re.compile(r"/trade/v1/infoprices"), "infoprices", self._infoprice),
+            ("POST", re.compile(r"/trade/v2/orders"), "place_order", self._place_order),
+            (
+                "DELETE",
+                re.compile(r"/trade/v2/orders/(?P<order_ids>[^/]+)"),
+                "cancel_orders",
+                self._cancel_orders,
+            ),
+        ]
+        self._generate()
+
+    #########################
+    # Data generation
+    #########################
+    def _generate(self):
+        config = self.config
+        rng = random.Random(config.seed)
+        self.account = {
+            "AccountGroupKey": "fakeGroupKey",
+            "AccountId": "FAKE-0001",
+            "AccountKey": "fakeAccountKey",
+            "AccountType": "Normal",
+            "Active": True,
+            "ClientId": "FAKE",
+            "ClientKey": "fakeClientKey",
+            "Currency": config.currency,
+            "CurrencyDecimals": 2,
+            "DisplayName": "Fake trading account",
+        }
+        count = max(config.instruments, config.positions, config.orders, 20)
+        self.instruments = {}
+        used_symbols = set()
+        for index in range(count):
+            uic = 100000 + index
+            mic, exchange_id, currency = rng.choice(EXCHANGES)
+            name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            ticker, suffix = name[:4].upper(), 0
+            while f"{ticker}:{mic}" in used_symbols:
+                suffix += 1
+                ticker = f"{name[:3].upper()}{suffix}"
+            used_symbols.add(f"{ticker}:{mic}")
+            asset_type = rng.choice(ASSET_TYPES)
+            self.instruments[uic] = {
+                "AssetType": asset_type,
+                "CurrencyCode": currency,
+                "Description": f"{name} {rng.choice(SUFFIXES)}",
+                "ExchangeId": exchange_id,
+                "Format": {"Decimals": 2, "OrderDecimals": 2},
+                "IsTradable": True,
+                "PriceCurrency": currency,
+                "Symbol": f"{ticker}:{mic}",
+                "TradableAs": [asset_type],
+                "Uic": uic,
+                "_price": round(rng.lognormvariate(math.log(60), 0.8), 2),
+                "_day_change": round(rng.gauss(0, 1.5), 2),
+            }
+
+        now = datetime.now(timezone.utc)
+        local_midnight = (
+            datetime.now()
+            .astimezone()
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+            .astimezone(timezone.utc)
+        )
+        elapsed_today = max((now - local_midnight).total_seconds(), 1.0)
+        uics = list(self.instruments)
+
+        self.positions = []
+        for index, uic in enumerate(rng.sample(uics, config.positions)):
+            instrument = self.instruments[uic]
+            amount = rng.choice([1, 5, 10, 25, 50, 100, 250]) * (-1 if rng.random() < 0.05 else 1)
+            current = instrument["_price"]
+            open_price = round(current * rng.uniform(0.7, 1.3), 2)
+            profit_loss = round((current - open_price) * amount, 2)
+            opened = now - timedelta(days=rng.randint(1, 900))
+            position_id = str(5000000000 + index)
+            self.positions.append(
+                {
+                    "NetPositionId": f"{uic}__{instrument['AssetType']}",
+                    "PositionId": position_id,
+                    "PositionBase": {
+                        "AccountId": self.account["AccountId"],
+                        "AccountKey": self.account["AccountKey"],
+                        "Amount": amount,
+                        "AssetType": instrument["AssetType"],
+                        "CanBeClosed": True,
+                        "ClientId": self.account["ClientId"],
+                        "ExecutionTimeOpen": _iso(opened),
+                        "IsMarketOpen": True,
+                        "OpenPrice": open_price,
+                        "SourceOrderId": str(self._allocate_order_id()),
+                        "Status": "Open",
+                        "Uic": uic,
+                        "ValueDate": _iso(opened + timedelta(days=2)),
+                    },
+                    "PositionView": {
+                        "Ask": round(current * 1.001, 2),
+                        "Bid": round(current * 0.999, 2),
+                        "CalculationReliability": "Ok",
+                        "CurrentPrice": current,
+                        "CurrentPriceDelayMinutes": 0,
+                        "CurrentPriceType": "Bid",
+                        "Exposure": round(current * amount, 2),
+                        "ExposureCurrency": instrument["CurrencyCode"],
+                        "InstrumentPriceDayPercentChange": instrument["_day_change"],
+                        "MarketValue": round(current * amount, 2),
+                        "ProfitLossOnTrade": profit_loss,
+                        "ProfitLossOnTradeInBaseCurrency": profit_loss,
+                    },
+                }
+            )
+
+        self.orders = []
+        for uic in rng.sample(uics, config.orders):
+            self.orders.append(
+                self._working_order(
+                    self.instruments[uic],
+                    rng.choice(["Buy", "Sell"]),
+                    rng.choice([1, 5, 10, 50]),
+                    round(self.instruments[uic]["_price"] * rng.uniform(0.9, 1.1), 2),
+                    now - timedelta(seconds=rng.uniform(0, elapsed_today)),
+                )
+            )
+
+        activity_span = elapsed_today + 86400 * max(config.activity_days - 1, 0)
+        self.activities = []
+        for _ in range(config.activities):
+            instrument = self.instruments[rng.choice(uics)]
+            status = rng.choice(["Placed", "Filled", "Filled", "Cancelled", "Working"])
+            amount = rng.choice([1, 5, 10, 50])
+            self._record_activity(
+                instrument,
+                str(self._allocate_order_id()),
+                rng.choice(["Buy", "Sell"]),
+                amount,
+                round(instrument["_price"] * rng.uniform(0.95, 1.05), 2),
+                status,
+                now - timedelta(seconds=rng.uniform(0, activity_span)),
+            )
+        self.activities.sort(key=lambda row: row["ActivityTime"], reverse=True)
+        self._generate_options(now)
+        self.fx_spots = {
+            uic: {
+                "AssetType": "FxSpot",
+                "CurrencyCode": symbol[3:],
+                "Description": f"{symbol[:3]}/{symbol[3:]}",
+                "ExchangeId": "SBFX",
+                "Format": {"Decimals": 4, "OrderDecimals": 4},
+                "IsTradable": True,
+                "PriceCurrency": symbol[3:],
+                "Symbol": symbol,
+                "TradableAs": ["FxSpot"],
+                "Uic": uic,
+                "_price": price,
+            }
+            for symbol, (uic, price) in FX_SPOTS.items()
+        }
+
+    def _generate_options(self, now):
+        """Option roots on the first ``option_roots`` stocks, from their own seed."""
+        config = self.config
+        rng = random.Random(config.seed + 2)
+        self.option_roots = {}
+        self.option_contracts = {}
+        stocks = [row for row in self.instruments.values() if row["AssetType"] == "Stock"]
+        next_uic = 5000000
+        for index, underlying in enumerate(stocks[: config.option_roots]):
+            root_id = 900 + index
+            price = underlying["_price"]
+            step = _strike_step(price)
+            center = round(price / step) * step
+            strikes = [
+                round(center + (offset - config.option_strikes // 2) * step, 4)
+                for offset in range(config.option_strikes)
+            ]
+            strikes = [strike for strike in strikes if strike > 0]
+            expiries = []
+            month = now.date().replace(day=1)
+            while len(expiries) < config.option_expiries:
+                month = (month + timedelta(days=32)).replace(day=1)
+                expiries.append(_third_friday(month))
+            ticker, mic = underlying["Symbol"].split(":")
+            self.option_roots[root_id] = {
+                "OptionRootId": root_id,
+                "Underlying": underlying,
+                "Expiries": expiries,
+                "Strikes": strikes,
+                "_volatility": round(rng.uniform(0.15, 0.6), 4),
+            }
+            for expiry in expiries:
+                for strike in strikes:
+                    for put_call in ("Call", "Put"):
+                        next_uic += 1
+                        self.option_contracts[next_uic] = {
+                            "AssetType": "StockOption",
+                            "CurrencyCode": underlying["CurrencyCode"],
+                            "Description": (
+                                f"{underlying['Description']} {expiry:%d%b%y} {strike:g} {put_call}"
+                            ),
+                            "ExchangeId": underlying["ExchangeId"],
+                            "Format": {"Decimals": 2, "OrderDecimals": 2},
+                            "IsTradable": True,
+                            "ContractSize": 100,
+                            "OptionsData": {
+                                "ExerciseStyle": "American",
+                                "ExpiryDate": expiry.isoformat(),
+                                "PutCall": put_call,
+                                "StrikePrice": strike,
+                                "UnderlyingUic": underlying["Uic"],
+                            },
+                            "PriceCurrency": underlying["CurrencyCode"],
+                            "Symbol": f"{ticker}/{expiry:%d%b%y}{put_call[0]}{strike:g}:{mic}",
+                            "Uic": next_uic,
+                            "_root": root_id,
+                            "_expiry": expiry,
+                            "_strike": strike,
+                            "_put_call": put_call,
+                        }
+        contracts = list(self.option_contracts.values())
+        for index in range(min(config.option_positions, len(contracts))):
+            contract = rng.choice(contracts)
+            amount = -rng.choice([1, 2, 5, 10])
+            current = self.option_price(contract, now)
+            open_price = round(current * rng.uniform(0.6, 1.4), 2)
+            profit_loss = round((current - open_price) * amount * 100, 2)
+            self.positions.append(
+                {
+                    "NetPositionId": f"{contract['Uic']}__StockOption",
+                    "PositionId": str(5100000000 + index),
+                    "PositionBase": {
+                        "AccountId": self.account["AccountId"],
+                        "AccountKey": self.account["AccountKey"],
+                        "Amount": amount,
+                        "AssetType": "StockOption",
+                        "CanBeClosed": True,
+                        "ClientId": self.account["ClientId"],
+                        "ExecutionTimeOpen": _iso(now - timedelta(days=rng.randint(1, 30))),
+                        "OpenPrice": open_price,
+                        "Status": "Open",
+                        "Uic": contract["Uic"],
+                    },
+                    "PositionView": {
+                        "CalculationReliability": "Ok",
+                        "CurrentPrice": current,
+                        "CurrentPriceType": "Mid",
+                        "Exposure": round(current * amount * 100, 2),
+                        "ExposureCurrency": contract["CurrencyCode"],
+                        "MarketValue": round(current * amount * 100, 2),
+                        "ProfitLossOnTrade": profit_loss,
+                        "ProfitLossOnTradeInBaseCurrency": profit_loss,
+                    },
+                }
+            )
+
+    def _allocate_order_id(self) -> int:
+        self._next_order_id += 1
+        return self._next_order_id
+
+    def _display(self, instrument):
+        return {
+            "Currency": instrument["CurrencyCode"],
+            "Decimals": 2,
+            "Description": instrument["Description"],
+            "Format": "Normal",
+            "OrderDecimals": 2,
+            "Symbol": instrument["Symbol"],
+        }
+
+    def _working_order(self, instrument, buy_sell, amount, price, placed, order_type="Limit"):
+        return {
+            "AccountId": self.account["AccountId"],
+            "AccountKey": self.account["AccountKey"],
+            "Amount": amount,
+            "AssetType": instrument["AssetType"],
+            "BuySell": buy_sell,
+            "CalculationReliability": "Ok",
+            "ClientKey": self.account["ClientKey"],
+            "CurrentPrice": instrument["_price"],
+            "DisplayAndFormat": self._display(instrument),
+            "Duration": {"DurationType": "GoodTillCancel"},
+            "FilledAmount": 0,
+            "OpenOrderType": order_type,
+            "OrderId": str(self._allocate_order_id()),
+            "OrderTime": _iso(placed),
+            "Price": price,
+            "Status": "Working",
+            "Uic": instrument["Uic"],
+        }
+
+    def _record_activity(self, instrument, order_id, buy_sell, amount, price, status, moment):
+        filled = status == "Filled"
+        self.activities.insert(
+            0,
+            {
+                "AccountId": self.account["AccountId"],
+                "AccountKey": self.account["AccountKey"],
+                "ActivityTime": _iso(moment),
+                "Amount": amount,
+                "AssetType": instrument["AssetType"],
+                "AveragePrice": price if filled else None,
+                "BuySell": buy_sell,
+                "DisplayAndFormat": self._display(instrument),
+                "Duration": {"DurationType": "DayOrder"},
+                "FilledAmount": amount if filled else 0,
+                "LogId": str(len(self.activities) + 1),
+                "OrderId": order_id,
+                "OrderType": "Limit",
+                "Price": price,
+                "Status": status,
+                "SubStatus": "Confirmed",
+                "Uic": instrument["Uic"],
+            },
+        )
+
+    #########################
+    # Request handling
+    #########################
+    def fail_next(self, status: int = 503, count: int = 1) -> None:
+        """Force the next ``count`` API requests to fail with ``status``."""
+        with self._lock:
+            self._forced_faults.extend([status] * count)
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def handle(self, method, path, params=None, body=None, headers=None) -> FakeResponse:
+        """Serve one request; ``path`` may include a ``/sim/openapi`` style prefix."""
+        method = method.upper()
+        params = dict(params or {})
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        _, marker, endpoint = path.partition("/openapi")
+        endpoint = endpoint if marker else path
+        if endpoint.rstrip("/") == "/token" and method == "POST":
+            return self._token(body)
+
+        for route_method, pattern, name, handler in self._routes:
+            match = pattern.fullmatch(endpoint.rstrip("/"))
+            if route_method != method or match is None:
+                continue
+            delay, fault, limit_headers = self._admit(name)
+            if delay:
+                time.sleep(delay)
+            if limit_headers.get("Retry-After"):
+                return FakeResponse(
+                    429,
+                    {"ErrorCode": "RateLimitExceeded", "Message": "Request rate exceeded."},
+                    limit_headers,
+                )
+            if headers.get("authorization") != f"Bearer {self.config.token}":
+                return FakeResponse(401, None, limit_headers)
+            if fault:
+                return FakeResponse(
+                    fault,
+                    {"ErrorCode": "ServiceUnavailable", "Message": "Injected fault."},
+                    limit_headers,
+                )
+            with self._lock:
+                response = handler(params=params, body=body, **match.groupdict())
+            response.headers.update(limit_headers)
+            return response
+        return FakeResponse(404, {"ErrorCode": "NotFound", "Message": f"No route {endpoint}"})
+
+    def _admit(self, route):
+        """Count the request and draw its latency, fault and rate-limit outcome."""
+        config = self.config
+        with self._lock:
+            self.requests[route] += 1
+            delay = config.route_latency.get(route, config.latency).sample(self._rng)
+            fault = None
+            if self._forced_faults:
+                fault = self._forced_faults.pop(0)
+            elif config.fault_rate and self._rng.random() < config.fault_rate:
+                fault = self._rng.choice(config.fault_statuses)
+            headers = {}
+            if config.rate_limit is not None:
+                now = time.monotonic()
+                if now - self._window_start >= config.rate_limit_window:
+                    self._window_start, self._window_count = now, 0
+                reset = max(math.ceil(self._window_start + config.rate_limit_window - now), 0)
+                headers = {
+                    "X-RateLimit-Session-Limit": str(config.rate_limit),
+                    "X-RateLimit-Session-Reset": str(reset),
+                }
+                if self._window_count >= config.rate_limit:
+                    headers["X-RateLimit-Session-Remaining"] = "0"
+                    headers["Retry-After"] = str(max(reset, 1))
+                    return delay, None, headers
+                self._window_count += 1
+                headers["X-RateLimit-Session-Remaining"] = str(
+                    config.rate_limit - self._window_count
+                )
+        return delay, fault, headers
+
+    def _token(self, body):
+        form = body if isinstance(body, dict) else {}
+        grant_type = form.get("grant_type")
+        if grant_type == "refresh_token" and form.get("refresh_token") != DEFAULT_REFRESH_TOKEN:
+            return FakeResponse(401, {"error": "invalid_grant"})
+        if grant_type not in {"refresh_token", "authorization_code"}:
+            return FakeResponse(400, {"error": "unsupported_grant_type"})
+        with self._lock:
+            self.requests["token"] += 1
+        return FakeResponse(201, self.token_payload())
+
+    def token_payload(self) -> dict:
+        return {
+            "access_token": self.config.token,
+            "token_type": "Bearer",
+            "expires_in": TOKEN_LIFETIME_SECONDS,
+            "refresh_token": DEFAULT_REFRESH_TOKEN,
+            "refresh_token_expires_in": REFRESH_TOKEN_LIFETIME_SECONDS,
+        }
+
+    def write_token_file(self, path: str) -> str:
+        """Write a token file that ``SaxoClient`` accepts without logging in."""
+        now = int(time.time())
+        tokens = {
+            "access_token": self.config.token,
+            "token_type": "Bearer",
+            "refresh_token": DEFAULT_REFRESH_TOKEN,
+            "access_token_expires_at": now + TOKEN_LIFETIME_SECONDS,
+            "refresh_token_expires_at": now + REFRESH_TOKEN_LIFETIME_SECONDS,
+        }
+        path = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(tokens, file, indent=2)
+        return path
+
+    #########################
+    # Endpoints
+    #########################
+    @staticmethod
+    def _public(instrument):
+        return {key: value for key, value in instrument.items() if not key.startswith("_")}
+
+    @staticmethod
+    def _page(rows, params):
+        top = int(params.get("$top", len(rows) or 1))
+        skip = int(params.get("$skip", 0))
+        page = {"__count": len(rows), "Data": rows[skip : skip + top]}
+        if skip + top < len(rows):
+            page["__next"] = f"?$top={top}&$skip={skip + top}"
+        return FakeResponse(200, page)
+
+    def _instrument(self, uic):
+        try:
+            uic = int(uic)
+        except (TypeError, ValueError):
+            return None
+        return self.instruments.get(uic) or self.option_contracts.get(uic) or self.fx_spots.get(uic)
+
+    def option_price(self, contract, now=None):
+        """The model mid price of an option contract."""
+        root = self.option_roots[contract["_root"]]
+        now = now or datetime.now(timezone.utc)
+        expiry = datetime.combine(contract["_expiry"], datetime.min.time(), timezone.utc)
+        years = max((expiry - now).total_seconds(), 0) / (365 * 86400)
+        price = _black_scholes(
+            root["Underlying"]["_price"],
+            contract["_strike"],
+            years,
+            root["_volatility"],
+            contract["_put_call"],
+        )
+        return max(round(price, 2), 0.01)
+
+    def _error(self, status, message, code="InvalidRequest"):
+        return FakeResponse(status, {"ErrorCode": code, "Message": message})
+
+    def _accounts(self, params, body):
+        return FakeResponse(200, {"Data": [dict(self.account)]})
+
+    def _balances(self, params, body):
+        market_value = sum(row["PositionView"]["MarketValue"] for row in self.positions)
+        cash = round(25000 + 0.1 * abs(market_value), 2)
+        return FakeResponse(
+            200,
+            {
+                "CalculationReliability": "Ok",
+                "CashAvailableForTrading": cash,
+                "CashBalance": cash,
+                "Currency": self.config.currency,
+                "CurrencyDecimals": 2,
+                "MarginUsedByCurrentPositions": round(0.05 * abs(market_value), 2),
+                "NetEquityForMargin": round(cash + market_value, 2),
+                "NetPositionsCount": len(self.positions),
+                "OpenPositionsCount": len(self.positions),
+                "OrdersCount": len(self.orders),
+                "TotalValue": round(cash + market_value, 2),
+                "UnrealizedMarginProfitLoss": round(
+                    sum(row["PositionView"]["ProfitLossOnTrade"] for row in self.positions), 2
+                ),
+            },
+        )
+
+    def _positions(self, params, body):
+        return self._page(self.positions, params)
+
+    def _orders(self, params, body):
+        return self._page(self.orders, params)
+
+    def _order_activities(self, params, body):
+        rows = self.activities
+        if params.get("FromDateTime"):
+            start = _parse_iso(params["FromDateTime"])
+            rows = [row for row in rows if _parse_iso(row["ActivityTime"]) >= start]
+        if params.get("ToDateTime"):
+            end = _parse_iso(params["ToDateTime"])
+            rows = [row for row in rows if _parse_iso(row["ActivityTime"]) <= end]
+        return self._page(rows, params)
+
+    def _instrument_details(self, params, body, uic, asset_type):
+        instrument = self._instrument(uic)
+        if instrument is None or instrument["AssetType"] != asset_type:
+            return self._error(404, f"Instrument {uic}/{asset_type} not found.", "NotFound")
+        return FakeResponse(200, self._public(instrument))
+
+    def _search(self, params, body):
+        keywords = str(params.get("Keywords") or "").casefold()
+        asset_types = {value for value in str(params.get("AssetTypes") or "").split(",") if value}
+        rows = []
+        listed = [*self.instruments.values()]
+        if not asset_types or "FxSpot" in asset_types:
+            listed += self.fx_spots.values()
+        for instrument in listed:
+            if asset_types and instrument["AssetType"] not in asset_types:
+                continue
+            symbol, description = instrument["Symbol"], instrument["Description"]
+            if keywords and not (
+                symbol.casefold().startswith(keywords) or keywords in description.casefold()
+            ):
+                continue
+            rows.append(
+                {
+                    "AssetType": instrument["AssetType"],
+                    "CurrencyCode": instrument["CurrencyCode"],
+                    "Description": description,
+                    "ExchangeId": instrument["ExchangeId"],
+                    "Identifier": instrument["Uic"],
+                    "SummaryType": "Instrument",
+                    "Symbol": symbol,
+                }
+            )
+        if "StockOption" in asset_types:
+            for root in self.option_roots.values():
+                underlying = root["Underlying"]
+                symbol, description = underlying["Symbol"], underlying["Description"]
+                if keywords and not (
+                    symbol.casefold().startswith(keywords) or keywords in description.casefold()
+                ):
+                    continue
+                rows.append(
+                    {
+                        "AssetType": "StockOption",
+                        "CurrencyCode": underlying["CurrencyCode"],
+                        "Description": description,
+                        "ExchangeId": underlying["ExchangeId"],
+                        "Identifier": root["OptionRootId"],
+                        "SummaryType": "ContractOptionRoot",
+                        "Symbol": symbol,
+                    }
+                )
+        return self._page(rows, {"$top": params.get("$top", 50)})
+
+    def _option_space(self, params, body, root_id):
+        root = self.option_roots.get(int(root_id))
+        if root is None:
+            return self._error(404, f"Option root {root_id} not found.", "NotFound")
+        # Like Saxo, only the default expiry lists its contracts unless asked.
+        segment = params.get("OptionSpaceSegment", "DefaultDates")
+        wanted = {value for value in str(params.get("ExpiryDates") or "").split(",") if value}
+        if segment == "DefaultDates":
+            wanted = {root["Expiries"][0].isoformat()}
+        contracts = {}
+        for contract in self.option_contracts.values():
+            if contract["_root"] == root["OptionRootId"]:
+                contracts.setdefault(contract["_expiry"], []).append(contract)
+        space = []
+        for expiry in root["Expiries"]:
+            entry = {
+                "DisplayDaysToExpiry": (expiry - datetime.now(timezone.utc).date()).days,
+                "DisplayExpiry": expiry.isoformat(),
+                "Expiry": expiry.isoformat(),
+                "LastTradeDate": f"{expiry.isoformat()}T20:00:00.000000Z",
+            }
+            if segment == "AllDates" or expiry.isoformat() in wanted:
+                entry["SpecificOptions"] = [
+                    {
+                        "PutCall": contract["_put_call"],
+                        "StrikePrice": contract["_strike"],
+                        "TradingStatus": "Tradable",
+                        "Uic": contract["Uic"],
+                    }
+                    for contract in contracts.get(expiry, [])
+                ]
+            space.append(entry)
+        underlying = root["Underlying"]
+        return FakeResponse(
+            200,
+            {
+                "AssetType": "StockOption",
+                "CurrencyCode": underlying["CurrencyCode"],
+                "DefaultExpiry": root["Expiries"][0].isoformat(),
+                "Description": underlying["Description"],
+                "ExchangeId": underlying["ExchangeId"],
+                "OptionRootId": root["OptionRootId"],
+                "OptionSpace": space,
+                "UnderlyingAssetType": underlying["AssetType"],
+                "UnderlyingUic": underlying["Uic"],
+            },
+        )
+
+    def _price_row(self, instrument, asset_type=None):
+        if instrument["AssetType"] == "StockOption":
+            price = self.option_price(instrument)
+            half_spread = max(round(price * 0.02, 2), 0.01)
+            bid, ask = max(round(price - half_spread, 2), 0.0), round(price + half_spread, 2)
+        else:
+            price = instrument["_price"]
+            bid, ask = round(price * 0.999, 2), round(price * 1.001, 2)
+        return {
+            "AssetType": asset_type or instrument["AssetType"],
+            "DisplayAndFormat": self._display(instrument),
+            "LastUpdated": _iso(datetime.now(timezone.utc)),
+            "PriceSource": instrument["ExchangeId"],
+            "Quote": {
+                "Amount": 100000,
+                "Ask": ask,
+                "Bid": bid,
+                "DelayedByMinutes": 15,
+                "ErrorCode": "None",
+                "MarketState": "Open",
+                "Mid": price,
+                "PriceTypeAsk": "Tradable",
+                "PriceTypeBid": "Tradable",
+            },
+            "Uic": instrument["Uic"],
+        }
+
+    def _infoprice(self, params, body):
+        instrument = self._instrument(params.get("Uic"))
+        if instrument is None:
+            return self._error(404, f"Instrument {params.get('Uic')} not found.", "NotFound")
+        return FakeResponse(200, self._price_row(instrument, params.get("AssetType")))
+
+    def _infoprices(self, params, body):
+        asset_type = params.get("AssetType")
+        rows = []
+        for uic in str(params.get("Uics") or "").split(","):
+            instrument = self._instrument(uic)
+            if instrument is not None and instrument["AssetType"] == asset_type:
+                rows.append(self._price_row(instrument, asset_type))
+        return FakeResponse(200, {"Data": rows})
+
+    def bars(self, uic: int, horizon: int) -> tuple[list[float], list[dict]]:
+        """Bar start times and ``Data`` rows of one instrument, oldest first.
+
+        Closes follow a random walk ending at the instrument's price, driven
+        partly by a market factor shared by every instrument of the horizon,
+        so returns are correlated.
+        """
+        key = (uic, horizon)
+        if key not in self._bars:
+            instrument = self._instrument(uic)
+            step = horizon * 60
+            latest = self._bars_until // step * step
+            market = random.Random(f"{self.config.seed}-market-{horizon}")
+            rng = random.Random(f"{self.config.seed}-{uic}-{horizon}")
+            weight = rng.uniform(0.3, 0.8)
+            volatility = rng.uniform(0.01, 0.03) * math.sqrt(horizon / 1440)
+            close = instrument["_price"]
+            times, rows = [], []
+            for index in range(CHART_BARS):
+                move = volatility * (
+                    weight * market.gauss(0, 1) + math.sqrt(1 - weight**2) * rng.gauss(0, 1)
+                )
+                open_ = close / math.exp(move)
+                moment = latest - index * step
+                times.append(moment)
+                rows.append(
+                    {
+                        "Close": round(close, 4),
+                        "High": round(max(open_, close) * (1 + abs(rng.gauss(0, volatility))), 4),
+                        "Low": round(min(open_, close) * (1 - abs(rng.gauss(0, volatility))), 4),
+                        "Open": round(open_, 4),
+                        "Time": _iso(datetime.fromtimestamp(moment, timezone.utc)),
+                        "Volume": rng.randint(1000, 100000),
+                    }
+                )
+                close = open_
+            self._bars[key] = (times[::-1], rows[::-1])
+        return self._bars[key]
+
+    def _chart(self, params, body):
+        instrument = self._instrument(params.get("Uic"))
+        if instrument is None or "_price" not in instrument:
+            return self._error(404, f"No chart data for {params.get('Uic')}.", "NotFound")
+        count = int(params.get("Count", CHART_MAX_COUNT))
+        if count > CHART_MAX_COUNT:
+            return self._error(400, f"Count must be at most {CHART_MAX_COUNT}.")
+        times, rows = self.bars(instrument["Uic"], int(params.get("Horizon", 1440)))
+        moment = _parse_iso(params["Time"]).timestamp() if params.get("Time") else None
+        if params.get("Mode") == "From":
+            start = 0 if moment is None else bisect_left(times, moment)
+            data = rows[start : start + count]
+        else:
+            end = len(times) if moment is None else bisect_right(times, moment)
+            data = rows[max(end - count, 0) : end]
+        return FakeResponse(200, {"Data": data, "DataVersion": 1})
+
+    def _place_order(self, params, body):
+        order = body if isinstance(body, dict) else {}
+        instrument = self._instrument(order.get("Uic"))
+        if instrument is None:
+            return self._error(400, "Unknown or missing Uic.")
+        if order.get("AccountKey") != self.account["AccountKey"]:
+            return self._error(400, "Unknown AccountKey.")
+        if order.get("BuySell") not in {"Buy", "Sell"}:
+            return self._error(400, "BuySell must be Buy or Sell.")
+        try:
+            amount = float(order.get("Amount"))
+        except (TypeError, ValueError):
+            amount = 0
+        if amount <= 0:
+            return self._error(400, "Amount must be positive.")
+        order_type = order.get("OrderType", "Market")
+        now = datetime.now(timezone.utc)
+        if order_type == "Market":
+            order_id = str(self._allocate_order_id())
+            price = instrument["_price"]
+            self._record_activity(
+                instrument, order_id, order["BuySell"], amount, price, "Filled", now
+            )
+            self._apply_fill(instrument, order["BuySell"], amount, price, now)
+            return FakeResponse(200, {"OrderId": order_id})
+        if order.get("OrderPrice") is None:
+            return self._error(400, "OrderPrice is required for non-market orders.")
+        working = self._working_order(
+            instrument, order["BuySell"], amount, order["OrderPrice"], now, order_type
+        )
+        self.orders.append(working)
+        self._record_activity(
+            instrument,
+            working["OrderId"],
+            order["BuySell"],
+            amount,
+            order["OrderPrice"],
+            "Placed",
+            now,
+        )
+        return FakeResponse(200, {"OrderId": working["OrderId"]})
+
+    def _apply_fill(self, instrument, buy_sell, amount, price, moment):
+        signed = amount if buy_sell == "Buy" else -amount
+        for index, position in enumerate(self.positions):
+            base, view = position["PositionBase"], position["PositionView"]
+            if base["Uic"] != instrument["Uic"]:
+                continue
+            base["Amount"] += signed
+            if not base["Amount"]:
+                del self.positions[index]
+            else:
+                view["MarketValue"] = view["Exposure"] = round(price * base["Amount"], 2)
+            return
+        self.positions.append(
+            {
+                "NetPositionId": f"{instrument['Uic']}__{instrument['AssetType']}",
+                "PositionId": str(self._allocate_order_id()),
+                "PositionBase": {
+                    "AccountId": self.account["AccountId"],
+                    "AccountKey": self.account["AccountKey"],
+                    "Amount": signed,
+                    "AssetType": instrument["AssetType"],
+                    "CanBeClosed": True,
+                    "ExecutionTimeOpen": _iso(moment),
+                    "OpenPrice": price,
+                    "Status": "Open",
+                    "Uic": instrument["Uic"],
+                },
+                "PositionView": {
+                    "CalculationReliability": "Ok",
+                    "CurrentPrice": price,
+                    "Exposure": round(price * signed, 2),
+                    "InstrumentPriceDayPercentChange": instrument["_day_change"],
+                    "MarketValue": round(price * signed, 2),
+                    "ProfitLossOnTrade": 0.0,
+                },
+            }
+        )
+
+    def _cancel_orders(self, params, body, order_ids):
+        if params.get("AccountKey") != self.account["AccountKey"]:
+            return self._error(400, "Unknown AccountKey.")
+        requested = order_ids.split(",")
+        cancelled = []
+        now = datetime.now(timezone.utc)
+        for order in list(self.orders):
+            if order["OrderId"] in requested:
+                self.orders.remove(order)
+                cancelled.append({"OrderId": order["OrderId"]})
+                self._record_activity(
+                    self.instruments[order["Uic"]],
+                    order["OrderId"],
+                    order["BuySell"],
+                    order["Amount"],
+                    order["Price"],
+                    "Cancelled",
+                    now,
+                )
+        missing = [
+            {"OrderId": order_id, "ErrorInfo": {"ErrorCode": "OrderNotFound"}}
+            for order_id in requested
+            if order_id not in {row["OrderId"] for row in cancelled}
+        ]
+        return FakeResponse(200, {"Orders": cancelled + missing})
+
+    #########################
+    # Transports
+    #########################
+    def _handle_httpx(self, request: httpx.Request) -> httpx.Response:
+        body = None
+        if request.content:
+            if request.headers.get("content-type", "").startswith("application/json"):
+                body = json.loads(request.content)
+            else:
+                body = dict(parse_qsl(request.content.decode()))
+        response = self.handle(
+            request.method,
+            request.url.path,
+            dict(request.url.params),
+            body,
+            dict(request.headers),
+        )
+        headers = dict(response.headers)
+        if response.payload is not None:
+            headers["Content-Type"] = "application/json"
+        return httpx.Response(response.status, headers=headers, content=response.body())
+
+    def transport(self) -> httpx.MockTransport:
+        """Return an ``httpx`` transport serving this fake in-process."""
+        return httpx.MockTransport(self._handle_httpx)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid delayed-ACK stalls.
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = None
+        if raw:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                body = json.loads(raw)
+            else:
+                body = dict(parse_qsl(raw.decode()))
+        response = self.server.fake.handle(
+            self.command, url.path, dict(parse_qsl(url.query)), body, dict(self.headers)
+        )
+        content = response.body()
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        if content:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_DELETE = do_PUT = do_PATCH = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSaxoServer:
+    """Serve a ``FakeSaxo`` over HTTP on a background thread."""
+
+    def __init__(self, fake: FakeSaxo | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake or FakeSaxo()
+        self._server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self.fake
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/sim/openapi"
+
+    @property
+    def token_endpoint(self) -> str:
+        return f"{self.url}/token"
+
+    def start(self) -> FakeSaxoServer:
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="fake-saxo",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> FakeSaxoServer:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def config_from_args(args: argparse.Namespace) -> FakeSaxoConfig:
+    return FakeSaxoConfig(
+        positions=args.positions,
+        orders=args.orders,
+        activities=args.activities,
+        activity_days=args.activity_days,
+        option_roots=args.option_roots,
+        option_positions=args.option_positions,
+        seed=args.seed,
+        latency=Latency.parse(args.latency),
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        fault_rate=args.fault_rate,
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--positions", type=int, default=25, help="Number of open positions")
+    parser.add_argument("--orders", type=int, default=10, help="Number of working orders")
+    parser.add_argument("--activities", type=int, default=50, help="Order activities")
+    parser.add_argument(
+        "--activity-days", type=int, default=1, help="Local days the activities span"
+    )
+    parser.add_argument(
+        "--option-roots", type=int, default=0, help="Stocks with generated option chains"
+    )
+    parser.add_argument(
+        "--option-positions", type=int, default=0, help="Short positions on option contracts"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated data")
+    parser.add_argument(
+        "--latency",
+        default="none",
+        help="Latency distribution in ms: constant:20, uniform:5,50, lognormal:40,0.5",
+    )
+    parser.add_argument("--rate-limit", type=int, help="Requests allowed per window")
+    parser.add_argument("--rate-limit-window", type=float, default=60.0, help="Window seconds")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fraction of 5xx replies")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a fake Saxo OpenAPI gateway")
+    add_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--token-file",
+        default="~/.saxo/fake-tokens.json",
+        help="Token file written for clients of the fake gateway",
+    )
+    args = parser.parse_args(argv)
+    try:
+        config = config_from_args(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+    server = FakeSaxoServer(FakeSaxo(config), args.host, args.port)
+    token_file = server.fake.write_token_file(args.token_file)
+    print(f"export SAXO_BASE_URL={server.base_url}")
+    print(f"export SAXO_TOKEN_ENDPOINT={server.token_endpoint}")
+    print(f"export TOKEN_FILE={token_file}")
+    print("Press Ctrl+C to stop.", flush=True)
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
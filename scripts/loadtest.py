@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Drive the web dashboard with simulated browser tabs against the fake gateway.
+
+Each tab follows ``web/templates/positions.html``: it loads the page, then
+every refresh interval requests ``/api/status``, ``/api/positions``,
+``/api/orders`` and ``/api/order-history`` together, and polls
+``/api/status`` on its own shorter interval. Tabs optionally sell positions
+and cancel orders, refreshing afterwards as the page does. ``--mode
+dashboard`` replaces the three data requests with one ``/api/dashboard`` call.
+
+The app is served by a threaded Werkzeug server while tabs run as asyncio
+tasks in the same process, so the report covers server threads and memory
+(and latencies include the load generator's own CPU use)::
+
+    python scripts/loadtest.py --tabs 50 --duration 60 --time-scale 0.1 \\
+        --positions 500 --latency lognormal:40,0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.bench import BenchEnvironment, percentile  # noqa: E402
+from scripts.fake_saxo import Latency  # noqa: E402
+
+REFRESH_INTERVAL_SECONDS = 30
+STATUS_INTERVAL_SECONDS = 5
+# Browsers open at most six connections per host.
+CONNECTIONS_PER_TAB = 6
+
+
+def _rss_kb() -> float | None:
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return float(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class Recorder:
+    """Collect per-route latencies, failures and periodic resource samples."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+        self.threads = []
+        self.rss_kb = []
+
+    def record(self, route, seconds, status):
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[route] += 1
+
+    def sample(self):
+        self.threads.append(threading.active_count())
+        rss = _rss_kb()
+        if rss is not None:
+            self.rss_kb.append(rss)
+
+
+class Tab:
+    """One simulated dashboard tab."""
+
+    def __init__(self, client, recorder, options, rng):
+        self.client = client
+        self.recorder = recorder
+        self.options = options
+        self.rng = rng
+        self.positions = []
+        self.orders = []
+
+    async def request(self, method, route, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, route, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as exc:
+            response, status = None, type(exc).__name__
+        self.recorder.record(route, time.perf_counter() - started, status)
+        if response is not None and response.status_code < 400:
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        return None
+
+    async def status(self):
+        await self.request("GET", "/api/status")
+
+    async def refresh(self):
+        if self.options.mode == "dashboard":
+            results = await asyncio.gather(self.status(), self.request("GET", "/api/dashboard"))
+            dashboard = results[1] or {}
+            self.positions = (dashboard.get("positions") or []) if dashboard else []
+            self.orders = ((dashboard.get("orders") or {}).get("Data") or []) if dashboard else []
+            return
+        _, positions, orders, _ = await asyncio.gather(
+            self.status(),
+            self.request("GET", "/api/positions"),
+            self.request("GET", "/api/orders"),
+            self.request("GET", "/api/order-history"),
+        )
+        self.positions = (positions or {}).get("Data") or []
+        self.orders = (orders or {}).get("Data") or []
+
+    async def act(self):
+        """Sell or cancel like a user clicking a row button, then refresh."""
+        acted = False
+        if self.positions and self.rng.random() < self.options.sell_probability:
+            row = self.rng.choice(self.positions)
+            acted = True
+            await self.request(
+                "POST",
+                "/api/positions/sell",
+                json={
+                    "uic": row.get("uic"),
+                    "amount": row.get("amount"),
+                    "asset_type": row.get("asset_type"),
+                    "account_key": row.get("account_key"),
+                },
+            )
+        if self.orders and self.rng.random() < self.options.cancel_probability:
+            row = self.rng.choice(self.orders)
+            acted = True
+            await self.request(
+                "POST",
+                "/api/orders/cancel",
+                json={"order_id": row.get("OrderId"), "account_key": row.get("AccountKey")},
+            )
+        if acted:
+            await self.refresh()
+
+    async def run(self, deadline):
+        scale = self.options.time_scale
+        refresh_every = self.options.refresh_interval * scale
+        status_every = self.options.status_interval * scale
+
+        async def status_loop():
+            while True:
+                await asyncio.sleep(status_every)
+                if time.monotonic() >= deadline:
+                    return
+                await self.status()
+
+        await self.request("GET", "/")
+        await self.refresh()
+        poller = asyncio.create_task(status_loop())
+        try:
+            while True:
+                await self.act()
+                remaining = deadline - time.monotonic()
+                if remaining <= refresh_every:
+                    await asyncio.sleep(max(remaining, 0))
+                    return
+                await asyncio.sleep(refresh_every)
+                await self.refresh()
+        finally:
+            poller.cancel()
+
+
+async def _drive(base_url, recorder, options):
+    started = time.monotonic()
+    deadline = started + options.ramp_up + options.duration
+    rng = random.Random(options.seed)
+
+    async def open_tab(index):
+        await asyncio.sleep(options.ramp_up * index / max(options.tabs, 1))
+        limits = httpx.Limits(max_connections=CONNECTIONS_PER_TAB)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            tab = Tab(client, recorder, options, random.Random(rng.random()))
+            await tab.run(deadline)
+
+    async def sampler():
+        while time.monotonic() < deadline:
+            recorder.sample()
+            await asyncio.sleep(options.sample_interval)
+
+    sampling = asyncio.create_task(sampler())
+    await asyncio.gather(*(open_tab(index) for index in range(options.tabs)))
+    sampling.cancel()
+    recorder.sample()
+
+
+def _latency_summary(samples):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def run(options) -> dict:
+    """Serve the dashboard on an ephemeral port, drive it, and return the report."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    recorder = Recorder()
+    with BenchEnvironment(
+        options.positions,
+        options.seed,
+        trading_enabled=True,
+        orders=options.orders,
+        activities=options.activities,
+    ) as env:
+        # Latency, faults and rate limits only apply once setup has finished.
+        env.fake.config.latency = Latency.parse(options.latency)
+        env.fake.config.fault_rate = options.fault_rate
+        env.fake.config.rate_limit = options.rate_limit
+        server = make_server("127.0.0.1", 0, env.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, name="loadtest-server")
+        thread.start()
+        env.fake.reset_counts()
+        recorder.sample()
+        baseline_threads = recorder.threads[-1]
+        started = time.perf_counter()
+        try:
+            asyncio.run(_drive(f"http://127.0.0.1:{server.server_port}", recorder, options))
+        finally:
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+            thread.join()
+        outbound = Counter(env.fake.requests)
+
+    inbound = sum(len(samples) for samples in recorder.latencies.values())
+    errors = sum(recorder.errors.values())
+    all_samples = [sample for samples in recorder.latencies.values() for sample in samples]
+    return {
+        "config": {
+            key: getattr(options, key)
+            for key in (
+                "tabs",
+                "duration",
+                "ramp_up",
+                "time_scale",
+                "mode",
+                "positions",
+                "orders",
+                "latency",
+                "sell_probability",
+                "cancel_probability",
+            )
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "inbound": {
+            "requests": inbound,
+            "requests_per_s": round(inbound / elapsed, 3) if elapsed else None,
+            "errors": errors,
+            "error_rate": round(errors / inbound, 5) if inbound else 0.0,
+            "latency": _latency_summary(all_samples) if all_samples else None,
+            "routes": {
+                route: {
+                    **_latency_summary(samples),
+                    "errors": recorder.errors[route],
+                    "error_rate": round(recorder.errors[route] / len(samples), 5),
+                    "statuses": {
+                        str(key): value for key, value in recorder.statuses[route].items()
+                    },
+                }
+                for route, samples in sorted(recorder.latencies.items())
+            },
+        },
+        "outbound": {
+            "requests": sum(outbound.values()),
+            "per_inbound_request": round(sum(outbound.values()) / inbound, 3) if inbound else None,
+            "endpoints": dict(sorted(outbound.items())),
+        },
+        "threads": {
+            "baseline": baseline_threads,
+            "max": max(recorder.threads),
+            "mean": round(sum(recorder.threads) / len(recorder.threads), 1),
+        },
+        "memory": {
+            "rss_start_kb": recorder.rss_kb[0] if recorder.rss_kb else None,
+            "rss_peak_kb": max(recorder.rss_kb) if recorder.rss_kb else None,
+            "rss_end_kb": recorder.rss_kb[-1] if recorder.rss_kb else None,
+        },
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the Saxo web dashboard")
+    parser.add_argument("--tabs", type=int, default=10, help="Concurrent browser tabs")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to open all tabs")
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=1.0,
+        help="Multiply the page's polling intervals, e.g. 0.1 polls ten times faster",
+    )
+    parser.add_argument("--refresh-interval", type=float, default=REFRESH_INTERVAL_SECONDS)
+    parser.add_argument("--status-interval", type=float, default=STATUS_INTERVAL_SECONDS)
+    parser.add_argument("--mode", choices=["page", "dashboard"], default="page")
+    parser.add_argument("--sell-probability", type=float, default=0.0, help="Per refresh")
+    parser.add_argument("--cancel-probability", type=float, default=0.0, help="Per refresh")
+    parser.add_argument("--positions", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--activities", type=int, default=50)
+    parser.add_argument("--latency", default="none", help="Fake gateway latency, e.g. constant:20")
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, help="Fake gateway requests per minute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Resource sampling")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    options = parse_args(argv)
+    try:
+        Latency.parse(options.latency)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    report = run(options)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        Path(options.output).write_text(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,6 +4,7 @@ import json
 import logging
 import os
 import tempfile
+import threading
 import time
 from contextlib import contextmanager
 from pathlib import Path
@@ -17,42 +18,176 @@ logger = logging.getLogger()
 _http2_client = httpx.Client(http2=True)
 
 
+def _lock_handle(lock_handle, shared=False, blocking=True):
+    """Lock an open lock file; return False if ``blocking`` is off and it is held."""
+    if os.name == "nt":
+        import msvcrt
+
+        # Windows byte-range locks have no shared mode; readers lock exclusively.
+        lock_handle.seek(0)
+        lock_handle.write(b"0")
+        lock_handle.flush()
+        while True:
+            try:
+                lock_handle.seek(0)
+                msvcrt.locking(lock_handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.1)
+    import fcntl
+
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    try:
+        fcntl.flock(lock_handle.fileno(), operation)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock_handle(lock_handle):
+    if os.name == "nt":
+        import msvcrt
+
+        lock_handle.seek(0)
+        msvcrt.locking(lock_handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+
+def _sidecar_path(token_file, suffix):
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file)))
+    return token_path.with_name(token_path.name + suffix)
+
+
 @contextmanager
-def token_file_lock(token_file):
-    """Serialize token mutations across CLI processes."""
+def token_file_lock(token_file, shared=False, blocking=True):
+    """Serialize token mutations across CLI processes.
+
+    Yields True once the lock is held. With ``blocking=False`` it yields False
+    instead of waiting when another process holds the lock.
+    """
     if not isinstance(token_file, (str, os.PathLike)):
-        yield
+        yield True
         return
-    token_path = Path(os.path.abspath(os.path.expanduser(token_file)))
-    lock_path = token_path.with_name(token_path.name + ".lock")
+    lock_path = _sidecar_path(token_file, ".lock")
     lock_path.parent.mkdir(parents=True, exist_ok=True)
     with open(lock_path, "a+b") as lock_handle:
-        if os.name == "nt":
-            import msvcrt
+        if not _lock_handle(lock_handle, shared=shared, blocking=blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _unlock_handle(lock_handle)
 
-            lock_handle.seek(0)
-            lock_handle.write(b"0")
-            lock_handle.flush()
-            while True:
-                try:
-                    lock_handle.seek(0)
-                    msvcrt.locking(lock_handle.fileno(), msvcrt.LK_NBLCK, 1)
-                    break
-                except OSError:
-                    time.sleep(0.1)
-            try:
-                yield
-            finally:
-                lock_handle.seek(0)
-                msvcrt.locking(lock_handle.fileno(), msvcrt.LK_UNLCK, 1)
-        else:
-            import fcntl
 
-            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+class TokenBroker:
+    """Share one token file between concurrent processes without lock convoys.
+
+    Readers get an in-memory copy that is revalidated with a single ``stat``;
+    the file is only re-parsed after another process atomically replaced it.
+    A long-running process (``serve``) can claim refresh ownership through an
+    ``.owner`` lock held for its lifetime, so short-lived CLI processes leave
+    rotation to it while their token is still usable.
+    """
+
+    def __init__(self, token_file):
+        self.token_file = token_file
+        self._lock = threading.Lock()
+        self._signature = None
+        self._tokens = None
+        self._owner_handle = None
+
+    def _path(self):
+        return os.path.abspath(os.path.expanduser(self.token_file))
+
+    @staticmethod
+    def _stat_signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def read(self):
+        """Return the current token dict, or None when no token file exists."""
+        if not isinstance(self.token_file, (str, os.PathLike)):
+            return None
+        path = self._path()
+        try:
+            signature = self._stat_signature(path)
+        except OSError:
+            return None
+        with self._lock:
+            if signature == self._signature:
+                return dict(self._tokens)
+        try:
+            with open(path) as handle:
+                tokens = json.load(handle)
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to load tokens: %s", exc)
+            return None
+        if not isinstance(tokens, dict):
+            return None
+        with self._lock:
+            self._signature, self._tokens = signature, tokens
+        return dict(tokens)
+
+    def remember(self, tokens):
+        """Prime the cache after this process wrote ``tokens`` to disk."""
+        try:
+            signature = self._stat_signature(self._path())
+        except OSError:
+            return
+        with self._lock:
+            self._signature, self._tokens = signature, dict(tokens)
+
+    def acquire_ownership(self):
+        """Claim refresh ownership; return False if another process holds it."""
+        if self._owner_handle is not None:
+            return True
+        if not isinstance(self.token_file, (str, os.PathLike)):
+            return False
+        owner_path = _sidecar_path(self.token_file, ".owner")
+        owner_path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(owner_path, "a+b")
+        if not _lock_handle(handle, blocking=False):
+            handle.close()
+            return False
+        self._owner_handle = handle
+        return True
+
+    def release_ownership(self):
+        handle, self._owner_handle = self._owner_handle, None
+        if handle is not None:
             try:
-                yield
+                _unlock_handle(handle)
             finally:
-                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+
+    @property
+    def is_owner(self):
+        return self._owner_handle is not None
+
+    def owner_active(self):
+        """Return True if this or another process currently owns refreshes."""
+        if self.is_owner:
+            return True
+        if not isinstance(self.token_file, (str, os.PathLike)):
+            return False
+        owner_path = _sidecar_path(self.token_file, ".owner")
+        try:
+            handle = open(owner_path, "rb+")
+        except OSError:
+            return False
+        with handle:
+            if not _lock_handle(handle, blocking=False):
+                return True
+            _unlock_handle(handle)
+            return False
 
 
 # ==============================
@@ -71,7 +206,7 @@ class OAuth2Client:
         default_params = {"client_id": self.client_id, "redirect_uri": self.redirect_uri}
         default_params.update(params)
         url = self.auth_endpoint + "?" + "&".join(f"{k}={v}" for k, v in default_params.items())
-        logger.debug(f"Built authorization URL: {url}")
+        logger.debug("Built authorization URL: %s", url)
         return url
 
     def _exchange_for_token(self, code, code_verifier):
@@ -87,7 +222,7 @@ class OAuth2Client:
                 "code_verifier": code_verifier,
             },
         )
-        logger.debug(f"Token endpoint status: {response.status_code}")
+        logger.debug("Token endpoint status: %s", response.status_code)
 
         response.raise_for_status()
         return response.json()
@@ -101,7 +236,7 @@ def handle_oauth_errors(func):
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            logger.error(f"{func.__name__} failed: {e}")
+            logger.error("%s failed: %s", func.__name__, e)
             return {"error": str(e)}
 
     return wrapper
@@ -128,6 +263,7 @@ class AuthorizationCodeClient(OAuth2Client):
         self.code_verifier = None
         self.code_challenge = None
         self.token_file = token_file
+        self.broker = TokenBroker(token_file)
         self._cleanup_stale_token_temps()
         self.tokens = self._load_tokens() or {}
 
@@ -136,18 +272,48 @@ class AuthorizationCodeClient(OAuth2Client):
             # Log token expiry details
             # Check if they exist first
             if "access_token_expires_at" in self.tokens:
-                logger.debug(
-                    f"Access token expiry at {lifetime_seconds_to_datetime(self.tokens.get('access_token_expires_at', 0))}"
-                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Access token expiry at %s",
+                        lifetime_seconds_to_datetime(self.tokens["access_token_expires_at"]),
+                    )
             else:
                 logger.error("No access_token_expires_at found in tokens.")
             if "refresh_token_expires_at" in self.tokens:
-                logger.debug(
-                    f"Refresh token expiry at {lifetime_seconds_to_datetime(self.tokens.get('refresh_token_expires_at', 0))}"
-                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Refresh token expiry at %s",
+                        lifetime_seconds_to_datetime(self.tokens["refresh_token_expires_at"]),
+                    )
             else:
                 logger.error("No refresh_token_expires_at found in tokens.")
 
+    @property
+    def tokens(self):
+        return self._tokens
+
+    @tokens.setter
+    def tokens(self, value):
+        # Translate the persisted wall-clock expiry into a monotonic deadline
+        # once per token, so request hot paths only compare two floats.
+        self._tokens = value
+        self._access_deadline = None
+        try:
+            expires_at = float(value.get("access_token_expires_at"))
+        except (AttributeError, TypeError, ValueError):
+            return
+        self._access_deadline = time.monotonic() + (expires_at - time.time())
+
+    def access_token_seconds_remaining(self):
+        """Return seconds until the access token expires, or None if unknown."""
+        deadline = self._access_deadline
+        return None if deadline is None else deadline - time.monotonic()
+
+    def access_token_valid(self, skew=0):
+        """Cheap, log-free validity check against the cached monotonic deadline."""
+        deadline = self._access_deadline
+        return deadline is not None and time.monotonic() < deadline - skew
+
     # --- PKCE helpers ---
     def _generate_code_verifier(self):
         verifier = base64.urlsafe_b64encode(os.urandom(64)).decode("utf-8").rstrip("=")
@@ -158,7 +324,7 @@ class AuthorizationCodeClient(OAuth2Client):
     def _generate_code_challenge(self, verifier):
         digest = hashlib.sha256(verifier.encode("utf-8")).digest()
         challenge = base64.urlsafe_b64encode(digest).decode("utf-8").rstrip("=")
-        logger.debug("Generated code_challenge " + challenge)
+        logger.debug("Generated code_challenge %s", challenge)
         self.code_challenge = challenge
         return challenge
 
@@ -182,40 +348,24 @@ class AuthorizationCodeClient(OAuth2Client):
     def _save_tokens(self, token_data):
         """Save tokens to file, computing absolute expiry timestamp."""
         if "expires_in" in token_data:
-            logger.debug("Saving new access token...")
-            logger.debug("Current time: " + str(int(time.time())))
-            logger.debug("Relative expires_in: " + str(int(token_data["expires_in"])))
+            expires_at = int(time.time()) + int(token_data["expires_in"])
             logger.debug(
-                "Computed access_token_expires_at: "
-                + str(int(time.time()) + int(token_data["expires_in"]))
+                "Saving new access token: expires_in=%s, access_token_expires_at=%s.",
+                token_data["expires_in"],
+                expires_at,
             )
-            logger.debug(
-                "Access token expiry at "
-                + lifetime_seconds_to_datetime(int(time.time()) + int(token_data["expires_in"]))
-            )
-            token_data["access_token_expires_at"] = int(time.time()) + int(token_data["expires_in"])
+            token_data["access_token_expires_at"] = expires_at
             token_data.pop("expires_in", None)
 
         if "refresh_token_expires_in" in token_data:
-            logger.debug("Saving new refresh token...")
-            logger.debug("Current time: " + str(int(time.time())))
-            logger.debug(
-                "Relative refresh_token_expires_in: "
-                + str(int(token_data["refresh_token_expires_in"]))
-            )
+            expires_at = int(time.time()) + int(token_data["refresh_token_expires_in"])
             logger.debug(
-                "Computed refresh_token_expires_in: "
-                + str(int(time.time()) + int(token_data["refresh_token_expires_in"]))
-            )
-            logger.debug(
-                "Refresh token expiry at "
-                + lifetime_seconds_to_datetime(
-                    int(time.time()) + int(token_data["refresh_token_expires_in"])
-                )
-            )
-            token_data["refresh_token_expires_at"] = int(time.time()) + int(
-                token_data["refresh_token_expires_in"]
+                "Saving new refresh token: refresh_token_expires_in=%s, "
+                "refresh_token_expires_at=%s.",
+                token_data["refresh_token_expires_in"],
+                expires_at,
             )
+            token_data["refresh_token_expires_at"] = expires_at
             token_data.pop("refresh_token_expires_in", None)
 
         token_path = os.path.abspath(os.path.expanduser(self.token_file))
@@ -254,6 +404,7 @@ class AuthorizationCodeClient(OAuth2Client):
             logger.debug("Could not apply POSIX token-file permissions on this platform.")
         logger.info("Tokens saved to the configured user credential store.")
         self.tokens = token_data
+        self.broker.remember(token_data)
 
     def _load_tokens(self):
         token_path = os.path.abspath(os.path.expanduser(self.token_file))
@@ -266,7 +417,7 @@ class AuthorizationCodeClient(OAuth2Client):
             logger.debug("Loaded tokens from the configured user credential store.")
             return data
         except Exception as e:
-            logger.error(f"Failed to load tokens: {e}")
+            logger.error("Failed to load tokens: %s", e)
             return None
 
     def _is_access_token_expired(self, skew=600):
@@ -290,10 +441,11 @@ class AuthorizationCodeClient(OAuth2Client):
             return True
 
         if (exp - time.time()) < skew:
-            logger.info("Access token is expiring soon or has expired; treating as expired.")
+            logger.debug("Access token is expiring soon or has expired; treating as expired.")
             return True
         else:
-            logger.debug(f"Access token valid until {lifetime_seconds_to_datetime(exp)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Access token valid until %s", lifetime_seconds_to_datetime(exp))
             return False
 
     def _is_refresh_token_expired(self, skew=30):
@@ -357,11 +509,11 @@ class AuthorizationCodeClient(OAuth2Client):
                 "code_verifier": code_verifier,
             },
         )
-        logger.debug(f"Refresh token endpoint status: {response.status_code}")
+        logger.debug("Refresh token endpoint status: %s", response.status_code)
 
         if response.status_code != 200 and response.status_code != 201:
-            logger.error(f"Token refresh failed ({response.status_code})")
-            logger.debug(f"Failed response: {response.text}")
+            logger.error("Token refresh failed (%s)", response.status_code)
+            logger.debug("Failed response: %s", response.text)
             return None
 
         new_tokens = response.json()
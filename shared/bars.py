@@ -0,0 +1,302 @@
+"""Local store of historical chart bars.
+
+Bars from ``/chart/v3/charts`` are kept per environment, asset type, UIC and
+horizon as one file of fixed-size records (``BAR_DTYPE``: time, open, high,
+low, close and volume as float64), oldest first::
+
+    <directory>/<environment>/Stock-211-1440.bars
+                              Stock-211-1440.json     fetched range
+
+``read`` memory-maps the file and returns slices of the map, so a range query
+copies nothing and reading years of bars again costs one ``stat``.
+``refresh`` fetches only bars at or after the last stored one (that bar may
+still be forming and is rewritten in place) and backfills older ranges in
+windows of at most ``CHART_BARS_MAX_COUNT`` bars, several at a time. Extending
+a series only ever grows its file; a backfill writes a new file and replaces
+the old one atomically. The store drops its own map of the old file first
+(a mapped file cannot be replaced on Windows); maps readers still hold stay
+valid on POSIX systems.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from .auth import token_file_lock
+from .client import CHART_BARS_MAX_COUNT
+from .domain import number
+from .snapshots import parse_duration
+from .tracing import TracingExecutor, span
+
+logger = logging.getLogger(__name__)
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+BAR_DTYPE = np.dtype([("time", "<f8")] + [(name, "<f8") for name in BAR_FIELDS])
+# Bar lengths in minutes that /chart/v3/charts accepts.
+HORIZONS = (1, 2, 3, 5, 10, 15, 30, 60, 120, 240, 360, 480, 1440, 10080, 43200)
+BACKFILL_MAX_WORKERS = 4
+_EMPTY = np.empty(0, BAR_DTYPE)
+
+
+def default_directory(token_file=None):
+    """``SAXO_BAR_DIR``, or ``chart-bars`` beside the token file."""
+    configured = os.getenv("SAXO_BAR_DIR")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file or "tokens.json")))
+    return token_path.with_name("chart-bars")
+
+
+def parse_horizon(value):
+    """Minutes from ``1440``, ``15m``, ``1h``, ``1d`` or ``1w``; must be a Saxo horizon."""
+    text = str(value).strip()
+    minutes = float(text) if text.isdigit() else parse_duration(text) / 60
+    if minutes not in HORIZONS:
+        choices = ", ".join(str(horizon) for horizon in HORIZONS)
+        raise ValueError(f"Unsupported bar horizon {value!r}; use minutes in {choices}.")
+    return int(minutes)
+
+
+def _epoch(timestamp):
+    try:
+        return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return math.nan
+
+
+def _price(row, name):
+    """``Open`` etc., or the bid/ask midpoint that FX bars carry instead."""
+    value = row.get(name)
+    if value is None:
+        bid, ask = row.get(f"{name}Bid"), row.get(f"{name}Ask")
+        if bid is None or ask is None:
+            return math.nan
+        value = (number(bid) + number(ask)) / 2
+    return number(value, math.nan)
+
+
+def bar_records(rows):
+    """``BAR_DTYPE`` records from chart ``Data`` rows, sorted and unique by time."""
+    records = np.array(
+        [
+            (
+                _epoch(row.get("Time")),
+                _price(row, "Open"),
+                _price(row, "High"),
+                _price(row, "Low"),
+                _price(row, "Close"),
+                number(row.get("Volume"), math.nan),
+            )
+            for row in rows
+        ],
+        dtype=BAR_DTYPE,
+    )
+    records = records[~np.isnan(records["time"])]
+    # Later rows win for a repeated time: keep the last of each run.
+    records = records[np.argsort(records["time"], kind="stable")]
+    keep = np.ones(len(records), bool)
+    keep[:-1] = records["time"][1:] != records["time"][:-1]
+    return records[keep]
+
+
+def bar_rows(bars):
+    """JSON rows of ``BAR_DTYPE`` records; missing values become ``None``."""
+    return [
+        {
+            "time": datetime.fromtimestamp(values[0], timezone.utc).isoformat(),
+            **{
+                name: None if math.isnan(value) else value
+                for name, value in zip(BAR_FIELDS, values[1:], strict=True)
+            },
+        }
+        for values in bars.tolist()
+    ]
+
+
+class BarStore:
+    """Chart bars of one environment, one memory-mapped file per series."""
+
+    def __init__(self, directory, environment, max_workers=BACKFILL_MAX_WORKERS):
+        self.environment = environment
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", environment).strip("-") or "default"
+        self.path = Path(directory) / slug
+        self.max_workers = max_workers
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def series_path(self, uic, asset_type="Stock", horizon=1440):
+        return self.path / f"{asset_type}-{int(uic)}-{int(horizon)}.bars"
+
+    def _map(self, path):
+        """The whole file as a read-only record array, remapped only after it changed."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return _EMPTY
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            rows = stat.st_size // BAR_DTYPE.itemsize
+            bars = np.memmap(path, BAR_DTYPE, "r", shape=(rows,)) if rows else _EMPTY
+            self._maps[path] = (key, bars)
+            return bars
+
+    def _release(self, path):
+        """Forget the cached map of ``path``; it is unmapped once no view of it is left."""
+        with self._lock:
+            self._maps.pop(path, None)
+
+    def _bounds(self, path):
+        """The first and last stored bar times, or ``None``, without keeping a view."""
+        times = self._map(path)["time"]
+        return (float(times[0]), float(times[-1])) if len(times) else None
+
+    def read(self, uic, asset_type="Stock", horizon=1440, start=None, end=None):
+        """Stored bars with ``start <= time < end`` (epoch seconds): a view, not a copy."""
+        bars = self._map(self.series_path(uic, asset_type, horizon))
+        times = bars["time"]
+        low = 0 if start is None else bisect_left(times, start)
+        high = len(bars) if end is None else bisect_left(times, end)
+        return bars[low:high]
+
+    def _coverage(self, path):
+        """The sidecar: ``covered_from``, the earliest time fetched, and
+        ``complete_until``; bars starting before it were complete when fetched.
+        """
+        try:
+            with open(path.with_suffix(".json")) as handle:
+                coverage = json.load(handle)
+            return {name: float(value) for name, value in coverage.items()}
+        except (OSError, ValueError, AttributeError, TypeError):
+            return {}
+
+    def _set_coverage(self, path, coverage):
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".json.tmp")
+        with os.fdopen(handle, "w") as output:
+            json.dump(coverage, output)
+        os.replace(temporary, path.with_suffix(".json"))
+
+    def _extend(self, path, records):
+        """Write bars at or after the last stored one; it is rewritten in place."""
+        bars = self._map(path)
+        if len(bars):
+            records = records[records["time"] >= bars["time"][-1]]
+        if not len(records):
+            return 0
+        position = len(bars) - int(len(bars) > 0 and records["time"][0] == bars["time"][-1])
+        with open(path, "r+b" if len(bars) else "wb") as handle:
+            handle.seek(position * BAR_DTYPE.itemsize)
+            handle.write(records.tobytes())
+        return position + len(records) - len(bars)
+
+    def _prepend(self, path, records):
+        """Put bars older than the first stored one in front, replacing the file."""
+        bars = self._map(path)
+        if len(bars):
+            records = records[records["time"] < bars["time"][0]]
+        if not len(records):
+            return 0
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".bars.tmp")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                output.write(records.tobytes())
+                output.write(bars.tobytes())
+            del bars
+            self._release(path)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return len(records)
+
+    def refresh(
+        self, client, uic, asset_type="Stock", horizon=1440, start=None, end=None, now=None
+    ):
+        """Bring one series up to date for ``[start, end)``; return the new bar count.
+
+        Newer bars are fetched from the last stored bar unless every bar
+        before ``end`` was already complete when stored; older ones from
+        ``start`` back to the first stored bar, unless that range was fetched
+        before. An empty series without ``start`` gets the latest
+        ``CHART_BARS_MAX_COUNT`` bars.
+        """
+        path = self.series_path(uic, asset_type, horizon)
+        step = horizon * 60
+        window = CHART_BARS_MAX_COUNT * step
+        # The end of the bar forming now.
+        until = ((time.time() if now is None else now) // step + 1) * step
+        # Only the bounds: ``_prepend`` cannot replace a file this still maps.
+        stored = self._bounds(path)
+        coverage = self._coverage(path)
+        if start is None:
+            start = stored[0] if stored else until - CHART_BARS_MAX_COUNT * step
+        older, newer = [], []
+        if stored is None:
+            newer = [(start, until)]
+        else:
+            first, last = stored
+            floor = min(first, coverage.get("covered_from", first))
+            if start < floor:
+                older = [(start, floor)]
+            if end is None or end > coverage.get("complete_until", last):
+                newer = [(last, until)]
+
+        def split(ranges):
+            return [
+                (low, min(low + window, high))
+                for begin, high in ranges
+                for low in np.arange(begin, high, window).tolist()
+            ]
+
+        def fetch(bounds):
+            low, high = bounds
+            rows = client.get_chart_bars(
+                uic,
+                asset_type,
+                horizon,
+                mode="From",
+                at=datetime.fromtimestamp(low, timezone.utc),
+                count=CHART_BARS_MAX_COUNT,
+            )
+            records = bar_records(rows)
+            return records[(records["time"] >= low) & (records["time"] < high)]
+
+        older, newer = split(older), split(newer)
+        if not older and not newer:
+            return 0
+        with (
+            span("bars.refresh", uic=uic, horizon=horizon, requests=len(older) + len(newer)),
+            TracingExecutor(
+                max_workers=min(self.max_workers, len(older) + len(newer)),
+                thread_name_prefix="saxo-bars",
+            ) as pool,
+        ):
+            fetched = list(pool.map(fetch, older + newer))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with token_file_lock(path):
+            added = self._prepend(path, np.concatenate(fetched[: len(older)] or [_EMPTY]))
+            added += self._extend(path, np.concatenate(fetched[len(older) :] or [_EMPTY]))
+            coverage["covered_from"] = min(start, coverage.get("covered_from", start))
+            if newer:
+                coverage["complete_until"] = until - step
+            self._set_coverage(path, coverage)
+        logger.debug(
+            "Fetched %d windows of %s %s bars (%d new).",
+            len(fetched),
+            uic,
+            horizon,
+            added,
+        )
+        return added
@@ -0,0 +1,286 @@
+"""Record and replay Saxo HTTP traffic through the shared httpx clients.
+
+A cassette holds request/response pairs with their timing. Tokens are dropped
+and account identifiers are replaced by stable placeholders before anything is
+written, so cassettes can be shared and replayed without credentials.
+"""
+
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+from . import auth, client
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+REDACTED = "REDACTED"
+# Response/request fields whose values identify the account holder.
+SENSITIVE_KEYS = (
+    "AccountGroupKey",
+    "AccountId",
+    "AccountKey",
+    "ClientId",
+    "ClientKey",
+    "UserId",
+    "UserKey",
+)
+TOKEN_KEYS = ("access_token", "refresh_token", "code", "code_verifier", "id_token")
+KEPT_RESPONSE_HEADERS = ("content-type", "retry-after")
+# Query parameters that change on every run and must not affect matching.
+VOLATILE_PARAMS = ("FromDateTime", "ToDateTime")
+REPLAY_TOKEN_LIFETIME_SECONDS = 24 * 3600
+
+
+def _open(path, mode):
+    return gzip.open(path, mode + "t") if str(path).endswith(".gz") else open(path, mode)
+
+
+def _decode(content, content_type):
+    if not content:
+        return None
+    text = content.decode("utf-8", errors="replace")
+    if "json" in (content_type or ""):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+    elif "x-www-form-urlencoded" in (content_type or ""):
+        return dict(parse_qsl(text))
+    return text
+
+
+def _match_key(method, url):
+    parts = urlsplit(url)
+    params = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in VOLATILE_PARAMS
+    )
+    return f"{method.upper()} {parts.path}?{urlencode(params)}"
+
+
+class Cassette:
+    """An ordered list of recorded interactions with scrubbing and matching."""
+
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with _open(path, "r") as handle:
+            data = json.load(handle)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {path}.")
+        return cls(data.get("interactions", []))
+
+    def save(self, path):
+        with self._lock:
+            interactions = self.scrubbed()
+        with _open(path, "w") as handle:
+            json.dump(
+                {"version": CASSETTE_VERSION, "interactions": interactions},
+                handle,
+                separators=(",", ":"),
+            )
+        logger.info("Saved %d interactions to %s.", len(interactions), path)
+
+    def append(self, interaction):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def scrubbed(self):
+        """Return interactions with tokens removed and account identifiers masked."""
+        aliases = {}
+        counts = Counter()
+
+        def collect(value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if key in SENSITIVE_KEYS and isinstance(item, str) and item not in aliases:
+                        counts[key] += 1
+                        aliases[item] = f"{key.upper()}-{counts[key]}"
+                    collect(item)
+            elif isinstance(value, list):
+                for item in value:
+                    collect(item)
+
+        def scrub(value):
+            if isinstance(value, dict):
+                return {
+                    key: REDACTED if key in TOKEN_KEYS and item else scrub(item)
+                    for key, item in value.items()
+                }
+            if isinstance(value, list):
+                return [scrub(item) for item in value]
+            if isinstance(value, str):
+                return aliases.get(value, value)
+            return value
+
+        def scrub_url(url):
+            for original in sorted(aliases, key=len, reverse=True):
+                url = url.replace(original, aliases[original])
+            return url
+
+        for interaction in self.interactions:
+            collect(interaction.get("request_body"))
+            collect(interaction.get("response_body"))
+            collect(dict(parse_qsl(urlsplit(interaction["url"]).query)))
+        return [
+            dict(
+                interaction,
+                url=scrub_url(interaction["url"]),
+                request_body=scrub(interaction.get("request_body")),
+                response_body=scrub(interaction.get("response_body")),
+            )
+            for interaction in self.interactions
+        ]
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Forward requests to ``transport`` and append each exchange to ``cassette``."""
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport or httpx.HTTPTransport(http2=True)
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            # Read the transport stream itself: responses built from bytes
+            # (for example by MockTransport) are already marked consumed.
+            raw = b"".join(response.stream)
+        finally:
+            response.close()
+        elapsed = time.perf_counter() - started
+        # Hand the client the undecoded bytes; the cassette stores decoded ones.
+        forwarded = httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            content=raw,
+            extensions=response.extensions,
+        )
+        content = httpx.Response(response.status_code, headers=response.headers, content=raw).read()
+        self.cassette.append(
+            {
+                "method": request.method,
+                "url": str(request.url),
+                "request_body": _decode(request.content, request.headers.get("content-type")),
+                "status": response.status_code,
+                "headers": {
+                    key: value
+                    for key, value in response.headers.items()
+                    if key.lower() in KEPT_RESPONSE_HEADERS or key.lower().startswith("x-ratelimit")
+                },
+                "response_body": _decode(content, response.headers.get("content-type")),
+                "elapsed": round(elapsed, 6),
+            }
+        )
+        return forwarded
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serve recorded responses, matched by method, path and stable query.
+
+    Repeated requests consume matching interactions in recording order; the
+    last one is reused once exhausted so benchmarks can loop. Each response is
+    delayed by its recorded latency times ``latency_scale`` (0 disables it).
+    """
+
+    def __init__(self, cassette, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        for interaction in cassette.interactions:
+            key = _match_key(interaction["method"], interaction["url"])
+            self._queues[key].append(interaction)
+
+    def _next(self, request):
+        with self._lock:
+            queue = self._queues.get(_match_key(request.method, str(request.url)))
+            if not queue:
+                return None
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def handle_request(self, request):
+        interaction = self._next(request)
+        if interaction is None:
+            logger.warning("No recorded response for %s %s.", request.method, request.url.path)
+            return httpx.Response(
+                404,
+                json={"ErrorCode": "NotRecorded", "Message": "Request is not in the cassette."},
+                request=request,
+            )
+        delay = interaction.get("elapsed", 0) * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+        body = interaction.get("response_body")
+        if body is None:
+            content = b""
+        elif isinstance(body, str):
+            content = body.encode()
+        else:
+            content = json.dumps(body).encode()
+        return httpx.Response(
+            interaction["status"],
+            headers=interaction.get("headers") or {},
+            content=content,
+            request=request,
+        )
+
+
+@contextmanager
+def use_transport(transport):
+    """Route the shared Saxo API and OAuth httpx clients through ``transport``."""
+    previous = client._http2_client, auth._http2_client
+    http_client = httpx.Client(transport=transport)
+    client._http2_client = auth._http2_client = http_client
+    try:
+        yield http_client
+    finally:
+        client._http2_client, auth._http2_client = previous
+        http_client.close()
+
+
+@contextmanager
+def recording(path, transport=None):
+    """Record all Saxo traffic in the block to ``path`` (gzip when it ends in .gz)."""
+    cassette = Cassette()
+    try:
+        with use_transport(RecordingTransport(cassette, transport)):
+            yield cassette
+    finally:
+        cassette.save(path)
+
+
+@contextmanager
+def replaying(path, latency_scale=1.0):
+    """Serve all Saxo traffic in the block from the cassette at ``path``."""
+    cassette = Cassette.load(path)
+    with use_transport(ReplayTransport(cassette, latency_scale)):
+        yield cassette
+
+
+def authorize_replay(saxo_client):
+    """Give ``saxo_client`` an in-memory placeholder token for replayed traffic.
+
+    Replayed responses never check credentials, so no token file is read or
+    written and no login is required.
+    """
+    saxo_client.auth_client.tokens = {
+        "access_token": REDACTED,
+        "access_token_expires_at": int(time.time()) + REPLAY_TOKEN_LIFETIME_SECONDS,
+    }
+    saxo_client.transition(saxo_client.STATE_AUTHENTICATED)
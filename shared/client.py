@@ -1,14 +1,85 @@
 import logging
+import random
+import re
 import threading
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlsplit
 
 import httpx
 
-from .auth import AuthorizationCodeClient, lifetime_seconds_to_datetime, token_file_lock
+from .auth import AuthorizationCodeClient, token_file_lock
+from .metrics import REGISTRY
+from .tracing import span
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
-_http2_client = httpx.Client(http2=True)
+# Every SaxoClient has its own connection pool, so environments never share
+# connections; ``cassette.use_transport`` installs one client here for all.
+_http2_client = None
+
+# The scheduler rotates the access token this long before it expires. Requests
+# only fall back to a blocking refresh inside the much smaller request skew.
+REFRESH_SKEW_SECONDS = 600
+REQUEST_SKEW_SECONDS = 30
+# UICs per /trade/v1/infoprices/list request; keeps the query string short.
+INFO_PRICES_BATCH_SIZE = 500
+# Most bars /chart/v3/charts returns per request.
+CHART_BARS_MAX_COUNT = 1200
+
+API_LATENCY = REGISTRY.histogram(
+    "saxo_api_request_duration_seconds",
+    "Saxo OpenAPI request latency by environment and endpoint.",
+    ("env", "method", "endpoint"),
+)
+API_RESPONSES = REGISTRY.counter(
+    "saxo_api_responses",
+    "Saxo OpenAPI responses by status code; status is 'error' for transport failures.",
+    ("env", "method", "endpoint", "status"),
+)
+API_BYTES = REGISTRY.counter(
+    "saxo_api_bytes", "Bytes sent to and received from the Saxo OpenAPI.", ("env", "direction")
+)
+API_RATE_LIMITED = REGISTRY.counter(
+    "saxo_api_rate_limited", "Saxo OpenAPI 429 responses by endpoint.", ("env", "endpoint")
+)
+API_RATE_LIMIT_REMAINING = REGISTRY.gauge(
+    "saxo_api_rate_limit_remaining",
+    "Remaining Saxo rate-limit quota of each environment reported by its latest response.",
+    ("env", "dimension"),
+)
+API_RETRIES = REGISTRY.counter(
+    "saxo_api_retries", "Retried Saxo operations by reason.", ("reason",)
+)
+_ID_SEGMENT = re.compile(r"^(?!v\d+$).*\d")
+
+
+@lru_cache(maxsize=1024)
+def _endpoint_label(endpoint):
+    """Collapse UICs and order ids so each endpoint is one metric series."""
+    path = endpoint.split("?", 1)[0]
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+def _record_response(env, method, endpoint, response, elapsed):
+    API_LATENCY.labels(env, method, endpoint).observe(elapsed)
+    API_RESPONSES.labels(env, method, endpoint, response.status_code).inc()
+    API_BYTES.labels(env, "sent").inc(len(response.request.content))
+    API_BYTES.labels(env, "received").inc(len(response.content))
+    if response.status_code == 429:
+        API_RATE_LIMITED.labels(env, endpoint).inc()
+    for name, value in response.headers.items():
+        # Saxo reports quotas as X-RateLimit-<Dimension>-Remaining.
+        if name.startswith("x-ratelimit-") and name.endswith("-remaining"):
+            try:
+                API_RATE_LIMIT_REMAINING.labels(env, name[12:-10]).set(float(value))
+            except ValueError:
+                pass
+
+
+def _utc_iso(moment):
+    return moment.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
 class AuthenticationError(ConnectionError):
@@ -23,6 +94,106 @@ class SaxoAPIError(ConnectionError):
     """A non-authentication Saxo API failure."""
 
 
+class TokenRefreshScheduler:
+    """Refresh the access token once per lifetime, shortly before it expires.
+
+    The next wake-up is derived from the token's monotonic deadline minus
+    ``skew_seconds``. Failed refreshes are retried with jittered exponential
+    backoff; after ``max_attempts`` consecutive failures the worker stops and
+    requests fall back to their own refresh check.
+    """
+
+    def __init__(
+        self,
+        client,
+        skew_seconds=REFRESH_SKEW_SECONDS,
+        max_sleep_seconds=None,
+        retry_seconds=5,
+        max_retry_seconds=120,
+        max_attempts=5,
+    ):
+        self.client = client
+        self.skew_seconds = skew_seconds
+        self.max_sleep_seconds = max_sleep_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.max_attempts = max_attempts
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._next_refresh = None
+
+    def start(self):
+        if self.is_alive():
+            logger.info("Token refresh scheduler is already running.")
+            return
+        logger.info("Starting token refresh scheduler.")
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="saxo-token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.is_alive():
+            return
+        logger.info("Stopping token refresh scheduler.")
+        self._stop_event.set()
+        self._thread.join()
+        self._next_refresh = None
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def next_refresh_in(self):
+        """Return seconds until the next scheduled refresh, or None when idle."""
+        next_refresh = self._next_refresh
+        return None if next_refresh is None else max(0.0, next_refresh - time.monotonic())
+
+    def _refresh_delay(self):
+        remaining = self.client.auth_client.access_token_seconds_remaining()
+        if remaining is None:
+            return 0.0
+        # One extra second keeps the wake-up safely inside the window in
+        # which the client's expiry check agrees that a refresh is due.
+        return max(0.0, remaining - self.skew_seconds + 1)
+
+    def _retry_delay(self, attempt):
+        delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _refresh(self):
+        try:
+            self.client.refresh_token()
+        except Exception as exc:
+            logger.warning("Scheduled token refresh failed: %s", exc)
+            return False
+        # A refresh that leaves the deadline inside the skew window (for
+        # example an unusable response) counts as a failure, never a spin.
+        return self._refresh_delay() > 0
+
+    def _run(self):
+        attempt = 0
+        while True:
+            delay = self._retry_delay(attempt) if attempt else self._refresh_delay()
+            if self.max_sleep_seconds:
+                delay = min(delay, self.max_sleep_seconds)
+            self._next_refresh = time.monotonic() + delay
+            if self._stop_event.wait(delay):
+                return
+            if self._refresh_delay() > 0:
+                # Early wake-up, or a request/other process already refreshed.
+                attempt = 0
+                continue
+            if self._refresh():
+                logger.info("Scheduled token refresh successful.")
+                attempt = 0
+                continue
+            attempt += 1
+            if attempt >= self.max_attempts:
+                logger.error("Token refresh failed; user re-authorization is required.")
+                self._next_refresh = None
+                return
+            API_RETRIES.labels("token_refresh").inc()
+
+
 class SaxoClient:
     # Define possible states for the client
     STATE_NOT_AUTHENTICATED = "not_authenticated"
@@ -42,11 +213,17 @@ class SaxoClient:
         scope="required_scope",
         baseurl="https://gateway.saxobank.com/sim/openapi",
         trading_enabled=False,
+        environment=None,
     ):
-        """Initialize the SaxoClient with authentication and service clients."""
+        """Initialize the SaxoClient with authentication and service clients.
+
+        ``environment`` names the client in metrics (the base URL otherwise).
+        """
         self._state = self.STATE_NOT_AUTHENTICATED  # Initial state
         self._refresh_lock = threading.Lock()
         self.trading_enabled = trading_enabled
+        self.environment = environment or baseurl
+        self.http = httpx.Client(http2=True)
         self.auth_client = AuthorizationCodeClient(
             client_id=client_id,
             redirect_uri=redirect_uri,
@@ -76,11 +253,11 @@ class SaxoClient:
             self.STATE_REFRESHING,
             self.STATE_ERROR,
         ]:
-            logger.warning(f"Attempted to transition to an unknown state: {new_state}")
+            logger.warning("Attempted to transition to an unknown state: %s", new_state)
             return
 
         if self._state != new_state:
-            logger.info(f"SaxoClient state transition: {self._state} -> {new_state}")
+            logger.info("SaxoClient state transition: %s -> %s", self._state, new_state)
             self._state = new_state
 
         if new_state == self.STATE_ERROR:
@@ -112,38 +289,74 @@ class SaxoClient:
                 self.transition(self.STATE_ERROR)
             return tokens
         except Exception as e:
-            logger.error(f"Failed to get token: {e}")
+            logger.error("Failed to get token: %s", e)
             self.transition(self.STATE_ERROR)
 
     def refresh_token(self):
-        """Refresh the access token."""
+        """Refresh the access token, sharing refreshes with other processes."""
         # A request and a long-running serve session can notice expiry at the
         # same time. Serialize refreshes to avoid rotating tokens concurrently.
         with self._refresh_lock:
-            with token_file_lock(self.auth_client.token_file):
-                # Another process may have refreshed while this process was
-                # waiting for the lock. Prefer its fresh token.
-                latest_tokens = self.auth_client._load_tokens()
-                if isinstance(latest_tokens, dict) and latest_tokens:
-                    self.auth_client.tokens = latest_tokens
-                    if not self.auth_client._is_access_token_expired():
-                        self.transition(self.STATE_AUTHENTICATED)
-                        return latest_tokens
-                self.transition(self.STATE_REFRESHING)
-                try:
-                    refreshed_tokens = self.auth_client.refresh_token()
-                    if refreshed_tokens and self.auth_client.tokens.get("access_token"):
-                        self.transition(self.STATE_AUTHENTICATED)
-                    else:
-                        logger.warning("Token refresh did not return usable tokens.")
-                        self.transition(self.STATE_NOT_AUTHENTICATED)
-                    return refreshed_tokens
-                except Exception as e:
-                    logger.error(f"Failed to refresh token: {e}")
-                    # Authentication policy belongs to the runtime session; do
-                    # not initiate an interactive flow from a refresh operation.
-                    self.transition(self.STATE_NOT_AUTHENTICATED)
-                    raise
+            broker = self.auth_client.broker
+            # Fast path: another process (usually ``serve``) already published
+            # a fresh token. The stat-validated read takes no lock at all.
+            latest_tokens = self._adopt_tokens(broker.read())
+            if latest_tokens is not None:
+                return latest_tokens
+            if (
+                not broker.is_owner
+                and broker.owner_active()
+                and self.auth_client.access_token_valid(REQUEST_SKEW_SECONDS)
+            ):
+                # The owning process rotates the token before it expires; keep
+                # using the current one instead of queueing on the lock.
+                self.transition(self.STATE_AUTHENTICATED)
+                return self.auth_client.tokens
+            token_file = self.auth_client.token_file
+            with token_file_lock(token_file, blocking=False) as acquired:
+                if acquired:
+                    return self._refresh_token_locked()
+            # Another process is refreshing right now. Wait for it as a reader
+            # and only take over if it did not publish a usable token.
+            with token_file_lock(token_file, shared=True):
+                latest_tokens = self._adopt_tokens(broker.read())
+            if latest_tokens is not None:
+                return latest_tokens
+            with token_file_lock(token_file):
+                return self._refresh_token_locked()
+
+    def _adopt_tokens(self, latest_tokens):
+        """Use tokens from disk; return them if the access token is still fresh."""
+        if not isinstance(latest_tokens, dict) or not latest_tokens:
+            return None
+        # Always adopt: another process may have rotated the refresh token.
+        self.auth_client.tokens = latest_tokens
+        if not self.auth_client.access_token_valid(REFRESH_SKEW_SECONDS):
+            return None
+        self.transition(self.STATE_AUTHENTICATED)
+        return latest_tokens
+
+    def _refresh_token_locked(self):
+        # Another process may have refreshed while this process was waiting
+        # for the lock. Prefer its fresh token.
+        latest_tokens = self._adopt_tokens(self.auth_client.broker.read())
+        if latest_tokens is not None:
+            return latest_tokens
+        self.transition(self.STATE_REFRESHING)
+        try:
+            refreshed_tokens = self.auth_client.refresh_token()
+            if refreshed_tokens and self.auth_client.tokens.get("access_token"):
+                self.transition(self.STATE_AUTHENTICATED)
+            else:
+                logger.warning("Token refresh did not return usable tokens.")
+                self.transition(self.STATE_NOT_AUTHENTICATED)
+            return refreshed_tokens
+        except Exception as e:
+            logger.error("Failed to refresh token: %s", e)
+            # Authentication policy belongs to the runtime session; do
+            # not initiate an interactive flow from a refresh operation.
+            self.transition(self.STATE_NOT_AUTHENTICATED)
+            raise
 
     def ensure_access_token(self):
         """Ensure a usable access token exists, refreshing it when necessary."""
@@ -177,46 +390,35 @@ class SaxoClient:
         print("Authentication failed. No access token was saved.")
         return False
 
-    def start_refresh_thread(self, interval=60):
-        """Start a background thread to refresh the token periodically."""
-        if not hasattr(self, "_refresh_thread") or not self._refresh_thread.is_alive():
-            logger.info("Starting token refresh thread...")
-            self._stop_event = threading.Event()
-            self._refresh_thread = threading.Thread(
-                target=self._refresh_loop, args=(interval,), daemon=True
-            )
-            self._refresh_thread.start()
-        else:
-            logger.info("Token refresh thread is already running.")
+    def start_refresh_thread(self, interval=None):
+        """Start the deadline-driven token refresh scheduler.
+
+        ``interval`` only caps a single sleep so wall-clock jumps (for example
+        a suspended laptop) are noticed; refreshes still happen once per token.
+        """
+        scheduler = getattr(self, "_refresh_scheduler", None)
+        if scheduler is None or not scheduler.is_alive():
+            scheduler = TokenRefreshScheduler(self, max_sleep_seconds=interval)
+            self._refresh_scheduler = scheduler
+        # Concurrent CLI processes defer rotation to the owning process.
+        if not self.auth_client.broker.acquire_ownership():
+            logger.info("Another process owns token refreshes; following its token file.")
+        scheduler.start()
+        return scheduler
 
     def stop_refresh_thread(self):
-        """Stop the background token refresh thread."""
-        if hasattr(self, "_refresh_thread") and self._refresh_thread.is_alive():
-            logger.info("Stopping token refresh thread...")
-            self._stop_event.set()
-            self._refresh_thread.join()
+        """Stop the token refresh scheduler."""
+        scheduler = getattr(self, "_refresh_scheduler", None)
+        if scheduler is not None and scheduler.is_alive():
+            scheduler.stop()
         else:
-            logger.info("No active token refresh thread to stop.")
-
-    def _refresh_loop(self, interval):
-        """Background thread to refresh token periodically."""
-        while not self._stop_event.is_set():
-            if self.auth_client._is_access_token_expired():
-                logger.info("Access token expired or about to expire; refreshing...")
-                self.transition(self.STATE_REFRESHING)
-                try:
-                    self.ensure_access_token()
-                    logger.info("Token refresh successful.")
-                except AuthenticationError:
-                    logger.error("Token refresh failed; user re-authorization is required.")
-                    break
-            else:
-                expires_at = self.auth_client.tokens.get("access_token_expires_at", 0)
-                self.transition(self.STATE_AUTHENTICATED)
-                logger.debug(
-                    f"Access token valid until {lifetime_seconds_to_datetime(expires_at)}."
-                )
-            self._stop_event.wait(interval)
+            logger.info("No active token refresh scheduler to stop.")
+        self.auth_client.broker.release_ownership()
+
+    def next_refresh_in(self):
+        """Return seconds until the scheduled token refresh, or None."""
+        scheduler = getattr(self, "_refresh_scheduler", None)
+        return scheduler.next_refresh_in() if scheduler is not None else None
 
     #########################
     # API methods
@@ -232,12 +434,14 @@ class SaxoClient:
                 "Trading is disabled. Set TRADING_ENABLED=true and use --execute."
             )
 
-        if not self.auth_client.tokens or self.auth_client._is_access_token_expired():
+        # The refresh scheduler keeps the token ahead of this check in serve
+        # mode; only a missing, failed or one-shot refresh reaches the slow path.
+        if not self.auth_client.access_token_valid(REQUEST_SKEW_SECONDS):
             logger.warning("Token expired or not found. Attempting to refresh.")
             try:
                 self.ensure_access_token()
             except Exception as e:
-                logger.error(f"Failed to refresh token: {e}")
+                logger.error("Failed to refresh token: %s", e)
                 self.transition(self.STATE_NOT_AUTHENTICATED)
                 raise ConnectionError(
                     "Authentication token is invalid or expired, and refresh failed."
@@ -253,9 +457,16 @@ class SaxoClient:
             "Content-Type": "application/json",  # Assuming JSON for most requests
         }
 
+        label = _endpoint_label(endpoint)
+        started = time.perf_counter()
         try:
-            response = _http2_client.request(
-                method, url, headers=headers, json=data, params=params
+            with span(f"saxo {method} {label}") as request_span:
+                response = (_http2_client or self.http).request(
+                    method, url, headers=headers, json=data, params=params
+                )
+                request_span.set(status=response.status_code)
+            _record_response(
+                self.environment, method, label, response, time.perf_counter() - started
             )
             # logger.debug(f"API Request: {method} {url} - Status Code: {response.status_code}")
             # logger.debug(f"Headers: {headers}   Data: {data}   Params: {params}")
@@ -276,24 +487,28 @@ class SaxoClient:
                 + (f" - {detail[:500]}" if detail else "")
             ) from e
         except httpx.RequestError as e:
-            logger.error(f"API request failed: {e}")
+            API_LATENCY.labels(self.environment, method, label).observe(
+                time.perf_counter() - started
+            )
+            API_RESPONSES.labels(self.environment, method, label, "error").inc()
+            logger.error("API request failed: %s", e)
             raise SaxoAPIError(f"API request to {url} failed.") from e
 
     def get_positions(self):
         """Get current positions."""
         # Refactored to use the template method
-        logger.info("Fetching positions via SaxoClient helper.")
+        logger.debug("Fetching positions via SaxoClient helper.")
         return self._make_api_request("GET", "/port/v1/positions/me")
 
     def get_accounts(self):
         """Get current accounts."""
         # Refactored to use the template method
-        logger.info("Fetching accounts via SaxoClient helper.")
+        logger.debug("Fetching accounts via SaxoClient helper.")
         return self._make_api_request("GET", "/port/v1/accounts/me")
 
     def get_instrument_by_uic(self, uic, asset_type="Stock"):
         # Refactored to use the template method
-        logger.info("Fetching instrument details via SaxoClient helper.")
+        logger.debug("Fetching instrument details via SaxoClient helper.")
         return self._make_api_request("GET", f"/ref/v1/instruments/details/{uic}/{asset_type}")
 
     def get_balances(self):
@@ -311,20 +526,31 @@ class SaxoClient:
             local_now = datetime.now().astimezone()
             start = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
             end = start + timedelta(days=1) - timedelta(microseconds=1)
-            params.update(
-                {
-                    "FromDateTime": start.astimezone(timezone.utc)
-                    .isoformat()
-                    .replace("+00:00", "Z"),
-                    "ToDateTime": end.astimezone(timezone.utc).isoformat().replace("+00:00", "Z"),
-                }
-            )
+            params.update({"FromDateTime": _utc_iso(start), "ToDateTime": _utc_iso(end)})
         return self._make_api_request(
             "GET",
             "/cs/v1/audit/orderactivities",
             params=params,
         )
 
+    def get_order_activities(self, from_time=None, to_time=None, page_size=1000):
+        """Return every order activity between two aware datetimes, following ``__next``."""
+        params = {"EntryType": "All", "$top": page_size, "FieldGroups": "DisplayAndFormat"}
+        if from_time is not None:
+            params["FromDateTime"] = _utc_iso(from_time)
+        if to_time is not None:
+            params["ToDateTime"] = _utc_iso(to_time)
+        rows = []
+        while True:
+            page = self._make_api_request("GET", "/cs/v1/audit/orderactivities", params=params)
+            data = page.get("Data") or [] if isinstance(page, dict) else []
+            rows.extend(data)
+            next_page = page.get("__next") if isinstance(page, dict) else None
+            if not next_page or not data:
+                return rows
+            # The next link carries the paging cursor ($skip or $skiptoken).
+            params = {**params, **dict(parse_qsl(urlsplit(next_page).query))}
+
     def search_instruments(self, query, asset_type=None):
         params = {"Keywords": query}
         if asset_type:
@@ -337,6 +563,57 @@ class SaxoClient:
             params["AccountKey"] = account_key
         return self._make_api_request("GET", "/trade/v1/infoprices", params=params)
 
+    def get_quotes(self, uics, asset_type="Stock", account_key=None, field_groups="Quote"):
+        """Quote many instruments of one asset type; return the ``Data`` rows.
+
+        Uses ``/trade/v1/infoprices/list``, one request per
+        ``INFO_PRICES_BATCH_SIZE`` UICs.
+        """
+        uics = [str(uic) for uic in uics]
+        rows = []
+        for start in range(0, len(uics), INFO_PRICES_BATCH_SIZE):
+            params = {
+                "Uics": ",".join(uics[start : start + INFO_PRICES_BATCH_SIZE]),
+                "AssetType": asset_type,
+                "FieldGroups": field_groups,
+            }
+            if account_key:
+                params["AccountKey"] = account_key
+            page = self._make_api_request("GET", "/trade/v1/infoprices/list", params=params)
+            rows.extend(page.get("Data") or [] if isinstance(page, dict) else [])
+        return rows
+
+    def get_chart_bars(
+        self, uic, asset_type="Stock", horizon=1440, mode="UpTo", at=None, count=None
+    ):
+        """Return up to ``count`` OHLC bars of ``horizon`` minutes, oldest first.
+
+        ``mode`` ``"From"`` returns bars starting at or after the aware
+        datetime ``at`` (the ``Time`` parameter), ``"UpTo"`` the bars up to it
+        (the latest without ``at``). Uses ``/chart/v3/charts``; ``count`` is capped at
+        ``CHART_BARS_MAX_COUNT``.
+        """
+        params = {
+            "Uic": uic,
+            "AssetType": asset_type,
+            "Horizon": int(horizon),
+            "Mode": mode,
+            "Count": min(int(count or CHART_BARS_MAX_COUNT), CHART_BARS_MAX_COUNT),
+        }
+        if at is not None:
+            params["Time"] = _utc_iso(at)
+        page = self._make_api_request("GET", "/chart/v3/charts", params=params)
+        return page.get("Data") or [] if isinstance(page, dict) else []
+
+    def get_option_space(self, option_root_id, expiries=None):
+        """Get an option root with the contracts of every expiry, or only ``expiries``."""
+        params = {"OptionSpaceSegment": "AllDates"}
+        if expiries:
+            params = {"OptionSpaceSegment": "SpecificDates", "ExpiryDates": ",".join(expiries)}
+        return self._make_api_request(
+            "GET", f"/ref/v1/instruments/contractoptionspaces/{option_root_id}", params=params
+        )
+
     def place_order(self, order):
         request = dict(order)
         request["WithAdvice"] = False
@@ -1,6 +1,9 @@
 """Normalized, agent-facing Saxo data models and local portfolio analytics."""
 
-from datetime import datetime, timezone
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .fields import BALANCE, INSTRUMENT, POSITION, QUOTE
 
 
 def first(data, *keys, default=None):
@@ -28,119 +31,330 @@ def normalize_account(raw, environment):
     }
 
 
+class _Model:
+    """Base of the slotted models: read-only mapping access for dict-era callers.
+
+    ``model["symbol"]`` and ``model.get("symbol")`` read attributes, so code
+    written against the former per-row dicts keeps working. ``to_json()``
+    returns the public field names used in CLI and web output.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+@dataclass(slots=True)
+class Balance(_Model):
+    environment: str | None
+    currency: str | None
+    cash: float
+    net_equity: float
+    available_for_trading: float
+    margin_used: float
+
+    def to_json(self):
+        return {
+            "environment": self.environment,
+            "currency": self.currency,
+            "cash": self.cash,
+            "net_equity": self.net_equity,
+            "available_for_trading": self.available_for_trading,
+            "margin_used": self.margin_used,
+        }
+
+
+@dataclass(slots=True)
+class Position(_Model):
+    symbol: str | None
+    description: str | None
+    asset_type: str | None
+    uic: int | None
+    quantity: float
+    currency: str | None
+    market_price: float | None
+    market_value: float | None
+    cost_price: float | None
+    unrealized_pnl: float | None
+    account_id: str | None = None
+    account_key: str | None = None
+    one_day_percent: float | None = None
+    total_percent: float | None = None
+    # Option contract terms from the instrument details; ``None`` otherwise.
+    strike: float | None = None
+    expiry: str | None = None
+    put_call: str | None = None
+    underlying_uic: int | None = None
+    contract_size: float | None = None
+
+    @property
+    def uin(self):
+        return self.uic
+
+    @property
+    def side(self):
+        return "short" if number(self.quantity) < 0 else "long"
+
+    @property
+    def raw(self):
+        return {"Uic": self.uic, "AssetType": self.asset_type}
+
+    def to_json(self):
+        return {
+            "symbol": self.symbol,
+            "description": self.description,
+            "asset_type": self.asset_type,
+            "uin": self.uic,
+            "uic": self.uic,
+            "quantity": self.quantity,
+            "currency": self.currency,
+            "market_price": self.market_price,
+            "market_value": self.market_value,
+            "cost_price": self.cost_price,
+            "unrealized_pnl": self.unrealized_pnl,
+            "account_id": self.account_id,
+            "side": self.side,
+            "raw": self.raw,
+            **(
+                {
+                    "strike": self.strike,
+                    "expiry": self.expiry,
+                    "put_call": self.put_call,
+                    "underlying_uic": self.underlying_uic,
+                    "contract_size": self.contract_size,
+                }
+                if self.strike is not None
+                else {}
+            ),
+        }
+
+
+@dataclass(slots=True)
+class Quote(_Model):
+    symbol: str | None
+    timestamp: str | None
+    bid: float | None
+    ask: float | None
+    mid: float | None
+    last: float | None
+    currency: str | None
+    is_delayed: bool | None
+    delayed_by_minutes: int | None
+    market_state: str | None
+
+    def to_json(self):
+        return {
+            "symbol": self.symbol,
+            "timestamp": self.timestamp,
+            "bid": self.bid,
+            "ask": self.ask,
+            "mid": self.mid,
+            "last": self.last,
+            "currency": self.currency,
+            "is_delayed": self.is_delayed,
+            "delayed_by_minutes": self.delayed_by_minutes,
+            "market_state": self.market_state,
+        }
+
+
+@dataclass(slots=True)
+class Order(_Model):
+    """A working order as listed by the dashboard."""
+
+    instrument: str
+    company_name: str | None
+    status: str | None
+    sub_status: str | None
+    buy_sell: str | None
+    amount: float | None
+    order_price: float | None
+    order_id: str | None
+    account_key: str | None
+    filled_amount: float | None
+    average_price: float | None
+
+    activity_time = None
+
+    def to_json(self):
+        return {
+            "instrument": self.instrument,
+            "company_name": self.company_name,
+            "Status": self.status,
+            "SubStatus": self.sub_status,
+            "BuySell": self.buy_sell,
+            "Amount": self.amount,
+            "OrderPrice": self.order_price,
+            "ActivityTime": self.activity_time,
+            "OrderId": self.order_id,
+            "AccountKey": self.account_key,
+            "FilledAmount": self.filled_amount,
+            "AveragePrice": self.average_price,
+        }
+
+
+@dataclass(slots=True)
+class OrderActivity(Order):
+    """One order-history entry: an order's state at ``activity_time``."""
+
+    activity_time: str | None = None
+
+
+def to_json(value):
+    """``json.dumps`` default: models serialize through ``to_json()``."""
+    serialize = getattr(value, "to_json", None)
+    return serialize() if serialize is not None else str(value)
+
+
 def normalize_balance(raw, environment, currency=None):
-    return {
-        "environment": environment,
-        "currency": currency or first(raw, "Currency", "AccountCurrency", "BaseCurrency"),
-        "cash": first(raw, "CashBalance", "Cash", "CashBalanceInBaseCurrency", default=0),
-        "net_equity": first(
-            raw, "TotalValue", "NetEquityForMargin", "NetEquity", "TotalNetValue", default=0
-        ),
-        "available_for_trading": first(
-            raw, "AvailableForTrading", "AvailableCash", "CashAvailableForTrading", default=0
-        ),
-        "margin_used": first(raw, "MarginUsed", "MarginUtilization", default=0),
-    }
+    raw_currency, cash, net_equity, available, margin_used = BALANCE.extract(raw or {})
+    return Balance(
+        environment=environment,
+        currency=currency or raw_currency,
+        cash=0 if cash is None else cash,
+        net_equity=0 if net_equity is None else net_equity,
+        available_for_trading=0 if available is None else available,
+        margin_used=0 if margin_used is None else margin_used,
+    )
 
 
-def normalize_position(raw, instrument=None, account_currency=None):
-    base = raw.get("PositionBase", raw)
-    view = raw.get("PositionView", {})
-    instrument = instrument or {}
-    quantity = first(base, "Amount", "Quantity", default=0)
-    price = first(view, "CurrentPrice", "MarketPrice", "Price", default=0)
-    market_value = first(
-        view, "MarketValue", "MarketValueInBaseCurrency", default=number(quantity) * number(price)
+def _position(values, details, account_currency):
+    (
+        account_id,
+        account_key,
+        uic,
+        asset_type,
+        symbol,
+        quantity,
+        currency,
+        price,
+        market_value,
+        cost_price,
+        unrealized_pnl,
+        total_percent,
+        one_day_percent,
+    ) = values
+    (
+        instrument_symbol,
+        description,
+        instrument_asset_type,
+        strike,
+        expiry,
+        put_call,
+        underlying_uic,
+        contract_size,
+        instrument_currency,
+    ) = details
+    quantity = 0 if quantity is None else quantity
+    price = 0 if price is None else price
+    return Position(
+        symbol=instrument_symbol or symbol,
+        description=description,
+        asset_type=asset_type if asset_type is not None else instrument_asset_type,
+        uic=uic,
+        quantity=quantity,
+        currency=currency or instrument_currency or account_currency,
+        market_price=price,
+        market_value=number(quantity) * number(price) if market_value is None else market_value,
+        cost_price=0 if cost_price is None else cost_price,
+        unrealized_pnl=0 if unrealized_pnl is None else unrealized_pnl,
+        account_id=account_id,
+        account_key=account_key,
+        one_day_percent=one_day_percent,
+        total_percent=total_percent,
+        strike=strike,
+        expiry=None if expiry is None else str(expiry)[:10],
+        put_call=put_call,
+        underlying_uic=underlying_uic,
+        contract_size=contract_size,
     )
-    return {
-        "symbol": first(instrument, "Symbol", "Identifier", "Description")
-        or first(base, "Symbol", "Identifier"),
-        "description": first(instrument, "Description", "Name"),
-        "asset_type": first(base, "AssetType", default=first(instrument, "AssetType")),
-        "uin": first(base, "Uic", "UIN"),
-        "uic": first(base, "Uic", "UIN"),
-        "quantity": quantity,
-        "currency": first(view, "Currency") or account_currency,
-        "market_price": price,
-        "market_value": market_value,
-        "cost_price": first(view, "AverageOpenPrice", "OpenPrice", "EntryPrice", default=0),
-        "unrealized_pnl": first(
-            view, "ProfitLossOnTrade", "ProfitLossOnTradeInBaseCurrency", default=0
-        ),
-        "account_id": first(base, "AccountId"),
-        "side": "short" if number(quantity) < 0 else "long",
-        "raw": {"Uic": first(base, "Uic", "UIN"), "AssetType": first(base, "AssetType")},
-    }
+
+
+def normalize_position(raw, instrument=None, account_currency=None):
+    return _position(POSITION.extract(raw), INSTRUMENT.extract(instrument or {}), account_currency)
+
+
+def normalize_positions(raws, instruments, account_currencies=None):
+    """Normalize a page of positions with the compiled extractors.
+
+    ``instruments`` and ``account_currencies`` are per-row sequences parallel
+    to ``raws``; an instrument may be ``None`` or ``{}``.
+    """
+    raws = list(raws)
+    if not raws:
+        return []
+    instruments = [instrument or {} for instrument in instruments]
+    account_currencies = account_currencies or [None] * len(raws)
+    extract = POSITION.compile()
+    describe = INSTRUMENT.compile()
+    return [
+        _position(extract(raw), describe(instrument), currency)
+        for raw, instrument, currency in zip(raws, instruments, account_currencies, strict=True)
+    ]
 
 
 def normalize_quote(raw, symbol=None, currency=None):
-    bid = first(raw, "Bid", "BidAsk", default=None)
-    ask = first(raw, "Ask", default=None)
+    (
+        timestamp,
+        bid,
+        ask,
+        mid,
+        last,
+        raw_currency,
+        is_delayed,
+        delayed_minutes,
+        market_state,
+    ) = QUOTE.extract(raw or {})
     if isinstance(bid, dict):
         bid = first(bid, "Bid", "Price")
-    mid = first(
-        raw,
-        "Mid",
-        "MidPrice",
-        default=(number(bid) + number(ask)) / 2 if bid is not None and ask is not None else None,
-    )
-    delayed_minutes = first(raw, "DelayedByMinutes", default=None)
-    is_delayed = first(raw, "IsDelayed", "Delayed", default=None)
+    if mid is None and bid is not None and ask is not None:
+        mid = (number(bid) + number(ask)) / 2
     if is_delayed is None and delayed_minutes is not None:
         is_delayed = number(delayed_minutes) > 0
-    return {
-        "symbol": symbol,
-        "timestamp": first(raw, "Timestamp", "LastUpdated"),
-        "bid": bid,
-        "ask": ask,
-        "mid": mid,
-        "last": first(raw, "LastTraded", "Last", "Price"),
-        "currency": currency or first(raw, "Currency"),
-        "is_delayed": is_delayed,
-        "delayed_by_minutes": delayed_minutes,
-        "market_state": first(raw, "MarketState", "MarketStatus"),
-        "raw": raw,
-    }
+    return Quote(
+        symbol=symbol,
+        timestamp=timestamp,
+        bid=bid,
+        ask=ask,
+        mid=mid,
+        last=last,
+        currency=currency or raw_currency,
+        is_delayed=is_delayed,
+        delayed_by_minutes=delayed_minutes,
+        market_state=market_state,
+    )
 
 
-def portfolio_summary(positions, balance):
-    total = number(balance.get("net_equity")) or sum(
-        number(p.get("market_value")) for p in positions
-    )
-    classes = {}
-    for p in positions:
-        kind = str(p.get("asset_type") or "other").lower()
-        key = (
-            "options_market_value"
-            if "option" in kind
-            else ("stocks" if "stock" in kind or "equity" in kind else "other")
-        )
-        classes[key] = classes.get(key, 0) + number(p.get("market_value"))
-    if balance.get("cash") is not None:
-        classes["cash"] = number(balance.get("cash"))
-    largest = sorted(
-        (
-            dict(p, weight=(number(p.get("market_value")) / total if total else 0))
-            for p in positions
-        ),
-        key=lambda p: abs(number(p.get("market_value"))),
-        reverse=True,
-    )[:10]
-    return {
-        "environment": balance.get("environment"),
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "net_value": total,
-        "cash": balance.get("cash"),
-        "asset_classes": classes,
-        "largest_positions": [
-            {
-                "symbol": p.get("symbol"),
-                "market_value": p.get("market_value"),
-                "weight": p["weight"],
-            }
-            for p in largest
-        ],
-    }
+@lru_cache(maxsize=256)
+def _asset_class(asset_type):
+    kind = str(asset_type or "other").lower()
+    if "option" in kind:
+        return 1
+    return 0 if "stock" in kind or "equity" in kind else 2
+
+
+def portfolio_summary(positions, balance, rates=None):
+    """Summarize normalized positions (a list or a ``PositionFrame``).
+
+    With ``rates`` (currency -> units of the balance currency) values are
+    converted to the balance currency first; otherwise they are added as they
+    are.
+    """
+    from .frame import PositionFrame
+
+    frame = positions if isinstance(positions, PositionFrame) else PositionFrame(positions)
+    if rates is not None:
+        frame = frame.convert(rates, balance.get("currency"))
+    return frame.summary(balance)
+
+
+ROLL_SORT_KEYS = ("annualized", "conservative", "midpoint")
 
 
 def roll_analysis(existing, new, contracts, multiplier=100):
@@ -0,0 +1,221 @@
+"""Declarative Saxo field mappings compiled into per-shape extractors.
+
+A ``Schema`` lists, for each output field, the source keys to try in order
+(``"PositionView.CurrentPrice"`` reads a nested section). Scanning those
+fallbacks through generic path handling for every field of every row is what
+made normalizing large payloads slow, so each schema generates one
+straight-line function that resolves every section once per row and tries the
+candidates of each field with plain ``dict.get`` calls, in declared order.
+The order never depends on other rows, so a batch of rows with different
+shapes (a CFD with only ``Exposure`` next to a stock with ``MarketValue``)
+extracts exactly as each row would alone.
+
+Extractors return a tuple in field order; missing fields are ``None`` and
+callers apply their own defaults.
+"""
+
+import threading
+
+_EMPTY = {}
+
+
+class Schema:
+    """Ordered ``(name, candidates)`` fields over a payload with optional sections.
+
+    ``sections`` are the nested objects paths may name; ``root`` is the
+    section that is the row itself when the row does not nest it, as
+    ``PositionBase`` is for flat position rows.
+    """
+
+    def __init__(self, name, fields, sections=(), root=None):
+        self.name = name
+        self.fields = tuple((field, tuple(candidates)) for field, candidates in fields)
+        self.names = tuple(field for field, _ in self.fields)
+        self.sections = tuple(sections)
+        self.root = root
+        for _, candidates in self.fields:
+            for path in candidates:
+                self._split(path)
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def _split(self, path):
+        section, _, key = path.rpartition(".")
+        if section and section not in self.sections:
+            raise ValueError(f"Unknown section {section!r} in {self.name} schema.")
+        return section, key
+
+    def compile(self):
+        """Return the generated ``extract(row) -> tuple``, built on first use."""
+        extract = self._compiled
+        if extract is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = self._generate()
+                extract = self._compiled
+        return extract
+
+    def extract(self, row):
+        """Extract one row; batches should ``compile`` once instead."""
+        return self.compile()(row)
+
+    def extract_all(self, rows):
+        extract = self.compile()
+        return [extract(row) for row in rows]
+
+    def _generate(self):
+        variables = {section: f"s{index}" for index, section in enumerate(self.sections)}
+        variables[""] = "row"
+        lines = ["def extract(row):"]
+        for section in self.sections:
+            name = variables[section]
+            missing = "row" if section == self.root else "_EMPTY"
+            lines.append(f"    {name} = row.get({section!r})")
+            lines.append(f"    if not isinstance({name}, dict): {name} = {missing}")
+        results = []
+        for number, (_, ordered) in enumerate(self.fields):
+            result = f"v{number}"
+            results.append(result)
+            indent = "    "
+            for position, path in enumerate(ordered):
+                section, key = self._split(path)
+                lines.append(f"{indent}{result} = {variables[section]}.get({key!r})")
+                if position < len(ordered) - 1:
+                    lines.append(f"{indent}if {result} is None:")
+                    indent += "    "
+            if not ordered:
+                lines.append(f"    {result} = None")
+        lines.append(f"    return ({', '.join(results)}{',' if len(results) == 1 else ''})")
+        namespace = {"_EMPTY": _EMPTY}
+        exec(compile("\n".join(lines), f"<{self.name} schema>", "exec"), namespace)
+        return namespace["extract"]
+
+
+POSITION = Schema(
+    "position",
+    (
+        ("account_id", ("PositionBase.AccountId",)),
+        ("account_key", ("PositionBase.AccountKey", "PositionBase.AccountId")),
+        ("uic", ("PositionBase.Uic", "PositionBase.UIN")),
+        ("asset_type", ("PositionBase.AssetType",)),
+        ("symbol", ("PositionBase.Symbol", "PositionBase.Identifier")),
+        ("quantity", ("PositionBase.Amount", "PositionBase.Quantity")),
+        ("currency", ("PositionView.Currency",)),
+        (
+            "market_price",
+            (
+                "PositionView.CurrentPrice",
+                "PositionView.MarketPrice",
+                "PositionView.Price",
+                "PositionBase.CurrentPrice",
+                "PositionBase.MarketPrice",
+                "PositionBase.Price",
+            ),
+        ),
+        (
+            "market_value",
+            (
+                "PositionView.MarketValue",
+                "PositionView.MarketValueInBaseCurrency",
+                "PositionView.Exposure",
+            ),
+        ),
+        (
+            "cost_price",
+            (
+                "PositionBase.OpenPrice",
+                "PositionView.OpenPrice",
+                "PositionBase.PurchasePrice",
+                "PositionView.PurchasePrice",
+                "PositionBase.AverageOpenPrice",
+                "PositionView.AverageOpenPrice",
+                "PositionView.EntryPrice",
+            ),
+        ),
+        (
+            "unrealized_pnl",
+            ("PositionView.ProfitLossOnTrade", "PositionView.ProfitLossOnTradeInBaseCurrency"),
+        ),
+        (
+            "total_percent",
+            (
+                "PositionView.ProfitLossOnTradeInPercent",
+                "PositionView.ProfitLossPercent",
+                "PositionView.TotalProfitLossPercent",
+            ),
+        ),
+        (
+            "one_day_percent",
+            (
+                "PositionView.InstrumentPriceDayPercentChange",
+                "PositionView.OneDayProfitLossPercent",
+                "PositionView.DailyProfitLossPercent",
+                "PositionView.DayChangePercent",
+                "PositionView.ChangePercent",
+            ),
+        ),
+    ),
+    sections=("PositionBase", "PositionView"),
+    root="PositionBase",
+)
+
+INSTRUMENT = Schema(
+    "instrument",
+    (
+        ("symbol", ("Symbol", "Identifier", "Description")),
+        ("description", ("Description", "Name")),
+        ("asset_type", ("AssetType",)),
+        ("strike", ("OptionsData.StrikePrice", "OptionsData.Strike", "StrikePrice")),
+        ("expiry", ("OptionsData.ExpiryDate", "ExpiryDate")),
+        ("put_call", ("OptionsData.PutCall", "PutCall")),
+        ("underlying_uic", ("OptionsData.UnderlyingUic", "UnderlyingUic")),
+        ("contract_size", ("ContractSize", "OptionsData.ContractSize")),
+        ("currency", ("CurrencyCode", "PriceCurrency")),
+    ),
+    sections=("OptionsData",),
+)
+
+BALANCE = Schema(
+    "balance",
+    (
+        ("currency", ("Currency", "AccountCurrency", "BaseCurrency")),
+        ("cash", ("CashBalance", "Cash", "CashBalanceInBaseCurrency")),
+        ("net_equity", ("TotalValue", "NetEquityForMargin", "NetEquity", "TotalNetValue")),
+        (
+            "available_for_trading",
+            ("AvailableForTrading", "AvailableCash", "CashAvailableForTrading"),
+        ),
+        ("margin_used", ("MarginUsed", "MarginUtilization")),
+    ),
+)
+
+QUOTE = Schema(
+    "quote",
+    (
+        ("timestamp", ("Timestamp", "LastUpdated")),
+        ("bid", ("Bid", "BidAsk")),
+        ("ask", ("Ask",)),
+        ("mid", ("Mid", "MidPrice")),
+        ("last", ("LastTraded", "Last", "Price")),
+        ("currency", ("Currency",)),
+        ("is_delayed", ("IsDelayed", "Delayed")),
+        ("delayed_by_minutes", ("DelayedByMinutes",)),
+        ("market_state", ("MarketState", "MarketStatus")),
+    ),
+)
+
+ORDER = Schema(
+    "order",
+    (
+        ("status", ("Status",)),
+        ("sub_status", ("SubStatus",)),
+        ("buy_sell", ("BuySell",)),
+        ("amount", ("Amount",)),
+        ("order_price", ("OrderPrice", "Price")),
+        ("order_id", ("OrderId",)),
+        ("account_key", ("AccountKey", "AccountId")),
+        ("filled_amount", ("FilledAmount", "FillAmount")),
+        ("average_price", ("AveragePrice",)),
+        ("activity_time", ("ActivityTime",)),
+    ),
+)
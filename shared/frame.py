@@ -0,0 +1,182 @@
+"""Normalized positions as NumPy columns for vectorized portfolio analytics.
+
+``shared.domain.portfolio_summary`` builds a ``PositionFrame`` when given a
+list; the module is separate so that code using only the data models does not
+import NumPy.
+"""
+
+import copy
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .domain import _asset_class, number
+
+_ASSET_CLASSES = ("stocks", "options_market_value", "other")
+LARGEST_POSITIONS = 10
+
+
+def _ordered_sum(values):
+    """Left-to-right sum, bit-for-bit equal to ``sum()`` over the same floats."""
+    return float(np.add.accumulate(values)[-1]) if len(values) else 0
+
+
+class PositionFrame:
+    """Normalized positions as columns for vectorized portfolio analytics.
+
+    Numeric fields are parsed with ``number()`` once, into float arrays;
+    asset class and currency are integer codes into ``ASSET_CLASSES`` and
+    ``currencies``. ``positions`` keeps the source rows for reporting.
+    Aggregations add values in row order, so they equal the plain-Python sums.
+    Values are in each position's own currency unless the frame comes from
+    ``convert``, which sets ``base_currency``.
+    """
+
+    ASSET_CLASSES = _ASSET_CLASSES
+    base_currency = None
+    fx_rates = None
+    unconverted = ()
+
+    def __init__(self, positions):
+        self.positions = list(positions)
+        quantity, price, market_value, pnl, asset_class, currency = [], [], [], [], [], []
+        currencies = {}
+        for p in self.positions:
+            quantity.append(number(p.get("quantity")))
+            price.append(number(p.get("market_price")))
+            market_value.append(number(p.get("market_value")))
+            pnl.append(number(p.get("unrealized_pnl")))
+            asset_class.append(_asset_class(p.get("asset_type")))
+            currency.append(currencies.setdefault(p.get("currency"), len(currencies)))
+        self.quantity = np.array(quantity, dtype=np.float64)
+        self.price = np.array(price, dtype=np.float64)
+        self.market_value = np.array(market_value, dtype=np.float64)
+        self.unrealized_pnl = np.array(pnl, dtype=np.float64)
+        self.asset_class = np.array(asset_class, dtype=np.int8)
+        self.currency = np.array(currency, dtype=np.int32)
+        self.currencies = tuple(currencies)
+
+    @classmethod
+    def concat(cls, frames):
+        """One frame over several accounts' frames, in order."""
+        return cls([p for frame in frames for p in frame.positions])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def convert(self, rates, base_currency):
+        """A copy with market values and P&L in ``base_currency``.
+
+        ``rates`` maps currencies to units of ``base_currency`` (as from
+        ``FxRates.rates``); every row is converted by one gather from the
+        per-currency rate table. Positions without a currency count as
+        ``base_currency``; those in a currency without a rate keep their own
+        values and the currency is listed in ``unconverted``.
+        """
+        table = np.array(
+            [
+                1.0
+                if currency is None or currency == base_currency
+                else number(rates.get(currency), math.nan)
+                for currency in self.currencies
+            ],
+            dtype=np.float64,
+        )
+        known = np.isfinite(table)
+        factor = np.where(known, table, 1.0)[self.currency]
+        converted = copy.copy(self)
+        converted.market_value = self.market_value * factor
+        converted.unrealized_pnl = self.unrealized_pnl * factor
+        converted.base_currency = base_currency
+        converted.fx_rates = {
+            currency: float(rate)
+            for currency, rate, ok in zip(self.currencies, table, known, strict=True)
+            if ok and currency not in (None, base_currency)
+        }
+        converted.unconverted = tuple(
+            currency for currency, ok in zip(self.currencies, known, strict=True) if not ok
+        )
+        return converted
+
+    def total_market_value(self):
+        return _ordered_sum(self.market_value)
+
+    def asset_class_totals(self):
+        """Market value per asset class, keyed in order of first appearance."""
+        if not len(self):
+            return {}
+        totals = np.bincount(self.asset_class, self.market_value, len(self.ASSET_CLASSES))
+        present, first_rows = np.unique(self.asset_class, return_index=True)
+        return {
+            self.ASSET_CLASSES[code]: float(totals[code])
+            for code in present[np.argsort(first_rows)]
+        }
+
+    def weights(self, total):
+        if not total:
+            return np.zeros(len(self))
+        return self.market_value / total
+
+    def largest(self, count=LARGEST_POSITIONS):
+        """Row indexes of the ``count`` largest absolute market values.
+
+        Ties keep row order, as a stable descending sort would.
+        """
+        size = abs(self.market_value)
+        if len(self) > count:
+            candidates = np.argpartition(-size, count - 1)[:count]
+            size_floor = size[candidates].min()
+            # Every row tied with the cut-off competes, in row order.
+            candidates = np.flatnonzero(size >= size_floor)
+        else:
+            candidates = np.arange(len(self))
+        return candidates[np.argsort(-size[candidates], kind="stable")][:count]
+
+    def pnl_totals(self):
+        """Unrealized P&L in total and per asset class and position currency."""
+        classes = len(self.ASSET_CLASSES)
+        counts = np.bincount(self.asset_class, minlength=classes)
+        by_class = np.bincount(self.asset_class, self.unrealized_pnl, classes)
+        by_currency = np.bincount(self.currency, self.unrealized_pnl, len(self.currencies))
+        return {
+            "total": _ordered_sum(self.unrealized_pnl),
+            "asset_classes": {
+                name: float(by_class[code])
+                for code, name in enumerate(self.ASSET_CLASSES)
+                if counts[code]
+            },
+            "currencies": {
+                currency: float(by_currency[code]) for code, currency in enumerate(self.currencies)
+            },
+        }
+
+    def summary(self, balance):
+        total = number(balance.get("net_equity")) or self.total_market_value()
+        classes = self.asset_class_totals()
+        if balance.get("cash") is not None:
+            classes["cash"] = number(balance.get("cash"))
+        converted = self.base_currency is not None
+        summary = {
+            "environment": balance.get("environment"),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "net_value": total,
+            "cash": balance.get("cash"),
+            "asset_classes": classes,
+            "largest_positions": [
+                {
+                    "symbol": self.positions[row].get("symbol"),
+                    "market_value": float(self.market_value[row])
+                    if converted
+                    else self.positions[row].get("market_value"),
+                    "weight": float(self.market_value[row]) / total if total else 0,
+                }
+                for row in self.largest().tolist()
+            ],
+        }
+        if converted:
+            summary["base_currency"] = self.base_currency
+            summary["fx_rates"] = self.fx_rates
+            summary["unconverted_currencies"] = list(self.unconverted)
+            summary["unrealized_pnl"] = _ordered_sum(self.unrealized_pnl)
+        return summary
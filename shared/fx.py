@@ -0,0 +1,95 @@
+"""Conversion rates into an account currency from ``FxSpot`` quotes.
+
+``FxRates.rates`` returns, for a set of currencies, the units of the base
+currency one unit of each is worth. The ``FxSpot`` crosses with the base
+currency are found with one instrument search per base currency (kept for
+the process) and every missing rate is quoted in a single
+``infoprices/list`` request; rates are then reused for ``ttl`` seconds, so
+the dashboard and repeated summaries do not requote them. A cross quoted the
+other way round (``EURUSD`` for a USD rate into EUR) is inverted.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from .domain import normalize_quote
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 60
+
+
+def default_ttl():
+    """``SAXO_FX_TTL`` seconds, or ``DEFAULT_TTL_SECONDS``."""
+    return float(os.getenv("SAXO_FX_TTL") or DEFAULT_TTL_SECONDS)
+
+
+class FxRates:
+    """Cached FX rates of one client; safe to share between threads."""
+
+    def __init__(self, client, ttl=None):
+        self.client = client
+        self.ttl = default_ttl() if ttl is None else ttl
+        self._rates = {}
+        self._crosses = {}
+        self._lock = threading.Lock()
+
+    def _cross_uics(self, base):
+        """``FxSpot`` symbol (``EURUSD``) -> UIC for the pairs quoted against ``base``."""
+        if base not in self._crosses:
+            found = self.client.search_instruments(base, "FxSpot")
+            rows = found.get("Data", []) if isinstance(found, dict) else []
+            self._crosses[base] = {
+                str(row.get("Symbol") or "").upper(): row.get("Identifier", row.get("Uic"))
+                for row in rows
+                if str(row.get("AssetType") or "FxSpot") == "FxSpot"
+            }
+        return self._crosses[base]
+
+    def rates(self, currencies, base):
+        """Units of ``base`` per unit of each currency; ``None`` where nothing quotes it."""
+        base = str(base or "").upper()
+        wanted = {str(currency).upper() for currency in currencies if currency}
+        wanted.discard(base)
+        with self._lock:
+            now = time.monotonic()
+            missing = [
+                currency
+                for currency in sorted(wanted)
+                if (currency, base) not in self._rates
+                or now - self._rates[currency, base][1] >= self.ttl
+            ]
+            if missing and base:
+                with span("fx.rates", currencies=len(missing)):
+                    try:
+                        self._fetch(missing, base, now)
+                    except Exception as exc:
+                        logger.warning("FX rates into %s unavailable: %s", base, exc)
+            result = {
+                currency: self._rates.get((currency, base), (None,))[0] for currency in wanted
+            }
+        if base:
+            result[base] = 1.0
+        return result
+
+    def _fetch(self, currencies, base, now):
+        crosses = self._cross_uics(base)
+        pairs = {}
+        for currency in currencies:
+            if crosses.get(f"{currency}{base}") is not None:
+                pairs[currency] = (crosses[f"{currency}{base}"], False)
+            elif crosses.get(f"{base}{currency}") is not None:
+                pairs[currency] = (crosses[f"{base}{currency}"], True)
+            else:
+                logger.warning("No FxSpot cross between %s and %s.", currency, base)
+        if not pairs:
+            return
+        rows = self.client.get_quotes(sorted({uic for uic, _ in pairs.values()}), "FxSpot")
+        mids = {row.get("Uic"): normalize_quote(row.get("Quote") or {}).mid for row in rows}
+        for currency, (uic, inverted) in pairs.items():
+            mid = mids.get(uic)
+            if mid:
+                self._rates[currency, base] = (1 / mid if inverted else float(mid), now)
@@ -0,0 +1,227 @@
+"""Vectorized Black-Scholes / Black-76 prices, implied volatility and greeks.
+
+Every function takes NumPy arrays (or scalars) that broadcast together, so a
+whole chain or every option position is handled in one call. ``carry`` is the
+cost of carry: the risk-free rate for stock options without dividends
+(Black-Scholes, the default) and 0 for options on futures (Black-76, with the
+futures price as ``spot``). Rates and volatilities are annual decimals and
+``years`` is the time to expiry.
+
+Greeks are per unit of the underlying: theta per calendar day and vega per
+volatility point (0.01).
+"""
+
+import math
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+VOLATILITY_BOUNDS = (1e-4, 5.0)
+IV_TOLERANCE = 1e-8
+IV_MAX_ITERATIONS = 100
+GREEK_NAMES = ("iv", "delta", "gamma", "theta", "vega")
+_SQRT_2PI = math.sqrt(2 * math.pi)
+_HART_NUMERATOR = (
+    3.52624965998911e-02,
+    0.700383064443688,
+    6.37396220353165,
+    33.912866078383,
+    112.079291497871,
+    221.213596169931,
+    220.206867912376,
+)
+_HART_DENOMINATOR = (
+    8.83883476483184e-02,
+    1.75566716318264,
+    16.064177579207,
+    86.7807322029461,
+    296.564248779674,
+    637.333633378831,
+    793.826512519948,
+    440.413735824752,
+)
+# Underlying asset type per option asset type, and the options priced as Black-76.
+UNDERLYING_ASSET_TYPES = {
+    "StockOption": "Stock",
+    "StockIndexOption": "StockIndex",
+    "FuturesOption": "ContractFutures",
+}
+FUTURES_OPTIONS = frozenset({"FuturesOption"})
+
+
+def default_rate():
+    """``SAXO_RISK_FREE_RATE`` as an annual decimal, default 0."""
+    return float(os.getenv("SAXO_RISK_FREE_RATE") or 0.0)
+
+
+def years_to_expiry(expiries, now=None):
+    """Years until the end (UTC) of each ``YYYY-MM-DD`` expiry date; negative once past."""
+    now = now or datetime.now(timezone.utc)
+    seconds = [
+        (
+            datetime.combine(
+                date.fromisoformat(str(expiry)[:10]), datetime.min.time(), timezone.utc
+            )
+            + timedelta(days=1)
+            - now
+        ).total_seconds()
+        for expiry in expiries
+    ]
+    return np.array(seconds, dtype=np.float64) / (365 * 86400)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def norm_cdf(x):
+    """Standard normal CDF by Hart's rational approximation (absolute error below 1e-15)."""
+    x = np.asarray(x, dtype=np.float64)
+    z = np.abs(x)
+    numerator = np.zeros_like(z)
+    for coefficient in _HART_NUMERATOR:
+        numerator = numerator * z + coefficient
+    denominator = np.zeros_like(z)
+    for coefficient in _HART_DENOMINATOR:
+        denominator = denominator * z + coefficient
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = z + 0.65
+        for term in (4, 3, 2, 1):
+            fraction = z + term / fraction
+        tail = np.exp(-0.5 * z * z) * np.where(
+            z < 7.07106781186547, numerator / denominator, 1 / (fraction * _SQRT_2PI)
+        )
+    return np.where(x > 0, 1 - tail, tail)
+
+
+def _inputs(spot, strike, years, is_call, rate, carry):
+    rate = np.asarray(rate, dtype=np.float64)
+    carry = rate if carry is None else np.asarray(carry, dtype=np.float64)
+    return (
+        np.asarray(spot, dtype=np.float64),
+        np.asarray(strike, dtype=np.float64),
+        np.asarray(years, dtype=np.float64),
+        np.asarray(is_call, dtype=bool),
+        rate,
+        carry,
+    )
+
+
+def _d1_d2(spot, strike, years, volatility, carry):
+    deviation = volatility * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (carry + 0.5 * volatility * volatility) * years) / deviation
+    return d1, d1 - deviation
+
+
+def price(spot, strike, years, volatility, is_call, rate=0.0, carry=None):
+    """Option price; NaN where ``years`` or ``volatility`` is not positive."""
+    spot, strike, years, is_call, rate, carry = _inputs(spot, strike, years, is_call, rate, carry)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(spot, strike, years, volatility, carry)
+        forward = spot * np.exp((carry - rate) * years)
+        discounted = strike * np.exp(-rate * years)
+        call = forward * norm_cdf(d1) - discounted * norm_cdf(d2)
+        put = discounted * norm_cdf(-d2) - forward * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def greeks(spot, strike, years, volatility, is_call, rate=0.0, carry=None):
+    """``price``, ``delta``, ``gamma``, ``theta`` (per day) and ``vega`` (per point)."""
+    spot, strike, years, is_call, rate, carry = _inputs(spot, strike, years, is_call, rate, carry)
+    volatility = np.asarray(volatility, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(spot, strike, years, volatility, carry)
+        root = np.sqrt(years)
+        growth = np.exp((carry - rate) * years)
+        discount = np.exp(-rate * years)
+        density = norm_pdf(d1)
+        n1, n2 = norm_cdf(d1), norm_cdf(d2)
+        m1, m2 = norm_cdf(-d1), norm_cdf(-d2)
+        decay = -spot * growth * density * volatility / (2 * root)
+        call_theta = decay - (carry - rate) * spot * growth * n1 - rate * strike * discount * n2
+        put_theta = decay + (carry - rate) * spot * growth * m1 + rate * strike * discount * m2
+        return {
+            "price": np.where(
+                is_call,
+                spot * growth * n1 - strike * discount * n2,
+                strike * discount * m2 - spot * growth * m1,
+            ),
+            "delta": np.where(is_call, growth * n1, growth * (n1 - 1)),
+            "gamma": growth * density / (spot * volatility * root),
+            "theta": np.where(is_call, call_theta, put_theta) / 365,
+            "vega": spot * growth * density * root / 100,
+        }
+
+
+def implied_volatility(
+    option_price,
+    spot,
+    strike,
+    years,
+    is_call,
+    rate=0.0,
+    carry=None,
+    tolerance=IV_TOLERANCE,
+    max_iterations=IV_MAX_ITERATIONS,
+):
+    """Volatility reproducing ``option_price``; NaN where no volatility can.
+
+    In-the-money prices are converted to the out-of-the-money side through
+    put-call parity, so the solver works on time value alone. Newton steps run
+    on all unconverged contracts at once; each keeps a bracket around its root,
+    and a step that leaves the bracket (or has no usable vega) is replaced by
+    bisection, so every contract converges.
+    """
+    spot, strike, years, is_call, rate, carry = _inputs(spot, strike, years, is_call, rate, carry)
+    target = np.asarray(option_price, dtype=np.float64)
+    shape = np.broadcast_shapes(
+        target.shape, spot.shape, strike.shape, years.shape, is_call.shape, rate.shape, carry.shape
+    )
+    target, spot, strike, years, is_call, rate, carry = (
+        np.broadcast_to(array, shape).ravel()
+        for array in (target, spot, strike, years, is_call, rate, carry)
+    )
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        forward = spot * np.exp((carry - rate) * years)
+        discounted = strike * np.exp(-rate * years)
+        out_of_money_call = discounted >= forward
+        parity = forward - discounted
+        target = target - parity * (is_call.astype(int) - out_of_money_call.astype(int))
+        is_call = out_of_money_call
+        ceiling = np.where(is_call, forward, discounted)
+        solvable = (years > 0) & (target > 0) & (target < ceiling) & (spot > 0) & (strike > 0)
+
+    result = np.full(target.shape, np.nan)
+    active = np.flatnonzero(solvable)
+    target, forward, discounted = target[active], forward[active], discounted[active]
+    root, is_call = np.sqrt(years[active]), is_call[active]
+    log_moneyness = np.log(forward / discounted)
+    low = np.full(active.shape, VOLATILITY_BOUNDS[0])
+    high = np.full(active.shape, VOLATILITY_BOUNDS[1])
+    # Brenner-Subrahmanyam at-the-money estimate as the starting point.
+    sigma = np.clip(target / forward * _SQRT_2PI / root, 0.05, 2.0)
+    for _ in range(max_iterations):
+        if not active.size:
+            break
+        deviation = sigma * root
+        d1 = log_moneyness / deviation + 0.5 * deviation
+        d2 = d1 - deviation
+        sign = np.where(is_call, 1.0, -1.0)
+        value = sign * (forward * norm_cdf(sign * d1) - discounted * norm_cdf(sign * d2))
+        error = value - target
+        done = np.abs(error) <= tolerance * target
+        result[active[done]] = sigma[done]
+        high = np.where(error > 0, sigma, high)
+        low = np.where(error < 0, sigma, low)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = sigma - error / (forward * norm_pdf(d1) * root)
+        bisect = ~np.isfinite(step) | (step <= low) | (step >= high)
+        sigma = np.where(bisect, (low + high) / 2, step)
+        keep = ~done & (high - low > tolerance * 1e-3)
+        unsettled = ~done & ~keep
+        result[active[unsettled]] = sigma[unsettled]
+        active, low, high, sigma = active[keep], low[keep], high[keep], sigma[keep]
+        target, forward, discounted = target[keep], forward[keep], discounted[keep]
+        root, is_call, log_moneyness = root[keep], is_call[keep], log_moneyness[keep]
+    return result.reshape(shape)
@@ -0,0 +1,272 @@
+"""Local append-only store of Saxo order activities.
+
+Activities from ``/cs/v1/audit/orderactivities`` are kept in SQLite, keyed by
+environment (the gateway base URL) and ``LogId``, so history queries run
+against indexed local tables instead of the API. ``sync`` fetches only what is
+newer than the ActivityTime high-water mark; ``backfill`` fetches whole local
+days that have never been fetched, several at a time. Rows are only ever
+inserted; an activity that is fetched twice is ignored the second time.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as clock
+from pathlib import Path
+
+from .tracing import TracingExecutor, span
+
+logger = logging.getLogger(__name__)
+
+# Activities can become visible slightly after their ActivityTime, so each
+# sync re-reads this much before the high-water mark.
+SYNC_OVERLAP_SECONDS = 60
+# Dashboard tabs poll history together; one sync per interval is enough.
+SYNC_MIN_INTERVAL_SECONDS = 10
+BACKFILL_MAX_WORKERS = 4
+PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    environment TEXT NOT NULL,
+    log_id TEXT NOT NULL,
+    activity_time TEXT NOT NULL,
+    order_id TEXT,
+    uic INTEGER,
+    status TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (environment, log_id)
+);
+CREATE INDEX IF NOT EXISTS activities_time ON activities (environment, activity_time);
+CREATE INDEX IF NOT EXISTS activities_uic ON activities (environment, uic, activity_time);
+CREATE INDEX IF NOT EXISTS activities_order ON activities (environment, order_id, activity_time);
+CREATE INDEX IF NOT EXISTS activities_status ON activities (environment, status, activity_time);
+CREATE TABLE IF NOT EXISTS coverage (
+    environment TEXT NOT NULL,
+    day TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (environment, day)
+);
+"""
+
+
+def default_path(token_file=None):
+    """``SAXO_ORDER_HISTORY_DB``, or ``order-activity.sqlite3`` beside the token file."""
+    configured = os.getenv("SAXO_ORDER_HISTORY_DB")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file or "tokens.json")))
+    return token_path.with_name("order-activity.sqlite3")
+
+
+def _utc(moment):
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.astimezone(timezone.utc)
+
+
+def _stamp(moment):
+    """Fixed-width UTC text, so string order in SQLite is time order."""
+    return _utc(moment).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def day_start(day):
+    """The start of a local calendar day as an aware datetime."""
+    return datetime.combine(day, clock.min).astimezone()
+
+
+def parse_bound(value, end=False):
+    """Parse ``YYYY-MM-DD`` or an ISO time; a date ``end`` includes the whole day."""
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return day_start(day + timedelta(days=1) if end else day)
+        moment = _parse_time(value)
+    except ValueError:
+        raise ValueError(f"Invalid date or time {value!r}; use YYYY-MM-DD or ISO 8601.") from None
+    return moment if moment.tzinfo is not None else moment.astimezone()
+
+
+class OrderActivityStore:
+    """Order activities of one environment in a SQLite file.
+
+    Several stores (one per environment) may share a file. The database is
+    created on first use, and every operation opens its own connection, so a
+    store can be shared by request and executor threads.
+    """
+
+    def __init__(self, path, environment, min_sync_interval=SYNC_MIN_INTERVAL_SECONDS):
+        self.path = Path(path)
+        self.environment = environment
+        self.min_sync_interval = min_sync_interval
+        self._ready = False
+        self._last_sync = None
+        self._sync_lock = threading.Lock()
+
+    def _connect(self):
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._ready = True
+        return connection
+
+    def _row(self, activity):
+        activity_time = _stamp(_parse_time(activity["ActivityTime"]))
+        log_id = activity.get("LogId")
+        if log_id is None:
+            log_id = f"{activity.get('OrderId')}|{activity_time}|{activity.get('Status')}"
+        uic = activity.get("Uic")
+        return (
+            self.environment,
+            str(log_id),
+            activity_time,
+            None if activity.get("OrderId") is None else str(activity["OrderId"]),
+            int(uic) if uic is not None else None,
+            activity.get("Status"),
+            json.dumps(activity, separators=(",", ":")),
+        )
+
+    def add(self, activities, days=()):
+        """Insert new activities and mark ``days`` as fetched; return the new row count."""
+        rows = [self._row(activity) for activity in activities if activity.get("ActivityTime")]
+        with closing(self._connect()) as connection, connection:
+            inserted = connection.executemany(
+                "INSERT OR IGNORE INTO activities VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            ).rowcount
+            connection.executemany(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                [(self.environment, day.isoformat(), time.time()) for day in days],
+            )
+        return max(inserted, 0)
+
+    def high_water_mark(self):
+        with closing(self._connect()) as connection:
+            (value,) = connection.execute(
+                "SELECT MAX(activity_time) FROM activities WHERE environment = ?",
+                (self.environment,),
+            ).fetchone()
+        return _parse_time(value) if value else None
+
+    def covered_days(self):
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT day FROM coverage WHERE environment = ?", (self.environment,)
+            ).fetchall()
+        return {date.fromisoformat(day) for (day,) in rows}
+
+    def sync(self, client, force=False):
+        """Fetch activities newer than the high-water mark; return the new row count.
+
+        An empty store starts at the beginning of the local day; older days
+        come from ``backfill``. Calls within ``min_sync_interval`` of the last
+        sync return 0 without contacting the API unless ``force`` is set.
+        """
+        with self._sync_lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._last_sync is not None
+                and now - self._last_sync < self.min_sync_interval
+            ):
+                return 0
+            with span("order_history.sync") as sync_span:
+                mark = self.high_water_mark()
+                since = (
+                    mark - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+                    if mark is not None
+                    else day_start(date.today())
+                )
+                activities = client.get_order_activities(since, page_size=PAGE_SIZE)
+                inserted = self.add(activities)
+                sync_span.set(fetched=len(activities), inserted=inserted)
+            self._last_sync = time.monotonic()
+        logger.debug("Order history sync from %s added %d activities.", since, inserted)
+        return inserted
+
+    def backfill(self, client, start, end, max_workers=BACKFILL_MAX_WORKERS):
+        """Fetch every past local day in ``[start, end)`` not fetched before.
+
+        Days are requested concurrently; each one is written (and marked as
+        covered) in the calling thread as soon as it arrives. Today is left
+        to ``sync`` because it is not complete yet. Returns the new row count.
+        """
+        today = date.today()
+        last = today
+        if end is not None:
+            last = end.astimezone().date()
+            if end > day_start(last):
+                last += timedelta(days=1)
+            last = min(last, today)
+        day = start.astimezone().date()
+        covered = self.covered_days()
+        days = []
+        while day < last:
+            if day not in covered:
+                days.append(day)
+            day += timedelta(days=1)
+        if not days:
+            return 0
+
+        def fetch(day):
+            start = day_start(day)
+            end = day_start(day + timedelta(days=1)) - timedelta(microseconds=1)
+            return day, client.get_order_activities(start, end, page_size=PAGE_SIZE)
+
+        inserted = 0
+        workers = min(max_workers, len(days))
+        with (
+            span("order_history.backfill", days=len(days)),
+            TracingExecutor(max_workers=workers, thread_name_prefix="saxo-history") as pool,
+        ):
+            for day, activities in pool.map(fetch, days):
+                inserted += self.add(activities, days=[day])
+        logger.info("Backfilled %d days of order history (%d activities).", len(days), inserted)
+        return inserted
+
+    def refresh(self, client, start=None, end=None):
+        """Bring ``[start, end)`` up to date: backfill past days, then sync."""
+        if start is not None and start < day_start(date.today()):
+            self.backfill(client, start, end)
+        if end is None or end > day_start(date.today()):
+            self.sync(client)
+
+    def query(self, start=None, end=None, uic=None, order_id=None, status=None, limit=None):
+        """Return stored activities in ``[start, end)``, newest first."""
+        clauses, values = ["environment = ?"], [self.environment]
+        if start is not None:
+            clauses.append("activity_time >= ?")
+            values.append(_stamp(start))
+        if end is not None:
+            clauses.append("activity_time < ?")
+            values.append(_stamp(end))
+        if uic is not None:
+            clauses.append("uic = ?")
+            values.append(int(uic))
+        if order_id is not None:
+            clauses.append("order_id = ?")
+            values.append(str(order_id))
+        if status is not None:
+            clauses.append("status = ?")
+            values.append(status)
+        sql = (
+            f"SELECT payload FROM activities WHERE {' AND '.join(clauses)}"
+            " ORDER BY activity_time DESC, log_id DESC"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            values.append(int(limit))
+        with span("order_history.query"), closing(self._connect()) as connection:
+            rows = connection.execute(sql, values).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
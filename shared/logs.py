@@ -0,0 +1,171 @@
+"""Non-blocking logging: handlers run on a listener thread behind a queue.
+
+``install_queue_logging`` replaces a logger's handlers with one
+``DeferredQueueHandler``; the real handlers (console, files) run on a
+``QueueListener`` thread, so a slow terminal or disk never delays the caller.
+Records are formatted on the listener thread too, which keeps ``%``-style
+arguments lazy; arguments must not be mutated after the logging call.
+
+The order audit trail is a JSONL file written by ``RotatingJsonlHandler``,
+which rotates on size and on age.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+
+AUDIT_MAX_BYTES = 10 * 1024 * 1024
+AUDIT_ROTATE_SECONDS = 24 * 3600
+AUDIT_BACKUP_COUNT = 30
+
+_listeners = []
+_lock = threading.Lock()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue records untouched; formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def install_queue_logging(logger, handlers, level=None):
+    """Move ``handlers`` behind a queue on ``logger`` and return the listener.
+
+    Calling it again for a logger that already has a queue is a no-op, so
+    repeated app or CLI construction does not stack handlers or threads.
+    """
+    if level is not None:
+        logger.setLevel(level)
+    with _lock:
+        for handler in logger.handlers:
+            if isinstance(handler, DeferredQueueHandler):
+                return handler.listener
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, *handlers, respect_handler_level=True)
+        handler = DeferredQueueHandler(records)
+        handler.listener = listener
+        logger.addHandler(handler)
+        listener.start()
+        _listeners.append(listener)
+    return listener
+
+
+def flush_logging():
+    """Stop every listener after it drains its queue; later records are dropped."""
+    with _lock:
+        listeners = list(_listeners)
+        _listeners.clear()
+    for listener in listeners:
+        if listener._thread is not None:  # Not already stopped by its owner.
+            listener.stop()
+
+
+atexit.register(flush_logging)
+
+
+class LazyJson:
+    """A log argument serialized only if and when the record is formatted."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=str, sort_keys=True)
+
+
+class JsonlFormatter(logging.Formatter):
+    """One JSON object per record: time, level and the record's ``audit`` fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+        }
+        audit = getattr(record, "audit", None)
+        if isinstance(audit, dict):
+            entry.update(audit)
+        else:
+            entry["message"] = record.getMessage()
+        return json.dumps(entry, default=str, sort_keys=True)
+
+
+class RotatingJsonlHandler(BaseRotatingHandler):
+    """Append JSON lines, rotating when the file exceeds ``max_bytes`` or when
+    ``rotate_seconds`` have passed since it was started.
+
+    Rotated files are named ``<file>.<UTC timestamp>`` and only the newest
+    ``backup_count`` are kept.
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=AUDIT_MAX_BYTES,
+        rotate_seconds=AUDIT_ROTATE_SECONDS,
+        backup_count=AUDIT_BACKUP_COUNT,
+    ):
+        filename = os.path.abspath(os.path.expanduser(filename))
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        super().__init__(filename, "a", encoding="utf-8")
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        try:
+            started = os.stat(filename).st_mtime
+        except FileNotFoundError:
+            started = time.time()
+        self.rollover_at = started + rotate_seconds if rotate_seconds else None
+        self.setFormatter(JsonlFormatter())
+
+    def _size(self):
+        if self.stream is not None:
+            return self.stream.tell()
+        try:
+            return os.path.getsize(self.baseFilename)
+        except FileNotFoundError:
+            return 0
+
+    def shouldRollover(self, record):
+        size = self._size()
+        if not size:
+            return False
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes:
+            return size + len(self.format(record)) + 1 > self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        destination = f"{self.baseFilename}.{stamp}"
+        suffix = 1
+        while os.path.exists(destination):
+            destination = f"{self.baseFilename}.{stamp}-{suffix}"
+            suffix += 1
+        self.rotate(self.baseFilename, destination)
+        self.stream = self._open()
+        if self.backup_count:
+            for old in self.rotated_files()[: -self.backup_count]:
+                os.remove(old)
+        if self.rotate_seconds:
+            self.rollover_at = time.time() + self.rotate_seconds
+
+    def rotated_files(self):
+        directory, name = os.path.split(self.baseFilename)
+        return sorted(
+            os.path.join(directory, entry)
+            for entry in os.listdir(directory)
+            if entry.startswith(name + ".")
+        )
@@ -0,0 +1,621 @@
+"""Option chains as arrays of expiries x strikes x call/put.
+
+``OptionChain.from_option_space`` turns one ``contractoptionspaces`` response
+into sorted expiry and strike axes and a UIC array; quotes live in parallel
+bid/ask/mid arrays filled by bulk ``infoprices/list`` requests, so a chain is
+fetched and quoted in a few requests rather than one per contract. Strike
+ranges are located by binary search (``searchsorted``) on the strike axis.
+
+``OptionChainCache`` keeps chains on disk as ``.npz`` files, one per
+environment and option root, and reuses them for ``ttl`` seconds.
+
+``OptionChain.analyze`` solves implied volatility and greeks for the quoted
+contracts in one vectorized pass (``shared.greeks``). Each result remembers
+the contract and underlying quote timestamps it came from, and contracts whose
+quotes have not changed since are not recomputed.
+
+``screen_rolls`` evaluates every roll of a short contract to the same side of
+the chain at once, using ``roll_analysis``'s formulas over whole arrays.
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from . import greeks as bs
+from .domain import ROLL_SORT_KEYS, roll_analysis
+from .fields import QUOTE
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+CALL, PUT = 0, 1
+PUT_CALL = ("Call", "Put")
+# Option spaces change when exchanges list new expiries or strikes, which is
+# rare within a trading day.
+DEFAULT_TTL_SECONDS = 3600
+_STRIKE_TOLERANCE = 1e-6
+_TIME, _BID, _ASK, _MID, _LAST = (
+    QUOTE.names.index(name) for name in ("timestamp", "bid", "ask", "mid", "last")
+)
+
+
+def default_directory(token_file=None):
+    """``SAXO_OPTION_CHAIN_DIR``, or ``option-chains`` beside the token file."""
+    configured = os.getenv("SAXO_OPTION_CHAIN_DIR")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file or "tokens.json")))
+    return token_path.with_name("option-chains")
+
+
+def default_ttl():
+    """``SAXO_OPTION_CHAIN_TTL`` seconds, or ``DEFAULT_TTL_SECONDS``."""
+    return float(os.getenv("SAXO_OPTION_CHAIN_TTL") or DEFAULT_TTL_SECONDS)
+
+
+def put_call_index(value):
+    """0 for ``call``, 1 for ``put`` (any case)."""
+    try:
+        return [name.casefold() for name in PUT_CALL].index(str(value).casefold())
+    except ValueError:
+        raise ValueError(f"Option type must be call or put, not {value!r}.") from None
+
+
+def _value(array, index):
+    value = float(array.flat[index])
+    return None if np.isnan(value) else value
+
+
+def _epoch(timestamp):
+    """Seconds since the epoch of an ISO timestamp, NaN when missing or malformed."""
+    try:
+        return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _mid(values):
+    """Mid price of an extracted ``QUOTE`` tuple: mid, bid/ask midpoint or last."""
+    bid, ask, mid = values[_BID], values[_ASK], values[_MID]
+    if mid is None and bid is not None and ask is not None:
+        mid = (bid + ask) / 2
+    return values[_LAST] if mid is None else mid
+
+
+class OptionChain:
+    """One option root: ``uics[expiry, strike, put_call]`` with quotes alongside.
+
+    ``asset_type`` is the option root's (``StockOption``, ``FuturesOption``
+    ...) and every contract's; the underlying is quoted as
+    ``underlying_asset_type``. Missing contracts have UIC 0 and missing quotes
+    are NaN. ``updated`` holds
+    each contract's quote time (epoch seconds); ``greeks[GREEK_NAMES index]``
+    the last ``analyze`` results and ``greeks_updated[..., 0|1]`` the contract
+    and underlying quote times they were computed from.
+    """
+
+    def __init__(
+        self,
+        root_id,
+        underlying_uic,
+        currency,
+        expiries,
+        strikes,
+        uics,
+        asset_type="StockOption",
+        underlying_asset_type=None,
+        **quotes,
+    ):
+        self.root_id = int(root_id)
+        self.underlying_uic = underlying_uic
+        self.currency = currency
+        self.asset_type = asset_type
+        self.underlying_asset_type = underlying_asset_type or bs.UNDERLYING_ASSET_TYPES.get(
+            asset_type, "Stock"
+        )
+        self.expiries = [str(expiry) for expiry in expiries]
+        self.strikes = np.asarray(strikes, dtype=np.float64)
+        self.uics = np.asarray(uics, dtype=np.int64)
+        shape = self.uics.shape
+        self.bid = quotes.get("bid", np.full(shape, np.nan))
+        self.ask = quotes.get("ask", np.full(shape, np.nan))
+        self.mid = quotes.get("mid", np.full(shape, np.nan))
+        self.updated = quotes.get("updated", np.full(shape, np.nan))
+        self.greeks = quotes.get("greeks", np.full((len(bs.GREEK_NAMES), *shape), np.nan))
+        self.greeks_updated = quotes.get("greeks_updated", np.full((*shape, 2), np.nan))
+        self.spot = quotes.get("spot")
+        self.spot_updated = quotes.get("spot_updated")
+        self.fetched_at = float(quotes.get("fetched_at", time.time()))
+        self.quoted_at = quotes.get("quoted_at")
+
+    @classmethod
+    def from_option_space(cls, space, asset_type="StockOption"):
+        """The chain of one ``contractoptionspaces`` response.
+
+        ``asset_type`` is the root's when the response does not name it.
+        """
+        entries = space.get("OptionSpace") or []
+        expiries = sorted({str(entry.get("Expiry"))[:10] for entry in entries})
+        contracts = []
+        for entry in entries:
+            for option in entry.get("SpecificOptions") or []:
+                contracts.append(
+                    (
+                        str(entry.get("Expiry"))[:10],
+                        float(option["StrikePrice"]),
+                        put_call_index(option.get("PutCall")),
+                        int(option["Uic"]),
+                    )
+                )
+        strikes = np.unique(np.array([row[1] for row in contracts], dtype=np.float64))
+        uics = np.zeros((len(expiries), len(strikes), 2), dtype=np.int64)
+        if contracts:
+            expiry_index = {expiry: index for index, expiry in enumerate(expiries)}
+            rows = np.array(
+                [(expiry_index[e], 0, put_call) for e, _, put_call, _ in contracts],
+                dtype=np.intp,
+            )
+            rows[:, 1] = np.searchsorted(strikes, [row[1] for row in contracts])
+            uics[rows[:, 0], rows[:, 1], rows[:, 2]] = [row[3] for row in contracts]
+        return cls(
+            space.get("OptionRootId"),
+            space.get("UnderlyingUic"),
+            space.get("CurrencyCode"),
+            expiries,
+            strikes,
+            uics,
+            asset_type=space.get("AssetType") or asset_type,
+            underlying_asset_type=space.get("UnderlyingAssetType"),
+        )
+
+    def __len__(self):
+        return int(np.count_nonzero(self.uics))
+
+    def expiry_index(self, expiry):
+        try:
+            return self.expiries.index(str(expiry)[:10])
+        except ValueError:
+            raise LookupError(
+                f"No {expiry} expiry; available: {', '.join(self.expiries) or 'none'}."
+            ) from None
+
+    def strike_slice(self, min_strike=None, max_strike=None):
+        """The strike-axis slice within ``[min_strike, max_strike]``, by binary search."""
+        start = 0
+        stop = len(self.strikes)
+        if min_strike is not None:
+            start = int(np.searchsorted(self.strikes, min_strike - _STRIKE_TOLERANCE, "left"))
+        if max_strike is not None:
+            stop = int(np.searchsorted(self.strikes, max_strike + _STRIKE_TOLERANCE, "right"))
+        return slice(start, max(start, stop))
+
+    def select(self, expiry=None, put_call=None, min_strike=None, max_strike=None):
+        """Flat indices of existing contracts, ordered by expiry, strike, call/put."""
+        mask = np.zeros(self.uics.shape, dtype=bool)
+        expiries = slice(None) if expiry is None else self.expiry_index(expiry)
+        sides = slice(None) if put_call is None else put_call_index(put_call)
+        mask[expiries, self.strike_slice(min_strike, max_strike), sides] = True
+        return np.flatnonzero(mask & (self.uics > 0))
+
+    def contract(self, expiry, strike, put_call):
+        """The flat index of one contract; ``LookupError`` if it is not listed."""
+        expiry_index = self.expiry_index(expiry)
+        strikes = self.strike_slice(strike, strike)
+        index = None
+        if strikes.start < strikes.stop:
+            index = np.ravel_multi_index(
+                (expiry_index, strikes.start, put_call_index(put_call)), self.uics.shape
+            )
+        if index is None or not self.uics.flat[index]:
+            raise LookupError(f"No {expiry} {strike:g} {put_call} contract in this chain.")
+        return int(index)
+
+    def quote(self, client, indices):
+        """Refresh bid/ask/mid of ``indices`` with bulk quote requests."""
+        indices = np.asarray(indices, dtype=np.intp)
+        if not len(indices):
+            return self
+        positions = dict(zip(self.uics.flat[indices].tolist(), indices.tolist(), strict=True))
+        with span("options.quote", contracts=len(indices)):
+            rows = client.get_quotes(list(positions), asset_type=self.asset_type)
+        quotes = [row.get("Quote") or {} for row in rows]
+        for row, values in zip(rows, QUOTE.extract_all(quotes), strict=True):
+            index = positions.get(row.get("Uic"))
+            if index is None:
+                continue
+            bid, ask, mid = values[_BID], values[_ASK], values[_MID]
+            if mid is None and bid is not None and ask is not None:
+                mid = (bid + ask) / 2
+            self.bid.flat[index] = np.nan if bid is None else bid
+            self.ask.flat[index] = np.nan if ask is None else ask
+            self.mid.flat[index] = np.nan if mid is None else mid
+            self.updated.flat[index] = _epoch(row.get("LastUpdated") or values[_TIME])
+        self.quoted_at = time.time()
+        return self
+
+    def quote_underlying(self, client, asset_type=None):
+        """Refresh ``spot`` and ``spot_updated`` from one underlying quote."""
+        if self.underlying_uic is None:
+            return self
+        row = client.get_quote(self.underlying_uic, asset_type or self.underlying_asset_type) or {}
+        values = QUOTE.extract(row.get("Quote") or row)
+        spot = _mid(values)
+        self.spot = None if spot is None else float(spot)
+        self.spot_updated = _epoch(row.get("LastUpdated") or values[_TIME])
+        return self
+
+    def analyze(self, indices, rate=None, carry=None, now=None):
+        """Implied volatility and greeks of ``indices`` from their mid prices.
+
+        Contracts whose own and underlying quote times equal those of their
+        last result keep it; the rest are solved together. ``carry`` defaults
+        to ``rate`` (Black-Scholes), or 0 for options on futures (Black-76).
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        spot_updated = np.nan if self.spot_updated is None else self.spot_updated
+        stamps = self.greeks_updated.reshape(-1, 2)[indices]
+        current = self.updated.flat[indices]
+        fresh = (stamps[:, 0] == current) & (stamps[:, 1] == spot_updated)
+        stale = indices[~fresh]
+        if not stale.size or self.spot is None:
+            return self
+        rate = bs.default_rate() if rate is None else rate
+        if carry is None and self.asset_type in bs.FUTURES_OPTIONS:
+            carry = 0.0
+        expiry, strike, side = np.unravel_index(stale, self.uics.shape)
+        years = bs.years_to_expiry(self.expiries, now)[expiry]
+        with span("options.analyze", contracts=len(stale)):
+            strikes, is_call = self.strikes[strike], side == CALL
+            volatility = bs.implied_volatility(
+                self.mid.flat[stale], self.spot, strikes, years, is_call, rate, carry
+            )
+            values = bs.greeks(self.spot, strikes, years, volatility, is_call, rate, carry)
+        flat = self.greeks.reshape(len(bs.GREEK_NAMES), -1)
+        flat[0, stale] = volatility
+        for row, name in enumerate(bs.GREEK_NAMES[1:], start=1):
+            flat[row, stale] = values[name]
+        self.greeks_updated.reshape(-1, 2)[stale] = np.column_stack(
+            (self.updated.flat[stale], np.full(len(stale), spot_updated))
+        )
+        logger.debug("Analyzed %d of %d option contracts.", len(stale), len(indices))
+        return self
+
+    def rows(self, indices):
+        expiry, strike, side = np.unravel_index(np.asarray(indices, dtype=np.intp), self.uics.shape)
+        return [
+            {
+                "expiry": self.expiries[e],
+                "strike": float(self.strikes[s]),
+                "put_call": PUT_CALL[p],
+                "uic": int(self.uics[e, s, p]),
+                "bid": _value(self.bid, index),
+                "ask": _value(self.ask, index),
+                "mid": _value(self.mid, index),
+                **{
+                    name: _value(self.greeks[row], index) for row, name in enumerate(bs.GREEK_NAMES)
+                },
+            }
+            for index, e, s, p in zip(indices, expiry, strike, side, strict=True)
+        ]
+
+
+class OptionChainCache:
+    """``OptionChain`` files of one environment, reused for ``ttl`` seconds."""
+
+    def __init__(self, directory, environment, ttl=None):
+        self.directory = Path(directory)
+        self.environment = environment
+        self.ttl = default_ttl() if ttl is None else ttl
+        self._prefix = hashlib.sha1(environment.encode()).hexdigest()[:12]
+
+    def path(self, root_id):
+        return self.directory / f"{self._prefix}-{int(root_id)}.npz"
+
+    def load(self, root_id):
+        """The cached chain, or ``None`` if it is missing, unreadable or expired."""
+        try:
+            with np.load(self.path(root_id), allow_pickle=False) as data:
+                fetched_at = float(data["fetched_at"])
+                if time.time() - fetched_at >= self.ttl:
+                    return None
+                quoted_at = float(data["quoted_at"])
+                spot, spot_updated = data["spot"].tolist()
+                return OptionChain(
+                    int(data["root_id"]),
+                    int(data["underlying_uic"]) if data["underlying_uic"] >= 0 else None,
+                    str(data["currency"]) or None,
+                    data["expiries"].tolist(),
+                    data["strikes"],
+                    data["uics"],
+                    asset_type=str(data["asset_type"]),
+                    underlying_asset_type=str(data["underlying_asset_type"]),
+                    bid=data["bid"],
+                    ask=data["ask"],
+                    mid=data["mid"],
+                    updated=data["updated"],
+                    greeks=data["greeks"],
+                    greeks_updated=data["greeks_updated"],
+                    spot=None if np.isnan(spot) else spot,
+                    spot_updated=spot_updated,
+                    fetched_at=fetched_at,
+                    quoted_at=None if np.isnan(quoted_at) else quoted_at,
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, chain):
+        """Write ``chain`` atomically, replacing any cached copy."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".npz.tmp")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                np.savez(
+                    output,
+                    root_id=chain.root_id,
+                    underlying_uic=-1 if chain.underlying_uic is None else chain.underlying_uic,
+                    currency=chain.currency or "",
+                    expiries=np.array(chain.expiries, dtype=str),
+                    strikes=chain.strikes,
+                    uics=chain.uics,
+                    asset_type=chain.asset_type,
+                    underlying_asset_type=chain.underlying_asset_type,
+                    bid=chain.bid,
+                    ask=chain.ask,
+                    mid=chain.mid,
+                    updated=chain.updated,
+                    greeks=chain.greeks,
+                    greeks_updated=chain.greeks_updated,
+                    spot=np.array(
+                        [
+                            np.nan if chain.spot is None else chain.spot,
+                            np.nan if chain.spot_updated is None else chain.spot_updated,
+                        ]
+                    ),
+                    fetched_at=chain.fetched_at,
+                    quoted_at=np.nan if chain.quoted_at is None else chain.quoted_at,
+                )
+            os.replace(temporary, self.path(chain.root_id))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return chain
+
+    def get(self, client, root_id, refresh=False, asset_type="StockOption"):
+        """The cached chain, or a freshly fetched one when missing, stale or ``refresh``.
+
+        ``asset_type`` is the root's, for option spaces that do not name it.
+        """
+        chain = None if refresh else self.load(root_id)
+        if chain is not None:
+            return chain
+        with span("options.option_space", root=root_id):
+            chain = OptionChain.from_option_space(client.get_option_space(root_id), asset_type)
+        logger.debug("Fetched option root %s with %d contracts.", root_id, len(chain))
+        return self.save(chain)
+
+
+def _roll_block(chain, existing, min_strike=None, max_strike=None, max_expiry=None):
+    """The (expiries, strikes, side) block of rolls: same side, not earlier expiry."""
+    expiry, _, side = np.unravel_index(existing, chain.uics.shape)
+    stop = len(chain.expiries)
+    if max_expiry is not None:
+        stop = bisect.bisect_right(chain.expiries, str(max_expiry)[:10])
+    return (
+        slice(int(expiry), max(int(expiry), stop)),
+        chain.strike_slice(min_strike, max_strike),
+        int(side),
+    )
+
+
+def roll_candidates(chain, existing, min_strike=None, max_strike=None, max_expiry=None):
+    """Flat indices of the contracts ``screen_rolls`` considers, plus ``existing``."""
+    mask = np.zeros(chain.uics.shape, dtype=bool)
+    mask[_roll_block(chain, existing, min_strike, max_strike, max_expiry)] = True
+    mask.flat[existing] = True
+    return np.flatnonzero(mask & (chain.uics > 0))
+
+
+def screen_rolls(
+    chain,
+    existing,
+    contracts=1,
+    multiplier=100,
+    min_strike=None,
+    max_strike=None,
+    max_expiry=None,
+    min_credit=None,
+    sort="annualized",
+    limit=20,
+    today=None,
+):
+    """Rank the rolls of the short contract at flat index ``existing``.
+
+    Every quoted contract of the same side, at the same or a later expiry and
+    within the strike and expiry bounds, is evaluated in one pass. The
+    annualized credit is the conservative credit relative to the new strike's
+    notional over the days the roll adds (the days to expiry when it keeps the
+    expiry). Returns ``(evaluated, rows)``; rows are ``roll_analysis`` results
+    (without the repeated ``existing_option``) plus ``days_added``,
+    ``annualized_credit`` and, once the chain is analyzed,
+    ``position_delta_change`` (the short position's delta after the roll
+    minus before), best first.
+    """
+    if sort not in ROLL_SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(ROLL_SORT_KEYS)}.")
+    old_bid, old_ask = chain.bid.flat[existing], chain.ask.flat[existing]
+    if np.isnan(old_bid) or np.isnan(old_ask):
+        raise LookupError("The existing contract has no bid/ask quote.")
+    expiries, strikes, side = _roll_block(chain, existing, min_strike, max_strike, max_expiry)
+    today = today or date.today()
+    days = np.array(
+        [(date.fromisoformat(e) - today).days for e in chain.expiries[expiries]], dtype=np.float64
+    )
+    new_strike = chain.strikes[strikes][np.newaxis, :]
+    bid = chain.bid[expiries, strikes, side]
+    ask = chain.ask[expiries, strikes, side]
+    size = contracts * multiplier
+
+    with span("options.screen_rolls", candidates=bid.size):
+        conservative = (bid - old_ask) * size
+        midpoint = ((bid + ask) / 2 - (old_bid + old_ask) / 2) * size
+        days_added = days - days[0] if len(days) else days
+        held = np.maximum(np.where(days_added > 0, days_added, days), 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            annualized = conservative / (new_strike * size) * 365 / held[:, np.newaxis]
+        valid = (chain.uics[expiries, strikes, side] > 0) & ~np.isnan(bid) & ~np.isnan(ask)
+        _, existing_strike, _ = np.unravel_index(existing, chain.uics.shape)
+        if strikes.start <= existing_strike < strikes.stop and valid.size:
+            valid[0, existing_strike - strikes.start] = False
+        if min_credit is not None:
+            valid &= conservative >= min_credit
+        key = {"annualized": annualized, "conservative": conservative, "midpoint": midpoint}[sort]
+        candidates = np.flatnonzero(valid)
+        best = candidates[np.argsort(-key.flat[candidates], kind="stable")[:limit]]
+
+    existing_row = chain.rows([existing])[0]
+    old_delta = existing_row["delta"]
+    rows = []
+    for position in best.tolist():
+        row, column = divmod(position, bid.shape[1])
+        index = np.ravel_multi_index(
+            (expiries.start + row, strikes.start + column, side), chain.uics.shape
+        )
+        analysis = roll_analysis(existing_row, chain.rows([index])[0], contracts, multiplier)
+        del analysis["existing_option"]
+        analysis["days_added"] = int(days_added[row])
+        analysis["annualized_credit"] = float(annualized[row, column])
+        new_delta = analysis["new_option"]["delta"]
+        analysis["position_delta_change"] = (
+            None if None in (old_delta, new_delta) else (old_delta - new_delta) * size
+        )
+        rows.append(analysis)
+    return int(valid.sum()), rows
+
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+
+def option_book(client, positions, rate=None, now=None, multiplier=100):
+    """The option positions among ``positions`` as pricing arrays.
+
+    Returns a dict with ``positions`` (the option ``Position`` rows) and
+    parallel arrays ``spot``, ``strike``, ``years``, ``is_call``, ``carry``,
+    ``price``, ``size`` (quantity times contract size, ``multiplier`` when the
+    instrument has none) and ``iv``, the list ``underlying_symbol`` and the
+    scalar ``rate``. Underlyings are quoted with one bulk request per
+    underlying asset type; options on futures
+    get carry 0 (Black-76) and the rest carry ``rate`` (Black-Scholes).
+    """
+    options = [
+        position
+        for position in positions
+        if position.asset_type in bs.UNDERLYING_ASSET_TYPES
+        and None not in (position.strike, position.expiry, position.put_call)
+        and position.underlying_uic is not None
+    ]
+    underlyings = {}
+    for position in options:
+        asset_type = bs.UNDERLYING_ASSET_TYPES[position.asset_type]
+        underlyings.setdefault(asset_type, set()).add(position.underlying_uic)
+    spots, symbols = {}, {}
+    rate = bs.default_rate() if rate is None else rate
+    with span("options.option_book", positions=len(options)):
+        for asset_type, uics in underlyings.items():
+            rows = client.get_quotes(
+                sorted(uics), asset_type=asset_type, field_groups="Quote,DisplayAndFormat"
+            )
+            quotes = QUOTE.extract_all([row.get("Quote") or {} for row in rows])
+            for row, values in zip(rows, quotes, strict=True):
+                spots[asset_type, row.get("Uic")] = _mid(values)
+                symbols[asset_type, row.get("Uic")] = (row.get("DisplayAndFormat") or {}).get(
+                    "Symbol"
+                )
+        book = {
+            "positions": options,
+            "underlying_symbol": [
+                symbols.get((bs.UNDERLYING_ASSET_TYPES[p.asset_type], p.underlying_uic))
+                for p in options
+            ],
+            "rate": rate,
+            "spot": np.array(
+                [
+                    _number(spots.get((bs.UNDERLYING_ASSET_TYPES[p.asset_type], p.underlying_uic)))
+                    for p in options
+                ],
+                dtype=np.float64,
+            ),
+            "strike": np.array([float(p.strike) for p in options], dtype=np.float64),
+            "years": bs.years_to_expiry([p.expiry for p in options], now),
+            "is_call": np.array([str(p.put_call).casefold() == "call" for p in options], bool),
+            "carry": np.array(
+                [0.0 if p.asset_type in bs.FUTURES_OPTIONS else rate for p in options],
+                dtype=np.float64,
+            ),
+            "price": np.array([_number(p.market_price) for p in options], dtype=np.float64),
+            "size": np.array(
+                [float(p.quantity) * (p.contract_size or multiplier) for p in options],
+                dtype=np.float64,
+            ),
+        }
+        book["iv"] = bs.implied_volatility(
+            book["price"],
+            book["spot"],
+            book["strike"],
+            book["years"],
+            book["is_call"],
+            rate,
+            book["carry"],
+        )
+    return book
+
+
+def position_greeks(client, positions, rate=None, now=None, multiplier=100):
+    """Implied volatility and greeks of every option position in one pass.
+
+    See ``option_book`` for the inputs. Position greeks scale by quantity
+    times contract size. Totals are per currency: delta as underlying value,
+    theta per day and vega per volatility point.
+    """
+    book = option_book(client, positions, rate, now, multiplier)
+    if not book["positions"]:
+        return {"positions": [], "totals": {}}
+    spot, strike, price, size = book["spot"], book["strike"], book["price"], book["size"]
+    values = bs.greeks(
+        spot, strike, book["years"], book["iv"], book["is_call"], book["rate"], book["carry"]
+    )
+    values["iv"] = book["iv"]
+    rows, totals = [], {}
+    for index, position in enumerate(book["positions"]):
+        row = {
+            "symbol": position.symbol,
+            "uic": position.uic,
+            "underlying_uic": position.underlying_uic,
+            "expiry": position.expiry,
+            "strike": float(strike[index]),
+            "put_call": position.put_call,
+            "quantity": position.quantity,
+            "currency": position.currency,
+            "price": _value(price, index),
+            "underlying_price": _value(spot, index),
+        }
+        row.update((name, _value(values[name], index)) for name in bs.GREEK_NAMES)
+        for name in bs.GREEK_NAMES[1:]:
+            row[f"position_{name}"] = _value(values[name] * size, index)
+        rows.append(row)
+        total = totals.setdefault(
+            position.currency, {"delta_value": 0.0, "theta": 0.0, "vega": 0.0}
+        )
+        if row["position_delta"] is not None:
+            total["delta_value"] += row["position_delta"] * row["underlying_price"]
+            total["theta"] += row["position_theta"]
+            total["vega"] += row["position_vega"]
+    return {"positions": rows, "totals": totals}
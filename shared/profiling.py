@@ -0,0 +1,179 @@
+"""On-demand CPU and memory profiling for CLI commands and web requests.
+
+``Profiler("cpu")`` runs cProfile; ``Profiler("mem")`` takes a tracemalloc
+snapshot. Both write their native format plus a collapsed-stack file
+(``frame;frame;frame value`` per line) that flamegraph.pl, speedscope and
+inferno read directly. cProfile follows one thread, so work submitted through
+``call()`` (as ``TracingExecutor`` does) is profiled separately and merged.
+"""
+
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+from collections import defaultdict
+
+MODES = ("cpu", "mem")
+TRACEMALLOC_FRAMES = 32
+_active = contextvars.ContextVar("saxo_profiler", default=None)
+
+
+def _frame_label(filename, lineno, name=None):
+    location = f"{os.path.basename(filename)}:{lineno}"
+    label = f"{name} ({location})" if name else location
+    return label.replace(";", ":")
+
+
+def collapsed_cpu_stacks(stats):
+    """Turn pstats caller edges into collapsed stacks weighted in microseconds.
+
+    cProfile keeps only caller/callee pairs, so each function's time is split
+    across its callers in proportion to the cumulative time of each edge.
+    """
+    children = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children[caller][function] = edge[3]
+    roots = [function for function, row in stats.stats.items() if not row[4]]
+    totals = defaultdict(float)
+
+    def walk(function, fraction, stack, visiting):
+        _, _, own, _, _ = stats.stats[function]
+        stack = (*stack, _frame_label(*function))
+        totals[";".join(stack)] += own * fraction
+        for child, edge_cumulative in children[function].items():
+            child_cumulative = stats.stats[child][3]
+            # Recursion is cut at the first repeat to keep stacks finite.
+            if child in visiting or not child_cumulative:
+                continue
+            share = fraction * edge_cumulative / child_cumulative
+            walk(child, share, stack, visiting | {child})
+
+    for root in roots:
+        walk(root, 1.0, (), {root})
+    return [
+        f"{stack} {round(seconds * 1e6)}"
+        for stack, seconds in sorted(totals.items())
+        if round(seconds * 1e6)
+    ]
+
+
+def collapsed_memory_stacks(snapshot):
+    """Collapsed stacks of live allocations weighted in bytes."""
+    lines = []
+    for statistic in snapshot.statistics("traceback"):
+        stack = ";".join(
+            _frame_label(frame.filename, frame.lineno) for frame in statistic.traceback
+        )
+        lines.append(f"{stack} {statistic.size}")
+    return sorted(lines)
+
+
+class Profiler:
+    """Profile the block it wraps; ``write()`` or ``report()`` afterwards."""
+
+    def __init__(self, mode="cpu"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {MODES}.")
+        self.mode = mode
+        self.snapshot = None
+        self._profile = None
+        self._workers = []
+        self._lock = threading.Lock()
+        self._token = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.reset(self._token)
+        if self.mode == "cpu":
+            self._profile.disable()
+        else:
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ]
+            )
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def add_worker(self, profile):
+        with self._lock:
+            self._workers.append(profile)
+
+    def stats(self, stream=None):
+        stats = pstats.Stats(self._profile, stream=stream)
+        with self._lock:
+            for profile in self._workers:
+                stats.add(profile)
+        return stats
+
+    def collapsed(self):
+        if self.mode == "cpu":
+            return collapsed_cpu_stacks(self.stats())
+        return collapsed_memory_stacks(self.snapshot)
+
+    def report(self, limit=40):
+        """Return a plain-text summary: top functions or top allocation sites."""
+        stream = io.StringIO()
+        if self.mode == "cpu":
+            self.stats(stream).sort_stats("cumulative").print_stats(limit)
+            return stream.getvalue()
+        statistics = self.snapshot.statistics("lineno")
+        total = sum(statistic.size for statistic in statistics)
+        stream.write(f"{len(statistics)} allocation sites, {total / 1024:.1f} KiB live\n")
+        for statistic in statistics[:limit]:
+            stream.write(f"{statistic}\n")
+        return stream.getvalue()
+
+    def write(self, prefix):
+        """Write the profile next to ``prefix`` and return the created paths."""
+        directory = os.path.dirname(os.path.abspath(prefix))
+        os.makedirs(directory, exist_ok=True)
+        if self.mode == "cpu":
+            native = f"{prefix}.pstats"
+            self.stats().dump_stats(native)
+        else:
+            native = f"{prefix}.tracemalloc"
+            self.snapshot.dump(native)
+        collapsed = f"{prefix}.collapsed"
+        with open(collapsed, "w", encoding="utf-8") as handle:
+            handle.writelines(line + "\n" for line in self.collapsed())
+        return [native, collapsed]
+
+
+def active():
+    return _active.get()
+
+
+def call(function, *args, **kwargs):
+    """Call ``function``, profiling it on this thread for an active CPU profiler."""
+    profiler = _active.get()
+    if profiler is None or profiler.mode != "cpu":
+        return function(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ profiles every thread from one Profile via
+        # sys.monitoring and allows only one at a time.
+        return function(*args, **kwargs)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.disable()
+        profiler.add_worker(profile)
@@ -0,0 +1,299 @@
+"""Historical and parametric value at risk over stored daily bars.
+
+Current positions are joined to the daily closes of their instruments from
+the local ``BarStore``. The closes of every instrument are scattered into one
+dates x instruments matrix in a single indexed assignment, gaps are
+forward-filled, and the simple returns of the last ``window`` days drive
+everything else as matrix products:
+
+* historical VaR and expected shortfall from the P&L of today's exposures
+  replayed over each past day (``returns @ exposures``);
+* parametric (normal) VaR and expected shortfall from ``exposures' C
+  exposures`` with the covariance matrix ``C``;
+* Euler contributions, which add up to the parametric VaR, and each
+  position's share of the historical tail P&L.
+
+The returns and covariance of one window, end date and instrument universe
+are cached as ``.npz`` files beside the bars, so repeated runs over an
+unchanged book skip the alignment and covariance work.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+from .frame import PositionFrame
+from .greeks import UNDERLYING_ASSET_TYPES
+from .tracing import TracingExecutor, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 250
+DEFAULT_CONFIDENCE = (0.95, 0.99)
+DAY = 86400
+# Calendar days fetched per trading day of the window (weekends, holidays).
+CALENDAR_FACTOR = 1.5
+# An instrument needs returns on this share of the window's days.
+MIN_COVERAGE = 0.5
+REFRESH_MAX_WORKERS = 4
+
+
+def parse_confidence(value):
+    """A confidence level from ``0.99`` or ``99``."""
+    try:
+        level = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid confidence {value!r}; use e.g. 0.99 or 99.") from None
+    level = level / 100 if level >= 1 else level
+    if not 0.5 <= level < 1:
+        raise ValueError(f"Confidence {value!r} must be between 50% and 100%.")
+    return level
+
+
+def align_closes(series, start, end):
+    """Closes of every series on the union of their dates in ``[start, end)``.
+
+    ``series`` are ``BAR_DTYPE`` arrays; returns ``(dates, closes)`` with a
+    dates x series matrix, forward-filled, NaN before a series' first bar.
+    """
+    pieces = [bars[(bars["time"] >= start) & (bars["time"] < end)] for bars in series]
+    times = np.concatenate([bars["time"] for bars in pieces] or [np.empty(0)])
+    columns = np.repeat(np.arange(len(pieces)), [len(bars) for bars in pieces])
+    dates = np.unique(times)
+    closes = np.full((len(dates), len(pieces)), np.nan)
+    closes[np.searchsorted(dates, times), columns] = np.concatenate(
+        [bars["close"] for bars in pieces] or [np.empty(0)]
+    )
+    # Each cell takes the row of the latest non-missing close at or before it.
+    rows = np.where(np.isnan(closes), 0, np.arange(len(dates))[:, np.newaxis])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return dates, closes[rows, np.arange(len(pieces))]
+
+
+class CovarianceCache:
+    """Returns and covariance per (window, end date, universe), as ``.npz`` files."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path(self, window, end, universe):
+        key = f"{window}|{end}|" + ",".join(f"{asset}:{uic}" for asset, uic in universe)
+        return self.directory / f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.npz"
+
+    def load(self, window, end, universe):
+        try:
+            with np.load(self.path(window, end, universe), allow_pickle=False) as data:
+                return data["dates"], data["returns"], data["modeled"], data["covariance"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, window, end, universe, dates, returns, modeled, covariance):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".npz.tmp")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                np.savez(
+                    output, dates=dates, returns=returns, modeled=modeled, covariance=covariance
+                )
+            os.replace(temporary, self.path(window, end, universe))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+def _returns(store, universe, window, start, end):
+    """Window returns (days x instruments, gaps as 0), the modeled mask and dates."""
+    series = [store.read(uic, asset, 1440, start, end) for asset, uic in universe]
+    dates, closes = align_closes(series, start, end)
+    dates, closes = dates[-(window + 1) :], closes[-(window + 1) :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = closes[1:] / closes[:-1] - 1
+    valid = np.isfinite(returns)
+    modeled = valid.sum(axis=0) >= max(MIN_COVERAGE * window, 2)
+    return dates[1:], np.where(valid, returns, 0.0)[:, modeled], modeled
+
+
+def portfolio_risk(
+    positions,
+    store,
+    client=None,
+    window=DEFAULT_WINDOW,
+    confidence=DEFAULT_CONFIDENCE,
+    horizon_days=1,
+    cache=None,
+    now=None,
+    rates=None,
+    base_currency=None,
+):
+    """VaR, expected shortfall, contributions and correlations of ``positions``.
+
+    ``store`` is a ``BarStore``; with ``client`` it first fetches the daily
+    bars each instrument is missing. Only completed days count, up to the
+    start of today (UTC). Exposures are market values in each position's own
+    currency, or in ``base_currency`` with ``rates`` (currency -> units of
+    it); options and instruments without enough history are listed as
+    ``unmodeled``. VaR and shortfall are positive losses scaled to
+    ``horizon_days`` by the square root of time.
+    """
+    frame = positions if isinstance(positions, PositionFrame) else PositionFrame(positions)
+    if rates is not None:
+        frame = frame.convert(rates, base_currency)
+    rows = frame.positions
+    end = ((time.time() if now is None else now) // DAY) * DAY
+    candidates = [
+        index
+        for index, row in enumerate(rows)
+        if row.get("uic") is not None and row.get("asset_type") not in UNDERLYING_ASSET_TYPES
+    ]
+    universe = sorted(
+        {(rows[i].get("asset_type") or "Stock", int(rows[i]["uic"])) for i in candidates}
+    )
+    start = end - math.ceil((window + 1) * CALENDAR_FACTOR) * DAY
+    failed = set()
+    if client is not None and universe:
+
+        def refresh(key):
+            asset, uic = key
+            try:
+                store.refresh(client, uic, asset, 1440, start, end, now=now)
+            except Exception as exc:
+                logger.warning("No daily bars for %s %s: %s", asset, uic, exc)
+                failed.add(key)
+
+        with (
+            span("risk.refresh", instruments=len(universe)),
+            TracingExecutor(
+                max_workers=min(REFRESH_MAX_WORKERS, len(universe)),
+                thread_name_prefix="saxo-risk",
+            ) as pool,
+        ):
+            list(pool.map(refresh, universe))
+
+    with span("risk.compute", instruments=len(universe), window=window):
+        cached = cache.load(window, end, universe) if cache is not None else None
+        if cached is None:
+            dates, returns, modeled = _returns(store, universe, window, start, end)
+            count = returns.shape[1]
+            covariance = (
+                np.cov(returns, rowvar=False).reshape(count, count)
+                if len(returns) > 1 and count
+                else np.zeros((count, count))
+            )
+            # Only a fully refreshed universe is worth reusing.
+            if cache is not None and client is not None and not failed:
+                cache.save(window, end, universe, dates, returns, modeled, covariance)
+        else:
+            dates, returns, modeled, covariance = cached
+        keys = [key for key, kept in zip(universe, modeled, strict=True) if kept]
+        column = {key: index for index, key in enumerate(keys)}
+
+        # Position -> column of the modeled universe, or -1.
+        position_column = np.full(len(rows), -1)
+        for index in candidates:
+            key = (rows[index].get("asset_type") or "Stock", int(rows[index]["uic"]))
+            position_column[index] = column.get(key, -1)
+        included = np.flatnonzero(position_column >= 0)
+        values = frame.market_value[included]
+        exposures = np.bincount(position_column[included], values, len(keys))
+
+        scale = math.sqrt(horizon_days)
+        pnl = returns @ exposures
+        variance = float(exposures @ covariance @ exposures)
+        volatility = math.sqrt(max(variance, 0.0))
+        marginal = covariance @ exposures / volatility if volatility else np.zeros(len(keys))
+        deviations = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.outer(deviations, deviations)
+        correlation = np.where(np.isfinite(correlation), correlation, 0.0)
+
+        var, shortfall, tails = {}, {}, {}
+        for level in confidence:
+            z = NormalDist().inv_cdf(level)
+            threshold = np.quantile(pnl, 1 - level) if len(pnl) else 0.0
+            tail = pnl <= threshold
+            tails[level] = tail
+            label = f"{level:g}"
+            var[label] = {
+                "historical": -float(threshold) * scale,
+                "parametric": z * volatility * scale,
+            }
+            shortfall[label] = {
+                "historical": -float(pnl[tail].mean()) * scale if tail.any() else 0.0,
+                "parametric": NormalDist().pdf(z) / (1 - level) * volatility * scale,
+            }
+
+        level = confidence[0]
+        z = NormalDist().inv_cdf(level)
+        # Per position: Euler VaR share and mean P&L over the historical tail.
+        position_returns = returns[:, position_column[included]]
+        tail = tails[level]
+        tail_pnl = (
+            -(position_returns[tail] * values).mean(axis=0) if tail.any() else np.zeros_like(values)
+        )
+        euler = values * marginal[position_column[included]] * z * scale
+        total_var = z * volatility * scale
+
+    position_rows = [
+        {
+            "symbol": rows[index].get("symbol"),
+            "uic": rows[index].get("uic"),
+            "asset_type": rows[index].get("asset_type"),
+            "currency": rows[index].get("currency"),
+            "market_value": float(value),
+            "return_volatility": float(deviations[position_column[index]] * scale),
+            "var_contribution": float(contribution),
+            "var_contribution_percent": float(contribution / total_var * 100)
+            if total_var
+            else None,
+            "tail_loss": float(loss * scale),
+        }
+        for index, value, contribution, loss in zip(
+            included.tolist(), values.tolist(), euler.tolist(), tail_pnl.tolist(), strict=True
+        )
+    ]
+    position_rows.sort(key=lambda row: row["var_contribution"], reverse=True)
+    unmodeled = [
+        {
+            "symbol": row.get("symbol"),
+            "asset_type": row.get("asset_type"),
+            "market_value": float(frame.market_value[index]),
+        }
+        for index, row in enumerate(rows)
+        if position_column[index] < 0
+    ]
+    symbols = {
+        (rows[index].get("asset_type") or "Stock", int(rows[index]["uic"])): rows[index].get(
+            "symbol"
+        )
+        for index in candidates
+    }
+    labels = [symbols[key] for key in keys]
+    return {
+        "as_of": _date(end),
+        "window": window,
+        "observations": len(returns),
+        "first_date": _date(dates[0]) if len(dates) else None,
+        "horizon_days": horizon_days,
+        "confidence": list(confidence),
+        "base_currency": frame.base_currency,
+        "unconverted_currencies": list(frame.unconverted),
+        "exposure": float(exposures.sum()),
+        "pnl_volatility": volatility * scale,
+        "var": var,
+        "expected_shortfall": shortfall,
+        "positions": position_rows,
+        "unmodeled": unmodeled,
+        "correlation": {"symbols": labels, "matrix": np.round(correlation, 6).tolist()},
+        "covariance": {"symbols": labels, "matrix": covariance.tolist()},
+    }
+
+
+def _date(moment):
+    return time.strftime("%Y-%m-%d", time.gmtime(moment))
@@ -2,7 +2,6 @@ import json
 import logging
 import os
 import sys
-import threading
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -64,23 +63,33 @@ def default_token_file(environment="sim"):
     return str(directory / f"tokens-{suffix}.json")
 
 
-def load_runtime_config(params_path="params.json", logger=None, environment=None):
-    json_config = {}
+def _load_params(params_path):
     try:
         with open(params_path) as file:
-            json_config = json.load(file)
+            return json.load(file)
     except (FileNotFoundError, json.JSONDecodeError):
-        pass
+        return {}
 
-    redirect_uri = load_config_value(
-        "REDIRECT_URI",
-        default="https://djm300.github.io/saxo/oauth-redirect.html",
-        json_config=json_config,
-        logger=logger,
-    )
-    simulation_mode = parse_bool(
-        load_config_value("SIMULATION_MODE", default=True, json_config=json_config, logger=logger)
+
+def load_runtime_config(params_path="params.json", logger=None, environment=None, overrides=None):
+    """Load one environment's configuration.
+
+    ``overrides`` take precedence over environment variables and params.json;
+    the client manager uses them so each named environment keeps its own
+    token file and trading flag even when ``TOKEN_FILE`` is set globally.
+    """
+    json_config = _load_params(params_path)
+    overrides = overrides or {}
+
+    def config_value(key, default=None):
+        if key in overrides:
+            return overrides[key]
+        return load_config_value(key, default=default, json_config=json_config, logger=logger)
+
+    redirect_uri = config_value(
+        "REDIRECT_URI", default="https://djm300.github.io/saxo/oauth-redirect.html"
     )
+    simulation_mode = parse_bool(config_value("SIMULATION_MODE", default=True))
     if environment is not None:
         simulation_mode = environment != "live"
 
@@ -91,14 +100,9 @@ def load_runtime_config(params_path="params.json", logger=None, environment=None
         token_endpoint = os.environ.get(
             "SAXO_TOKEN_ENDPOINT", "https://sim.logonvalidation.net/token"
         )
-        token_file = load_config_value(
-            "TOKEN_FILE",
-            default=default_token_file("sim"),
-            json_config=json_config,
-            logger=logger,
-        )
+        token_file = config_value("TOKEN_FILE", default=default_token_file("sim"))
         client_id = "89da08eeb25c428a9099f768cdb1696e"
-        base_url = "https://gateway.saxobank.com/sim/openapi"
+        base_url = os.environ.get("SAXO_BASE_URL", "https://gateway.saxobank.com/sim/openapi")
     else:
         auth_endpoint = os.environ.get(
             "SAXO_AUTH_ENDPOINT", "https://live.logonvalidation.net/authorize"
@@ -106,26 +110,12 @@ def load_runtime_config(params_path="params.json", logger=None, environment=None
         token_endpoint = os.environ.get(
             "SAXO_TOKEN_ENDPOINT", "https://live.logonvalidation.net/token"
         )
-        token_file = load_config_value(
-            "TOKEN_FILE",
-            default=default_token_file("live"),
-            json_config=json_config,
-            logger=logger,
-        )
+        token_file = config_value("TOKEN_FILE", default=default_token_file("live"))
         client_id = "28d17c462242447f94c4b0767c41a552"
-        base_url = "https://gateway.saxobank.com/openapi"
+        base_url = os.environ.get("SAXO_BASE_URL", "https://gateway.saxobank.com/openapi")
 
-    trading_enabled = parse_bool(
-        load_config_value("TRADING_ENABLED", default=False, json_config=json_config, logger=logger)
-    )
-    refresh_interval = int(
-        load_config_value(
-            "TOKEN_REFRESH_INTERVAL_SECONDS",
-            default=300,
-            json_config=json_config,
-            logger=logger,
-        )
-    )
+    trading_enabled = parse_bool(config_value("TRADING_ENABLED", default=False))
+    refresh_interval = int(config_value("TOKEN_REFRESH_INTERVAL_SECONDS", default=300))
 
     return SaxoRuntimeConfig(
         redirect_uri=redirect_uri,
@@ -140,7 +130,7 @@ def load_runtime_config(params_path="params.json", logger=None, environment=None
     )
 
 
-def create_client(config):
+def create_client(config, environment=None):
     client = SaxoClient(
         client_id=config.client_id,
         redirect_uri=config.redirect_uri,
@@ -148,6 +138,7 @@ def create_client(config):
         token_endpoint=config.token_endpoint,
         token_file=config.token_file,
         baseurl=config.base_url,
+        environment=environment,
     )
     client.trading_enabled = config.trading_enabled
     return client
@@ -183,46 +174,31 @@ class AuthenticationSession:
     """Own the authentication lifecycle for one CLI process.
 
     Short-lived commands use the session as a one-shot boundary. ``serve``
-    additionally starts the client's refresh worker and stops it on shutdown.
+    additionally starts the client's refresh scheduler and stops it on shutdown.
     The web layer never owns this lifecycle.
     """
 
     def __init__(self, client, refresh_interval_seconds=300):
         self.client = client
         self.refresh_interval_seconds = refresh_interval_seconds
-        self._refresh_thread = None
-        self._stop_event = None
+        self._refresh_started = False
 
     def authenticate(self):
         ensure_authenticated(self.client)
         return self.client
 
     def start_refresh(self):
-        if self._refresh_thread and self._refresh_thread.is_alive():
+        if self._refresh_started:
             return
-        logging.info("Starting token refresh worker.")
-        self._stop_event = threading.Event()
-        self._refresh_thread = threading.Thread(
-            target=self._refresh_loop,
-            name="saxo-token-refresh",
-            daemon=True,
-        )
-        self._refresh_thread.start()
-
-    def _refresh_loop(self):
-        while not self._stop_event.wait(self.refresh_interval_seconds):
-            try:
-                self.client.ensure_access_token()
-            except Exception as exc:
-                logging.error("Background token refresh failed: %s", exc)
-                break
+        # The client's scheduler refreshes once per token lifetime; the
+        # configured interval only bounds a single sleep.
+        self.client.start_refresh_thread(self.refresh_interval_seconds)
+        self._refresh_started = True
 
     def close(self):
-        if self._refresh_thread and self._refresh_thread.is_alive():
-            logging.info("Stopping token refresh worker.")
-            self._stop_event.set()
-            self._refresh_thread.join()
-        self._refresh_thread = None
+        if self._refresh_started:
+            self.client.stop_refresh_thread()
+            self._refresh_started = False
 
         # A shutdown refresh is a check, not an unconditional token rotation.
         # If the token became stale while the command was running, persist the
@@ -237,3 +213,82 @@ class AuthenticationSession:
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
+
+
+@dataclass
+class ManagedClient:
+    name: str
+    config: SaxoRuntimeConfig
+    client: SaxoClient
+    session: AuthenticationSession
+
+
+class ClientManager:
+    """Hold several configured clients, for example SIM and LIVE, in one process.
+
+    Every entry has its own ``SaxoClient``, token file, refresh scheduler and
+    authentication session, so refreshes and failures never cross environments.
+    Named entries beyond ``sim`` and ``live`` come from the ``ENVIRONMENTS``
+    mapping in params.json, e.g. ``{"sim-2": {"SIMULATION_MODE": true,
+    "TOKEN_FILE": "~/.config/saxo/tokens-sim-2.json"}}``.
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+        self._entries = {}
+
+    @classmethod
+    def from_params(cls, names, params_path="params.json", logger=None):
+        environments = _load_params(params_path).get("ENVIRONMENTS") or {}
+        manager = cls()
+        for name in names:
+            overrides = dict(environments.get(name) or {})
+            if name not in ("sim", "live") and "SIMULATION_MODE" not in overrides:
+                raise ValueError(f"Environment {name!r} is not defined in ENVIRONMENTS.")
+            if name in ("sim", "live"):
+                overrides.setdefault("SIMULATION_MODE", name == "sim")
+                if len(names) > 1:
+                    # A global TOKEN_FILE cannot serve several environments.
+                    overrides.setdefault("TOKEN_FILE", default_token_file(name))
+            config = load_runtime_config(params_path, logger=logger, overrides=overrides)
+            manager.add(name, create_client(config, name), config)
+        return manager
+
+    def add(self, name, client, config):
+        if name in self._entries:
+            raise ValueError(f"Environment {name!r} is already configured.")
+        session = AuthenticationSession(
+            client, getattr(config, "token_refresh_interval_seconds", 300)
+        )
+        self._entries[name] = ManagedClient(name, config, client, session)
+        if self.default is None:
+            self.default = name
+        return self._entries[name]
+
+    def names(self):
+        return list(self._entries)
+
+    def get(self, name=None):
+        """Return the entry for ``name`` (the default when omitted)."""
+        try:
+            return self._entries[name or self.default]
+        except KeyError:
+            raise LookupError(f"Unknown environment: {name}") from None
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def authenticate(self):
+        for entry in self:
+            entry.session.authenticate()
+
+    def start_refresh(self):
+        for entry in self:
+            entry.session.start_refresh()
+
+    def close(self):
+        for entry in self:
+            entry.session.close()
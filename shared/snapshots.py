@@ -0,0 +1,402 @@
+"""Append-only columnar store of portfolio snapshots.
+
+Each snapshot records the balance, the ``portfolio_summary`` asset classes and
+every normalized position at one moment. Columns are separate files of native
+machine values (``array`` typecodes), so reading a time range only touches the
+slices it needs and a year of five-minute snapshots stays a few megabytes::
+
+    <directory>/<environment>/time.d          one row per snapshot
+                              net_value.d ... position_start.q, position_count.q
+                              positions/market_value.d ... symbol.i
+                              strings.jsonl    dictionary for text columns
+
+The ``time`` column is written last and defines how many snapshots exist, so
+a reader never sees half of one; a writer interrupted part-way is repaired by
+the next append. Appends hold a file lock, so ``serve`` and ``saxo-cli
+snapshot`` can write the same store.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .auth import token_file_lock
+from .domain import first, normalize_balance, normalize_positions, number, portfolio_summary
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL_SECONDS = 300
+SNAPSHOT_COLUMNS = (
+    ("net_value", "d"),
+    ("cash", "d"),
+    ("stocks", "d"),
+    ("options_market_value", "d"),
+    ("other", "d"),
+    ("unrealized_pnl", "d"),
+    ("position_start", "q"),
+    ("position_count", "q"),
+)
+POSITION_COLUMNS = (
+    ("uic", "q"),
+    ("quantity", "d"),
+    ("market_price", "d"),
+    ("market_value", "d"),
+    ("cost_price", "d"),
+    ("unrealized_pnl", "d"),
+    ("symbol", "i"),
+    ("asset_type", "i"),
+    ("currency", "i"),
+)
+ASSET_CLASSES = ("stocks", "options_market_value", "other", "cash")
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhdw]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def default_directory(token_file=None):
+    """``SAXO_SNAPSHOT_DIR``, or ``portfolio-snapshots`` beside the token file."""
+    configured = os.getenv("SAXO_SNAPSHOT_DIR")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file or "tokens.json")))
+    return token_path.with_name("portfolio-snapshots")
+
+
+def parse_duration(value):
+    """Seconds from ``90``, ``15m``, ``1h``, ``1d`` or ``1w``."""
+    match = _DURATION.match(str(value).strip().lower())
+    if not match or not float(match.group(1)):
+        raise ValueError(f"Invalid interval {value!r}; use e.g. 300, 15m, 1h or 1d.")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def _data(value):
+    return value.get("Data", []) if isinstance(value, dict) else []
+
+
+def normalized_positions(client, instrument=None):
+    """Fetch and normalize every position; ``instrument(uic, asset_type)`` supplies details."""
+    accounts = _data(client.get_accounts())
+    currencies = {a.get("AccountId"): a.get("Currency") for a in accounts}
+    raws = _data(client.get_positions())
+    details, account_currencies = [], []
+    for raw in raws:
+        base = raw.get("PositionBase", raw)
+        uic, asset = first(base, "Uic", "UIN"), first(base, "AssetType", default="Stock")
+        found = {}
+        if uic:
+            try:
+                found = (
+                    instrument(uic, asset)
+                    if instrument is not None
+                    else client.get_instrument_by_uic(uic, asset_type=asset)
+                ) or {}
+            except Exception:
+                pass
+        details.append(found)
+        account_currencies.append(currencies.get(base.get("AccountId")))
+    return normalize_positions(raws, details, account_currencies)
+
+
+def fetch_balance(client, environment):
+    """Fetch and normalize the balance in the first account's currency."""
+    account = (_data(client.get_accounts()) or [{}])[0]
+    raw = client.get_balances()
+    raw = (raw.get("Data") or [{}])[0] if isinstance(raw, dict) else {}
+    return normalize_balance(raw, environment, account.get("Currency"))
+
+
+def capture(client, environment, instrument=None, fx=None):
+    """Fetch positions and balances and return one snapshot dict.
+
+    With ``fx`` (an ``FxRates``) the summary is in the balance currency.
+    """
+    positions = normalized_positions(client, instrument)
+    balance = fetch_balance(client, environment)
+    rates = None
+    if fx is not None:
+        rates = fx.rates({p.currency for p in positions}, balance.currency)
+    return {
+        "positions": positions,
+        "balance": balance,
+        "summary": portfolio_summary(positions, balance, rates),
+    }
+
+
+def _float(value):
+    return number(value, math.nan)
+
+
+def _unrealized_pnl(summary, positions):
+    """Total P&L in the summary's currency; summed per position when it has none."""
+    if summary.get("unrealized_pnl") is not None:
+        return _float(summary["unrealized_pnl"])
+    return sum(_float(p.get("unrealized_pnl")) for p in positions) if positions else 0.0
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+class _Column:
+    def __init__(self, path, typecode):
+        self.path = path
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // self.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def read(self, start=0, stop=None):
+        values = array(self.typecode)
+        stop = len(self) if stop is None else stop
+        if stop <= start:
+            return values
+        with open(self.path, "rb") as handle:
+            handle.seek(start * self.itemsize)
+            values.fromfile(handle, stop - start)
+        return values
+
+    def append(self, values):
+        with open(self.path, "ab") as handle:
+            array(self.typecode, values).tofile(handle)
+
+    def truncate(self, rows):
+        try:
+            if os.path.getsize(self.path) > rows * self.itemsize:
+                with open(self.path, "r+b") as handle:
+                    handle.truncate(rows * self.itemsize)
+        except FileNotFoundError:
+            pass
+
+
+class SnapshotStore:
+    """Portfolio snapshots of one environment in a directory of column files."""
+
+    def __init__(self, directory, environment):
+        self.environment = environment
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", environment).strip("-") or "default"
+        self.path = Path(directory) / slug
+        self.time = _Column(self.path / "time.d", "d")
+        self.columns = {
+            name: _Column(self.path / f"{name}.{code}", code) for name, code in SNAPSHOT_COLUMNS
+        }
+        self.positions = {
+            name: _Column(self.path / "positions" / f"{name}.{code}", code)
+            for name, code in POSITION_COLUMNS
+        }
+        self._strings_path = self.path / "strings.jsonl"
+        self._strings = []
+        self._string_ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.time)
+
+    def _load_strings(self):
+        try:
+            with open(self._strings_path, "rb") as handle:
+                handle.seek(0, os.SEEK_END)
+                size = handle.tell()
+                if size == sum(len(json.dumps(text)) + 1 for text in self._strings):
+                    return
+                handle.seek(0)
+                lines = handle.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        self._strings = [json.loads(line) for line in lines if line.strip()]
+        self._string_ids = {text: index for index, text in enumerate(self._strings)}
+
+    def _string_id(self, value, pending):
+        if value is None:
+            return -1
+        text = str(value)
+        index = self._string_ids.get(text)
+        if index is None:
+            index = self._string_ids[text] = len(self._strings)
+            self._strings.append(text)
+            pending.append(text)
+        return index
+
+    def _repair(self):
+        """Drop rows an interrupted append left beyond the committed snapshots."""
+        rows = len(self.time)
+        self.time.truncate(rows)
+        for column in self.columns.values():
+            column.truncate(rows)
+        committed = 0
+        if rows:
+            start = self.columns["position_start"].read(rows - 1, rows)[0]
+            count = self.columns["position_count"].read(rows - 1, rows)[0]
+            committed = start + count
+        for column in self.positions.values():
+            column.truncate(committed)
+        return rows, committed
+
+    def append(self, snapshot, at=None):
+        """Append one ``capture()`` result; return the new snapshot count."""
+        at = time.time() if at is None else at
+        summary = snapshot.get("summary") or {}
+        balance = snapshot.get("balance") or {}
+        classes = summary.get("asset_classes") or {}
+        positions = snapshot.get("positions") or []
+        (self.path / "positions").mkdir(parents=True, exist_ok=True)
+        with self._lock, token_file_lock(self.path / "store"):
+            rows, committed = self._repair()
+            if rows and at < self.time.read(rows - 1, rows)[0]:
+                raise ValueError("Snapshots must be appended in time order.")
+            self._load_strings()
+            pending = []
+            columns = {name: [] for name, _ in POSITION_COLUMNS}
+            for position in positions:
+                uic = position.get("uic")
+                columns["uic"].append(int(uic) if uic is not None else -1)
+                for name in ("quantity", "market_price", "market_value", "cost_price"):
+                    columns[name].append(_float(position.get(name)))
+                columns["unrealized_pnl"].append(_float(position.get("unrealized_pnl")))
+                for name in ("symbol", "asset_type", "currency"):
+                    columns[name].append(self._string_id(position.get(name), pending))
+            if pending:
+                with open(self._strings_path, "a", encoding="utf-8") as handle:
+                    handle.writelines(json.dumps(text) + "\n" for text in pending)
+            for name, column in self.positions.items():
+                column.append(columns[name])
+            values = {
+                "net_value": _float(summary.get("net_value", balance.get("net_equity"))),
+                "cash": _float(balance.get("cash")),
+                "stocks": _float(classes.get("stocks")),
+                "options_market_value": _float(classes.get("options_market_value")),
+                "other": _float(classes.get("other")),
+                "unrealized_pnl": _unrealized_pnl(summary, positions),
+                "position_start": committed,
+                "position_count": len(positions),
+            }
+            for name, column in self.columns.items():
+                column.append([values[name]])
+            # Written last: this commits the snapshot for readers.
+            self.time.append([at])
+            return rows + 1
+
+    def _range(self, start, end):
+        times = self.time.read()
+        low = 0 if start is None else bisect_left(times, start)
+        high = len(times) if end is None else bisect_left(times, end)
+        return times, low, high
+
+    def query(self, start=None, end=None, every=None, positions=False):
+        """Snapshots with ``start <= time < end`` (epoch seconds), oldest first.
+
+        ``every`` downsamples to the last snapshot in each bucket of that many
+        seconds. ``positions`` adds each snapshot's position rows.
+        """
+        times, low, high = self._range(start, end)
+        indexes = range(low, high)
+        if every:
+            last = {}
+            for index in indexes:
+                last[int(times[index] // every)] = index
+            indexes = list(last.values())
+        if not indexes:
+            return []
+        first_index, stop = indexes[0], indexes[-1] + 1
+        columns = {name: column.read(first_index, stop) for name, column in self.columns.items()}
+        if positions:
+            self._load_strings()
+            position_low = columns["position_start"][0]
+            position_high = columns["position_start"][-1] + columns["position_count"][-1]
+            rows = {
+                name: column.read(position_low, position_high)
+                for name, column in self.positions.items()
+            }
+        result = []
+        for index in indexes:
+            offset = index - first_index
+            snapshot = {
+                "timestamp": datetime.fromtimestamp(times[index], timezone.utc).isoformat(),
+                "net_value": _optional(columns["net_value"][offset]),
+                "cash": _optional(columns["cash"][offset]),
+                "unrealized_pnl": _optional(columns["unrealized_pnl"][offset]),
+                "asset_classes": {
+                    name: columns[name][offset]
+                    for name in ASSET_CLASSES
+                    if not math.isnan(columns[name][offset])
+                },
+                "position_count": columns["position_count"][offset],
+            }
+            if positions:
+                begin = columns["position_start"][offset] - position_low
+                snapshot["positions"] = [
+                    self._position(rows, row)
+                    for row in range(begin, begin + columns["position_count"][offset])
+                ]
+            result.append(snapshot)
+        return result
+
+    def _position(self, rows, row):
+        def text(name):
+            index = rows[name][row]
+            return self._strings[index] if index >= 0 else None
+
+        uic = rows["uic"][row]
+        return {
+            "symbol": text("symbol"),
+            "uic": uic if uic >= 0 else None,
+            "asset_type": text("asset_type"),
+            "currency": text("currency"),
+            **{
+                name: _optional(rows[name][row])
+                for name in (
+                    "quantity",
+                    "market_price",
+                    "market_value",
+                    "cost_price",
+                    "unrealized_pnl",
+                )
+            },
+        }
+
+
+class Snapshotter:
+    """A daemon thread appending a snapshot of one environment every ``interval``."""
+
+    def __init__(self, store, take, interval=SNAPSHOT_INTERVAL_SECONDS):
+        self.store = store
+        self.take = take
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            self.store.append(self.take())
+        except Exception:
+            logger.exception("Portfolio snapshot failed for %s", self.store.environment)
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"saxo-snapshot-{self.store.path.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,309 @@
+"""Scenario stress tests over normalized positions.
+
+A ``ScenarioGrid`` is the Cartesian product of shock axes: relative
+underlying price moves (for every position, one asset class or one symbol),
+relative moves of a position currency against the base currency, and
+absolute implied-volatility moves for options. Axes are written as
+``[TARGET=]VALUES`` where values are comma-separated or a
+``start:stop:step`` range, in percent (volatility in points).
+
+``stress`` revalues the book under every scenario at once. Linear positions
+are aggregated into buckets of (asset class, targeted symbol, currency) with
+``bincount``, so their scenario P&L is one matrix product however large the
+book is; option positions are repriced with Black-Scholes / Black-76 at the
+shocked underlying and volatility as a scenarios x options array. Only the
+worst scenarios are broken down per position.
+"""
+
+import logging
+
+import numpy as np
+
+from . import greeks as bs
+from .domain import _asset_class, number
+from .frame import PositionFrame
+from .options import option_book
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+PRICE, FX, VOL = "price", "fx", "vol"
+ALL = "all"
+DEFAULT_PRICE_SHOCKS = "-30:30:5"
+DEFAULT_VOL_SHOCKS = "-10,0,10"
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+MAX_SCENARIOS = 100_000
+WORST_SCENARIOS = 10
+CONTRIBUTORS = 5
+
+
+def parse_values(text):
+    """Numbers from ``-10,0,10`` or the inclusive range ``-30:30:5``."""
+    text = str(text).strip()
+    try:
+        if ":" in text:
+            start, stop, step = (float(part) for part in text.split(":"))
+            if step <= 0 or stop < start:
+                raise ValueError
+            count = int(round((stop - start) / step)) + 1
+            return tuple(float(value) for value in np.round(start + step * np.arange(count), 10))
+        values = tuple(float(part) for part in text.split(",") if part.strip())
+    except ValueError:
+        raise ValueError(f"Invalid shocks {text!r}; use e.g. -10,0,10 or -30:30:5.") from None
+    if not values:
+        raise ValueError("A shock axis needs at least one value.")
+    return values
+
+
+def parse_axis(kind, text, default_target=ALL):
+    """``(kind, target, values)`` from ``[TARGET=]VALUES``; FX axes need a currency."""
+    target, _, values = str(text).rpartition("=")
+    target = target.strip() or default_target
+    if kind == FX and target == ALL:
+        raise ValueError(f"FX shocks need a currency, e.g. USD={text}.")
+    if kind == VOL:
+        target = ALL
+    return kind, target, parse_values(values)
+
+
+class ScenarioGrid:
+    """Every combination of the axes' shocks, as a scenarios x axes array.
+
+    ``axes`` are ``(kind, target, values)``; stored shocks are fractions
+    (percent / 100), volatility in absolute terms (points / 100).
+    """
+
+    def __init__(self, axes):
+        self.axes = [(kind, target, tuple(values)) for kind, target, values in axes]
+        sizes = [len(values) for _, _, values in self.axes]
+        if int(np.prod(sizes, dtype=np.int64)) > MAX_SCENARIOS:
+            raise ValueError(f"The grid has more than {MAX_SCENARIOS} scenarios.")
+        codes = np.indices(sizes).reshape(len(sizes), -1)
+        self.shocks = (
+            np.column_stack(
+                [
+                    np.asarray(values)[code] / 100
+                    for (_, _, values), code in zip(self.axes, codes, strict=True)
+                ]
+            )
+            if self.axes
+            else np.zeros((1, 0))
+        )
+
+    @classmethod
+    def parse(cls, price=(), fx=(), vol=()):
+        """A grid from axis strings; without any axis, a default price x vol grid."""
+        axes = [parse_axis(PRICE, text) for text in price]
+        axes += [parse_axis(FX, text) for text in fx]
+        axes += [parse_axis(VOL, text) for text in vol]
+        if not axes:
+            axes = [parse_axis(PRICE, DEFAULT_PRICE_SHOCKS), parse_axis(VOL, DEFAULT_VOL_SHOCKS)]
+        return cls(axes)
+
+    def __len__(self):
+        return len(self.shocks)
+
+    def scenario(self, index):
+        """``{"price": {target: %}, "fx": {currency: %}, "vol": points}`` of one row."""
+        described = {}
+        for column, (kind, target, _) in enumerate(self.axes):
+            value = round(float(self.shocks[index, column]) * 100, 10)
+            if kind == VOL:
+                described[VOL] = described.get(VOL, 0) + value
+            else:
+                described.setdefault(kind, {})[target] = value
+        return described
+
+    def factors(self, classes, symbols, currencies, base_currency):
+        """Price and FX growth factors, scenarios x items, and the volatility shift.
+
+        Item ``i`` is an asset class name (or a tuple of the names it answers
+        to), the symbol axes may target (or ``None``) and a currency; matching
+        axes compound multiplicatively.
+        """
+        classes = [c if isinstance(c, tuple) else (c,) for c in classes]
+        price = np.ones((len(self), len(classes)))
+        fx = np.ones((len(self), len(classes)))
+        vol = np.zeros(len(self))
+        for column, (kind, target, _) in enumerate(self.axes):
+            shock = self.shocks[:, column]
+            if kind == VOL:
+                vol += shock
+                continue
+            if kind == FX:
+                if str(target).upper() == str(base_currency or "").upper():
+                    continue
+                matches = np.array([str(c).upper() == target.upper() for c in currencies], bool)
+                fx[:, matches] *= 1 + shock[:, np.newaxis]
+                continue
+            if target == ALL:
+                matches = np.ones(len(classes), bool)
+            else:
+                key = target.casefold()
+                matches = np.array(
+                    [
+                        key in c or (s is not None and s.casefold() == key)
+                        for c, s in zip(classes, symbols, strict=True)
+                    ],
+                    bool,
+                )
+            price[:, matches] *= 1 + shock[:, np.newaxis]
+        return price, fx, vol
+
+
+CLASS_NAMES = ("stocks", "options", "other")
+
+
+def _class_name(asset_type):
+    return CLASS_NAMES[_asset_class(asset_type)]
+
+
+def stress(
+    positions,
+    grid,
+    base_currency=None,
+    net_value=None,
+    client=None,
+    book=None,
+    rates=None,
+    **options,
+):
+    """Scenario P&L of ``positions`` (normalized ``Position`` rows) under ``grid``.
+
+    Option positions are repriced from ``book`` (``option_book``'s arrays,
+    fetched through ``client`` when not given; ``options`` go to it). Their
+    underlying moves with the ``options`` class, the underlying's own class
+    and the underlying symbol (``underlying_symbol`` in the book, else the
+    symbol of a held linear position on it); options whose volatility
+    cannot be implied keep their value apart from FX. Positions count in
+    their own currency unless ``rates`` (currency -> units of
+    ``base_currency``) converts them; FX shocks revalue those not in
+    ``base_currency`` on top.
+    """
+    frame = positions if isinstance(positions, PositionFrame) else PositionFrame(positions)
+    if rates is not None:
+        frame = frame.convert(rates, base_currency)
+    rows = frame.positions
+    if book is None and client is not None:
+        book = option_book(client, rows, **options)
+    options_rows = book["positions"] if book else []
+    option_ids = {id(position) for position in options_rows}
+    linear = np.flatnonzero([id(p) not in option_ids for p in rows])
+    targets = {
+        target.casefold()
+        for kind, target, _ in grid.axes
+        if kind == PRICE and target != ALL and target.casefold() not in CLASS_NAMES
+    }
+
+    def targeted(symbol):
+        return symbol if str(symbol).casefold() in targets else None
+
+    with span("stress", scenarios=len(grid), positions=len(rows)):
+        # Linear positions move with their bucket: (asset class, targeted symbol, currency).
+        buckets = {}
+        codes = np.array(
+            [
+                buckets.setdefault(
+                    (
+                        CLASS_NAMES[frame.asset_class[row]],
+                        targeted(rows[row].get("symbol")),
+                        rows[row].get("currency"),
+                    ),
+                    len(buckets),
+                )
+                for row in linear.tolist()
+            ],
+            dtype=np.intp,
+        )
+        values = frame.market_value[linear]
+        keys = list(buckets)
+        price, fx, _ = grid.factors(
+            [key[0] for key in keys],
+            [key[1] for key in keys],
+            [key[2] for key in keys],
+            base_currency,
+        )
+        growth = price * fx - 1
+        pnl = growth @ np.bincount(codes, values, len(buckets))
+
+        option_pnl = np.zeros((len(grid), len(options_rows)))
+        unpriced = 0
+        if options_rows:
+            held = {rows[row].get("uic"): rows[row].get("symbol") for row in linear.tolist()}
+            underlying_symbols = book.get("underlying_symbol") or [None] * len(options_rows)
+            price_factor, fx_factor, vol = grid.factors(
+                [
+                    ("options", _class_name(bs.UNDERLYING_ASSET_TYPES[p.asset_type]))
+                    for p in options_rows
+                ],
+                [
+                    targeted(symbol or held.get(p.underlying_uic))
+                    for p, symbol in zip(options_rows, underlying_symbols, strict=True)
+                ],
+                [p.currency for p in options_rows],
+                base_currency,
+            )
+            current = book["price"] * book["size"]
+            priced = np.isfinite(book["iv"]) & np.isfinite(book["spot"])
+            unpriced = int(np.count_nonzero(~priced))
+            shocked = bs.price(
+                book["spot"] * price_factor,
+                book["strike"],
+                book["years"],
+                np.maximum(book["iv"] + vol[:, np.newaxis], bs.VOLATILITY_BOUNDS[0]),
+                book["is_call"],
+                book["rate"],
+                book["carry"],
+            )
+            revalued = np.where(priced, shocked * book["size"], current)
+            option_pnl = np.nan_to_num(revalued * fx_factor - current)
+            if frame.fx_rates:
+                option_pnl *= [frame.fx_rates.get(p.currency, 1.0) for p in options_rows]
+            pnl = pnl + option_pnl.sum(axis=1)
+
+    net_value = number(net_value) or frame.total_market_value()
+    names = [rows[row].get("symbol") for row in linear.tolist()]
+    names += [position.symbol for position in options_rows]
+
+    def scenario_row(scenario):
+        value = float(pnl[scenario])
+        return {
+            "scenario": grid.scenario(scenario),
+            "pnl": value,
+            "pnl_percent": value / net_value * 100 if net_value else None,
+        }
+
+    def contributors(scenario):
+        contributions = np.concatenate([values * growth[scenario, codes], option_pnl[scenario]])
+        top = np.argsort(contributions, kind="stable")[:CONTRIBUTORS]
+        return [{"symbol": names[i], "pnl": float(contributions[i])} for i in top.tolist()]
+
+    order = np.argsort(pnl, kind="stable")
+    return {
+        "base_currency": base_currency,
+        "unconverted_currencies": list(frame.unconverted),
+        "net_value": net_value,
+        "positions": len(frame),
+        "option_positions": len(options_rows),
+        "unpriced_options": unpriced,
+        "scenarios": len(grid),
+        "axes": [
+            {"kind": kind, "target": target, "values": list(values)}
+            for kind, target, values in grid.axes
+        ],
+        "distribution": {
+            "mean": float(pnl.mean()),
+            "std": float(pnl.std()),
+            "min": float(pnl[order[0]]),
+            "max": float(pnl[order[-1]]),
+            "percentiles": {
+                str(q): float(value)
+                for q, value in zip(PERCENTILES, np.percentile(pnl, PERCENTILES), strict=True)
+            },
+        },
+        "worst": [
+            {**scenario_row(scenario), "contributors": contributors(scenario)}
+            for scenario in order[:WORST_SCENARIOS].tolist()
+        ],
+        "best": scenario_row(int(order[-1])),
+    }
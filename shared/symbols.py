@@ -0,0 +1,166 @@
+"""Symbol resolution through instrument search, with an on-disk cache.
+
+``resolve`` picks one instrument from the ``/ref/v1/instruments`` search
+results for a query. ``SymbolCache`` keeps resolved search rows in
+``symbol-cache.json`` beside the token file, keyed by environment, asset type
+and query, so a watchlist that was resolved once needs no search requests
+until the entries expire. ``resolve_many`` looks every query up in the cache
+with one read and searches the misses concurrently.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from .auth import token_file_lock
+from .tracing import TracingExecutor, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 5 * 86400
+RESOLVE_MAX_WORKERS = 8
+
+
+def default_path(token_file=None):
+    """``SAXO_SYMBOL_CACHE``, or ``symbol-cache.json`` beside the token file."""
+    configured = os.getenv("SAXO_SYMBOL_CACHE")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    token_path = Path(os.path.abspath(os.path.expanduser(token_file or "tokens.json")))
+    return token_path.with_name("symbol-cache.json")
+
+
+def default_ttl():
+    """``SAXO_SYMBOL_CACHE_TTL`` seconds, or ``DEFAULT_TTL_SECONDS``."""
+    return float(os.getenv("SAXO_SYMBOL_CACHE_TTL") or DEFAULT_TTL_SECONDS)
+
+
+def best_match(matches, query):
+    """The search row ``query`` names; ``LookupError`` or ``ValueError`` if none or many."""
+    if not matches:
+        raise LookupError(f"No instrument matching {query} was found.")
+    query_key = query.strip().casefold()
+    exact = [
+        match
+        for match in matches
+        if any(
+            str(match.get(field) or "").strip().casefold() == query_key
+            for field in ("Symbol", "Identifier")
+        )
+    ]
+    if exact:
+        stock_matches = [
+            match for match in exact if str(match.get("AssetType") or "").casefold() == "stock"
+        ]
+        if len(stock_matches) == 1:
+            return stock_matches[0]
+        if len(exact) == 1:
+            return exact[0]
+    stock_description_matches = [
+        match
+        for match in matches
+        if str(match.get("AssetType") or "").casefold() == "stock"
+        and query_key in str(match.get("Description") or "").casefold()
+    ]
+    if len(stock_description_matches) == 1:
+        return stock_description_matches[0]
+    if len(matches) > 1:
+        raise ValueError(f"Instrument query {query!r} is ambiguous.")
+    return matches[0]
+
+
+def resolve(client, query, asset_type=None):
+    """Search for ``query`` and return the one matching instrument row."""
+    found = client.search_instruments(query, asset_type)
+    return best_match(found.get("Data", []) if isinstance(found, dict) else [], query)
+
+
+class SymbolCache:
+    """Resolved search rows of one environment, reused for ``ttl`` seconds."""
+
+    def __init__(self, path, environment, ttl=None):
+        self.path = Path(path)
+        self.environment = environment
+        self.ttl = default_ttl() if ttl is None else ttl
+
+    def _key(self, query, asset_type):
+        return f"{self.environment}|{asset_type or ''}|{query.strip().casefold()}"
+
+    def _read(self):
+        try:
+            with self.path.open(encoding="utf-8") as handle:
+                value = json.load(handle)
+            return value if isinstance(value, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get_many(self, queries, asset_type=None):
+        """``{query: row}`` for the queries with a fresh entry."""
+        with token_file_lock(self.path, shared=True):
+            values = self._read()
+        now = time.time()
+        found = {}
+        for query in queries:
+            entry = values.get(self._key(query, asset_type))
+            try:
+                if now - float(entry["cached_at"]) < self.ttl and isinstance(entry["row"], dict):
+                    found[query] = entry["row"]
+            except (KeyError, TypeError, ValueError):
+                continue
+        return found
+
+    def put_many(self, rows, asset_type=None):
+        """Store ``{query: row}`` with one locked read-modify-replace."""
+        if not rows:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        with token_file_lock(self.path):
+            values = self._read()
+            for query, row in rows.items():
+                values[self._key(query, asset_type)] = {"row": row, "cached_at": now}
+            handle, temporary = tempfile.mkstemp(
+                prefix=".saxo-symbols-", dir=self.path.parent, text=True
+            )
+            try:
+                with os.fdopen(handle, "w", encoding="utf-8") as output:
+                    json.dump(values, output, indent=2, sort_keys=True)
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+
+def resolve_many(client, queries, asset_type=None, cache=None, max_workers=RESOLVE_MAX_WORKERS):
+    """``{query: row}`` for every distinct query, or the error resolving it raised.
+
+    ``LookupError`` and ``ValueError`` (no or several matches) are returned in
+    place of the row; any other failure propagates. Only resolved rows are
+    cached.
+    """
+    unique = list(dict.fromkeys(queries))
+    found = cache.get_many(unique, asset_type) if cache is not None else {}
+    missing = [query for query in unique if query not in found]
+
+    def search(query):
+        try:
+            return resolve(client, query, asset_type)
+        except (LookupError, ValueError) as exc:
+            return exc
+
+    with span("symbols.resolve", queries=len(unique), cached=len(found)):
+        if missing:
+            with TracingExecutor(
+                max_workers=min(max_workers, len(missing)), thread_name_prefix="saxo-resolve"
+            ) as pool:
+                results = dict(zip(missing, pool.map(search, missing), strict=True))
+            if cache is not None:
+                cache.put_many(
+                    {query: row for query, row in results.items() if isinstance(row, dict)},
+                    asset_type,
+                )
+            found.update(results)
+    return found
@@ -0,0 +1,260 @@
+"""Lightweight in-process tracing with no external collector.
+
+A trace starts at a root span (a web request or a CLI command); ``span()``
+blocks opened while it is active become its children. The active span lives in
+a ``contextvars`` variable, so ``TracingExecutor`` carries it into worker
+threads and records how long each task waited in the queue. Finished traces go
+to a ``TraceExporter`` file and can be summarized as a ``Server-Timing`` header.
+Outside a trace ``span()`` returns a shared no-op object.
+"""
+
+import contextvars
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import count
+
+from . import profiling
+
+_current = contextvars.ContextVar("saxo_trace_span", default=None)
+# perf_counter has no epoch; this offset turns it into wall-clock time.
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+_span_ids = count(1)
+# Server-Timing metric names are HTTP tokens; descriptions are quoted strings.
+_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+^_`|~-]+")
+_QUOTED = re.compile(r'["\\]')
+
+
+class Span:
+    """One timed operation inside a trace."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "start",
+        "end",
+        "thread_id",
+        "thread_name",
+        "attributes",
+        "_token",
+    )
+
+    def __init__(self, trace, name, parent_id=None, attributes=None, start=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.attributes = attributes or {}
+        self._token = None
+
+    @property
+    def duration(self):
+        end = time.perf_counter() if self.end is None else self.end
+        return end - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, end=None):
+        self.end = time.perf_counter() if end is None else end
+        self.trace.add(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current.reset(self._token)
+        self.finish()
+        return False
+
+    def as_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start + _EPOCH_OFFSET, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": self.thread_name,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """The finished spans of one root operation."""
+
+    def __init__(self, name, exporter=None):
+        self.trace_id = secrets.token_hex(8)
+        self.name = name
+        self.exporter = exporter
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def server_timing(self, root=None):
+        """Summarize child spans per name as a ``Server-Timing`` header value.
+
+        Durations of concurrent spans add up, so a name can exceed ``total``.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        totals = defaultdict(float)
+        counts = defaultdict(int)
+        for span in spans:
+            if span is not root:
+                totals[span.name] += span.duration
+                counts[span.name] += 1
+        entries = [
+            f"{_TOKEN.sub('.', name).strip('.')};dur={totals[name] * 1000:.1f};"
+            f'desc="{_QUOTED.sub("", name)} x{counts[name]}"'
+            for name in sorted(totals, key=totals.get, reverse=True)
+        ]
+        if root is not None:
+            entries.insert(0, f"total;dur={root.duration * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def current_span():
+    return _current.get()
+
+
+def span(name, **attributes):
+    """Open a child of the active span, or a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def start_trace(name, exporter=None, **attributes):
+    """Return the root span of a new trace; use it as a context manager."""
+    return Span(Trace(name, exporter), name, attributes=attributes)
+
+
+def finish_trace(root):
+    """Close ``root`` opened without ``with`` and export its trace."""
+    if root.end is None:
+        root.finish()
+    if root.trace.exporter is not None:
+        root.trace.exporter.export(root.trace)
+
+
+@contextmanager
+def trace(name, exporter=None, **attributes):
+    """Run the block as the root span of a trace exported on exit."""
+    root = start_trace(name, exporter, **attributes)
+    try:
+        with root:
+            yield root
+    finally:
+        finish_trace(root)
+
+
+class TracingExecutor(ThreadPoolExecutor):
+    """A thread pool whose tasks run inside the submitting span's trace.
+
+    Each traced task records an ``executor.wait`` span for the time it spent
+    queued behind other work before a worker picked it up. Tasks submitted
+    under an active CPU profiler are profiled on their worker thread too.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        parent = _current.get()
+        if parent is None and profiling.active() is None:
+            return super().submit(fn, *args, **kwargs)
+        context = contextvars.copy_context()
+        queued = time.perf_counter()
+
+        def run():
+            if parent is not None:
+                Span(parent.trace, "executor.wait", parent.span_id, start=queued).finish()
+            return profiling.call(fn, *args, **kwargs)
+
+        return super().submit(context.run, run)
+
+
+class TraceExporter:
+    """Append finished traces to ``path``.
+
+    Files ending in ``.jsonl`` get one JSON span per line. Anything else is
+    written in the Chrome trace event format, which ``chrome://tracing`` and
+    Perfetto open even though the array is never closed.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.chrome = not self.path.endswith(".jsonl")
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _chrome_events(self, trace, spans):
+        pid = os.getpid()
+        for span in spans:
+            yield {
+                "name": span.name,
+                "cat": trace.name,
+                "ph": "X",
+                "ts": round((span.start + _EPOCH_OFFSET) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {"trace_id": trace.trace_id, **span.attributes},
+            }
+
+    def export(self, trace):
+        with trace._lock:
+            spans = list(trace.spans)
+        if self.chrome:
+            events = self._chrome_events(trace, spans)
+            lines = [json.dumps(event, default=str) + ",\n" for event in events]
+        else:
+            lines = [json.dumps(span.as_dict(), default=str) + "\n" for span in spans]
+        with self._lock:
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", encoding="utf-8") as handle:
+                if new and self.chrome:
+                    handle.write("[\n")
+                handle.writelines(lines)
+
+
+def exporter_from_env(path=None):
+    """Return an exporter for ``path`` or ``SAXO_TRACE_FILE``, or None."""
+    path = path or os.getenv("SAXO_TRACE_FILE")
+    return TraceExporter(path) if path else None
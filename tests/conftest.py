@@ -4,3 +4,15 @@ import sys
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+from scripts.fake_saxo import FakeSaxo, FakeSaxoServer  # noqa: E402
+
+
+@pytest.fixture
+def fake_saxo(request):
+    """A running fake Saxo gateway; parametrize indirectly with FakeSaxo options."""
+    options = getattr(request, "param", None) or {}
+    with FakeSaxoServer(FakeSaxo(**options)) as server:
+        yield server
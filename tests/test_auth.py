@@ -1,9 +1,18 @@
+import json
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
 import requests
 
-from shared.auth import AuthorizationCodeClient, OAuth2Client, handle_oauth_errors
+from shared.auth import (
+    AuthorizationCodeClient,
+    OAuth2Client,
+    TokenBroker,
+    handle_oauth_errors,
+    token_file_lock,
+)
 
 
 class TestOAuth2Client(unittest.TestCase):
@@ -146,12 +155,17 @@ class TestAuthorizationCodeClient(unittest.TestCase):
         self.assertTrue(self.auth_client._is_access_token_expired())
         self.auth_client.tokens = {"access_token_expires_at": "bad"}
         self.assertTrue(self.auth_client._is_access_token_expired())
+        self.assertFalse(self.auth_client.access_token_valid())
+        self.assertIsNone(self.auth_client.access_token_seconds_remaining())
         self.auth_client.tokens = {
             "access_token_expires_at": 2000,
             "refresh_token_expires_at": 2000,
         }
         self.assertFalse(self.auth_client._is_access_token_expired())
         self.assertFalse(self.auth_client._is_refresh_token_expired())
+        self.assertTrue(self.auth_client.access_token_valid(skew=600))
+        self.assertFalse(self.auth_client.access_token_valid(skew=1200))
+        self.assertAlmostEqual(self.auth_client.access_token_seconds_remaining(), 1000, delta=1)
         data = {"access_token": "x", "expires_in": 10, "refresh_token_expires_in": 20}
         file_mock = unittest.mock.mock_open()
         file_mock.return_value.__enter__.return_value.fileno.return_value = 1
@@ -187,6 +201,50 @@ class TestAuthorizationCodeClient(unittest.TestCase):
             self.assertIsNone(self.auth_client.refresh_token())
 
 
+class TestTokenBroker(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.token_file = os.path.join(directory.name, "tokens.json")
+
+    def write_tokens(self, tokens):
+        with open(self.token_file, "w") as handle:
+            json.dump(tokens, handle)
+
+    def test_read_reparses_only_after_the_file_changes(self):
+        broker = TokenBroker(self.token_file)
+        self.assertIsNone(broker.read())
+        self.write_tokens({"access_token": "a"})
+        self.assertEqual(broker.read(), {"access_token": "a"})
+        with patch("shared.auth.json.load") as load:
+            self.assertEqual(broker.read(), {"access_token": "a"})
+        load.assert_not_called()
+        self.write_tokens({"access_token": "bb"})
+        self.assertEqual(broker.read(), {"access_token": "bb"})
+
+    def test_refresh_ownership_is_exclusive_across_brokers(self):
+        owner, follower = TokenBroker(self.token_file), TokenBroker(self.token_file)
+        self.assertFalse(follower.owner_active())
+        self.assertTrue(owner.acquire_ownership())
+        self.assertTrue(owner.is_owner)
+        self.assertTrue(follower.owner_active())
+        self.assertFalse(follower.acquire_ownership())
+        owner.release_ownership()
+        self.assertFalse(follower.owner_active())
+        self.assertTrue(follower.acquire_ownership())
+        follower.release_ownership()
+
+    def test_non_blocking_lock_reports_contention(self):
+        with token_file_lock(self.token_file) as held:
+            self.assertTrue(held)
+            with token_file_lock(self.token_file, blocking=False) as acquired:
+                self.assertFalse(acquired)
+        with token_file_lock(self.token_file, shared=True) as first:
+            with token_file_lock(self.token_file, shared=True, blocking=False) as second:
+                self.assertTrue(first)
+                self.assertTrue(second)
+
+
 class TestDecorator(unittest.TestCase):
     @handle_oauth_errors
     def _test_method_success(self):
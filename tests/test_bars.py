@@ -0,0 +1,156 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import weakref
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+
+from cli.saxocli import main
+from scripts.fake_saxo import FakeSaxo
+from shared.bars import BarStore, bar_records, parse_horizon
+from shared.cassette import use_transport
+from shared.runtime import create_client, load_runtime_config
+
+DAY = 86400
+
+
+class TestBarRecords(unittest.TestCase):
+    def test_fx_midpoints_order_and_duplicates(self):
+        records = bar_records(
+            [
+                {"Time": "2024-01-03T00:00:00Z", "Open": 3, "High": 4, "Low": 2, "Close": 3},
+                {"Time": "2024-01-02T00:00:00Z", "Open": 1, "High": 2, "Low": 1, "Close": 2},
+                {"Time": "2024-01-03T00:00:00Z", "Open": 5, "High": 6, "Low": 4, "Close": 5},
+                {"Time": "2024-01-04T00:00:00Z", "OpenBid": 1.0, "OpenAsk": 1.2, "CloseBid": 2},
+                {"Time": "garbage", "Open": 9},
+            ]
+        )
+        self.assertEqual(records["open"].tolist()[:2], [1.0, 5.0])
+        self.assertAlmostEqual(records["open"][2], 1.1)
+        self.assertTrue(np.isnan(records["close"][2]) and np.isnan(records["volume"]).all())
+        self.assertEqual(parse_horizon("1d"), parse_horizon("1440"))
+        with self.assertRaises(ValueError):
+            parse_horizon("7m")
+
+
+class TestBarStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=2, seed=5)
+        self._transport = use_transport(self.fake.transport())
+        self._transport.__enter__()
+        self.addCleanup(self._transport.__exit__, None, None, None)
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with patch.dict(
+            os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+        ):
+            config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        self.client = create_client(config)
+        self.store = BarStore(os.path.join(self._directory.name, "bars"), config.base_url)
+        self.uic = next(iter(self.fake.instruments))
+        self.times, self.rows = self.fake.bars(self.uic, 1440)
+        self.now = self.times[-1] + 3600
+
+    def test_incremental_sync_rewrites_only_the_forming_bar(self):
+        earlier = self.times[-11] + 3600
+        self.assertEqual(self.store.refresh(self.client, self.uic, now=earlier), 1200)
+        self.assertEqual(self.fake.requests["chart"], 1)
+        self.fake.reset_counts()
+
+        self.assertEqual(self.store.refresh(self.client, self.uic, now=self.now), 10)
+        self.assertEqual(self.fake.requests["chart"], 1)
+        bars = self.store.read(self.uic)
+        self.assertEqual(bars["time"].tolist(), self.times[-1210:])
+        self.assertEqual(bars["close"][-1], self.rows[-1]["Close"])
+
+        self.rows[-1]["Close"] = 1.5  # The forming bar moves.
+        self.assertEqual(self.store.refresh(self.client, self.uic, now=self.now), 0)
+        self.assertEqual(len(self.store.read(self.uic)), 1210)
+        self.assertEqual(self.store.read(self.uic)["close"][-1], 1.5)
+
+    def test_backfill_runs_in_windows_once(self):
+        self.store.refresh(self.client, self.uic, now=self.now)
+        self.fake.reset_counts()
+        start = self.times[0] - 500 * DAY  # Before the instrument's history begins.
+
+        self.assertEqual(self.store.refresh(self.client, self.uic, start=start, now=self.now), 1300)
+        self.assertEqual(self.fake.requests["chart"], 3)  # Two older windows, one newer.
+        self.fake.reset_counts()
+        self.store.refresh(self.client, self.uic, start=start, now=self.now)
+        self.assertEqual(self.fake.requests["chart"], 1)  # The range before it is covered.
+        self.assertEqual(self.store.read(self.uic)["time"].tolist(), self.times)
+
+    def test_backfill_releases_the_map_before_replacing_the_file(self):
+        self.store.refresh(self.client, self.uic, now=self.now)
+        path = self.store.series_path(self.uic)
+        old_map = weakref.ref(self.store.read(self.uic).base)
+        released, replace_file = [], os.replace
+
+        def replace(source, target):
+            if str(target).endswith(".bars"):
+                released.append((old_map() is None, path in self.store._maps))
+            replace_file(source, target)
+
+        with patch("shared.bars.os.replace", side_effect=replace):
+            added = self.store.refresh(
+                self.client, self.uic, start=self.times[0] - DAY, now=self.now
+            )
+        self.assertGreater(added, 0)
+        self.assertEqual(released, [(True, False)])
+        self.assertEqual(self.store.read(self.uic)["time"].tolist(), self.times)
+
+    def test_range_queries_are_views_of_the_file(self):
+        self.store.refresh(self.client, self.uic, now=self.now)
+        bars = self.store.read(self.uic, start=self.times[-30], end=self.times[-20])
+        self.assertIsInstance(bars, np.memmap)
+        self.assertEqual(bars["time"].tolist(), self.times[-30:-20])
+        self.assertEqual(bars["open"].tolist(), [row["Open"] for row in self.rows[-30:-20]])
+        self.assertIs(self.store.read(self.uic).base, self.store.read(self.uic).base)
+        self.assertEqual(len(self.store.read(self.uic, horizon=60)), 0)
+
+
+class TestBarsCommand(unittest.TestCase):
+    def test_bars_command(self):
+        fake = FakeSaxo(positions=3, seed=2)
+        instrument = next(iter(fake.instruments.values()))
+        times, _ = fake.bars(instrument["Uic"], 1440)
+        start, end = (
+            datetime.fromtimestamp(moment, timezone.utc).isoformat() for moment in times[-40:-30:9]
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            params = os.path.join(directory, "params.json")
+            token_file = fake.write_token_file(os.path.join(directory, "tokens.json"))
+            with open(params, "w") as handle:
+                json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+
+            def bars(*options):
+                output = io.StringIO()
+                with (
+                    patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+                    use_transport(fake.transport()),
+                    contextlib.redirect_stdout(output),
+                ):
+                    code = main(["--params", params, "bars", instrument["Symbol"], *options])
+                return code, json.loads(output.getvalue())
+
+            code, result = bars("--horizon", "1d", "--from", start, "--to", end)
+            self.assertEqual(code, 0)
+            self.assertEqual((result["uic"], result["horizon"]), (instrument["Uic"], 1440))
+            self.assertEqual(len(result["bars"]), 9)
+            self.assertEqual(result["bars"][0]["time"], start)
+            self.assertTrue(os.path.isdir(os.path.join(directory, "chart-bars")))
+            fake.reset_counts()
+            code, offline = bars("--from", start, "--to", end, "--offline")
+            self.assertEqual(offline["bars"], result["bars"])
+            self.assertEqual(fake.requests["chart"], 0)
+            self.assertEqual(bars("--horizon", "7m")[0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
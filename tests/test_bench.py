@@ -0,0 +1,47 @@
+import unittest
+
+import pytest
+
+from scripts.bench import CASES, compare, percentile, run
+
+
+def results(**metrics):
+    return {"results": {"positions[10]": metrics}}
+
+
+class TestBenchComparison(unittest.TestCase):
+    def test_percentile_uses_nearest_rank(self):
+        samples = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(samples, 0.50), 50.0)
+        self.assertEqual(percentile(samples, 0.99), 99.0)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+
+    def test_regressions_beyond_threshold_are_reported(self):
+        baseline = results(p50_ms=10.0, throughput_per_s=100.0, peak_memory_kb=50.0)
+        current = results(p50_ms=11.0, throughput_per_s=70.0, peak_memory_kb=80.0)
+
+        regressions = compare(current, baseline, threshold=0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("positions[10] throughput_per_s"))
+        self.assertTrue(regressions[1].startswith("positions[10] peak_memory_kb"))
+
+    def test_metric_thresholds_and_improvements(self):
+        baseline = results(p50_ms=10.0, p99_ms=10.0)
+        current = results(p50_ms=5.0, p99_ms=14.0)
+
+        self.assertEqual(compare(current, baseline, 0.2, {"p99_ms": 0.5}), [])
+        self.assertEqual(len(compare(current, baseline, 0.2)), 1)
+        self.assertEqual(compare(current, {"results": {}}), [])
+
+
+@pytest.mark.bench
+class TestBenchCases(unittest.TestCase):
+    def test_every_case_reports_metrics(self):
+        report = run(sizes=(10,), budget_seconds=0.05, min_iterations=2)
+
+        self.assertEqual(set(report["results"]), {f"{case.name}[10]" for case in CASES})
+        for metrics in report["results"].values():
+            self.assertGreater(metrics["throughput_per_s"], 0)
+            self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+            self.assertGreater(metrics["peak_memory_kb"], 0)
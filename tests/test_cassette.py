@@ -0,0 +1,128 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cli.saxocli import build_positions_payload, main
+from scripts.fake_saxo import FakeSaxo
+from shared import auth, client
+from shared.cassette import (
+    REDACTED,
+    Cassette,
+    ReplayTransport,
+    authorize_replay,
+    recording,
+    replaying,
+    use_transport,
+)
+from shared.client import SaxoAPIError, SaxoClient
+
+
+def make_client(token_file):
+    return SaxoClient(
+        client_id="client",
+        redirect_uri="https://example.invalid/callback",
+        auth_endpoint="https://fake/authorize",
+        token_endpoint="https://fake/token",
+        token_file=token_file,
+        baseurl="https://fake/sim/openapi",
+    )
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=6, orders=2, activities=4, seed=5)
+        self.path = os.path.join(self._directory.name, "traffic.json.gz")
+        self.previous = client._http2_client, auth._http2_client
+
+    def record(self):
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        saxo = make_client(token_file)
+        with recording(self.path, transport=self.fake.transport()):
+            payload = build_positions_payload(saxo)
+            saxo.get_order_history()
+            saxo.auth_client.refresh_token()
+        return payload
+
+    def test_replay_reproduces_recorded_payload_without_credentials(self):
+        recorded = self.record()
+        saxo = make_client(os.path.join(self._directory.name, "missing.json"))
+        authorize_replay(saxo)
+
+        with replaying(self.path, latency_scale=0):
+            replayed = build_positions_payload(saxo)
+            history = saxo.get_order_history()
+
+        self.assertEqual(
+            [(row["uic"], row["quantity"], row["symbol"]) for row in replayed["positions"]],
+            [(row["uic"], row["quantity"], row["symbol"]) for row in recorded["positions"]],
+        )
+        self.assertEqual(len(history["Data"]), 4)
+        self.assertIs(client._http2_client, self.previous[0])
+        self.assertIs(auth._http2_client, self.previous[1])
+
+    def test_tokens_and_account_keys_are_scrubbed(self):
+        self.record()
+        cassette = Cassette.load(self.path)
+        text = json.dumps(cassette.interactions)
+
+        for secret in (self.fake.config.token, "fake-refresh-token", "fakeAccountKey", "FAKE-0001"):
+            self.assertNotIn(secret, text)
+        token = next(row for row in cassette.interactions if row["url"].endswith("/token"))
+        self.assertEqual(token["response_body"]["access_token"], REDACTED)
+        self.assertEqual(token["request_body"]["refresh_token"], REDACTED)
+        accounts = next(row for row in cassette.interactions if "accounts" in row["url"])
+        account = accounts["response_body"]["Data"][0]
+        self.assertEqual(account["AccountKey"], "ACCOUNTKEY-1")
+        self.assertTrue(all(row["elapsed"] >= 0 for row in cassette.interactions))
+
+    def test_replay_scales_latency_and_rejects_unknown_requests(self):
+        cassette = Cassette(
+            [
+                {
+                    "method": "GET",
+                    "url": "https://fake/sim/openapi/port/v1/balances/me",
+                    "status": 200,
+                    "headers": {"content-type": "application/json"},
+                    "response_body": {"CashBalance": 1},
+                    "elapsed": 0.2,
+                }
+            ]
+        )
+        saxo = make_client(os.path.join(self._directory.name, "missing.json"))
+        authorize_replay(saxo)
+
+        with patch("shared.cassette.time.sleep") as sleep:
+            with use_transport(ReplayTransport(cassette, latency_scale=0.5)):
+                self.assertEqual(saxo.get_balances(), {"CashBalance": 1})
+                self.assertEqual(saxo.get_balances(), {"CashBalance": 1})
+                with self.assertRaises(SaxoAPIError):
+                    saxo.get_positions()
+
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.1, 0.1])
+
+    def test_cli_replays_a_recording(self):
+        self.record()
+        params = os.path.join(self._directory.name, "params.json")
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": os.path.join(self._directory.name, "none.json")}, handle)
+        output = io.StringIO()
+
+        with patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}):
+            with contextlib.redirect_stdout(output):
+                code = main(
+                    ["--params", params, "--replay", self.path, "--latency-scale", "0", "positions"]
+                )
+
+        self.assertEqual(code, 0)
+        self.assertEqual(len(json.loads(output.getvalue())["positions"]), 6)
+        self.assertFalse(os.path.exists(os.path.join(self._directory.name, "none.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
 import argparse
+import os
+import subprocess
 import sys
 import types
 import unittest
@@ -93,6 +95,15 @@ class TestServeLifecycle(unittest.TestCase):
         args = parse_args(["orders", "--history"])
         self.assertTrue(args.history)
 
+    def test_roll_is_its_own_command_and_roll_stays_a_symbol(self):
+        args = parse_args(
+            ["roll", "ROLL", "--expiry", "2030-01-18", "--strike", "5", "--type", "put"]
+        )
+        self.assertEqual((args.command, args.symbol, args.sort), ("roll", "ROLL", "annualized"))
+        args = parse_args(["options", "roll"])
+        self.assertEqual((args.command, args.symbol), ("options", "roll"))
+        self.assertEqual(parse_args(["quote", "options", "roll"]).symbols, ["options", "roll"])
+
     @patch("cli.saxocli.AuthenticationSession")
     @patch("cli.saxocli.create_client")
     @patch("cli.saxocli.load_runtime_config")
@@ -122,7 +133,44 @@ class TestServeLifecycle(unittest.TestCase):
             host="127.0.0.1",
             port=5011,
             dev=False,
+            trace_file=None,
+            snapshot_interval=None,
+        )
+
+    @patch("cli.saxocli.ClientManager")
+    @patch("cli.saxocli.create_client")
+    @patch("cli.saxocli.load_runtime_config")
+    def test_serve_several_environments_with_one_manager(
+        self, load_config, create_client, manager_cls
+    ):
+        load_config.return_value = SimpleNamespace(
+            simulation_mode=True, token_refresh_interval_seconds=19
+        )
+        manager = manager_cls.from_params.return_value
+        web_app = types.ModuleType("web.app")
+        web_app.startSaxoServer = MagicMock(return_value=None)
+        web_package = types.ModuleType("web")
+        web_package.app = web_app
+        with patch.dict(sys.modules, {"web": web_package, "web.app": web_app}):
+            from cli.saxocli import main
+
+            self.assertEqual(main(["serve", "--environments", "sim, live"]), 0)
+
+        manager_cls.from_params.assert_called_once_with(["sim", "live"], "params.json")
+        manager.authenticate.assert_called_once_with()
+        manager.start_refresh.assert_called_once_with()
+        manager.close.assert_called_once_with()
+        self.assertIs(web_app.startSaxoServer.call_args.kwargs["manager"], manager)
+
+
+class TestImports(unittest.TestCase):
+    def test_the_cli_imports_numpy_only_for_the_commands_using_it(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "import sys, cli.saxocli; print('numpy' in sys.modules)"
+        completed = subprocess.run(
+            [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
         )
+        self.assertEqual(completed.stdout.strip(), "False")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,17 @@
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
 
 import httpx
 
-from shared.client import AuthenticationError, SaxoAPIError, SaxoClient
+from shared.client import AuthenticationError, SaxoAPIError, SaxoClient, TokenRefreshScheduler
 
 
 class TestSaxoClient(unittest.TestCase):
     def setUp(self):
         self.mock_auth_client = MagicMock()
         self.mock_auth_client._is_access_token_expired.return_value = False
+        self.mock_auth_client.access_token_valid.return_value = True
         self.mock_auth_client.tokens = {"access_token": "abc"}
 
         self.patcher_auth = patch(
@@ -52,6 +54,23 @@ class TestSaxoClient(unittest.TestCase):
         self.client.refresh_token()
         self.mock_auth_client.refresh_token.assert_called_once()
 
+    def test_refresh_adopts_fresh_token_from_disk_without_locking(self):
+        self.mock_auth_client.broker.read.return_value = {"access_token": "shared"}
+        with patch("shared.client.token_file_lock") as lock:
+            self.assertEqual(self.client.refresh_token(), {"access_token": "shared"})
+        lock.assert_not_called()
+        self.mock_auth_client.refresh_token.assert_not_called()
+
+    def test_refresh_defers_to_owning_process_while_token_is_usable(self):
+        self.mock_auth_client.broker.read.return_value = None
+        self.mock_auth_client.broker.is_owner = False
+        self.mock_auth_client.broker.owner_active.return_value = True
+        with patch("shared.client.token_file_lock") as lock:
+            self.client.refresh_token()
+        lock.assert_not_called()
+        self.mock_auth_client.refresh_token.assert_not_called()
+        self.assertEqual(self.client.current_state(), self.client.STATE_AUTHENTICATED)
+
     def test_ensure_access_token_skips_valid_token(self):
         self.client.ensure_access_token()
         self.mock_auth_client.refresh_token.assert_not_called()
@@ -89,6 +108,19 @@ class TestSaxoClient(unittest.TestCase):
         self.assertIsInstance(kwargs["params"]["FromDateTime"], str)
         self.assertIsInstance(kwargs["params"]["ToDateTime"], str)
 
+    @patch.object(SaxoClient, "_make_api_request", return_value={"Data": [{"Close": 1}]})
+    def test_get_chart_bars(self, mock_api):
+        at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=1)))
+        rows = self.client.get_chart_bars(211, horizon=60, mode="From", at=at, count=5000)
+        self.assertEqual(rows, [{"Close": 1}])
+        args, kwargs = mock_api.call_args
+        self.assertEqual(args, ("GET", "/chart/v3/charts"))
+        self.assertEqual(kwargs["params"]["Mode"], "From")
+        self.assertEqual(kwargs["params"]["Count"], 1200)
+        self.assertEqual(kwargs["params"]["Time"], "2024-01-02T02:04:05Z")
+        self.client.get_chart_bars(211)
+        self.assertNotIn("Time", mock_api.call_args.kwargs["params"])
+
     def test_api_request_rejects_write_methods(self):
         with self.assertRaises(PermissionError):
             self.client._make_api_request("POST", "/trade/v2/orders", data={"Amount": 1})
@@ -118,9 +150,11 @@ class TestSaxoClient(unittest.TestCase):
         self.mock_auth_client.tokens = {"access_token": "x"}
         response = MagicMock(status_code=404)
         response.raise_for_status.side_effect = httpx.HTTPStatusError(
-            "missing", request=httpx.Request("GET", "https://example.test/missing"), response=httpx.Response(404)
+            "missing",
+            request=httpx.Request("GET", "https://example.test/missing"),
+            response=httpx.Response(404),
         )
-        with patch("shared.client._http2_client.request", return_value=response):
+        with patch.object(self.client.http, "request", return_value=response):
             with self.assertRaises(SaxoAPIError):
                 self.client._make_api_request("GET", "/missing")
 
@@ -146,13 +180,14 @@ class TestSaxoClient(unittest.TestCase):
         self.mock_auth_client._is_access_token_expired.return_value = False
         response = MagicMock()
         response.json.return_value = {"ok": True}
-        with patch("shared.client._http2_client.request", return_value=response) as request:
+        with patch.object(self.client.http, "request", return_value=response) as request:
             self.assertEqual(
                 self.client._make_api_request("get", "/x", data={"a": 1}, params={"p": 2}),
                 {"ok": True},
             )
             request.assert_called_once()
         self.mock_auth_client.tokens = {}
+        self.mock_auth_client.access_token_valid.return_value = False
         self.mock_auth_client.refresh_token.return_value = None
         with self.assertRaises(ConnectionError):
             self.client._make_api_request("GET", "/x")
@@ -171,7 +206,7 @@ class TestSaxoClient(unittest.TestCase):
         response.raise_for_status.side_effect = httpx.RequestError(
             "down", request=httpx.Request("GET", "https://example.test/x")
         )
-        with patch("shared.client._http2_client.request", return_value=response):
+        with patch.object(self.client.http, "request", return_value=response):
             with self.assertRaises(ConnectionError):
                 self.client._make_api_request("GET", "/x")
 
@@ -188,37 +223,70 @@ class TestSaxoClient(unittest.TestCase):
         self.mock_auth_client.refresh_token.side_effect = RuntimeError("bad")
         with self.assertRaises(RuntimeError):
             self.client.refresh_token()
-        thread = MagicMock()
-        thread.is_alive.return_value = True
-        self.client._refresh_thread = thread
-        self.client._stop_event = MagicMock()
-        self.client.start_refresh_thread()
-        self.client.stop_refresh_thread()
-        thread.is_alive.return_value = False
-        self.client.stop_refresh_thread()
-
-    def test_refresh_loop_success_failure_and_valid_token(self):
-        class StopEvent:
-            def __init__(self):
-                self.calls = 0
-
-            def is_set(self):
-                return self.calls > 0
-
-            def wait(self, _interval):
-                self.calls += 1
-
-        self.client._stop_event = StopEvent()
-        self.mock_auth_client._is_access_token_expired.return_value = True
-        self.mock_auth_client.refresh_token.return_value = {"access_token": "x"}
-        self.client._refresh_loop(0)
-        self.client._stop_event = StopEvent()
-        self.mock_auth_client.refresh_token.return_value = None
-        self.client._refresh_loop(0)
-        self.client._stop_event = StopEvent()
-        self.mock_auth_client._is_access_token_expired.return_value = False
-        self.mock_auth_client.tokens = {"access_token_expires_at": 9999999999}
-        self.client._refresh_loop(0)
+        with patch("shared.client.TokenRefreshScheduler") as scheduler_cls:
+            scheduler = self.client.start_refresh_thread(30)
+            self.client.stop_refresh_thread()
+        scheduler_cls.assert_called_once_with(self.client, max_sleep_seconds=30)
+        scheduler.start.assert_called_once_with()
+        scheduler.stop.assert_called_once_with()
+
+    def test_valid_token_request_does_not_check_expiry_or_refresh(self):
+        response = MagicMock()
+        response.json.return_value = {"ok": True}
+        self.mock_auth_client._is_access_token_expired.reset_mock()
+        with patch.object(self.client.http, "request", return_value=response):
+            self.client._make_api_request("GET", "/x")
+        self.mock_auth_client._is_access_token_expired.assert_not_called()
+        self.mock_auth_client.refresh_token.assert_not_called()
+
+
+class RecordingStopEvent:
+    def __init__(self, stop_after):
+        self.delays = []
+        self.stop_after = stop_after
+
+    def wait(self, delay):
+        self.delays.append(delay)
+        return len(self.delays) > self.stop_after
+
+
+class TestTokenRefreshScheduler(unittest.TestCase):
+    def make_scheduler(self, stop_after, **kwargs):
+        client = MagicMock()
+        scheduler = TokenRefreshScheduler(client, skew_seconds=600, **kwargs)
+        scheduler._stop_event = RecordingStopEvent(stop_after)
+        return client, scheduler
+
+    def test_refreshes_once_per_token_lifetime(self):
+        client, scheduler = self.make_scheduler(stop_after=1)
+        # Initial delay, post-wake check, post-refresh check, next delay.
+        client.auth_client.access_token_seconds_remaining.side_effect = [1000, 599, 1200, 1200]
+
+        scheduler._run()
+
+        self.assertEqual(scheduler._stop_event.delays, [401, 601])
+        client.refresh_token.assert_called_once_with()
+
+    def test_failed_refresh_retries_with_backoff_then_stops(self):
+        client, scheduler = self.make_scheduler(stop_after=10, max_attempts=3)
+        client.auth_client.access_token_seconds_remaining.return_value = 0
+        client.refresh_token.side_effect = RuntimeError("down")
+
+        with patch("shared.client.random.uniform", return_value=1.0):
+            scheduler._run()
+
+        self.assertEqual(scheduler._stop_event.delays, [0.0, 5, 10])
+        self.assertEqual(client.refresh_token.call_count, 3)
+        self.assertIsNone(scheduler.next_refresh_in())
+
+    def test_refresh_elsewhere_reschedules_without_refreshing(self):
+        client, scheduler = self.make_scheduler(stop_after=1, max_sleep_seconds=60)
+        client.auth_client.access_token_seconds_remaining.return_value = 1200
+
+        scheduler._run()
+
+        self.assertEqual(scheduler._stop_event.delays, [60, 60])
+        client.refresh_token.assert_not_called()
 
 
 if __name__ == "__main__":
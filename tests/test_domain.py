@@ -1,6 +1,10 @@
+import json
+import random
 import unittest
 
 from shared.domain import (
+    Order,
+    OrderActivity,
     first,
     normalize_account,
     normalize_balance,
@@ -9,7 +13,9 @@ from shared.domain import (
     number,
     portfolio_summary,
     roll_analysis,
+    to_json,
 )
+from shared.frame import PositionFrame
 
 
 class TestDomain(unittest.TestCase):
@@ -44,6 +50,49 @@ class TestDomain(unittest.TestCase):
         self.assertTrue(quote["is_delayed"])
         self.assertEqual(normalize_quote({"IsDelayed": False}, "X")["is_delayed"], False)
 
+    def test_models_are_slotted_and_serialize_with_public_names(self):
+        position = normalize_position(
+            {"PositionBase": {"Uic": 7, "Amount": 3, "AccountId": "A"}},
+            {"Symbol": "XYZ", "AssetType": "Etf"},
+        )
+        self.assertFalse(hasattr(position, "__dict__"))
+        self.assertEqual(position.get("missing", "default"), "default")
+        with self.assertRaises(KeyError):
+            position["missing"]
+        self.assertEqual(
+            position.to_json(),
+            {
+                "symbol": "XYZ",
+                "description": None,
+                "asset_type": "Etf",
+                "uin": 7,
+                "uic": 7,
+                "quantity": 3,
+                "currency": None,
+                "market_price": 0,
+                "market_value": 0.0,
+                "cost_price": 0,
+                "unrealized_pnl": 0,
+                "account_id": "A",
+                "side": "long",
+                "raw": {"Uic": 7, "AssetType": "Etf"},
+            },
+        )
+        quote = normalize_quote({"Bid": 1, "Ask": 3, "Extra": list(range(100))}, "XYZ")
+        self.assertNotIn("raw", quote.to_json())
+        self.assertEqual(quote.mid, 2)
+        balance = normalize_balance({"Cash": 5}, "sim", "EUR")
+        self.assertEqual(
+            json.loads(json.dumps({"q": quote, "b": balance}, default=to_json)),
+            {"q": quote.to_json(), "b": balance.to_json()},
+        )
+
+        fields = ("ABC", "Acme", "Working", None, "Buy", 1, 2.5, "9", "K", 0, None)
+        self.assertIsNone(Order(*fields).to_json()["ActivityTime"])
+        activity = OrderActivity(*fields, activity_time="2024-01-02T03:04:05Z")
+        self.assertEqual(activity.to_json()["ActivityTime"], "2024-01-02T03:04:05Z")
+        self.assertEqual(activity.to_json()["OrderPrice"], 2.5)
+
     def test_portfolio_summary_and_roll_analysis(self):
         positions = [
             {"symbol": "A", "asset_type": "Stock", "market_value": 100},
@@ -62,5 +111,107 @@ class TestDomain(unittest.TestCase):
         self.assertEqual(roll["strike_increase"], 10)
 
 
+def reference_summary(positions, balance):
+    """The original per-dict ``portfolio_summary``, kept to pin the frame's output."""
+    total = number(balance.get("net_equity")) or sum(
+        number(p.get("market_value")) for p in positions
+    )
+    classes = {}
+    for p in positions:
+        kind = str(p.get("asset_type") or "other").lower()
+        key = (
+            "options_market_value"
+            if "option" in kind
+            else ("stocks" if "stock" in kind or "equity" in kind else "other")
+        )
+        classes[key] = classes.get(key, 0) + number(p.get("market_value"))
+    if balance.get("cash") is not None:
+        classes["cash"] = number(balance.get("cash"))
+    largest = sorted(
+        (
+            dict(p, weight=(number(p.get("market_value")) / total if total else 0))
+            for p in positions
+        ),
+        key=lambda p: abs(number(p.get("market_value"))),
+        reverse=True,
+    )[:10]
+    return {
+        "environment": balance.get("environment"),
+        "net_value": total,
+        "cash": balance.get("cash"),
+        "asset_classes": classes,
+        "largest_positions": [
+            {
+                "symbol": p.get("symbol"),
+                "market_value": p.get("market_value"),
+                "weight": p["weight"],
+            }
+            for p in largest
+        ],
+    }
+
+
+class TestPositionFrame(unittest.TestCase):
+    def random_positions(self, rng, count):
+        kinds = ["Stock", "StockOption", "FxSpot", "Etf", None, "CfdOnEquity", "Bond"]
+        # A small value pool forces ties around the top-10 cut-off.
+        values = [rng.choice([100, -100, 50.5, 0, None, "bad", "12.25"]) for _ in range(count)]
+        for index in rng.sample(range(count), count // 2):
+            values[index] = round(rng.uniform(-1e6, 1e6), 2)
+        return [
+            {
+                "symbol": f"S{index}",
+                "asset_type": rng.choice(kinds),
+                "currency": rng.choice(["EUR", "USD", None]),
+                "quantity": rng.randint(-50, 50),
+                "market_price": rng.uniform(1, 100),
+                "market_value": value,
+                "unrealized_pnl": rng.uniform(-100, 100),
+            }
+            for index, value in enumerate(values)
+        ]
+
+    def test_summary_matches_the_per_dict_implementation(self):
+        rng = random.Random(4)
+        for count in (0, 1, 9, 10, 11, 57, 400):
+            positions = self.random_positions(rng, count)
+            for balance in (
+                {"environment": "sim", "net_equity": 0, "cash": 5},
+                {"environment": "live", "net_equity": "123456.7", "cash": None},
+            ):
+                summary = portfolio_summary(positions, balance)
+                del summary["timestamp"]
+                self.assertEqual(
+                    json.dumps(summary), json.dumps(reference_summary(positions, balance))
+                )
+
+    def test_frame_columns_and_pnl_aggregates(self):
+        rng = random.Random(9)
+        first_account = self.random_positions(rng, 30)
+        second_account = self.random_positions(rng, 20)
+        frame = PositionFrame.concat([PositionFrame(first_account), PositionFrame(second_account)])
+        positions = first_account + second_account
+
+        self.assertEqual(len(frame), 50)
+        self.assertEqual(
+            frame.market_value.tolist(), [number(p["market_value"]) for p in positions]
+        )
+        totals = frame.pnl_totals()
+        self.assertEqual(totals["total"], sum(p["unrealized_pnl"] for p in positions))
+        for currency in ("EUR", "USD", None):
+            self.assertAlmostEqual(
+                totals["currencies"][currency],
+                sum(p["unrealized_pnl"] for p in positions if p["currency"] == currency),
+            )
+        self.assertAlmostEqual(sum(totals["asset_classes"].values()), totals["total"])
+        weights = frame.weights(frame.total_market_value())
+        self.assertAlmostEqual(float(weights.sum()), 1.0)
+        self.assertEqual(PositionFrame([]).largest().tolist(), [])
+        self.assertEqual(
+            portfolio_summary(frame, {"net_equity": 1})["asset_classes"],
+            portfolio_summary(positions, {"net_equity": 1})["asset_classes"],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from cli.saxocli import build_positions_payload
+from scripts.fake_saxo import FakeSaxo, FakeSaxoServer, Latency
+from shared.client import RateLimitError, SaxoAPIError
+from shared.runtime import create_client, load_runtime_config
+
+
+class TestFakeSaxoServer(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=40, orders=7, activities=12, seed=3)
+        self.server = FakeSaxoServer(self.fake).start()
+        self.addCleanup(self.server.stop)
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        environ = {
+            "SAXO_BASE_URL": self.server.base_url,
+            "SAXO_TOKEN_ENDPOINT": self.server.token_endpoint,
+            "TOKEN_FILE": token_file,
+            "TRADING_ENABLED": "true",
+        }
+        with patch.dict(os.environ, environ):
+            self.config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        self.client = create_client(self.config)
+
+    def test_client_reads_generated_portfolio(self):
+        payload = build_positions_payload(self.client)
+
+        self.assertEqual(len(payload["positions"]), 40)
+        self.assertTrue(all(row["symbol"] for row in payload["positions"]))
+        self.assertEqual(len(self.client.get_orders()["Data"]), 7)
+        history = self.client.get_order_history(limit=5)
+        self.assertEqual(len(history["Data"]), 5)
+        self.assertEqual(history["__count"], 12)
+        self.assertEqual(self.fake.requests["instrument_details"], 40)
+
+    def test_generation_is_reproducible(self):
+        def holdings(fake):
+            return [
+                (
+                    row["PositionBase"]["Uic"],
+                    row["PositionBase"]["Amount"],
+                    row["PositionBase"]["OpenPrice"],
+                )
+                for row in fake.positions
+            ]
+
+        other = FakeSaxo(positions=40, orders=7, activities=12, seed=3)
+        self.assertEqual(holdings(other), holdings(self.fake))
+        self.assertNotEqual(holdings(FakeSaxo(positions=40, seed=4)), holdings(self.fake))
+
+    def test_orders_change_portfolio_state(self):
+        uic = self.fake.positions[0]["PositionBase"]["Uic"]
+        amount = self.fake.positions[0]["PositionBase"]["Amount"]
+        account_key = self.fake.account["AccountKey"]
+
+        self.client.place_order(
+            {
+                "AccountKey": account_key,
+                "Uic": uic,
+                "AssetType": self.fake.instruments[uic]["AssetType"],
+                "Amount": abs(amount),
+                "BuySell": "Sell" if amount > 0 else "Buy",
+                "OrderType": "Market",
+            }
+        )
+        order_id = self.fake.orders[0]["OrderId"]
+        result = self.client.cancel_orders([order_id], account_key)
+
+        self.assertEqual(len(self.client.get_positions()["Data"]), 39)
+        self.assertEqual(result["Orders"], [{"OrderId": order_id}])
+        self.assertEqual(len(self.client.get_orders()["Data"]), 6)
+        statuses = [row["Status"] for row in self.client.get_order_history()["Data"][:2]]
+        self.assertEqual(statuses, ["Cancelled", "Filled"])
+
+    def test_rate_limit_returns_429_with_headers(self):
+        self.fake.config.rate_limit = 2
+        self.client.get_accounts()
+        response = httpx.get(
+            f"{self.server.base_url}/port/v1/balances/me",
+            headers={"Authorization": f"Bearer {self.fake.config.token}"},
+        )
+        self.assertEqual(response.headers["X-RateLimit-Session-Remaining"], "0")
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertRaises(RateLimitError) as raised:
+            self.client.get_positions()
+
+        headers = raised.exception.__cause__.response.headers
+        self.assertEqual(headers["X-RateLimit-Session-Limit"], "2")
+        self.assertGreaterEqual(int(headers["Retry-After"]), 1)
+
+    def test_injected_faults_raise_api_errors(self):
+        self.fake.fail_next(503)
+        with self.assertRaises(SaxoAPIError):
+            self.client.get_balances()
+        self.assertEqual(self.client.get_balances()["OpenPositionsCount"], 40)
+
+    def test_token_endpoint_refreshes_tokens(self):
+        self.assertTrue(self.client.auth_client.refresh_token())
+        self.assertEqual(self.client.auth_client.tokens["access_token"], self.fake.config.token)
+        self.assertEqual(self.fake.requests["token"], 1)
+
+
+class TestFakeSaxoTransport(unittest.TestCase):
+    def test_in_process_transport_serves_search_and_quotes(self):
+        fake = FakeSaxo(positions=3)
+        instrument = next(iter(fake.instruments.values()))
+        with httpx.Client(
+            transport=fake.transport(),
+            base_url="https://fake/sim/openapi",
+            headers={"Authorization": f"Bearer {fake.config.token}"},
+        ) as client:
+            matches = client.get(
+                "/ref/v1/instruments", params={"Keywords": instrument["Symbol"]}
+            ).json()["Data"]
+            quote = client.get("/trade/v1/infoprices", params={"Uic": instrument["Uic"]}).json()
+            unauthorized = client.get("/port/v1/positions/me", headers={"Authorization": "x"})
+
+        self.assertIn(instrument["Uic"], [row["Identifier"] for row in matches])
+        self.assertEqual(quote["Quote"]["Mid"], instrument["_price"])
+        self.assertEqual(unauthorized.status_code, 401)
+
+    def test_latency_specifications(self):
+        rng = SimpleNamespace(uniform=lambda a, b: b, gauss=lambda mu, sigma: mu)
+        self.assertEqual(Latency.parse("constant:20").sample(rng), 0.02)
+        self.assertEqual(Latency.parse("uniform:5,50").sample(rng), 0.05)
+        self.assertEqual(Latency.parse("lognormal:40,0.5").sample(rng), 0.04)
+        self.assertEqual(Latency.parse(None).sample(rng), 0.0)
+        with self.assertRaises(ValueError):
+            Latency.parse("gamma:1")
+
+
+@pytest.mark.parametrize("fake_saxo", [{"positions": 5, "orders": 2}], indirect=True)
+def test_fake_saxo_fixture(fake_saxo):
+    response = httpx.get(
+        f"{fake_saxo.base_url}/port/v1/positions/me",
+        headers={"Authorization": f"Bearer {fake_saxo.fake.config.token}"},
+    )
+    assert response.json()["__count"] == 5
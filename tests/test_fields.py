@@ -0,0 +1,76 @@
+import unittest
+
+from shared.domain import normalize_position, normalize_positions
+from shared.fields import POSITION, Schema
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema(
+            "test",
+            (("price", ("View.Last", "View.Close", "Price")), ("uic", ("Base.Uic",))),
+            sections=("Base", "View"),
+            root="Base",
+        )
+
+    def test_extract_uses_declared_order(self):
+        row = {"Base": {"Uic": 1}, "View": {"Last": None, "Close": 2}, "Price": 3}
+        self.assertEqual(self.schema.extract(row), (2, 1))
+        self.assertEqual(self.schema.extract({"Uic": 5}), (None, 5))  # Flat rows read the root.
+        self.assertEqual(self.schema.extract({"Base": {"Uic": 1}, "View": None}), (None, 1))
+
+    def test_batches_keep_the_declared_order_whatever_the_first_row(self):
+        rows = [
+            {"Base": {"Uic": 1}, "Price": 10},
+            {"Base": {"Uic": 2}, "View": {"Last": 20}, "Price": 99},
+            {"Base": {}},
+        ]
+        expected = [(10, 1), (20, 2), (None, None)]
+        self.assertEqual(self.schema.extract_all(rows), expected)
+        self.assertEqual(self.schema.extract_all(rows[::-1]), expected[::-1])
+        self.assertEqual([self.schema.extract(row) for row in rows], expected)
+        self.assertIs(self.schema.compile(), self.schema.compile())
+        self.assertEqual(self.schema.extract_all([]), [])
+
+    def test_unknown_sections_are_rejected(self):
+        with self.assertRaises(ValueError):
+            Schema("bad", (("x", ("Missing.Key",)),))
+
+    def test_batch_and_single_normalizers_agree(self):
+        raws = [
+            {
+                "PositionBase": {"Uic": uic, "Amount": uic, "OpenPrice": 2.0, "AssetType": "Stock"},
+                "PositionView": {"CurrentPrice": 3.0, "ProfitLossOnTrade": uic},
+            }
+            for uic in range(1, 6)
+        ]
+        instruments = [{"Symbol": f"S{uic}"} for uic in range(1, 6)]
+        batch = normalize_positions(raws, instruments, ["EUR"] * 5)
+        self.assertEqual(
+            batch,
+            [normalize_position(raw, i, "EUR") for raw, i in zip(raws, instruments, strict=True)],
+        )
+        self.assertEqual(batch[0].cost_price, 2.0)
+        self.assertEqual(batch[4].market_value, 15.0)
+        self.assertEqual(POSITION.names[:3], ("account_id", "account_key", "uic"))
+
+    def test_mixed_shapes_normalize_as_single_rows(self):
+        cfd = {
+            "PositionBase": {"Uic": 1, "Amount": 2, "AssetType": "CfdOnStock"},
+            "PositionView": {"Exposure": 40.0, "EntryPrice": 9.0},
+        }
+        stock = {
+            "PositionBase": {"Uic": 2, "Amount": 5, "OpenPrice": 8.0, "AssetType": "Stock"},
+            "PositionView": {"MarketValue": 50.0, "Exposure": 999.0, "EntryPrice": 7.0},
+        }
+        for rows in ([cfd, stock], [stock, cfd]):
+            batch = normalize_positions(rows, [{}] * 2)
+            self.assertEqual(batch, [normalize_position(row) for row in rows])
+        self.assertEqual(
+            [p.market_value for p in normalize_positions([cfd, stock], [{}] * 2)], [40.0, 50.0]
+        )
+        self.assertEqual(normalize_positions([cfd, stock], [{}] * 2)[1].cost_price, 8.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
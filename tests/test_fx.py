@@ -0,0 +1,109 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cli.saxocli import main
+from scripts.fake_saxo import FX_SPOTS, FakeSaxo
+from shared.cassette import use_transport
+from shared.domain import portfolio_summary
+from shared.frame import PositionFrame
+from shared.fx import FxRates
+from shared.runtime import create_client, load_runtime_config
+from shared.snapshots import normalized_positions
+
+
+class TestFxRates(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=12, seed=3)
+        self._transport = use_transport(self.fake.transport())
+        self._transport.__enter__()
+        self.addCleanup(self._transport.__exit__, None, None, None)
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with patch.dict(
+            os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+        ):
+            config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        self.client = create_client(config)
+
+    def test_crosses_are_inverted_batched_and_cached(self):
+        fx = FxRates(self.client, ttl=60)
+        rates = fx.rates(["USD", "GBP", "EUR", None], "EUR")
+        self.assertEqual(rates["EUR"], 1.0)
+        self.assertAlmostEqual(rates["USD"], 1 / FX_SPOTS["EURUSD"][1])
+        self.assertAlmostEqual(rates["GBP"], 1 / FX_SPOTS["EURGBP"][1])
+        self.assertEqual(
+            (self.fake.requests["instrument_search"], self.fake.requests["infoprices_list"]), (1, 1)
+        )
+
+        self.fake.reset_counts()
+        self.assertEqual(fx.rates(["GBP", "USD"], "EUR"), rates)
+        self.assertEqual(sum(self.fake.requests.values()), 0)
+
+        fx.ttl = 0
+        usd = fx.rates(["EUR", "GBP", "JPY"], "USD")
+        self.assertAlmostEqual(usd["EUR"], FX_SPOTS["EURUSD"][1])
+        self.assertAlmostEqual(usd["GBP"], FX_SPOTS["GBPUSD"][1])
+        self.assertIsNone(usd["JPY"])
+        fx.rates(["USD"], "EUR")  # Expired: requoted, but the crosses are known.
+        self.assertEqual(
+            (self.fake.requests["instrument_search"], self.fake.requests["infoprices_list"]), (1, 2)
+        )
+
+    def test_positions_are_converted_to_the_account_currency(self):
+        positions = normalized_positions(self.client)
+        self.assertGreater(len({p.currency for p in positions}), 1)
+        rates = FxRates(self.client).rates({p.currency for p in positions}, "EUR")
+        balance = {"environment": "sim", "currency": "EUR", "net_equity": 0, "cash": None}
+        summary = portfolio_summary(positions, balance, rates)
+        expected = sum(p.market_value * rates[p.currency] for p in positions)
+        self.assertAlmostEqual(summary["net_value"], expected)
+        self.assertEqual(summary["base_currency"], "EUR")
+        self.assertEqual(summary["unconverted_currencies"], [])
+        self.assertNotIn("base_currency", portfolio_summary(positions, balance))
+
+        frame = PositionFrame(positions).convert({"USD": 0.5}, "EUR")
+        for position, value in zip(positions, frame.market_value.tolist(), strict=True):
+            factor = 0.5 if position.currency == "USD" else 1
+            self.assertEqual(value, position.market_value * factor)
+        self.assertEqual(set(frame.unconverted), {p.currency for p in positions} - {"EUR", "USD"})
+
+
+class TestPortfolioCommand(unittest.TestCase):
+    def test_portfolio_totals_are_in_the_account_currency(self):
+        fake = FakeSaxo(positions=8, seed=6, currency="USD")
+        with tempfile.TemporaryDirectory() as directory:
+            params = os.path.join(directory, "params.json")
+            token_file = fake.write_token_file(os.path.join(directory, "tokens.json"))
+            with open(params, "w") as handle:
+                json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+            output = io.StringIO()
+            with (
+                patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+                use_transport(fake.transport()),
+                contextlib.redirect_stdout(output),
+            ):
+                code = main(["--params", params, "portfolio"])
+        self.assertEqual(code, 0)
+        result = json.loads(output.getvalue())
+        self.assertEqual(result["base_currency"], "USD")
+        self.assertEqual(
+            result["fx_rates"],
+            {
+                currency: FX_SPOTS[f"{currency}USD"][1]
+                for currency in {
+                    fake.instruments[row["PositionBase"]["Uic"]]["CurrencyCode"]
+                    for row in fake.positions
+                }
+                - {"USD"}
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
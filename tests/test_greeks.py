@@ -0,0 +1,86 @@
+import math
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+
+from shared import greeks as bs
+
+
+def reference_cdf(value):
+    return 0.5 * math.erfc(-value / math.sqrt(2))
+
+
+class TestGreeks(unittest.TestCase):
+    def setUp(self):
+        self.strike = np.linspace(60, 140, 161)
+        self.volatility = np.linspace(0.1, 0.9, 161)
+        self.is_call = np.arange(161) % 2 == 0
+
+    def test_norm_cdf_matches_erfc(self):
+        values = np.linspace(-8, 8, 161)
+        expected = [reference_cdf(value) for value in values]
+        np.testing.assert_allclose(bs.norm_cdf(values), expected, rtol=1e-8, atol=1e-15)
+
+    def test_put_call_parity_and_black_76(self):
+        args = (100.0, self.strike, 0.5, 0.3)
+        call = bs.price(*args, True, rate=0.04)
+        put = bs.price(*args, False, rate=0.04)
+        np.testing.assert_allclose(call - put, 100 - self.strike * math.exp(-0.02), atol=1e-9)
+        futures_call = bs.price(*args, True, rate=0.04, carry=0.0)
+        futures_put = bs.price(*args, False, rate=0.04, carry=0.0)
+        np.testing.assert_allclose(
+            futures_call - futures_put, (100 - self.strike) * math.exp(-0.02), atol=1e-9
+        )
+
+    def test_implied_volatility_round_trips(self):
+        for carry in (None, 0.0):
+            prices = bs.price(100.0, self.strike, 0.5, self.volatility, self.is_call, 0.03, carry)
+            solved = bs.implied_volatility(
+                prices, 100.0, self.strike, 0.5, self.is_call, 0.03, carry
+            )
+            time_value = np.minimum(
+                bs.price(100.0, self.strike, 0.5, self.volatility, True, 0.03, carry),
+                bs.price(100.0, self.strike, 0.5, self.volatility, False, 0.03, carry),
+            )
+            quoted = time_value > 0.01  # Deeper contracts carry no usable volatility.
+            np.testing.assert_allclose(solved[quoted], self.volatility[quoted], atol=1e-6)
+
+    def test_unattainable_prices_are_nan(self):
+        solved = bs.implied_volatility(
+            [0.0, 19.0, 120.0, 25.0, 25.0], 100.0, 80.0, [0.5, 0.5, 0.5, 0.0, -0.1], True
+        )
+        self.assertTrue(np.isnan(solved).all())  # Zero, below intrinsic, above spot, expired.
+
+    def test_greeks_match_finite_differences(self):
+        args = dict(strike=self.strike, years=0.75, is_call=self.is_call, rate=0.02)
+        values = bs.greeks(100.0, volatility=self.volatility, **args)
+        step = 0.05
+        up = bs.price(100 + step, volatility=self.volatility, **args)
+        down = bs.price(100 - step, volatility=self.volatility, **args)
+        np.testing.assert_allclose(values["delta"], (up - down) / (2 * step), atol=1e-5)
+        np.testing.assert_allclose(
+            values["gamma"], (up - 2 * values["price"] + down) / step**2, atol=1e-3
+        )
+        step = 1e-4
+        vol_up = bs.price(100.0, volatility=self.volatility + step, **args)
+        vol_down = bs.price(100.0, volatility=self.volatility - step, **args)
+        np.testing.assert_allclose(
+            values["vega"], (vol_up - vol_down) / (2 * step) / 100, atol=1e-5
+        )
+        day = 1 / 365
+        later = dict(args, years=0.75 - day)
+        np.testing.assert_allclose(
+            values["theta"],
+            bs.price(100.0, volatility=self.volatility, **later) - values["price"],
+            atol=1e-3,
+        )
+
+    def test_years_to_expiry_counts_to_the_end_of_the_day(self):
+        now = datetime(2030, 1, 18, 12, tzinfo=timezone.utc)
+        years = bs.years_to_expiry(["2030-01-18", "2030-01-19T00:00:00Z", "2030-01-17"], now)
+        np.testing.assert_allclose(years * 365, [0.5, 1.5, -0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
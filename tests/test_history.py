@@ -0,0 +1,151 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from cli.saxocli import main
+from scripts.bench import BenchEnvironment
+from scripts.fake_saxo import FakeSaxo
+from shared.cassette import use_transport
+from shared.history import OrderActivityStore, day_start, parse_bound
+from shared.runtime import create_client, load_runtime_config
+
+
+class TestOrderActivityStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=2, activities=60, activity_days=5, seed=7)
+        self._transport = use_transport(self.fake.transport())
+        self._transport.__enter__()
+        self.addCleanup(self._transport.__exit__, None, None, None)
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with patch.dict(
+            os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+        ):
+            self.config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        self.client = create_client(self.config)
+        self.store = OrderActivityStore(
+            os.path.join(self._directory.name, "history.sqlite3"), self.config.base_url
+        )
+
+    def expected(self, start, end=None):
+        return [
+            row["LogId"]
+            for row in self.fake.activities
+            if parse_bound(row["ActivityTime"]) >= start
+            and (end is None or parse_bound(row["ActivityTime"]) < end)
+        ]
+
+    def test_sync_is_incremental_and_deduplicated(self):
+        today = day_start(date.today())
+
+        self.assertEqual(self.store.sync(self.client), len(self.expected(today)))
+        self.fake.reset_counts()
+        self.assertEqual(self.store.sync(self.client), 0)
+        self.assertEqual(self.fake.requests["order_activities"], 0)  # Throttled.
+
+        instrument = next(iter(self.fake.instruments.values()))
+        self.fake._record_activity(
+            instrument, "1", "Buy", 1, 10.0, "Filled", parse_bound("2100-01-01T00:00:00Z")
+        )
+        self.assertEqual(self.store.sync(self.client, force=True), 1)
+        self.assertEqual(self.store.sync(self.client, force=True), 0)
+        rows = self.store.query(today)
+        self.assertEqual([row["LogId"] for row in rows], self.expected(today))
+        self.assertEqual(rows[0]["ActivityTime"], "2100-01-01T00:00:00.000Z")
+
+    def test_backfill_fetches_uncovered_days_once_with_paging(self):
+        start = day_start(date.today() - timedelta(days=4))
+        today = day_start(date.today())
+        with patch("shared.history.PAGE_SIZE", 3):
+            inserted = self.store.backfill(self.client, start, None)
+
+        self.assertEqual(inserted, len(self.expected(start, today)))
+        self.assertEqual(len(self.store.covered_days()), 4)
+        self.assertGreater(self.fake.requests["order_activities"], 4)
+        self.fake.reset_counts()
+        self.assertEqual(self.store.backfill(self.client, start, None), 0)
+        self.assertEqual(self.fake.requests["order_activities"], 0)
+
+        self.store.refresh(self.client, start)
+        self.assertEqual([row["LogId"] for row in self.store.query(start)], self.expected(start))
+
+    def test_query_filters_by_uic_order_and_status(self):
+        start = day_start(date.today() - timedelta(days=4))
+        self.store.refresh(self.client, start)
+        sample = self.fake.activities[0]
+
+        by_uic = self.store.query(start, uic=sample["Uic"])
+        self.assertTrue(by_uic)
+        self.assertTrue(all(row["Uic"] == sample["Uic"] for row in by_uic))
+        self.assertEqual(
+            [row["LogId"] for row in self.store.query(order_id=sample["OrderId"])],
+            [sample["LogId"]],
+        )
+        filled = self.store.query(start, status="Filled", limit=3)
+        self.assertLessEqual(len(filled), 3)
+        self.assertTrue(all(row["Status"] == "Filled" for row in filled))
+        other = OrderActivityStore(self.store.path, "https://fake/live/openapi")
+        self.assertEqual(other.query(), [])
+
+    def test_parse_bound_treats_end_dates_as_inclusive(self):
+        self.assertEqual(parse_bound("2024-03-01"), day_start(date(2024, 3, 1)))
+        self.assertEqual(parse_bound("2024-03-01", end=True), day_start(date(2024, 3, 2)))
+        with self.assertRaises(ValueError):
+            parse_bound("yesterday")
+
+
+class TestOrderHistoryInterfaces(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_dashboard_history_is_answered_locally(self):
+        with BenchEnvironment(6, activity_days=3) as env:
+            first = env.http.get("/api/order-history?from=" + str(date.today() - timedelta(2)))
+            env.fake.reset_counts()
+            second = env.http.get("/api/order-history?from=" + str(date.today() - timedelta(2)))
+            bad = env.http.get("/api/order-history?from=yesterday")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json, first.json)
+        self.assertEqual(len(first.json["Data"]), 6)
+        self.assertEqual(env.fake.requests["order_activities"], 0)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_cli_order_history_days_and_offline(self):
+        fake = FakeSaxo(positions=2, activities=20, activity_days=3, seed=1)
+        params = os.path.join(self._directory.name, "params.json")
+        token_file = fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+
+        def run(*argv):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(main(["--params", params, "order-history", *argv]), 0)
+            return json.loads(output.getvalue())["order_history"]
+
+        with (
+            patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+            use_transport(fake.transport()),
+        ):
+            rows = run("--days", "3")
+            fake.reset_counts()
+            offline = run("--days", "3", "--offline", "--status", "Filled")
+
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(fake.requests["order_activities"], 0)
+        self.assertEqual(offline, [row for row in rows if row["Status"] == "Filled"])
+        self.assertTrue(
+            os.path.exists(os.path.join(self._directory.name, "order-activity.sqlite3"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
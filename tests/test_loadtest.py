@@ -0,0 +1,59 @@
+import unittest
+
+from scripts.loadtest import parse_args, run
+
+
+class TestLoadTest(unittest.TestCase):
+    def options(self, *extra):
+        return parse_args(
+            [
+                "--tabs",
+                "3",
+                "--duration",
+                "0.4",
+                "--ramp-up",
+                "0.1",
+                "--time-scale",
+                "0.01",
+                "--positions",
+                "12",
+                "--orders",
+                "6",
+                "--sample-interval",
+                "0.05",
+                *extra,
+            ]
+        )
+
+    def test_tabs_follow_the_page_polling_pattern(self):
+        report = run(self.options("--sell-probability", "1", "--cancel-probability", "1"))
+
+        routes = report["inbound"]["routes"]
+        self.assertEqual(routes["/"]["count"], 3)
+        for route in (
+            "/api/status",
+            "/api/positions",
+            "/api/orders",
+            "/api/order-history",
+            "/api/positions/sell",
+            "/api/orders/cancel",
+        ):
+            self.assertIn(route, routes)
+        self.assertGreater(routes["/api/status"]["count"], routes["/api/positions"]["count"])
+        self.assertEqual(report["inbound"]["error_rate"], 0.0)
+        self.assertGreater(report["outbound"]["endpoints"]["place_order"], 0)
+        self.assertGreater(report["outbound"]["per_inbound_request"], 0)
+        self.assertGreaterEqual(report["threads"]["max"], report["threads"]["baseline"])
+
+    def test_dashboard_mode_and_fault_reporting(self):
+        report = run(self.options("--mode", "dashboard", "--fault-rate", "1"))
+
+        routes = report["inbound"]["routes"]
+        self.assertNotIn("/api/positions", routes)
+        self.assertEqual(routes["/api/dashboard"]["error_rate"], 1.0)
+        self.assertIn("502", routes["/api/dashboard"]["statuses"])
+        self.assertEqual(routes["/api/status"]["errors"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
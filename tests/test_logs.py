@@ -0,0 +1,111 @@
+import importlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from shared import logs
+from shared.logs import LazyJson, RotatingJsonlHandler, install_queue_logging
+
+web_module = importlib.import_module("web.app")
+
+
+class SlowHandler(logging.Handler):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append(self.format(record))
+        self.threads.append(threading.current_thread())
+
+
+class TestQueueLogging(unittest.TestCase):
+    def test_slow_handlers_do_not_block_and_formatting_is_deferred(self):
+        logger = logging.getLogger("tests.logs.queue")
+        logger.propagate = False
+        self.addCleanup(logger.handlers.clear)
+        handler = SlowHandler(0.2)
+        listener = install_queue_logging(logger, [handler], level=logging.INFO)
+        self.assertIs(install_queue_logging(logger, [SlowHandler(0)]), listener)
+        self.assertEqual(len(logger.handlers), 1)
+
+        started = time.perf_counter()
+        logger.info("order %s", LazyJson({"b": 2, "a": 1}))
+        logger.debug("dropped %s", LazyJson({"never": "serialized"}))
+        elapsed = time.perf_counter() - started
+        listener.stop()
+
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(handler.messages, ['order {"a": 1, "b": 2}'])
+        self.assertIsNot(handler.threads[0], threading.current_thread())
+
+
+class TestRotatingJsonlHandler(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.path = os.path.join(self._directory.name, "audit", "orders.jsonl")
+
+    def record(self, **audit):
+        record = logging.LogRecord("audit", logging.INFO, __file__, 1, "msg", (), None)
+        record.audit = audit
+        return record
+
+    def test_rotates_on_size_and_keeps_the_newest_backups(self):
+        handler = RotatingJsonlHandler(self.path, max_bytes=200, backup_count=2)
+        self.addCleanup(handler.close)
+        for index in range(12):
+            handler.handle(self.record(activity="list", index=index))
+
+        backups = handler.rotated_files()
+        self.assertEqual(len(backups), 2)
+        self.assertTrue(all(os.path.getsize(path) <= 200 for path in [self.path, *backups]))
+        with open(self.path, encoding="utf-8") as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual(rows[-1]["index"], 11)
+        self.assertEqual(rows[-1]["activity"], "list")
+        self.assertEqual(rows[-1]["level"], "INFO")
+
+    def test_rotates_when_the_interval_has_passed(self):
+        handler = RotatingJsonlHandler(self.path, max_bytes=0, rotate_seconds=60)
+        self.addCleanup(handler.close)
+        handler.handle(self.record(index=1))
+        with patch.object(logs.time, "time", return_value=time.time() + 61):
+            handler.handle(self.record(index=2))
+
+        self.assertEqual(len(handler.rotated_files()), 1)
+        with open(self.path, encoding="utf-8") as handle:
+            self.assertEqual([json.loads(line)["index"] for line in handle], [2])
+
+
+class TestOrderAudit(unittest.TestCase):
+    def test_order_activity_reaches_the_jsonl_trail(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = RotatingJsonlHandler(os.path.join(directory, "audit.jsonl"))
+            audit = web_module.audit_logger
+            previous = audit.level
+            audit.setLevel(logging.INFO)
+            audit.addHandler(handler)
+            try:
+                web_module._log_order_activity("sell_requested", payload={"uic": 211})
+            finally:
+                audit.removeHandler(handler)
+                audit.setLevel(previous)
+                handler.close()
+            with open(handler.baseFilename, encoding="utf-8") as handle:
+                row = json.loads(handle.readline())
+
+        self.assertEqual(row["activity"], "sell_requested")
+        self.assertEqual(row["payload"], {"uic": 211})
+
+
+if __name__ == "__main__":
+    unittest.main()
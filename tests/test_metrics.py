@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from scripts.fake_saxo import FakeSaxo
+from shared import client as client_module
+from shared.cassette import use_transport
+from shared.client import RateLimitError, SaxoClient, _endpoint_label
+from shared.metrics import Registry
+
+
+class TestRegistry(unittest.TestCase):
+    def test_renders_counters_gauges_and_histograms(self):
+        registry = Registry()
+        requests = registry.counter("app_requests", "Requests.", ("route",))
+        in_flight = registry.gauge("app_in_flight", "In flight.")
+        latency = registry.histogram("app_latency_seconds", "Latency.", buckets=(0.1, 1))
+        requests.labels(route='/a"b\\c').inc()
+        requests.labels(route='/a"b\\c').inc(2)
+        in_flight.set_function(lambda: 3)
+        latency.observe(0.05)
+        latency.observe(0.1)
+        latency.observe(5)
+
+        text = registry.render()
+
+        self.assertIn("# TYPE app_requests counter\n", text)
+        self.assertIn('app_requests_total{route="/a\\"b\\\\c"} 3\n', text)
+        self.assertIn("app_in_flight 3\n", text)
+        self.assertIn('app_latency_seconds_bucket{le="0.1"} 2\n', text)
+        self.assertIn('app_latency_seconds_bucket{le="1"} 2\n', text)
+        self.assertIn('app_latency_seconds_bucket{le="+Inf"} 3\n', text)
+        self.assertIn("app_latency_seconds_sum 5.15\n", text)
+        self.assertIn("app_latency_seconds_count 3\n", text)
+
+    def test_registration_is_idempotent_and_validates_labels(self):
+        registry = Registry()
+        counter = registry.counter("app_total", "Total.", ("a",))
+        self.assertIs(registry.counter("app_total", "Total.", ("a",)), counter)
+        with self.assertRaises(ValueError):
+            registry.gauge("app_total", "Total.", ("a",))
+        with self.assertRaises(ValueError):
+            counter.labels("x", "y")
+        with self.assertRaises(ValueError):
+            counter.labels("x").inc(-1)
+
+
+class TestClientMetrics(unittest.TestCase):
+    def test_endpoint_label_collapses_identifiers(self):
+        self.assertEqual(
+            _endpoint_label("/ref/v1/instruments/details/211/Stock"),
+            "/ref/v1/instruments/details/{id}/Stock",
+        )
+        self.assertEqual(
+            _endpoint_label("/trade/v2/orders/5001,5002/?AccountKey=abc"),
+            "/trade/v2/orders/{id}/",
+        )
+        self.assertEqual(_endpoint_label("/port/v1/positions/me"), "/port/v1/positions/me")
+
+    def test_requests_record_latency_status_bytes_and_rate_limits(self):
+        fake = FakeSaxo(positions=2, rate_limit=2)
+        with tempfile.TemporaryDirectory() as directory:
+            saxo = SaxoClient(
+                client_id="client",
+                redirect_uri="https://example.invalid/callback",
+                auth_endpoint="https://fake/authorize",
+                token_endpoint="https://fake/token",
+                token_file=fake.write_token_file(os.path.join(directory, "tokens.json")),
+                baseurl="https://fake/sim/openapi",
+            )
+            endpoint, env = "/port/v1/positions/me", "https://fake/sim/openapi"
+            responses = client_module.API_RESPONSES
+            ok = responses.labels(env, "GET", endpoint, 200).value
+            limited = client_module.API_RATE_LIMITED.labels(env, endpoint).value
+            received = client_module.API_BYTES.labels(env, "received").value
+            observed = client_module.API_LATENCY.labels(env, "GET", endpoint).count
+
+            with use_transport(fake.transport()):
+                saxo.get_positions()
+                saxo.get_positions()
+                with self.assertRaises(RateLimitError):
+                    saxo.get_positions()
+
+        self.assertEqual(responses.labels(env, "GET", endpoint, 200).value, ok + 2)
+        self.assertEqual(client_module.API_RATE_LIMITED.labels(env, endpoint).value, limited + 1)
+        self.assertEqual(client_module.API_LATENCY.labels(env, "GET", endpoint).count, observed + 3)
+        self.assertGreater(client_module.API_BYTES.labels(env, "received").value, received)
+        remaining = client_module.API_RATE_LIMIT_REMAINING.labels(env, "session").value
+        self.assertEqual(remaining, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,309 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from cli.saxocli import main
+from scripts.fake_saxo import FakeSaxo
+from shared import greeks as bs
+from shared.cassette import use_transport
+from shared.domain import roll_analysis
+from shared.options import OptionChain, OptionChainCache, roll_candidates, screen_rolls
+
+
+def option_space():
+    options = [
+        {"Uic": uic, "StrikePrice": strike, "PutCall": put_call}
+        for uic, (strike, put_call) in enumerate(
+            [(strike, side) for strike in (90.0, 95.0, 100.0, 105.0) for side in ("Call", "Put")],
+            start=1,
+        )
+    ]
+    return {
+        "OptionRootId": 7,
+        "UnderlyingUic": 21,
+        "CurrencyCode": "USD",
+        "OptionSpace": [
+            {"Expiry": "2030-02-15", "SpecificOptions": options[2:]},
+            {"Expiry": "2030-01-18", "SpecificOptions": options},
+            {"Expiry": "2030-03-15"},
+        ],
+    }
+
+
+class TestOptionChain(unittest.TestCase):
+    def test_axes_selection_and_contract_lookup(self):
+        chain = OptionChain.from_option_space(option_space())
+
+        self.assertEqual(chain.expiries, ["2030-01-18", "2030-02-15", "2030-03-15"])
+        self.assertEqual(chain.strikes.tolist(), [90.0, 95.0, 100.0, 105.0])
+        self.assertEqual(chain.uics.shape, (3, 4, 2))
+        self.assertEqual(len(chain), 14)
+        rows = chain.rows(chain.select(min_strike=94, max_strike=100, put_call="put"))
+        self.assertEqual(
+            [(row["expiry"], row["strike"], row["uic"]) for row in rows],
+            [
+                ("2030-01-18", 95.0, 4),
+                ("2030-01-18", 100.0, 6),
+                ("2030-02-15", 95.0, 4),
+                ("2030-02-15", 100.0, 6),
+            ],
+        )
+        self.assertEqual(len(chain.select("2030-02-15")), 6)
+        self.assertEqual(len(chain.select(min_strike=106)), 0)
+        (row,) = chain.rows([chain.contract("2030-01-18", 105, "call")])
+        self.assertEqual((row["uic"], row["bid"]), (7, None))
+        with self.assertRaises(LookupError):
+            chain.contract("2030-02-15", 90, "call")
+        with self.assertRaises(LookupError):
+            chain.contract("2030-01-18", 97.5, "call")
+        with self.assertRaises(LookupError):
+            chain.select("2031-01-17")
+
+    def test_cache_round_trip_and_expiry(self):
+        chain = OptionChain.from_option_space(option_space())
+        chain.bid.flat[chain.contract("2030-01-18", 100, "call")] = 1.25
+        with tempfile.TemporaryDirectory() as directory:
+            cache = OptionChainCache(directory, "https://fake/sim/openapi", ttl=60)
+            cache.save(chain)
+            loaded = cache.load(7)
+            self.assertEqual(loaded.expiries, chain.expiries)
+            self.assertEqual(loaded.uics.tolist(), chain.uics.tolist())
+            self.assertEqual(loaded.rows([5]), chain.rows([5]))
+            self.assertEqual((loaded.underlying_uic, loaded.currency), (21, "USD"))
+            self.assertEqual(
+                (loaded.asset_type, loaded.underlying_asset_type), ("StockOption", "Stock")
+            )
+            self.assertIsNone(OptionChainCache(directory, "https://fake/live/openapi").load(7))
+            self.assertIsNone(OptionChainCache(directory, cache.environment, ttl=0).load(7))
+
+    def test_contracts_and_underlying_are_quoted_as_the_root_asset_type(self):
+        space = {**option_space(), "AssetType": "FuturesOption"}
+        space["UnderlyingAssetType"] = "ContractFutures"
+        chain = OptionChain.from_option_space(space)
+        client = MagicMock()
+        client.get_quotes.return_value = []
+        client.get_quote.return_value = {"Quote": {"Mid": 100.0}}
+        chain.quote(client, chain.select("2030-01-18")).quote_underlying(client)
+        self.assertEqual(client.get_quotes.call_args.kwargs["asset_type"], "FuturesOption")
+        client.get_quote.assert_called_once_with(21, "ContractFutures")
+        self.assertEqual(chain.spot, 100.0)
+
+        index_options = OptionChain.from_option_space(option_space(), "StockIndexOption")
+        self.assertEqual(
+            (index_options.asset_type, index_options.underlying_asset_type),
+            ("StockIndexOption", "StockIndex"),
+        )
+
+    def test_analyze_recomputes_only_changed_quotes(self):
+        chain = OptionChain.from_option_space(option_space())
+        now = datetime(2029, 12, 1, tzinfo=timezone.utc)
+        indices = chain.select()
+        expiry, strike, side = np.unravel_index(indices, chain.uics.shape)
+        years = bs.years_to_expiry(chain.expiries, now)[expiry]
+        chain.mid.flat[indices] = bs.price(100.0, chain.strikes[strike], years, 0.3, side == 0)
+        chain.updated.flat[indices] = 1.0
+        chain.spot, chain.spot_updated = 100.0, 1.0
+
+        chain.analyze(indices, rate=0.0, now=now)
+        np.testing.assert_allclose(chain.greeks[0].flat[indices], 0.3, atol=1e-6)
+        first, second = indices[:2]
+        chain.mid.flat[[first, second]] *= 1.2
+        chain.updated.flat[second] = 2.0
+        chain.analyze(indices, rate=0.0, now=now)
+        self.assertAlmostEqual(chain.greeks[0].flat[first], 0.3, places=6)  # Same quote time.
+        self.assertGreater(chain.greeks[0].flat[second], 0.3)
+        chain.spot_updated = 2.0
+        chain.analyze(indices, rate=0.0, now=now)
+        self.assertGreater(chain.greeks[0].flat[first], 0.3)
+        (row,) = chain.rows([second])
+        self.assertEqual(row["iv"], chain.greeks[0].flat[second])
+        self.assertLess(row["delta"], 1)
+
+
+class TestRollScreener(unittest.TestCase):
+    def setUp(self):
+        self.chain = OptionChain.from_option_space(option_space())
+        rng = np.random.default_rng(3)
+        self.chain.bid[:] = rng.uniform(0.5, 5.0, self.chain.uics.shape).round(2)
+        self.chain.ask[:] = self.chain.bid + 0.1
+        self.chain.bid[1, 3, 0] = np.nan  # An unquoted candidate is skipped.
+        self.existing = self.chain.contract("2030-01-18", 95, "call")
+
+    def test_matches_pairwise_roll_analysis(self):
+        today = date(2029, 12, 1)
+        evaluated, rows = screen_rolls(
+            self.chain, self.existing, 2, sort="conservative", today=today
+        )
+        existing = self.chain.rows([self.existing])[0]
+        expected = []
+        for index in roll_candidates(self.chain, self.existing):
+            new = self.chain.rows([index])[0]
+            if index == self.existing or new["bid"] is None:
+                continue
+            expected.append(roll_analysis(existing, new, 2))
+        expected.sort(key=lambda row: -row["conservative_net_credit"])
+
+        self.assertEqual(evaluated, len(expected))
+        self.assertEqual(evaluated, 5)  # Three other January calls, two quoted February ones.
+        for row, reference in zip(rows, expected, strict=True):
+            self.assertEqual(row["new_option"], reference["new_option"])
+            for key in ("conservative_net_credit", "midpoint_net_credit", "strike_increase"):
+                self.assertAlmostEqual(row[key], reference[key])
+        feb = next(row for row in rows if row["new_option"]["expiry"] == "2030-02-15")
+        self.assertEqual(feb["days_added"], 28)
+        self.assertAlmostEqual(
+            feb["annualized_credit"],
+            feb["conservative_net_credit"] / (feb["new_option"]["strike"] * 200) * 365 / 28,
+        )
+
+    def test_filters_limit_and_missing_quotes(self):
+        _, rows = screen_rolls(
+            self.chain, self.existing, min_strike=100, max_expiry="2030-01-31", limit=1
+        )
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["new_option"]["expiry"], "2030-01-18")
+        self.assertGreaterEqual(rows[0]["new_option"]["strike"], 100)
+        evaluated, rows = screen_rolls(self.chain, self.existing, min_credit=1e9)
+        self.assertEqual((evaluated, rows), (0, []))
+        self.chain.ask.flat[self.existing] = np.nan
+        with self.assertRaises(LookupError):
+            screen_rolls(self.chain, self.existing)
+
+
+class TestOptionCommands(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=2, option_roots=2, option_expiries=3, seed=4)
+        params = os.path.join(self._directory.name, "params.json")
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+        self.params = params
+        self.root = next(iter(self.fake.option_roots.values()))
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with (
+            patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+            contextlib.redirect_stdout(output),
+        ):
+            code = main(["--params", self.params, *argv])
+        return code, json.loads(output.getvalue())
+
+    def test_chain_is_fetched_once_and_quoted_in_bulk(self):
+        symbol = self.root["Underlying"]["Symbol"]
+        expiry = self.root["Expiries"][1].isoformat()
+        strikes = self.root["Strikes"]
+        with use_transport(self.fake.transport()):
+            code, chain = self.run_cli("options", symbol)
+            self.assertEqual(code, 0)
+            self.assertEqual(self.fake.requests["option_space"], 1)
+            self.assertEqual(self.fake.requests["infoprices_list"], 1)
+            self.assertEqual(chain["asset_type"], "StockOption")
+            self.assertEqual(len(chain["contracts"]), 3 * len(strikes) * 2)
+            self.assertTrue(all(row["bid"] is not None for row in chain["contracts"]))
+            # Quotes are rounded to cents, so only near-the-money contracts recover it closely.
+            solved = [row["iv"] for row in chain["contracts"] if row["iv"] is not None]
+            self.assertGreater(len(solved), len(chain["contracts"]) // 2)
+            self.assertAlmostEqual(np.median(solved), self.root["_volatility"], delta=0.02)
+
+            self.fake.reset_counts()
+            code, puts = self.run_cli(
+                "options",
+                symbol,
+                "--expiry",
+                expiry,
+                "--type",
+                "put",
+                "--min-strike",
+                str(strikes[2]),
+                "--max-strike",
+                str(strikes[5]),
+            )
+            code, single = self.run_cli(
+                "option", symbol, "--expiry", expiry, "--strike", str(strikes[3]), "--type", "call"
+            )
+            _, missing = self.run_cli(
+                "option", symbol, "--expiry", expiry, "--strike", "0.01", "--type", "call"
+            )
+
+        self.assertEqual(self.fake.requests["option_space"], 0)  # Served from the cache.
+        self.assertEqual(self.fake.requests["infoprices_list"], 2)
+        self.assertEqual([row["strike"] for row in puts["contracts"]], strikes[2:6])
+        self.assertEqual({row["put_call"] for row in puts["contracts"]}, {"Put"})
+        contract = self.fake.option_contracts[single["uic"]]
+        self.assertEqual((contract["_strike"], contract["_put_call"]), (strikes[3], "Call"))
+        self.assertLess(single["bid"], single["ask"])
+        self.assertEqual(missing["error"]["code"], "instrument_not_found")
+
+    def test_roll_command(self):
+        symbol = self.root["Underlying"]["Symbol"]
+        expiry = self.root["Expiries"][0].isoformat()
+        strike = self.root["Strikes"][10]
+        with use_transport(self.fake.transport()):
+            code, result = self.run_cli(
+                "roll",
+                symbol,
+                "--expiry",
+                expiry,
+                "--strike",
+                str(strike),
+                "--type",
+                "call",
+                "--min-strike",
+                str(strike),
+                "--limit",
+                "5",
+            )
+
+        self.assertEqual(code, 0)
+        self.assertEqual(self.fake.requests["option_space"], 1)
+        self.assertEqual(self.fake.requests["infoprices_list"], 1)
+        self.assertEqual(result["existing_option"]["strike"], strike)
+        self.assertEqual(result["evaluated"], 3 * (len(self.root["Strikes"]) - 10) - 1)
+        self.assertEqual(len(result["rolls"]), 5)
+        credits = [row["annualized_credit"] for row in result["rolls"]]
+        self.assertEqual(credits, sorted(credits, reverse=True))
+        existing_delta = result["existing_option"]["delta"]
+        for row in result["rolls"]:
+            self.assertAlmostEqual(
+                row["position_delta_change"], (existing_delta - row["new_option"]["delta"]) * 100
+            )
+
+    def test_portfolio_reports_option_greeks(self):
+        fake = FakeSaxo(positions=2, option_roots=1, option_positions=3, seed=4)
+        with use_transport(fake.transport()):
+            code, portfolio = self.run_cli("portfolio")
+
+        self.assertEqual(code, 0)
+        # All underlyings in one request, the FX crosses in another.
+        self.assertEqual(fake.requests["infoprices_list"], 2)
+        greeks = portfolio["option_greeks"]
+        self.assertEqual(len(greeks["positions"]), 3)
+        root = next(iter(fake.option_roots.values()))
+        for row in greeks["positions"]:
+            contract = fake.option_contracts[row["uic"]]
+            self.assertEqual(
+                (row["strike"], row["put_call"]), (contract["_strike"], contract["_put_call"])
+            )
+            self.assertEqual(row["underlying_uic"], root["Underlying"]["Uic"])
+            self.assertEqual(row["underlying_price"], root["Underlying"]["_price"])
+            if row["iv"] is not None:
+                self.assertAlmostEqual(row["iv"], root["_volatility"], delta=0.1)
+                self.assertAlmostEqual(row["position_delta"], row["delta"] * row["quantity"] * 100)
+        self.assertTrue(any(row["iv"] is not None for row in greeks["positions"]))
+        (total,) = greeks["totals"].values()
+        vegas = [row["position_vega"] or 0 for row in greeks["positions"]]
+        self.assertAlmostEqual(total["vega"], sum(vegas))
+
+
+if __name__ == "__main__":
+    unittest.main()
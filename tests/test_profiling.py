@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import unittest
+from concurrent.futures import wait
+from unittest.mock import patch
+
+from cli.saxocli import main, parse_args
+from scripts.bench import BenchEnvironment
+from scripts.fake_saxo import FakeSaxo
+from shared.cassette import use_transport
+from shared.profiling import Profiler
+from shared.tracing import TracingExecutor
+
+COLLAPSED_LINE = re.compile(r"^\S.* \d+$")
+
+
+def busy(n):
+    return sum(index * index for index in range(n))
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_cpu_profile_includes_executor_work_and_writes_files(self):
+        with TracingExecutor(max_workers=2) as executor:
+            with Profiler("cpu") as profiler:
+                wait([executor.submit(busy, 20000) for _ in range(4)])
+
+        self.assertIn("busy", profiler.report())
+        collapsed = profiler.collapsed()
+        self.assertTrue(collapsed)
+        self.assertTrue(all(COLLAPSED_LINE.match(line) for line in collapsed))
+        self.assertTrue(any("busy (test_profiling.py" in line for line in collapsed))
+        prefix = os.path.join(self._directory.name, "nested", "run")
+        native, stacks = profiler.write(prefix)
+        self.assertEqual(native, prefix + ".pstats")
+        self.assertEqual(stacks, prefix + ".collapsed")
+        names = {function[2] for function in pstats.Stats(native).stats}
+        self.assertIn("busy", names)
+
+    def test_memory_profile_reports_allocation_sites(self):
+        with Profiler("mem") as profiler:
+            retained = [str(index) * 10 for index in range(5000)]
+
+        self.assertEqual(len(retained), 5000)
+        self.assertIn("test_profiling.py", profiler.report())
+        self.assertTrue(all(COLLAPSED_LINE.match(line) for line in profiler.collapsed()))
+        native, _ = profiler.write(os.path.join(self._directory.name, "mem"))
+        self.assertTrue(native.endswith(".tracemalloc"))
+        with self.assertRaises(ValueError):
+            Profiler("wall")
+
+    def test_cli_profile_option(self):
+        self.assertEqual(parse_args(["--profile", "positions"]).profile, "cpu")
+        self.assertEqual(parse_args(["--profile", "mem", "positions"]).profile, "mem")
+        self.assertIsNone(parse_args(["positions"]).profile)
+
+        fake = FakeSaxo(positions=3)
+        params = os.path.join(self._directory.name, "params.json")
+        token_file = fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+        prefix = os.path.join(self._directory.name, "positions")
+        stderr = io.StringIO()
+
+        with (
+            patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+            use_transport(fake.transport()),
+            contextlib.redirect_stdout(io.StringIO()),
+            contextlib.redirect_stderr(stderr),
+        ):
+            code = main(["--params", params, "--profile", "--profile-output", prefix, "positions"])
+
+        self.assertEqual(code, 0)
+        self.assertIn(prefix + ".pstats", stderr.getvalue())
+        with open(prefix + ".collapsed", encoding="utf-8") as handle:
+            self.assertIn("get_positions", handle.read())
+
+
+class TestRequestProfile(unittest.TestCase):
+    def test_dev_server_returns_the_profile_of_one_request(self):
+        with BenchEnvironment(5) as env:
+            report = env.http.get("/api/dashboard?profile=1")
+            collapsed = env.http.get("/api/dashboard?profile=1&profile_format=collapsed")
+            memory = env.http.get("/api/dashboard?profile=mem")
+            normal = env.http.get("/api/dashboard")
+
+        self.assertEqual(report.content_type, "text/plain; charset=utf-8")
+        text = report.get_data(as_text=True)
+        self.assertTrue(text.startswith("GET /api/dashboard?profile=1 -> 200"))
+        self.assertIn("make_position", text)
+        lines = collapsed.get_data(as_text=True).splitlines()
+        self.assertTrue(lines and all(COLLAPSED_LINE.match(line) for line in lines))
+        self.assertIn("allocation sites", memory.get_data(as_text=True))
+        self.assertEqual(normal.content_type, "application/json")
+
+    def test_profile_parameter_is_ignored_outside_dev_mode(self):
+        with BenchEnvironment(2) as env:
+            state = env.app.extensions["saxo"]
+            state.dev_mode, state.web_secret = False, "s3cret"
+            response = env.http.get("/api/dashboard?profile=1&secret=s3cret")
+
+        self.assertEqual(response.content_type, "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cli.saxocli import main
+from scripts.fake_saxo import FakeSaxo
+from shared.cassette import use_transport
+
+
+class TestQuoteCommand(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeSaxo(positions=40, seed=8)
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = self._directory.name
+        self.params = os.path.join(self.directory, "params.json")
+        token_file = self.fake.write_token_file(os.path.join(self.directory, "tokens.json"))
+        with open(self.params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+        self.instruments = list(self.fake.instruments.values())[:30]
+
+    def quote(self, *options):
+        output = io.StringIO()
+        with (
+            patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+            use_transport(self.fake.transport()),
+            contextlib.redirect_stdout(output),
+        ):
+            code = main(["--params", self.params, "quote", *options])
+        return code, output.getvalue()
+
+    def test_watchlist_is_resolved_once_and_quoted_in_bulk(self):
+        symbols = [instrument["Symbol"] for instrument in self.instruments]
+        watchlist = os.path.join(self.directory, "watchlist.txt")
+        with open(watchlist, "w") as handle:
+            handle.write("# Watchlist\n" + ", ".join(symbols[10:]) + "  # the rest\n\n")
+
+        code, output = self.quote(*symbols[:10], "NOSUCH", "--from-file", watchlist)
+        self.assertEqual(code, 0)
+        rows = json.loads(output)
+        self.assertEqual([row["symbol"] for row in rows], [*symbols[:10], "NOSUCH", *symbols[10:]])
+        self.assertEqual(rows[10]["error"]["code"], "instrument_not_found")
+        for row, instrument in zip(rows[:10], self.instruments, strict=False):
+            self.assertEqual(row["mid"], instrument["_price"])
+            self.assertEqual(row["currency"], instrument["CurrencyCode"])
+        asset_types = {instrument["AssetType"] for instrument in self.instruments}
+        self.assertEqual(self.fake.requests["instrument_search"], 31)
+        self.assertEqual(self.fake.requests["infoprices_list"], len(asset_types))
+        self.assertEqual(self.fake.requests["infoprices"], 0)
+
+        self.fake.reset_counts()
+        code, output = self.quote("--from-file", watchlist, "--ndjson")
+        lines = output.splitlines()
+        self.assertEqual([json.loads(line)["symbol"] for line in lines], symbols[10:])
+        self.assertEqual(self.fake.requests["instrument_search"], 0)  # All cached.
+
+    def test_single_symbol_keeps_the_object_output(self):
+        instrument = self.instruments[0]
+        code, output = self.quote(instrument["Symbol"])
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(output)["bid"], round(instrument["_price"] * 0.999, 2))
+        self.assertEqual(self.quote("NOSUCH")[0], 3)
+        self.assertEqual(self.quote()[0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
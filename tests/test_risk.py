@@ -0,0 +1,146 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from statistics import NormalDist
+from unittest.mock import patch
+
+import numpy as np
+
+from cli.saxocli import main
+from scripts.fake_saxo import FakeSaxo
+from shared.bars import BAR_DTYPE, BarStore
+from shared.cassette import use_transport
+from shared.risk import CovarianceCache, align_closes, parse_confidence, portfolio_risk
+from shared.runtime import create_client, load_runtime_config
+from shared.snapshots import normalized_positions
+
+DAY = 86400
+
+
+def series(times, closes):
+    bars = np.zeros(len(times), BAR_DTYPE)
+    bars["time"], bars["close"] = times, closes
+    return bars
+
+
+class TestAlignment(unittest.TestCase):
+    def test_union_of_dates_is_forward_filled(self):
+        dates, closes = align_closes(
+            [series([1, 2, 4], [10, 11, 12]), series([2, 3, 5], [20, 21, 22])], 1, 5
+        )
+        self.assertEqual(dates.tolist(), [1, 2, 3, 4])
+        np.testing.assert_array_equal(closes, [[10, np.nan], [11, 20], [11, 21], [12, 21]])
+        self.assertEqual(parse_confidence("99"), 0.99)
+        with self.assertRaises(ValueError):
+            parse_confidence("1.5%")
+
+
+class TestPortfolioRisk(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.fake = FakeSaxo(positions=6, option_roots=1, option_positions=1, seed=11)
+        self._transport = use_transport(self.fake.transport())
+        self._transport.__enter__()
+        self.addCleanup(self._transport.__exit__, None, None, None)
+        token_file = self.fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with patch.dict(
+            os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+        ):
+            config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        self.client = create_client(config)
+        self.store = BarStore(os.path.join(self._directory.name, "bars"), config.base_url)
+        self.cache = CovarianceCache(os.path.join(self._directory.name, "covariance"))
+        self.positions = normalized_positions(self.client)
+        self.now = self.fake._bars_until
+
+    def test_matches_a_per_day_revaluation(self):
+        result = portfolio_risk(
+            self.positions, self.store, self.client, window=60, cache=self.cache, now=self.now
+        )
+        self.assertEqual(result["observations"], 60)
+        self.assertEqual(len(result["positions"]), 6)
+        self.assertEqual([row["asset_type"] for row in result["unmodeled"]], ["StockOption"])
+
+        # Replay today's market values over the last 60 completed days.
+        end = self.now // DAY * DAY
+        pnl = np.zeros(60)
+        exposures = []
+        for position in self.positions[:6]:
+            times, rows = self.fake.bars(position.uic, 1440)
+            closes = [row["Close"] for time, row in zip(times, rows, strict=True) if time < end]
+            returns = np.array(closes[-60:]) / np.array(closes[-61:-1]) - 1
+            pnl += returns * position.market_value
+            exposures.append(returns)
+        historical = -np.quantile(pnl, 0.05)
+        self.assertAlmostEqual(result["var"]["0.95"]["historical"], historical)
+        tail = pnl <= np.quantile(pnl, 0.05)
+        self.assertAlmostEqual(
+            result["expected_shortfall"]["0.95"]["historical"], -pnl[tail].mean()
+        )
+        values = np.array([position.market_value for position in self.positions[:6]])
+        volatility = np.sqrt(values @ np.cov(np.array(exposures)) @ values)
+        self.assertAlmostEqual(
+            result["var"]["0.99"]["parametric"], NormalDist().inv_cdf(0.99) * volatility
+        )
+        self.assertAlmostEqual(
+            sum(row["var_contribution"] for row in result["positions"]),
+            result["var"]["0.95"]["parametric"],
+        )
+        self.assertAlmostEqual(
+            sum(row["tail_loss"] for row in result["positions"]),
+            result["expected_shortfall"]["0.95"]["historical"],
+        )
+        matrix = np.array(result["correlation"]["matrix"])
+        np.testing.assert_allclose(np.diag(matrix), 1.0)
+        self.assertTrue((matrix[~np.eye(len(matrix), dtype=bool)] > 0).any())  # Market factor.
+
+    def test_cached_covariance_and_stored_bars_are_reused(self):
+        first = portfolio_risk(
+            self.positions, self.store, self.client, window=60, cache=self.cache, now=self.now
+        )
+        self.fake.reset_counts()
+        with patch("shared.risk._returns", side_effect=AssertionError("not cached")):
+            again = portfolio_risk(
+                self.positions, self.store, self.client, window=60, cache=self.cache, now=self.now
+            )
+        self.assertEqual(again["var"], first["var"])
+        self.assertEqual(self.fake.requests["chart"], 0)  # Every completed day is stored.
+
+
+class TestRiskCommand(unittest.TestCase):
+    def test_risk_command(self):
+        fake = FakeSaxo(positions=4, seed=4)
+        with tempfile.TemporaryDirectory() as directory:
+            params = os.path.join(directory, "params.json")
+            token_file = fake.write_token_file(os.path.join(directory, "tokens.json"))
+            with open(params, "w") as handle:
+                json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+
+            def risk(*options):
+                output = io.StringIO()
+                with (
+                    patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+                    use_transport(fake.transport()),
+                    contextlib.redirect_stdout(output),
+                ):
+                    code = main(["--params", params, "risk", *options])
+                return code, json.loads(output.getvalue())
+
+            code, result = risk("--window", "100", "--confidence", "0.9")
+            self.assertEqual(code, 0)
+            self.assertEqual((result["observations"], list(result["var"])), (100, ["0.9"]))
+            self.assertEqual(len(result["correlation"]["symbols"]), 4)
+            self.assertGreater(result["var"]["0.9"]["historical"], 0)
+            fake.reset_counts()
+            code, offline = risk("--window", "100", "--confidence", "0.9", "--offline")
+            self.assertEqual(offline["var"], result["var"])
+            self.assertEqual(fake.requests["chart"], 0)
+            self.assertEqual(risk("--confidence", "2")[0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from unittest.mock import MagicMock, patch
 
 from shared.runtime import (
     AuthenticationSession,
+    ClientManager,
     create_client,
     ensure_authenticated,
     load_runtime_config,
@@ -69,18 +70,14 @@ class TestRuntimeHelpers(unittest.TestCase):
 
     def test_authentication_session_serve_worker_lifecycle(self):
         client = MagicMock()
-        fake_thread = MagicMock()
-        fake_thread.is_alive.return_value = True
-
-        with patch("shared.runtime.threading.Thread", return_value=fake_thread) as thread_cls:
-            session = AuthenticationSession(client, refresh_interval_seconds=23)
-            session.start_refresh()
-            session.close()
-
-        thread_cls.assert_called_once()
-        self.assertEqual(thread_cls.call_args.kwargs["name"], "saxo-token-refresh")
-        fake_thread.start.assert_called_once_with()
-        fake_thread.join.assert_called_once_with()
+
+        session = AuthenticationSession(client, refresh_interval_seconds=23)
+        session.start_refresh()
+        session.start_refresh()
+        session.close()
+
+        client.start_refresh_thread.assert_called_once_with(23)
+        client.stop_refresh_thread.assert_called_once_with()
         client.ensure_access_token.assert_called_once_with()
 
     @patch("shared.runtime.SaxoClient")
@@ -103,6 +100,7 @@ class TestRuntimeHelpers(unittest.TestCase):
             token_endpoint="token-endpoint",
             token_file="tokens.json",
             baseurl="base-url",
+            environment=None,
         )
 
     def test_ensure_authenticated_skips_when_client_ready(self):
@@ -190,5 +188,65 @@ class TestRuntimeHelpers(unittest.TestCase):
         self.assertTrue(config.trading_enabled)
 
 
+class TestClientManager(unittest.TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as params_file:
+            json.dump(
+                {
+                    "TRADING_ENABLED": True,
+                    "ENVIRONMENTS": {
+                        "live": {"TRADING_ENABLED": False},
+                        "sim-2": {"SIMULATION_MODE": True, "TOKEN_FILE": "tokens-sim-2.json"},
+                    },
+                },
+                params_file,
+            )
+        self.params_path = params_file.name
+        self.addCleanup(os.unlink, self.params_path)
+
+    @patch("shared.runtime.SaxoClient")
+    def test_from_params_isolates_environments(self, client_cls):
+        client_cls.side_effect = lambda **kwargs: MagicMock(token_file=kwargs["token_file"])
+        with patch.dict(os.environ, {"TOKEN_FILE": "shared.json"}):
+            manager = ClientManager.from_params(["sim", "live", "sim-2"], self.params_path)
+
+        self.assertEqual(manager.names(), ["sim", "live", "sim-2"])
+        self.assertEqual(manager.default, "sim")
+        sim, live, sim2 = (manager.get(name) for name in manager.names())
+        self.assertTrue(sim.config.simulation_mode)
+        self.assertFalse(live.config.simulation_mode)
+        self.assertTrue(sim.config.trading_enabled)
+        self.assertFalse(live.config.trading_enabled)
+        self.assertEqual(sim2.config.token_file, "tokens-sim-2.json")
+        self.assertEqual(
+            len({entry.config.token_file for entry in manager}), 3, "token files must differ"
+        )
+        self.assertIsNot(sim.client, live.client)
+        with self.assertRaises(LookupError):
+            manager.get("paper")
+
+    def test_unknown_named_environment_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ClientManager.from_params(["paper"], self.params_path)
+
+    def test_lifecycle_is_applied_to_every_environment(self):
+        manager = ClientManager()
+        clients = [MagicMock(), MagicMock()]
+        for name, client in zip(("sim", "live"), clients, strict=True):
+            client._is_authenticated.return_value = True
+            manager.add(name, client, MagicMock(token_refresh_interval_seconds=11))
+
+        manager.authenticate()
+        manager.start_refresh()
+        manager.close()
+
+        for client in clients:
+            client.start_refresh_thread.assert_called_once_with(11)
+            client.stop_refresh_thread.assert_called_once_with()
+            client.ensure_access_token.assert_called_once_with()
+        with self.assertRaises(ValueError):
+            manager.add("sim", MagicMock(), MagicMock())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,186 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from cli.saxocli import main
+from scripts.bench import BenchEnvironment
+from scripts.fake_saxo import FakeSaxo
+from shared.cassette import use_transport
+from shared.fx import FxRates
+from shared.runtime import create_client, load_runtime_config
+from shared.snapshots import SnapshotStore, Snapshotter, capture, parse_duration
+
+
+def snapshot(net_value, positions):
+    return {
+        "balance": {"cash": 100.0, "net_equity": net_value},
+        "summary": {"net_value": net_value, "asset_classes": {"stocks": net_value - 100.0}},
+        "positions": [
+            {
+                "symbol": symbol,
+                "uic": uic,
+                "asset_type": "Stock",
+                "currency": "EUR",
+                "quantity": 10,
+                "market_price": value / 10,
+                "market_value": value,
+                "cost_price": None,
+                "unrealized_pnl": value / 100,
+            }
+            for symbol, uic, value in positions
+        ],
+    }
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.store = SnapshotStore(self._directory.name, "https://fake/sim/openapi")
+
+    def test_range_queries_and_positions_round_trip(self):
+        for hour in range(5):
+            self.store.append(
+                snapshot(
+                    1000.0 + hour, [("AAA", 1, 500.0 + hour), ("BBB", 2, 400.0)][: hour % 2 + 1]
+                ),
+                at=hour * 3600.0,
+            )
+
+        self.assertEqual(len(self.store), 5)
+        rows = self.store.query(3600, 4 * 3600, positions=True)
+        self.assertEqual([row["net_value"] for row in rows], [1001.0, 1002.0, 1003.0])
+        self.assertEqual(rows[0]["asset_classes"], {"stocks": 901.0, "cash": 100.0})
+        self.assertEqual(rows[0]["unrealized_pnl"], 5.01 + 4.0)
+        self.assertEqual(
+            rows[0]["positions"][1],
+            {
+                "symbol": "BBB",
+                "uic": 2,
+                "asset_type": "Stock",
+                "currency": "EUR",
+                "quantity": 10.0,
+                "market_price": 40.0,
+                "market_value": 400.0,
+                "cost_price": None,
+                "unrealized_pnl": 4.0,
+            },
+        )
+        self.assertEqual([len(row["positions"]) for row in rows], [2, 1, 2])
+        self.assertNotIn("positions", self.store.query()[0])
+        with self.assertRaises(ValueError):
+            self.store.append(snapshot(1.0, []), at=0.0)
+
+    def test_downsampling_keeps_the_last_snapshot_per_bucket(self):
+        for minute in range(0, 180, 15):
+            self.store.append(snapshot(float(minute), []), at=minute * 60.0)
+
+        rows = self.store.query(every=parse_duration("1h"))
+        self.assertEqual([row["net_value"] for row in rows], [45.0, 105.0, 165.0])
+        with self.assertRaises(ValueError):
+            parse_duration("hourly")
+
+    def test_interrupted_append_is_repaired(self):
+        self.store.append(snapshot(1.0, [("AAA", 1, 1.0)]), at=1.0)
+        # Simulate a writer that died after the position columns.
+        self.store.positions["market_value"].append([9.0, 9.0])
+        self.store.columns["net_value"].append([9.0])
+
+        self.store.append(snapshot(2.0, [("CCC", 3, 2.0)]), at=2.0)
+        rows = self.store.query(positions=True)
+        self.assertEqual([row["net_value"] for row in rows], [1.0, 2.0])
+        self.assertEqual(rows[1]["positions"][0]["symbol"], "CCC")
+        self.assertEqual(rows[1]["positions"][0]["market_value"], 2.0)
+
+    def test_snapshotter_records_until_stopped(self):
+        calls = []
+
+        def take():
+            calls.append(1)
+            return snapshot(float(len(calls)), [])
+
+        snapshotter = Snapshotter(self.store, take, interval=0.01).start()
+        deadline = time.monotonic() + 5
+        while len(self.store) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        snapshotter.stop()
+        self.assertGreaterEqual(len(self.store), 3)
+
+
+class TestSnapshotInterfaces(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_cli_snapshot_then_history_without_saxo(self):
+        fake = FakeSaxo(positions=3, seed=2)
+        params = os.path.join(self._directory.name, "params.json")
+        token_file = fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+
+        def run(*argv):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(main(["--params", params, *argv]), 0)
+            return json.loads(output.getvalue())
+
+        with patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}):
+            with use_transport(fake.transport()):
+                recorded = [run("snapshot"), run("snapshot")]
+            fake.reset_counts()
+            with use_transport(fake.transport()):
+                history = run("history", "portfolio", "--positions", "--from", "2000-01-01")
+
+        self.assertEqual([row["snapshots"] for row in recorded], [1, 2])
+        self.assertEqual(sum(fake.requests.values()), 0)
+        rows = history["snapshots"]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[-1]["net_value"], recorded[-1]["net_value"])
+        self.assertEqual(len(rows[-1]["positions"]), 3)
+
+    def test_converted_snapshot_stores_pnl_in_the_account_currency(self):
+        fake = FakeSaxo(positions=12, seed=3)
+        token_file = fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with patch.dict(
+            os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+        ):
+            config = load_runtime_config(os.path.join(self._directory.name, "params.json"))
+        with use_transport(fake.transport()):
+            client = create_client(config)
+            fx = FxRates(client)
+            recorded = capture(client, "sim", fx=fx)
+            rates = fx.rates({p.currency for p in recorded["positions"]}, "EUR")
+        positions = recorded["positions"]
+        self.assertGreater(len({p.currency for p in positions}), 1)
+        store = SnapshotStore(self._directory.name, config.base_url)
+        store.append(recorded, at=1.0)
+
+        expected = sum(p.unrealized_pnl * rates[p.currency] for p in positions)
+        self.assertNotAlmostEqual(expected, sum(p.unrealized_pnl for p in positions))
+        self.assertAlmostEqual(store.query()[0]["unrealized_pnl"], expected)
+
+    def test_dashboard_snapshots_and_portfolio_history(self):
+        with BenchEnvironment(4) as env:
+            state = env.app.extensions["saxo"]
+            environment = state.environment()
+            environment.snapshots.append(environment.take_snapshot())
+            env.fake.reset_counts()
+            response = env.http.get("/api/portfolio-history?every=1d&positions=1")
+            bad = env.http.get("/api/portfolio-history?every=soon")
+
+        self.assertEqual(response.status_code, 200)
+        (row,) = response.json["Data"]
+        self.assertEqual(len(row["positions"]), 4)
+        self.assertTrue(all(position["symbol"] for position in row["positions"]))
+        self.assertEqual(sum(env.fake.requests.values()), 0)
+        self.assertEqual(bad.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from itertools import product
+from unittest.mock import patch
+
+import numpy as np
+
+from cli.saxocli import main
+from scripts.bench import BenchEnvironment
+from scripts.fake_saxo import FakeSaxo
+from shared import greeks as bs
+from shared.cassette import use_transport
+from shared.domain import Position
+from shared.options import option_book
+from shared.runtime import create_client, load_runtime_config
+from shared.snapshots import normalized_positions
+from shared.stress import ScenarioGrid, parse_axis, parse_values, stress
+
+
+def position(symbol, asset_type, value, currency="EUR", uic=None, **option):
+    return Position(
+        symbol=symbol,
+        description=None,
+        asset_type=asset_type,
+        uic=uic,
+        quantity=option.pop("quantity", 10),
+        currency=currency,
+        market_price=value / 10,
+        market_value=value,
+        cost_price=None,
+        unrealized_pnl=0,
+        **option,
+    )
+
+
+class TestScenarioGrid(unittest.TestCase):
+    def test_parsing(self):
+        self.assertEqual(parse_values("-10:10:5"), (-10.0, -5.0, 0.0, 5.0, 10.0))
+        self.assertEqual(parse_values("-1, 2"), (-1.0, 2.0))
+        self.assertEqual(parse_axis("price", "AAPL:xnas=-5,5"), ("price", "AAPL:xnas", (-5, 5)))
+        self.assertEqual(parse_axis("vol", "-10,10"), ("vol", "all", (-10.0, 10.0)))
+        for kind, text in (("price", "1:0:1"), ("price", "a,b"), ("fx", "-5,5"), ("vol", "")):
+            with self.assertRaises(ValueError):
+                parse_axis(kind, text)
+
+    def test_grid_is_the_cartesian_product(self):
+        grid = ScenarioGrid.parse(["-10,0,10", "stocks=-5,5"], ["USD=1,2"])
+        self.assertEqual(len(grid), 12)
+        self.assertEqual(
+            sorted(map(tuple, np.round(grid.shocks * 100, 6).tolist())),
+            sorted(product((-10.0, 0.0, 10.0), (-5.0, 5.0), (1.0, 2.0))),
+        )
+        self.assertEqual(
+            grid.scenario(0), {"price": {"all": -10.0, "stocks": -5.0}, "fx": {"USD": 1.0}}
+        )
+        self.assertEqual(len(ScenarioGrid.parse()), 13 * 3)
+
+
+class TestStress(unittest.TestCase):
+    def test_linear_book_matches_per_position_revaluation(self):
+        book = [
+            position("AAA", "Stock", 1000.0),
+            position("BBB", "Stock", 500.0, "USD"),
+            position("CCC", "Bond", 300.0, "USD"),
+            position("AAA", "Stock", -200.0),
+        ]
+        grid = ScenarioGrid.parse(["-20:20:10", "AAA=-50,0", "other=5"], ["USD=-10,10"])
+        result = stress(book, grid, base_currency="EUR", net_value=2000.0)
+
+        expected = []
+        for index in range(len(grid)):
+            scenario = grid.scenario(index)
+            total = 0.0
+            for row in book:
+                growth = 1 + scenario["price"]["all"] / 100
+                if row.symbol == "AAA":
+                    growth *= 1 + scenario["price"]["AAA"] / 100
+                if row.asset_type == "Bond":
+                    growth *= 1 + scenario["price"]["other"] / 100
+                if row.currency == "USD":
+                    growth *= 1 + scenario["fx"]["USD"] / 100
+                total += row.market_value * (growth - 1)
+            expected.append(total)
+        expected = np.array(expected)
+
+        self.assertEqual(result["scenarios"], 20)
+        self.assertAlmostEqual(result["distribution"]["min"], expected.min())
+        self.assertAlmostEqual(result["distribution"]["max"], expected.max())
+        self.assertAlmostEqual(result["distribution"]["mean"], expected.mean())
+        worst = result["worst"][0]
+        self.assertEqual(worst["scenario"]["price"], {"all": -20.0, "AAA": -50.0, "other": 5.0})
+        self.assertAlmostEqual(worst["pnl_percent"], expected.min() / 2000 * 100)
+        self.assertAlmostEqual(sum(row["pnl"] for row in worst["contributors"]), expected.min())
+        self.assertEqual(worst["contributors"][0]["symbol"], "AAA")
+        self.assertAlmostEqual(result["best"]["pnl"], expected.max())
+
+    def test_options_are_repriced_with_their_underlying(self):
+        stock = position("XYZ", "Stock", 1000.0, uic=7)
+        call = position(
+            "XYZ/C100",
+            "StockOption",
+            -500.0,
+            quantity=-1,
+            strike=100.0,
+            expiry="2030-01-18",
+            put_call="Call",
+            underlying_uic=7,
+        )
+        unpriced = position(
+            "XYZ/P1", "StockOption", 0.0, strike=1.0, expiry="2030-01-18", put_call="Put"
+        )
+        unpriced.underlying_uic = 7
+        book = {
+            "positions": [call, unpriced],
+            "rate": 0.0,
+            "spot": np.array([100.0, 100.0]),
+            "strike": np.array([100.0, 1.0]),
+            "years": np.array([0.5, 0.5]),
+            "is_call": np.array([True, False]),
+            "carry": np.array([0.0, 0.0]),
+            "price": np.array([5.0, 0.0]),
+            "size": np.array([-100.0, 1000.0]),
+            "iv": np.array([0.2, np.nan]),
+        }
+        grid = ScenarioGrid.parse(["XYZ=-10,10"], vol=["0,5"])
+        result = stress([stock, call, unpriced], grid, book=book)
+
+        self.assertEqual(result["unpriced_options"], 1)
+        for row in result["worst"]:
+            move, vol = row["scenario"]["price"]["XYZ"] / 100, row["scenario"]["vol"] / 100
+            option = bs.price(100 * (1 + move), 100.0, 0.5, 0.2 + vol, True)
+            self.assertAlmostEqual(row["pnl"], 1000 * move + (float(option) - 5.0) * -100)
+
+    def test_options_answer_to_their_class_and_underlying_symbol(self):
+        put = position(
+            "ABC/P50",
+            "StockOption",
+            200.0,
+            strike=50.0,
+            expiry="2030-01-18",
+            put_call="Put",
+            underlying_uic=9,
+        )
+        book = {
+            "positions": [put],
+            "underlying_symbol": ["ABC"],
+            "rate": 0.0,
+            "spot": np.array([50.0]),
+            "strike": np.array([50.0]),
+            "years": np.array([0.5]),
+            "is_call": np.array([False]),
+            "carry": np.array([0.0]),
+            "price": np.array([2.0]),
+            "size": np.array([100.0]),
+            "iv": np.array([0.25]),
+        }
+        unshocked = float(bs.price(50.0, 50.0, 0.5, 0.25, False))
+        for target in ("options", "stocks", "abc"):
+            result = stress([put], ScenarioGrid.parse([f"{target}=-20"]), book=book)
+            expected = (float(bs.price(40.0, 50.0, 0.5, 0.25, False)) - 2.0) * 100
+            self.assertAlmostEqual(result["best"]["pnl"], expected, msg=target)
+            self.assertGreater(result["best"]["pnl"], (unshocked - 2.0) * 100)
+        result = stress([put], ScenarioGrid.parse(["other=-20", "XYZ=-20"]), book=book)
+        self.assertAlmostEqual(result["best"]["pnl"], (unshocked - 2.0) * 100)
+
+
+class TestStressInterfaces(unittest.TestCase):
+    def test_cli_and_dashboard_endpoint(self):
+        fake = FakeSaxo(positions=5, option_roots=1, option_positions=2, seed=3)
+        with tempfile.TemporaryDirectory() as directory:
+            params = os.path.join(directory, "params.json")
+            token_file = fake.write_token_file(os.path.join(directory, "tokens.json"))
+            with open(params, "w") as handle:
+                json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+            output = io.StringIO()
+            with (
+                patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+                use_transport(fake.transport()),
+                contextlib.redirect_stdout(output),
+            ):
+                code = main(
+                    ["--params", params, "portfolio", "stress", "--price=-20:20:10", "--vol=0,10"]
+                )
+        self.assertEqual(code, 0)
+        result = json.loads(output.getvalue())
+        self.assertEqual((result["scenarios"], result["positions"]), (10, 7))
+        self.assertEqual(result["option_positions"], 2)
+        self.assertEqual(result["worst"][0]["scenario"]["price"], {"all": -20.0})
+        self.assertEqual(result["unconverted_currencies"], [])
+        self.assertEqual(fake.requests["infoprices_list"], 2)  # Underlyings, FX crosses.
+
+        with BenchEnvironment(4) as env:
+            response = env.http.get("/api/portfolio/stress?price=-10,10&fx=USD=-5,5")
+            bad = env.http.get("/api/portfolio/stress?fx=-5,5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["scenarios"], 4)
+        self.assertEqual(response.json["positions"], 4)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_options_on_unheld_underlyings_follow_their_symbol(self):
+        fake = FakeSaxo(positions=0, option_roots=1, option_positions=2, seed=3)
+        symbol = next(iter(fake.option_roots.values()))["Underlying"]["Symbol"]
+        with tempfile.TemporaryDirectory() as directory, use_transport(fake.transport()):
+            token_file = fake.write_token_file(os.path.join(directory, "tokens.json"))
+            with patch.dict(
+                os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi", "TOKEN_FILE": token_file}
+            ):
+                config = load_runtime_config(os.path.join(directory, "params.json"))
+            client = create_client(config)
+            positions = normalized_positions(client)
+            book = option_book(client, positions)
+            by_symbol = stress(positions, ScenarioGrid.parse([f"{symbol}=-20"]), book=book)
+            by_all = stress(positions, ScenarioGrid.parse(["-20"]), book=book)
+
+        self.assertEqual(book["underlying_symbol"], [symbol, symbol])
+        self.assertEqual(by_symbol["option_positions"], 2)
+        self.assertNotEqual(by_symbol["best"]["pnl"], 0)
+        self.assertAlmostEqual(by_symbol["best"]["pnl"], by_all["best"]["pnl"])
+
+
+if __name__ == "__main__":
+    unittest.main()
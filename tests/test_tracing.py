@@ -0,0 +1,140 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cli.saxocli import main
+from scripts.bench import BenchEnvironment
+from scripts.fake_saxo import FakeSaxo
+from shared import tracing
+from shared.cassette import use_transport
+from shared.tracing import TraceExporter, TracingExecutor, span, trace
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_spans_nest_and_are_noops_outside_a_trace(self):
+        with span("outside") as outside:
+            outside.set(ignored=True)
+        self.assertIsNone(tracing.current_span())
+
+        with trace("root") as root:
+            with span("child", kind="a") as child:
+                with span("grandchild") as grandchild:
+                    pass
+            self.assertIs(tracing.current_span(), root)
+
+        self.assertIsNone(tracing.current_span())
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertEqual(grandchild.parent_id, child.span_id)
+        self.assertEqual([item.name for item in root.trace.spans], ["grandchild", "child", "root"])
+        self.assertEqual(child.attributes, {"kind": "a"})
+
+    def test_executor_tasks_join_the_submitting_trace(self):
+        with TracingExecutor(max_workers=2, thread_name_prefix="traced") as executor:
+            untraced = executor.submit(tracing.current_span).result()
+            with trace("root") as root:
+                with span("fan-out") as parent:
+                    seen = list(executor.map(lambda _: tracing.current_span(), range(3)))
+
+        self.assertIsNone(untraced)
+        self.assertEqual(seen, [parent] * 3)
+        waits = [item for item in root.trace.spans if item.name == "executor.wait"]
+        self.assertEqual(len(waits), 3)
+        self.assertTrue(all(item.parent_id == parent.span_id for item in waits))
+        self.assertTrue(all(item.thread_name.startswith("traced") for item in waits))
+
+    def test_server_timing_aggregates_spans_by_name(self):
+        with trace("root") as root:
+            for _ in range(2):
+                with span("saxo GET /port/v1/positions/me"):
+                    pass
+            header = root.trace.server_timing(root)
+
+        entries = header.split(", ")
+        self.assertTrue(entries[0].startswith("total;dur="))
+        self.assertRegex(
+            entries[1],
+            r"^saxo\.GET\.port\.v1\.positions\.me;dur=\d+\.\d;"
+            r'desc="saxo GET /port/v1/positions/me x2"$',
+        )
+
+    def test_exporters_write_jsonl_and_chrome_trace(self):
+        jsonl = os.path.join(self._directory.name, "spans.jsonl")
+        chrome = os.path.join(self._directory.name, "trace.json")
+        for path in (jsonl, chrome):
+            exporter = TraceExporter(path)
+            for _ in range(2):
+                with trace("cli positions", exporter):
+                    with span("saxo GET /port/v1/positions/me"):
+                        pass
+
+        rows = [json.loads(line) for line in open(jsonl, encoding="utf-8")]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1]["name"], "cli positions")
+        self.assertEqual(rows[0]["parent_id"], rows[1]["span_id"])
+        text = open(chrome, encoding="utf-8").read()
+        self.assertTrue(text.startswith("[\n"))
+        events = json.loads(text.rstrip().rstrip(",") + "]")
+        self.assertEqual(len(events), 4)
+        self.assertEqual({event["ph"] for event in events}, {"X"})
+        self.assertEqual(events[0]["cat"], "cli positions")
+
+    def test_dashboard_request_is_traced_across_executor_workers(self):
+        path = os.path.join(self._directory.name, "web.jsonl")
+        with BenchEnvironment(4) as env:
+            env.app.extensions["saxo"].trace_exporter = TraceExporter(path)
+            response = env.http.get("/api/dashboard")
+
+        self.assertEqual(response.status_code, 200)
+        header = response.headers["Server-Timing"]
+        for name in (
+            "total",
+            "positions",
+            "enrich_order_rows",
+            "instrument_cache.get",
+            "executor.wait",
+            "serialize",
+            "saxo.GET.port.v1.positions.me",
+        ):
+            self.assertIn(f"{name};dur=", header)
+        rows = [json.loads(line) for line in open(path, encoding="utf-8")]
+        by_id = {row["span_id"]: row for row in rows}
+        root = next(row for row in rows if row["parent_id"] is None)
+        self.assertEqual(root["name"], "GET /api/dashboard")
+        self.assertEqual(root["attributes"]["status"], 200)
+        request = next(row for row in rows if row["name"] == "saxo GET /port/v1/positions/me")
+        self.assertTrue(request["thread"].startswith("saxo-web"))
+        self.assertEqual(request["attributes"]["status"], 200)
+        self.assertEqual(by_id[request["parent_id"]], root)
+        self.assertEqual({row["trace_id"] for row in rows}, {root["trace_id"]})
+
+    def test_cli_trace_option_exports_the_command(self):
+        fake = FakeSaxo(positions=2)
+        params = os.path.join(self._directory.name, "params.json")
+        token_file = fake.write_token_file(os.path.join(self._directory.name, "tokens.json"))
+        with open(params, "w") as handle:
+            json.dump({"TOKEN_FILE": token_file, "APP_KEY": "fake"}, handle)
+        path = os.path.join(self._directory.name, "cli.jsonl")
+
+        with (
+            patch.dict(os.environ, {"SAXO_BASE_URL": "https://fake/sim/openapi"}),
+            use_transport(fake.transport()),
+            contextlib.redirect_stdout(io.StringIO()),
+        ):
+            code = main(["--params", params, "--trace", path, "balances"])
+
+        self.assertEqual(code, 0)
+        rows = [json.loads(line) for line in open(path, encoding="utf-8")]
+        self.assertEqual(rows[-1]["name"], "cli balances")
+        self.assertIn("saxo GET /port/v1/balances/me", [row["name"] for row in rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
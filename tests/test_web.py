@@ -2,22 +2,54 @@ import importlib
 import json
 import os
 import tempfile
+import time
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import httpx
+
+from scripts.fake_saxo import FakeSaxo
+from shared import client as client_module
+from shared.client import SaxoClient
+
 web_module = importlib.import_module("web.app")
-flask_app = web_module.app
+
+
+def make_client(directory):
+    client = MagicMock()
+    client.STATE_NOT_AUTHENTICATED = SaxoClient.STATE_NOT_AUTHENTICATED
+    client.STATE_WAITING_FOR_TOKEN = SaxoClient.STATE_WAITING_FOR_TOKEN
+    client.trading_enabled = False
+    client.current_state.return_value = SaxoClient.STATE_AUTHENTICATED
+    client._is_authenticated.return_value = True
+    client.auth_client.tokens = {}
+    client.next_refresh_in.return_value = None
+    client.auth_client.token_file = str(Path(directory) / "tokens.json")
+    client.auth_client.baseurl = "https://example.test/sim"
+    return client
 
 
 class TestWeb(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        cls.client = flask_app.test_client()
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.saxoclient = make_client(self._directory.name)
+        self.config = SimpleNamespace(
+            simulation_mode=True, trading_enabled=False, token_refresh_interval_seconds=300
+        )
+        self.app = web_module.create_app(
+            self.saxoclient,
+            self.config,
+            dev=True,
+            log_file=str(Path(self._directory.name) / "app.log"),
+        )
+        self.addCleanup(self.app.extensions["saxo"].close)
+        self.client = self.app.test_client()
 
     def test_home_status_and_callback(self):
-        with patch.object(web_module.saxoclient, "current_state", return_value="authenticated"):
+        with patch.object(self.saxoclient, "current_state", return_value="authenticated"):
             self.assertEqual(self.client.get("/").status_code, 200)
             status = self.client.get("/status").get_json()
             self.assertEqual(status["app_status"], "running")
@@ -25,28 +57,21 @@ class TestWeb(unittest.TestCase):
             self.assertEqual(callback.status_code, 302)
 
     def test_status_reports_environment_and_trading_state(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
+        config = SimpleNamespace(
+            simulation_mode=False, trading_enabled=True, token_refresh_interval_seconds=300
+        )
         with (
             patch.object(client, "current_state", return_value="authenticated"),
             patch.object(client, "_is_authenticated", return_value=True),
-            patch.object(
-                web_module,
-                "runtime_config",
-                SimpleNamespace(
-                    simulation_mode=False,
-                    trading_enabled=True,
-                    token_refresh_interval_seconds=300,
-                ),
-            ),
         ):
-            status = web_module._status(client)
+            status = web_module._status(client, config)
         self.assertEqual(status["environment"], "LIVE")
         self.assertTrue(status["trading_enabled"])
 
     def test_authenticate_paths(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with (
-            patch.object(web_module, "config", SimpleNamespace(REDIRECT_URI="http://redirect")),
             patch.object(client, "current_state", return_value=client.STATE_NOT_AUTHENTICATED),
             patch.object(client, "get_authorization_url", return_value="http://auth"),
         ):
@@ -63,7 +88,7 @@ class TestWeb(unittest.TestCase):
             self.assertEqual(self.client.get("/authenticate?code=abc").status_code, 302)
 
     def test_positions_and_table(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with patch.object(client, "_is_authenticated", return_value=False):
             self.assertEqual(self.client.get("/positions").status_code, 401)
             self.assertEqual(self.client.get("/positionstable").status_code, 401)
@@ -111,20 +136,20 @@ class TestWeb(unittest.TestCase):
         with tempfile.TemporaryDirectory() as directory:
             cache_path = Path(directory) / "instruments.json"
             with patch.object(web_module, "_instrument_cache_path", return_value=cache_path):
-                self.assertEqual(web_module._instrument_name(mock_client, 1, "Stock", cache), "Desc")
-                self.assertEqual(web_module._instrument_name(mock_client, 1, "Stock", cache), "Desc")
+                self.assertEqual(
+                    web_module._instrument_name(mock_client, 1, "Stock", cache), "Desc"
+                )
+                self.assertEqual(
+                    web_module._instrument_name(mock_client, 1, "Stock", cache), "Desc"
+                )
                 # A fresh request-local cache should still hit the shared disk cache.
                 self.assertEqual(web_module._instrument_name(mock_client, 1, "Stock", {}), "Desc")
                 self.assertEqual(mock_client.get_instrument_by_uic.call_count, 1)
-                self.assertEqual(web_module._instrument_name(mock_client, None, "Stock", cache), "N/A")
+                self.assertEqual(
+                    web_module._instrument_name(mock_client, None, "Stock", cache), "N/A"
+                )
                 mock_client.get_instrument_by_uic.side_effect = RuntimeError("bad")
                 self.assertEqual(web_module._instrument_name(mock_client, 2, "Stock", cache), "N/A")
-        with (
-            patch.object(web_module.saxoclient, "start_refresh_thread"),
-            patch.object(web_module.saxoclient, "stop_refresh_thread"),
-        ):
-            web_module.start_background_tasks()
-            web_module.stop_background_tasks()
 
     def test_instrument_metadata_is_cached_for_company_tooltips(self):
         mock_client = MagicMock()
@@ -154,7 +179,7 @@ class TestWeb(unittest.TestCase):
         self.assertEqual(response.data.count(b"const sell="), 1)
 
     def test_dashboard_exposes_sell_control_only_when_trading_is_enabled(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with patch.object(client, "trading_enabled", True, create=True):
             response = self.client.get("/")
         self.assertIn(b"const tradingEnabled=true", response.data)
@@ -176,7 +201,9 @@ class TestWeb(unittest.TestCase):
             ):
                 self.assertEqual(web_module._instrument_name(mock_client, 7, "Stock", {}), "FRESH")
             self.assertEqual(mock_client.get_instrument_by_uic.call_count, 1)
-            self.assertEqual(json.loads(cache_path.read_text(encoding="utf-8"))[key]["name"], "FRESH")
+            self.assertEqual(
+                json.loads(cache_path.read_text(encoding="utf-8"))[key]["name"], "FRESH"
+            )
 
     def test_instrument_cache_separates_environments_and_does_not_cache_failures(self):
         sim_client = MagicMock()
@@ -190,7 +217,10 @@ class TestWeb(unittest.TestCase):
             with patch.object(web_module, "_instrument_cache_path", return_value=cache_path):
                 self.assertEqual(web_module._instrument_name(sim_client, 9, "Stock", {}), "SIM")
                 self.assertEqual(web_module._instrument_name(live_client, 9, "Stock", {}), "LIVE")
-                sim_client.get_instrument_by_uic.side_effect = [RuntimeError("temporary"), {"Symbol": "OK"}]
+                sim_client.get_instrument_by_uic.side_effect = [
+                    RuntimeError("temporary"),
+                    {"Symbol": "OK"},
+                ]
                 self.assertEqual(web_module._instrument_name(sim_client, 10, "Stock", {}), "N/A")
                 self.assertEqual(web_module._instrument_name(sim_client, 10, "Stock", {}), "OK")
         self.assertEqual(sim_client.get_instrument_by_uic.call_count, 3)
@@ -208,7 +238,7 @@ class TestWeb(unittest.TestCase):
             )
 
     def test_sell_position_requires_trading_and_submits_market_order(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with (
             patch.object(client, "_is_authenticated", return_value=True),
             patch.object(client, "trading_enabled", False, create=True),
@@ -242,7 +272,7 @@ class TestWeb(unittest.TestCase):
             )
 
     def test_cancel_order_requires_trading_and_submits_cancel(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with (
             patch.object(client, "_is_authenticated", return_value=True),
             patch.object(client, "trading_enabled", False, create=True),
@@ -264,7 +294,7 @@ class TestWeb(unittest.TestCase):
             client.cancel_orders.assert_called_once_with(["123"], "A")
 
     def test_cancel_order_validates_identifiers(self):
-        client = web_module.saxoclient
+        client = self.saxoclient
         with (
             patch.object(client, "_is_authenticated", return_value=True),
             patch.object(client, "trading_enabled", True, create=True),
@@ -273,14 +303,14 @@ class TestWeb(unittest.TestCase):
             self.assertEqual(response.status_code, 400)
 
     def test_server_reloader_only_runs_in_dev_mode(self):
-        client = MagicMock()
-        with patch.object(web_module.app, "run") as run:
+        client = make_client(self._directory.name)
+        with patch.object(web_module.Flask, "run") as run:
             web_module.startSaxoServer(
                 client, SimpleNamespace(), host="127.0.0.1", port=5000, dev=True, secret="secret"
             )
             self.assertTrue(run.call_args.kwargs["debug"])
             self.assertTrue(run.call_args.kwargs["use_reloader"])
-        with patch.object(web_module.app, "run") as run:
+        with patch.object(web_module.Flask, "run") as run:
             web_module.startSaxoServer(
                 client, SimpleNamespace(), host="127.0.0.1", port=5000, dev=False, secret="secret"
             )
@@ -288,13 +318,128 @@ class TestWeb(unittest.TestCase):
             self.assertFalse(run.call_args.kwargs["use_reloader"])
 
     def test_dashboard_script_has_valid_empty_query_in_dev_mode(self):
-        web_module.configure(
-            web_module.saxoclient, SimpleNamespace(token_refresh_interval_seconds=30), dev=True
-        )
         response = self.client.get("/")
         self.assertIn(b'const query="";', response.data)
         self.assertNotIn(b"&#34;", response.data)
 
+    def test_web_secret_is_required_outside_dev_mode(self):
+        app = web_module.create_app(self.saxoclient, self.config, secret="s3cret")
+        self.addCleanup(app.extensions["saxo"].close)
+        client = app.test_client()
+        self.assertEqual(client.get("/api/status").status_code, 403)
+        self.assertEqual(client.get("/api/status?secret=s3cret").status_code, 200)
+
+    def test_metrics_endpoint_reports_routes_and_requires_the_secret(self):
+        app = web_module.create_app(self.saxoclient, self.config, secret="s3cret")
+        self.addCleanup(app.extensions["saxo"].close)
+        client = app.test_client()
+        self.assertEqual(client.get("/metrics").status_code, 403)
+        self.assertEqual(client.get("/api/status?secret=s3cret").status_code, 200)
+
+        response = client.get("/metrics?secret=s3cret")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        text = response.get_data(as_text=True)
+        self.assertIn('saxo_web_requests_total{method="GET",route="/metrics",status="403"}', text)
+        self.assertIn(
+            'saxo_web_request_duration_seconds_count{method="GET",route="/api/status"}', text
+        )
+        self.assertIn("saxo_web_requests_in_flight 1", text)
+        self.assertRegex(text, r"\nsaxo_web_executor_queue_depth \d+\n")
+
+    def test_instrument_cache_counts_layers_and_evictions(self):
+        cache = web_module.InstrumentCache(Path(self._directory.name) / "instruments.json")
+        lookups = web_module.INSTRUMENT_CACHE_LOOKUPS
+        before = {result: lookups.labels(result).value for result in ("memory", "file", "miss")}
+        evictions = web_module.INSTRUMENT_CACHE_EVICTIONS.labels().value
+
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", {"symbol": "ABC", "company_name": "ABC Corp"})
+        self.assertEqual(cache.get("k")["symbol"], "ABC")
+        self.assertEqual(web_module.InstrumentCache(cache.path).get("k")["symbol"], "ABC")
+        expired_at = time.time() + web_module.INSTRUMENT_CACHE_TTL_SECONDS + 1
+        with patch.object(web_module.time, "time", return_value=expired_at):
+            self.assertIsNone(cache.get("k"))
+
+        self.assertEqual(lookups.labels("memory").value, before["memory"] + 1)
+        self.assertEqual(lookups.labels("file").value, before["file"] + 1)
+        self.assertEqual(lookups.labels("miss").value, before["miss"] + 2)
+        self.assertEqual(web_module.INSTRUMENT_CACHE_EVICTIONS.labels().value, evictions + 1)
+
+    def test_apps_are_isolated_per_client(self):
+        live_client = make_client(self._directory.name)
+        live_client.trading_enabled = True
+        live_config = SimpleNamespace(simulation_mode=False, trading_enabled=True)
+        live_app = web_module.create_app(live_client, live_config, dev=True)
+        self.addCleanup(live_app.extensions["saxo"].close)
+        self.assertIsNot(live_app, self.app)
+        self.assertIsNot(live_app.extensions["saxo"].executor, self.app.extensions["saxo"].executor)
+        self.assertEqual(
+            live_app.test_client().get("/api/status").get_json()["environment"], "LIVE"
+        )
+        self.assertEqual(self.client.get("/api/status").get_json()["environment"], "SIM")
+
+    def test_env_query_routes_to_the_matching_client(self):
+        manager = web_module.ClientManager()
+        manager.add("sim", self.saxoclient, self.config)
+        live_client = make_client(self._directory.name)
+        live_client.get_positions.return_value = {"Data": []}
+        manager.add("live", live_client, SimpleNamespace(simulation_mode=False))
+        app = web_module.create_app(manager=manager, dev=True)
+        self.addCleanup(app.extensions["saxo"].close)
+        client = app.test_client()
+
+        status = client.get("/api/status?env=live").get_json()
+        self.assertEqual(status["env"], "live")
+        self.assertEqual(status["environment"], "LIVE")
+        self.assertEqual(status["environments"], ["sim", "live"])
+        self.assertEqual(client.get("/api/status").get_json()["env"], "sim")
+        self.assertEqual(client.get("/api/positions?env=live").get_json(), {"Data": []})
+        live_client.get_positions.assert_called_once_with()
+        self.saxoclient.get_positions.assert_not_called()
+        self.assertEqual(client.get("/api/status?env=paper").status_code, 404)
+        self.assertIn(b'const query="?env=live"', client.get("/?env=live").data)
+
+    def test_each_environment_has_its_own_connection_pool_and_rate_limit_gauge(self):
+        manager = web_module.ClientManager()
+        fakes = {
+            "sim": FakeSaxo(positions=3, rate_limit=50),
+            "live": FakeSaxo(positions=2, rate_limit=20),
+        }
+        for name, fake in fakes.items():
+            token_file = fake.write_token_file(str(Path(self._directory.name) / f"{name}.json"))
+            saxo = SaxoClient(
+                client_id="client",
+                redirect_uri="https://example.invalid/callback",
+                auth_endpoint="https://fake/authorize",
+                token_endpoint="https://fake/token",
+                token_file=token_file,
+                baseurl=f"https://fake/{name}/openapi",
+                environment=name,
+            )
+            saxo.http = httpx.Client(transport=fake.transport())
+            self.addCleanup(saxo.http.close)
+            manager.add(name, saxo, SimpleNamespace(simulation_mode=name == "sim"))
+        app = web_module.create_app(manager=manager, dev=True)
+        self.addCleanup(app.extensions["saxo"].close)
+        client = app.test_client()
+
+        self.assertEqual(client.get("/api/positions?env=sim").status_code, 200)
+        self.assertEqual(client.get("/api/positions?env=live").status_code, 200)
+        self.assertIsNot(manager.get("sim").client.http, manager.get("live").client.http)
+        gauge = client_module.API_RATE_LIMIT_REMAINING
+        for name, fake in fakes.items():
+            used = sum(fake.requests.values())
+            self.assertEqual(gauge.labels(name, "session").value, fake.config.rate_limit - used)
+        text = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('saxo_api_rate_limit_remaining{env="sim",dimension="session"}', text)
+        self.assertIn('saxo_api_rate_limit_remaining{env="live",dimension="session"}', text)
+
+    def test_import_has_no_side_effects(self):
+        self.assertFalse(hasattr(web_module, "app"))
+        self.assertFalse(hasattr(web_module, "saxoclient"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,3 @@
-from .app import app, startSaxoServer
+from .app import create_app, startSaxoServer
 
-__all__ = ["app", "startSaxoServer"]
+__all__ = ["create_app", "startSaxoServer"]
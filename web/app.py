@@ -6,93 +6,141 @@ import logging
 import os
 import secrets
 import tempfile
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+import weakref
+from datetime import date
 from math import isfinite
 from pathlib import Path
-
-from flask import Flask, abort, jsonify, redirect, render_template, request, url_for
+from urllib.parse import urlencode
+
+from flask import (
+    Blueprint,
+    Flask,
+    abort,
+    current_app,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 
 from shared.auth import lifetime_seconds_to_datetime, token_file_lock
 from shared.client import SaxoClient
+from shared.domain import Order, OrderActivity, Position
+from shared.fields import ORDER, POSITION
 from shared.formatter import CustomFormatter
-from shared.runtime import create_client, load_runtime_config
-
-app = Flask(__name__)
-runtime_config = load_runtime_config()
-config = runtime_config
-saxoclient = create_client(runtime_config)
-web_secret = None
-dev_mode = False
+from shared.fx import FxRates
+from shared.greeks import UNDERLYING_ASSET_TYPES
+from shared.history import OrderActivityStore, day_start, parse_bound
+from shared.history import default_path as default_history_path
+from shared.logs import LazyJson, RotatingJsonlHandler, install_queue_logging
+from shared.metrics import CONTENT_TYPE, REGISTRY
+from shared.profiling import Profiler
+from shared.runtime import ClientManager
+from shared.snapshots import (
+    SNAPSHOT_INTERVAL_SECONDS,
+    SnapshotStore,
+    Snapshotter,
+    capture,
+    fetch_balance,
+    normalized_positions,
+    parse_duration,
+)
+from shared.snapshots import default_directory as default_snapshot_directory
+from shared.stress import ScenarioGrid, stress
+from shared.tracing import TracingExecutor, exporter_from_env, finish_trace, span, start_trace
+
 logger = logging.getLogger(__name__)
+# Order activity; propagates to the dashboard handlers and adds the JSONL trail.
+audit_logger = logging.getLogger(f"{__name__}.audit")
 INSTRUMENT_CACHE_TTL_SECONDS = 5 * 24 * 60 * 60
-if not logger.handlers:
+EXECUTOR_MAX_WORKERS = 8
+ORDER_HISTORY_LIMIT = 200
+
+bp = Blueprint("dashboard", __name__)
+
+WEB_LATENCY = REGISTRY.histogram(
+    "saxo_web_request_duration_seconds", "Dashboard request latency by route.", ("method", "route")
+)
+WEB_REQUESTS = REGISTRY.counter(
+    "saxo_web_requests", "Dashboard responses by route and status.", ("method", "route", "status")
+)
+WEB_IN_FLIGHT = REGISTRY.gauge("saxo_web_requests_in_flight", "Dashboard requests being served.")
+EXECUTOR_QUEUE = REGISTRY.gauge(
+    "saxo_web_executor_queue_depth", "Lookups waiting for a dashboard executor thread."
+)
+INSTRUMENT_CACHE_LOOKUPS = REGISTRY.counter(
+    "saxo_instrument_cache_lookups",
+    "Instrument cache lookups by the layer that answered them.",
+    ("result",),
+)
+INSTRUMENT_CACHE_EVICTIONS = REGISTRY.counter(
+    "saxo_instrument_cache_evictions", "Expired entries dropped from the in-memory layer."
+)
+# Executors of every live app; the queue gauge sums them at scrape time.
+_EXECUTORS = weakref.WeakSet()
+EXECUTOR_QUEUE.set_function(
+    lambda: sum(executor._work_queue.qsize() for executor in list(_EXECUTORS))
+)
+
+
+def _configure_logging(log_file=None):
+    """Attach the console, app.log and audit handlers the first time an app is built.
+
+    Importing this module must not open files; handlers are only created once
+    a dashboard is actually constructed. All of them run on queue listener
+    threads, so request threads never wait for the terminal or the disk.
+    """
+    if logger.handlers:
+        return
     logger.setLevel(logging.INFO)
     logger.propagate = False
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(CustomFormatter())
-    logger.addHandler(console_handler)
-    file_handler = logging.FileHandler(os.getenv("SAXO_APP_LOG", "app.log"))
+    log_file = log_file or os.getenv("SAXO_APP_LOG", "app.log")
+    file_handler = logging.FileHandler(log_file)
     file_handler.setFormatter(logging.Formatter("[%(levelname)s] %(asctime)s - %(message)s"))
-    logger.addHandler(file_handler)
-
-
-def _log_order_activity(activity, **details):
-    """Write a safe, structured order audit line to console and app.log."""
-    logger.info(
-        "ORDER activity | %s | %s", activity, json.dumps(details, default=str, sort_keys=True)
+    install_queue_logging(logger, [console_handler, file_handler])
+    audit_file = os.getenv("SAXO_AUDIT_LOG") or str(
+        Path(os.path.abspath(log_file)).with_name("order-audit.jsonl")
     )
+    install_queue_logging(audit_logger, [RotatingJsonlHandler(audit_file)])
 
 
-def configure(client, config=None, secret=None, dev=False):
-    global saxoclient, runtime_config, web_secret, dev_mode
-    saxoclient = client
-    runtime_config = config
-    dev_mode = bool(dev)
-    web_secret = (
-        None if dev_mode else (secret or os.getenv("SAXO_WEB_SECRET") or secrets.token_urlsafe(32))
+def _log_order_activity(activity, **details):
+    """Queue a structured order audit record for the console, app.log and audit JSONL."""
+    audit_logger.info(
+        "ORDER activity | %s | %s",
+        activity,
+        LazyJson(details),
+        extra={"audit": {"activity": activity, **details}},
     )
-    if getattr(config, "trading_enabled", False):
-        logger.warning("WARNING: TRADING_ENABLED is true. Web order execution is enabled.")
-    return web_secret
-
-
-@app.before_request
-def require_trust():
-    if dev_mode or web_secret is None:
-        return None
-    supplied = request.args.get("secret", "")
-    if not hmac.compare_digest(supplied, web_secret):
-        abort(403, description="A valid web secret is required.")
-    return None
-
-
-def _require_client():
-    if saxoclient is None:
-        abort(503, description="The Saxo client is not attached.")
-    if not saxoclient._is_authenticated():
-        abort(401, description="Saxo authentication is unavailable.")
-    return saxoclient
 
 
 def _data(value):
     return value.get("Data", []) if isinstance(value, dict) else []
 
 
-def _instrument_cache_path(client):
-    configured = os.getenv("SAXO_INSTRUMENT_CACHE")
-    if configured:
-        return Path(os.path.abspath(os.path.expanduser(configured)))
+def _token_path(client, config=None):
     token_file = getattr(getattr(client, "auth_client", None), "token_file", None)
     if not isinstance(token_file, (str, Path)):
-        configured_token_file = getattr(runtime_config, "token_file", None)
+        configured_token_file = getattr(config, "token_file", None)
         token_file = (
             configured_token_file
             if isinstance(configured_token_file, (str, Path))
             else "tokens.json"
         )
-    token_path = Path(os.path.abspath(os.path.expanduser(token_file)))
-    return token_path.with_name("instrument-cache.json")
+    return Path(os.path.abspath(os.path.expanduser(token_file)))
+
+
+def _instrument_cache_path(client, config=None):
+    configured = os.getenv("SAXO_INSTRUMENT_CACHE")
+    if configured:
+        return Path(os.path.abspath(os.path.expanduser(configured)))
+    return _token_path(client, config).with_name("instrument-cache.json")
 
 
 def _instrument_cache_key(client, uic, asset_type):
@@ -109,67 +157,115 @@ def _read_instrument_cache(path):
         return {}
 
 
-def _cached_instrument_metadata(client, uic, asset_type):
-    path = _instrument_cache_path(client)
-    key = _instrument_cache_key(client, uic, asset_type)
-    with token_file_lock(path):
-        entry = _read_instrument_cache(path).get(key)
-    if not isinstance(entry, dict):
-        return None
-    try:
-        fresh = time.time() - float(entry["cached_at"]) < INSTRUMENT_CACHE_TTL_SECONDS
-    except (KeyError, TypeError, ValueError):
-        return None
-    symbol = entry.get("symbol") or entry.get("name")
-    company_name = entry.get("company_name")
-    # Entries written by older versions only contain ``name``. Refetch those
-    # once so the dashboard can also provide a useful company-name tooltip.
-    if not fresh or not symbol or not company_name:
-        return None
-    return {"symbol": symbol, "company_name": company_name}
+class InstrumentCache:
+    """UIC metadata cache: process memory in front of the shared cache file.
 
+    The file remains the source of truth shared with other server processes;
+    the memory layer only avoids taking the file lock and re-parsing JSON for
+    entries this process has already seen. Both layers honour the same TTL.
+    """
 
-def _store_instrument_metadata(client, uic, asset_type, metadata):
-    symbol = metadata.get("symbol")
-    company_name = metadata.get("company_name")
-    if not uic or not symbol or symbol == "N/A":
-        return
-    path = _instrument_cache_path(client)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    key = _instrument_cache_key(client, uic, asset_type)
-    with token_file_lock(path):
-        values = _read_instrument_cache(path)
-        values[key] = {
-            "name": symbol,  # Backwards compatibility with older readers.
-            "symbol": symbol,
-            "company_name": company_name or symbol,
+    def __init__(self, path, ttl_seconds=INSTRUMENT_CACHE_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _metadata(self, entry):
+        if not isinstance(entry, dict):
+            return None
+        try:
+            fresh = time.time() - float(entry["cached_at"]) < self.ttl_seconds
+        except (KeyError, TypeError, ValueError):
+            return None
+        symbol = entry.get("symbol") or entry.get("name")
+        company_name = entry.get("company_name")
+        # Entries written by older versions only contain ``name``. Refetch those
+        # once so the dashboard can also provide a useful company-name tooltip.
+        if not fresh or not symbol or not company_name:
+            return None
+        metadata = {"symbol": symbol, "company_name": company_name}
+        if entry.get("currency"):
+            metadata["currency"] = entry["currency"]
+        return metadata
+
+    def get(self, key):
+        with span("instrument_cache.get") as lookup:
+            metadata, layer = self._get(key)
+            lookup.set(layer=layer)
+        INSTRUMENT_CACHE_LOOKUPS.labels(layer).inc()
+        return metadata
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            metadata = self._metadata(entry)
+            if entry is not None and not metadata:
+                del self._entries[key]
+                INSTRUMENT_CACHE_EVICTIONS.inc()
+        if metadata:
+            return metadata, "memory"
+        with span("instrument_cache.file"), token_file_lock(self.path):
+            entry = _read_instrument_cache(self.path).get(key)
+        metadata = self._metadata(entry)
+        if metadata:
+            with self._lock:
+                self._entries[key] = entry
+        return metadata, "file" if metadata else "miss"
+
+    def put(self, key, metadata):
+        entry = {
+            "name": metadata["symbol"],  # Backwards compatibility with older readers.
+            "symbol": metadata["symbol"],
+            "company_name": metadata.get("company_name") or metadata["symbol"],
             "cached_at": time.time(),
         }
-        descriptor, temporary_path = tempfile.mkstemp(
-            prefix=".saxo-instruments-", dir=path.parent, text=True
-        )
-        try:
-            with os.fdopen(descriptor, "w", encoding="utf-8") as handle:
-                descriptor = None
-                json.dump(values, handle, indent=2, sort_keys=True)
-                handle.flush()
-                os.fsync(handle.fileno())
-            os.replace(temporary_path, path)
-        finally:
-            if descriptor is not None:
-                os.close(descriptor)
+        if metadata.get("currency"):
+            entry["currency"] = metadata["currency"]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with span("instrument_cache.put"), token_file_lock(self.path):
+            values = _read_instrument_cache(self.path)
+            values[key] = entry
+            descriptor, temporary_path = tempfile.mkstemp(
+                prefix=".saxo-instruments-", dir=self.path.parent, text=True
+            )
             try:
-                os.unlink(temporary_path)
-            except FileNotFoundError:
-                pass
+                with os.fdopen(descriptor, "w", encoding="utf-8") as handle:
+                    descriptor = None
+                    json.dump(values, handle, indent=2, sort_keys=True)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(temporary_path, self.path)
+            finally:
+                if descriptor is not None:
+                    os.close(descriptor)
+                try:
+                    os.unlink(temporary_path)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._entries[key] = entry
+
+
+def _cached_instrument_metadata(client, uic, asset_type, instruments=None):
+    instruments = instruments or InstrumentCache(_instrument_cache_path(client))
+    return instruments.get(_instrument_cache_key(client, uic, asset_type))
+
+
+def _store_instrument_metadata(client, uic, asset_type, metadata, instruments=None):
+    symbol = metadata.get("symbol")
+    if not uic or not symbol or symbol == "N/A":
+        return
+    instruments = instruments or InstrumentCache(_instrument_cache_path(client))
+    instruments.put(_instrument_cache_key(client, uic, asset_type), metadata)
 
 
-def _instrument_metadata(client, uic, asset_type, cache):
+def _instrument_metadata(client, uic, asset_type, cache, instruments=None):
     if not uic:
         return {"symbol": "N/A", "company_name": "Unknown instrument"}
     key = (uic, asset_type or "")
     if key not in cache:
-        cached_metadata = _cached_instrument_metadata(client, uic, asset_type)
+        cached_metadata = _cached_instrument_metadata(client, uic, asset_type, instruments)
         if cached_metadata:
             cache[key] = cached_metadata
             return cached_metadata
@@ -178,7 +274,9 @@ def _instrument_metadata(client, uic, asset_type, cache):
             symbol = instrument.get("Symbol") or instrument.get("Description") or "N/A"
             company_name = instrument.get("Description") or symbol
             cache[key] = {"symbol": symbol, "company_name": company_name}
-            _store_instrument_metadata(client, uic, asset_type, cache[key])
+            if instrument.get("CurrencyCode"):
+                cache[key]["currency"] = instrument["CurrencyCode"]
+            _store_instrument_metadata(client, uic, asset_type, cache[key], instruments)
         except Exception:
             cache[key] = {"symbol": "N/A", "company_name": "Unknown instrument"}
     return cache[key]
@@ -192,69 +290,90 @@ def _instrument_name(client, uic, asset_type, cache):
     return cache[key]
 
 
-def _positions(client, raw=None):
-    raw = client.get_positions() if raw is None else raw
+def _map(executor, function, items, thread_name_prefix):
+    """Run independent lookups on the app executor, or a short-lived one."""
+    items = list(items)
+    if executor is not None:
+        return list(executor.map(function, items))
+    workers = min(EXECUTOR_MAX_WORKERS, max(1, len(items)))
+    with TracingExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as pool:
+        return list(pool.map(function, items))
+
+
+def _positions(client, raw=None, executor=None, instruments=None):
+    with span("positions") as positions_span:
+        raw = client.get_positions() if raw is None else raw
+        items = _data(raw)
+        positions_span.set(count=len(items))
+        return _position_rows(client, items, executor, instruments)
+
+
+def _position_rows(client, items, executor, instruments):
     cache = {}
-    items = _data(raw)
+    extract = POSITION.compile()
 
     def make_position(item):
-        base = item.get("PositionBase", item)
-        view = item.get("PositionView", {})
-        metadata = _instrument_metadata(
-            client, base.get("Uic"), base.get("AssetType"), cache
-        )
-        amount = base.get("Amount")
-        purchase_price = next(
-            (base.get(key) or view.get(key) for key in ("OpenPrice", "PurchasePrice", "AverageOpenPrice")
-             if base.get(key) is not None or view.get(key) is not None),
-            None,
-        )
-        current_price = next(
-            (view.get(key) or base.get(key) for key in ("CurrentPrice", "MarketPrice", "Price")
-             if view.get(key) is not None or base.get(key) is not None),
-            None,
-        )
-        profit_loss = view.get("ProfitLossOnTrade")
-        market_value = next(
-            (view.get(key) for key in ("MarketValue", "MarketValueInBaseCurrency", "Exposure")
-             if view.get(key) is not None),
-            None,
-        )
+        (
+            account_id,
+            account_key,
+            uic,
+            asset_type,
+            _,
+            amount,
+            currency,
+            current_price,
+            market_value,
+            purchase_price,
+            profit_loss,
+            total_percent,
+            one_day_percent,
+        ) = extract(item)
+        metadata = _instrument_metadata(client, uic, asset_type, cache, instruments)
         if market_value is None and current_price is not None and amount is not None:
             market_value = abs(float(amount)) * float(current_price)
-        total_percent = next(
-            (view.get(key) for key in ("ProfitLossOnTradeInPercent", "ProfitLossPercent", "TotalProfitLossPercent")
-             if view.get(key) is not None),
-            None,
-        )
         if total_percent is None and profit_loss is not None and purchase_price and amount:
-            total_percent = float(profit_loss) / (abs(float(purchase_price)) * abs(float(amount))) * 100
-        one_day_percent = next(
-            (view.get(key) for key in ("InstrumentPriceDayPercentChange", "OneDayProfitLossPercent", "DailyProfitLossPercent", "DayChangePercent", "ChangePercent")
-             if view.get(key) is not None),
-            None,
+            total_percent = (
+                float(profit_loss) / (abs(float(purchase_price)) * abs(float(amount))) * 100
+            )
+        return Position(
+            symbol=metadata["symbol"],
+            description=metadata["company_name"],
+            asset_type=asset_type,
+            uic=uic,
+            quantity=amount,
+            currency=currency,
+            market_price=current_price,
+            market_value=market_value,
+            cost_price=purchase_price,
+            unrealized_pnl=profit_loss,
+            account_id=account_id,
+            account_key=account_key,
+            one_day_percent=one_day_percent,
+            total_percent=total_percent,
         )
-        return {
-            "account_id": base.get("AccountId"),
-            "account_key": base.get("AccountKey") or base.get("AccountId"),
-            "uic": base.get("Uic"),
-            "name": metadata["symbol"],
-            "company_name": metadata["company_name"],
-            "asset_type": base.get("AssetType"),
-            "amount": amount,
-            "one_day_percent": one_day_percent,
-            "total_percent": total_percent,
-            "purchase_price": purchase_price,
-            "current_price": current_price,
-            "total_value": market_value,
-            "profit_loss": profit_loss,
-        }
 
     # Instrument detail requests are independent; parallelizing them avoids
     # making the page wait for one round trip per open position.
-    workers = min(8, max(1, len(items)))
-    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="saxo-position") as executor:
-        return list(executor.map(make_position, items))
+    return _map(executor, make_position, items, "saxo-position")
+
+
+def _position_json(position):
+    """The dashboard's field names for a ``Position``."""
+    return {
+        "account_id": position.account_id,
+        "account_key": position.account_key,
+        "uic": position.uic,
+        "name": position.symbol,
+        "company_name": position.description,
+        "asset_type": position.asset_type,
+        "amount": position.quantity,
+        "one_day_percent": position.one_day_percent,
+        "total_percent": position.total_percent,
+        "purchase_price": position.cost_price,
+        "current_price": position.market_price,
+        "total_value": position.market_value,
+        "profit_loss": position.unrealized_pnl,
+    }
 
 
 def _order_display_name(row):
@@ -281,7 +400,12 @@ def _order_company_name(row):
     return None
 
 
-def _enrich_order_rows(client, rows):
+def _enrich_order_rows(client, rows, executor=None, instruments=None):
+    with span("enrich_order_rows", count=len(rows)):
+        return _enrich_rows(client, rows, executor, instruments)
+
+
+def _enrich_rows(client, rows, executor, instruments):
     rows = [dict(row) for row in rows]
     cache = {}
     missing = {}
@@ -293,42 +417,41 @@ def _enrich_order_rows(client, rows):
             missing[key] = None
 
     def resolve(key):
-        return key, _instrument_metadata(client, key[0], key[1], cache)
+        return key, _instrument_metadata(client, key[0], key[1], cache, instruments)
 
     if missing:
-        with ThreadPoolExecutor(max_workers=min(8, len(missing)), thread_name_prefix="saxo-order") as executor:
-            for key, name in executor.map(resolve, missing):
-                missing[key] = name
+        for key, name in _map(executor, resolve, missing, "saxo-order"):
+            missing[key] = name
     for row in rows:
         metadata = missing.get((row.get("Uic"), row.get("AssetType") or "Stock"), {})
         row["instrument"] = _order_display_name(row) or metadata.get("symbol", "N/A")
         row["company_name"] = (
-            _order_company_name(row)
-            or metadata.get("company_name")
-            or row["instrument"]
+            _order_company_name(row) or metadata.get("company_name") or row["instrument"]
         )
     return rows
 
 
-def _compact_order(row):
-    """Keep only fields rendered by the dashboard to reduce JSON transfer."""
-    return {
-        "instrument": row.get("instrument") or _order_display_name(row) or "N/A",
-        "company_name": row.get("company_name") or _order_company_name(row),
-        "Status": row.get("Status"),
-        "SubStatus": row.get("SubStatus"),
-        "BuySell": row.get("BuySell"),
-        "Amount": row.get("Amount"),
-        "OrderPrice": row.get("OrderPrice", row.get("Price")),
-        "ActivityTime": row.get("ActivityTime"),
-        "OrderId": row.get("OrderId"),
-        "AccountKey": row.get("AccountKey") or row.get("AccountId"),
-        "FilledAmount": row.get("FilledAmount", row.get("FillAmount")),
-        "AveragePrice": row.get("AveragePrice"),
-    }
+def _compact_order(row, extract=None):
+    """Keep only fields rendered by the dashboard to reduce JSON transfer.
 
+    Pass ``extract=ORDER.compile()`` when compacting a whole list.
+    """
+    *fields, activity_time = (extract or ORDER.compile())(row)
+    instrument = row.get("instrument") or _order_display_name(row) or "N/A"
+    company_name = row.get("company_name") or _order_company_name(row)
+    if activity_time is None:
+        return Order(instrument, company_name, *fields)
+    return OrderActivity(instrument, company_name, *fields, activity_time=activity_time)
 
-def _status(client):
+
+def _compact_orders(rows):
+    if not rows:
+        return []
+    extract = ORDER.compile()
+    return [_compact_order(row, extract).to_json() for row in rows]
+
+
+def _status(client, config=None, dev_mode=False):
     tokens = getattr(getattr(client, "auth_client", None), "tokens", {}) or {}
     now = time.time()
 
@@ -349,123 +472,466 @@ def _status(client):
         "client_state": state,
         "saxoclient state": state,
         "authenticated": client._is_authenticated(),
-        "environment": "SIM" if getattr(runtime_config, "simulation_mode", True) else "LIVE",
-        "trading_enabled": bool(getattr(runtime_config, "trading_enabled", False)),
-        "refresh_interval_seconds": getattr(runtime_config, "token_refresh_interval_seconds", None),
+        "environment": "SIM" if getattr(config, "simulation_mode", True) else "LIVE",
+        "trading_enabled": bool(getattr(config, "trading_enabled", False)),
+        "refresh_interval_seconds": getattr(config, "token_refresh_interval_seconds", None),
+        "next_refresh_seconds": client.next_refresh_in(),
         "access_token": expiry("access_token_expires_at"),
         "refresh_token": expiry("refresh_token_expires_at"),
         "dev_mode": dev_mode,
     }
 
 
-def start_background_tasks():
-    saxoclient.start_refresh_thread(runtime_config.token_refresh_interval_seconds)
+class EnvironmentState:
+    """One served environment: its client, configuration and local caches."""
+
+    def __init__(self, name, client, config=None):
+        self.name = name
+        self.client = client
+        self.config = config
+        self.instruments = InstrumentCache(_instrument_cache_path(client, config))
+        baseurl = getattr(getattr(client, "auth_client", None), "baseurl", None)
+        key = baseurl if isinstance(baseurl, str) else name
+        self.history = OrderActivityStore(default_history_path(_token_path(client, config)), key)
+        self.snapshots = SnapshotStore(default_snapshot_directory(_token_path(client, config)), key)
+        self.fx = FxRates(client)
+
+    @property
+    def mode(self):
+        return "sim" if getattr(self.config, "simulation_mode", True) else "live"
+
+    def instrument_lookup(self, option_terms=False):
+        """``instrument(uic, asset_type)`` naming instruments through the cache.
+
+        With ``option_terms``, option positions get their full instrument
+        details instead, since the cache keeps no strike or expiry.
+        """
+        cache = {}
+
+        def instrument(uic, asset_type):
+            if option_terms and asset_type in UNDERLYING_ASSET_TYPES:
+                return self.client.get_instrument_by_uic(uic, asset_type=asset_type)
+            metadata = _instrument_metadata(self.client, uic, asset_type, cache, self.instruments)
+            if metadata["symbol"] == "N/A":
+                return {}
+            return {
+                "Symbol": metadata["symbol"],
+                "Description": metadata["company_name"],
+                "CurrencyCode": metadata.get("currency"),
+            }
+
+        return instrument
+
+    def take_snapshot(self):
+        """Capture positions and balances, naming instruments through the cache."""
+        return capture(self.client, self.mode, self.instrument_lookup(), self.fx)
+
+
+def _history_query(args):
+    """Order-history filters from ``?from=&to=&uic=&order_id=&status=&limit=``.
+
+    Without ``from`` the history starts at the beginning of the local day.
+    """
+    try:
+        start = parse_bound(args["from"]) if args.get("from") else day_start(date.today())
+        end = parse_bound(args["to"], end=True) if args.get("to") else None
+        uic = int(args["uic"]) if args.get("uic") else None
+        limit = int(args.get("limit") or ORDER_HISTORY_LIMIT)
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    return {
+        "start": start,
+        "end": end,
+        "uic": uic,
+        "order_id": args.get("order_id") or None,
+        "status": args.get("status") or None,
+        "limit": limit,
+    }
+
+
+def _order_history(environment, query):
+    """Sync the local store for the queried range and answer from it."""
+    environment.history.refresh(environment.client, query["start"], query["end"])
+    return environment.history.query(**query)
 
 
-def stop_background_tasks():
-    saxoclient.stop_refresh_thread()
+class DashboardState:
+    """Per-app dependencies: the attached clients, the executor and caches.
 
+    Each ``create_app`` call builds its own state. An app serves one or more
+    named environments from a ``ClientManager``; requests pick one with
+    ``?env=`` and fall back to the manager's default.
+    """
 
-@app.route("/")
+    def __init__(self, manager, secret=None, dev=False, trace_exporter=None):
+        self.default = manager.default
+        self.environments = {
+            entry.name: EnvironmentState(entry.name, entry.client, entry.config)
+            for entry in manager
+        }
+        self.dev_mode = bool(dev)
+        self.web_secret = (
+            None
+            if self.dev_mode
+            else (secret or os.getenv("SAXO_WEB_SECRET") or secrets.token_urlsafe(32))
+        )
+        self.trace_exporter = trace_exporter
+        self.executor = TracingExecutor(
+            max_workers=EXECUTOR_MAX_WORKERS, thread_name_prefix="saxo-web"
+        )
+        _EXECUTORS.add(self.executor)
+        self.snapshotters = []
+
+    def environment(self, name=None):
+        return self.environments.get(name or self.default)
+
+    def start_snapshots(self, interval):
+        """Record a portfolio snapshot of every attached environment each ``interval``."""
+        for environment in self.environments.values():
+            if environment.client is not None:
+                snapshotter = Snapshotter(
+                    environment.snapshots, environment.take_snapshot, interval
+                )
+                self.snapshotters.append(snapshotter.start())
+
+    def close(self):
+        for snapshotter in self.snapshotters:
+            snapshotter.stop()
+        _EXECUTORS.discard(self.executor)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _state():
+    return current_app.extensions["saxo"]
+
+
+def _environment():
+    environment = _state().environment(request.args.get("env"))
+    if environment is None:
+        abort(404, description="Unknown environment.")
+    return environment
+
+
+def _query(**extra):
+    """Preserve the secret and environment selection in dashboard API calls."""
+    values = {
+        "secret": request.args.get("secret", ""),
+        "env": request.args.get("env", ""),
+        **extra,
+    }
+    values = {key: value for key, value in values.items() if value}
+    return "?" + urlencode(values) if values else ""
+
+
+def create_app(
+    client=None,
+    config=None,
+    secret=None,
+    dev=False,
+    log_file=None,
+    manager=None,
+    trace_file=None,
+):
+    """Build a dashboard app around already-authenticated ``SaxoClient`` objects.
+
+    Pass a single ``client``/``config`` pair, or a ``ClientManager`` holding
+    several environments to serve them side by side. Request traces are
+    appended to ``trace_file`` (or ``SAXO_TRACE_FILE``) when one is given.
+    """
+    _configure_logging(log_file)
+    if manager is None:
+        manager = ClientManager()
+        manager.add("sim" if getattr(config, "simulation_mode", True) else "live", client, config)
+    app = Flask(__name__)
+    app.extensions["saxo"] = DashboardState(
+        manager, secret=secret, dev=dev, trace_exporter=exporter_from_env(trace_file)
+    )
+    app.register_blueprint(bp)
+    for entry in manager:
+        if getattr(entry.config, "trading_enabled", False):
+            logger.warning(
+                "WARNING: TRADING_ENABLED is true for %s. Web order execution is enabled.",
+                entry.name,
+            )
+    return app
+
+
+@bp.before_app_request
+def start_request_metrics():
+    # Registered before ``require_trust`` so rejected requests are counted too.
+    g.metrics_started = time.perf_counter()
+    WEB_IN_FLIGHT.inc()
+
+
+@bp.before_app_request
+def start_request_trace():
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.trace_root = start_trace(f"{request.method} {rule}", _state().trace_exporter)
+    g.trace_root.__enter__()
+
+
+@bp.after_app_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    root = g.get("trace_root")
+    if root is not None:
+        root.set(status=response.status_code)
+        response.headers["Server-Timing"] = root.trace.server_timing(root)
+    return response
+
+
+@bp.teardown_app_request
+def finish_request_trace(exc=None):
+    root = g.pop("trace_root", None)
+    if root is not None:
+        root.__exit__(type(exc) if exc else None, exc, None)
+        finish_trace(root)
+
+
+@bp.teardown_app_request
+def finish_request_metrics(exc=None):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    WEB_IN_FLIGHT.dec()
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    status = g.pop("metrics_status", 500)
+    WEB_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+    WEB_REQUESTS.labels(request.method, route, status).inc()
+
+
+@bp.before_app_request
+def require_trust():
+    state = _state()
+    if state.dev_mode or state.web_secret is None:
+        return None
+    supplied = request.args.get("secret", "")
+    if not hmac.compare_digest(supplied, state.web_secret):
+        abort(403, description="A valid web secret is required.")
+    return None
+
+
+@bp.before_app_request
+def start_request_profile():
+    # Development only: ``?profile=1`` (CPU) or ``?profile=mem`` replaces the
+    # response with the profile of this request.
+    mode = request.args.get("profile")
+    if not mode or not _state().dev_mode:
+        return None
+    g.profiler = Profiler("mem" if mode == "mem" else "cpu").__enter__()
+    return None
+
+
+@bp.after_app_request
+def return_request_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.__exit__(None, None, None)
+    if request.args.get("profile_format") == "collapsed":
+        body = "".join(line + "\n" for line in profiler.collapsed())
+    else:
+        body = f"{request.method} {request.full_path} -> {response.status_code}\n\n"
+        body += profiler.report()
+    return current_app.response_class(body, content_type="text/plain; charset=utf-8")
+
+
+@bp.teardown_app_request
+def stop_request_profile(exc=None):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.__exit__(type(exc) if exc else None, exc, None)
+
+
+def _require_client():
+    client = _environment().client
+    if client is None:
+        abort(503, description="The Saxo client is not attached.")
+    if not client._is_authenticated():
+        abort(401, description="Saxo authentication is unavailable.")
+    return client
+
+
+@bp.route("/")
 def home():
+    state = _state()
     return render_template(
         "positions.html",
-        secret=request.args.get("secret", ""),
-        dev_mode=dev_mode,
-        trading_enabled=getattr(saxoclient, "trading_enabled", False),
+        query=_query(),
+        dev_mode=state.dev_mode,
+        trading_enabled=getattr(_environment().client, "trading_enabled", False),
     )
 
 
-@app.route("/authenticate", methods=["GET", "POST"])
+@bp.route("/authenticate", methods=["GET", "POST"])
 def authenticate():
+    client = _environment().client
     code = request.values.get("authorization_code") or request.args.get("code")
-    if code and saxoclient.current_state() in (
+    if code and client.current_state() in (
         SaxoClient.STATE_WAITING_FOR_AUTHORIZATION_CODE,
         SaxoClient.STATE_NOT_AUTHENTICATED,
         SaxoClient.STATE_ERROR,
     ):
-        saxoclient.get_token(code)
+        client.get_token(code)
         return (
-            redirect(url_for("status"))
-            if saxoclient._is_authenticated()
-            else redirect(url_for("authenticate"))
+            redirect(url_for(".status"))
+            if client._is_authenticated()
+            else redirect(url_for(".authenticate"))
         )
     if request.method == "POST":
-        return redirect(url_for("status"))
-    return jsonify(
-        {"auth_url": saxoclient.get_authorization_url(), "state": saxoclient.current_state()}
-    )
+        return redirect(url_for(".status"))
+    return jsonify({"auth_url": client.get_authorization_url(), "state": client.current_state()})
 
 
-@app.route("/oauth/callback")
+@bp.route("/oauth/callback")
 def oauth_callback():
-    return redirect(url_for("authenticate", **request.args))
+    return redirect(url_for(".authenticate", **request.args))
 
 
-@app.route("/status")
+@bp.route("/status")
 def status():
-    if saxoclient is None:
+    state = _state()
+    environment = _environment()
+    if environment.client is None:
         abort(503, description="The Saxo client is not attached.")
-    return jsonify(_status(saxoclient))
+    return jsonify(
+        {
+            **_status(environment.client, environment.config, state.dev_mode),
+            "env": environment.name,
+            "environments": list(state.environments),
+        }
+    )
 
 
-@app.route("/api/status")
+@bp.route("/metrics")
+def metrics():
+    return current_app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@bp.route("/api/status")
 def api_status():
-    if saxoclient is None:
-        abort(503, description="The Saxo client is not attached.")
-    return jsonify(_status(saxoclient))
+    return status()
 
 
-@app.route("/api/dashboard")
+@bp.route("/api/dashboard")
 def dashboard():
+    state = _state()
+    environment = _environment()
     client = _require_client()
+    instruments = environment.instruments
+    history_query = _history_query(request.args)
     try:
         # Positions and orders are independent API calls. Fetch them together
         # so a slow orders endpoint does not delay positions (or vice versa).
-        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="saxo-dashboard") as executor:
-            positions_future = executor.submit(client.get_positions)
-            orders_future = executor.submit(client.get_orders)
-            history_future = executor.submit(client.get_order_history)
-            positions_raw = positions_future.result()
-            order_data = orders_future.result()
-            history_data = history_future.result()
-        orders = _enrich_order_rows(client, _data(order_data))
-        history = _enrich_order_rows(client, _data(history_data))
+        positions_future = state.executor.submit(client.get_positions)
+        orders_future = state.executor.submit(client.get_orders)
+        history_future = state.executor.submit(_order_history, environment, history_query)
+        positions_raw = positions_future.result()
+        order_data = orders_future.result()
+        history = _enrich_order_rows(client, history_future.result(), state.executor, instruments)
+        orders = _enrich_order_rows(client, _data(order_data), state.executor, instruments)
         _log_order_activity("list", count=len(orders), source="dashboard")
         _log_order_activity("history_list", count=len(history), source="dashboard")
-        compact_orders = [_compact_order(row) for row in orders]
-        compact_history = [_compact_order(row) for row in history]
-        order_data = {**order_data, "Data": compact_orders} if isinstance(order_data, dict) else {"Data": compact_orders}
-        history_data = {**history_data, "Data": compact_history} if isinstance(history_data, dict) else {"Data": compact_history}
-        return jsonify({"positions": _positions(client, positions_raw), "orders": order_data, "order_history": history_data, "status": _status(client)})
+        compact_orders = _compact_orders(orders)
+        compact_history = _compact_orders(history)
+        order_data = (
+            {**order_data, "Data": compact_orders}
+            if isinstance(order_data, dict)
+            else {"Data": compact_orders}
+        )
+        payload = {
+            "positions": [
+                _position_json(p)
+                for p in _positions(client, positions_raw, state.executor, instruments)
+            ],
+            "orders": order_data,
+            "order_history": {"Data": compact_history},
+            "status": _status(client, environment.config, state.dev_mode),
+        }
+        with span("serialize"):
+            return jsonify(payload)
     except Exception as exc:
         _log_order_activity("list_failed", source="dashboard", error=str(exc))
         logger.exception("Failed to load dashboard data")
         return jsonify({"error": str(exc)}), 502
 
 
-@app.route("/api/positions")
+@bp.route("/api/positions")
 def api_positions():
-    return jsonify({"Data": _positions(_require_client())})
+    client = _require_client()
+    positions = _positions(client, None, _state().executor, _environment().instruments)
+    return jsonify({"Data": [_position_json(p) for p in positions]})
 
 
-@app.route("/api/orders")
+@bp.route("/api/orders")
 def api_orders():
     client = _require_client()
-    rows = _enrich_order_rows(client, _data(client.get_orders()))
+    rows = _enrich_order_rows(
+        client, _data(client.get_orders()), _state().executor, _environment().instruments
+    )
     _log_order_activity("list", count=len(rows), source="compact_orders_endpoint")
-    return jsonify({"Data": [_compact_order(row) for row in rows]})
+    return jsonify({"Data": _compact_orders(rows)})
 
 
-@app.route("/api/order-history")
+@bp.route("/api/order-history")
 def api_order_history():
     client = _require_client()
-    rows = _enrich_order_rows(client, _data(client.get_order_history()))
+    environment = _environment()
+    rows = _enrich_order_rows(
+        client,
+        _order_history(environment, _history_query(request.args)),
+        _state().executor,
+        environment.instruments,
+    )
     _log_order_activity("history_list", count=len(rows), source="compact_history_endpoint")
-    return jsonify({"Data": [_compact_order(row) for row in rows]})
+    return jsonify({"Data": _compact_orders(rows)})
 
 
-@app.route("/api/positions/sell", methods=["POST"])
+@bp.route("/api/portfolio-history")
+def api_portfolio_history():
+    """Recorded snapshots for P&L curves; answered without calling Saxo."""
+    args = request.args
+    try:
+        start = parse_bound(args["from"]).timestamp() if args.get("from") else None
+        end = parse_bound(args["to"], end=True).timestamp() if args.get("to") else None
+        every = parse_duration(args["every"]) if args.get("every") else None
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    snapshots = _environment().snapshots.query(
+        start, end, every, positions=args.get("positions") == "1"
+    )
+    return jsonify({"Data": snapshots})
+
+
+@bp.route("/api/portfolio/stress")
+def api_portfolio_stress():
+    """Scenario P&L of the current positions.
+
+    ``?price=``, ``?fx=`` and ``?vol=`` repeat like the CLI's ``portfolio
+    stress`` options, e.g. ``?price=-20:20:5&fx=USD=-10,0,10&vol=-10,0,10``.
+    """
+    client = _require_client()
+    environment = _environment()
+    args = request.args
+    try:
+        grid = ScenarioGrid.parse(args.getlist("price"), args.getlist("fx"), args.getlist("vol"))
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    balance_future = _state().executor.submit(fetch_balance, client, environment.mode)
+    positions = normalized_positions(client, environment.instrument_lookup(option_terms=True))
+    balance = balance_future.result()
+    result = stress(
+        positions,
+        grid,
+        base_currency=balance.currency,
+        net_value=balance.net_equity,
+        client=client,
+        rates=environment.fx.rates({p.currency for p in positions}, balance.currency),
+    )
+    return jsonify({"environment": environment.name, **result})
+
+
+@bp.route("/api/positions/sell", methods=["POST"])
 def sell_position():
     client = _require_client()
     _log_order_activity("sell_requested", payload=request.get_json(silent=True) or {})
@@ -511,7 +977,7 @@ def sell_position():
     return jsonify({"message": "Sell order submitted.", "order": order, "response": response}), 201
 
 
-@app.route("/api/orders/cancel", methods=["POST"])
+@bp.route("/api/orders/cancel", methods=["POST"])
 def cancel_order():
     client = _require_client()
     payload = request.get_json(silent=True) or {}
@@ -540,54 +1006,86 @@ def cancel_order():
     return jsonify({"message": "Cancel request submitted.", "response": response}), 200
 
 
-@app.route("/positions")
+@bp.route("/positions")
 def positions():
     return jsonify(_require_client().get_positions())
 
 
-@app.route("/orders")
+@bp.route("/orders")
 def orders():
     client = _require_client()
     result = client.get_orders()
-    enriched = _enrich_order_rows(client, _data(result))
+    enriched = _enrich_order_rows(
+        client, _data(result), _state().executor, _environment().instruments
+    )
     _log_order_activity("list", count=len(enriched), source="orders_endpoint")
     return jsonify({**result, "Data": enriched} if isinstance(result, dict) else {"Data": enriched})
 
 
-@app.route("/order-history")
+@bp.route("/order-history")
 def order_history():
     client = _require_client()
-    result = client.get_order_history()
-    enriched = _enrich_order_rows(client, _data(result))
+    environment = _environment()
+    enriched = _enrich_order_rows(
+        client,
+        _order_history(environment, _history_query(request.args)),
+        _state().executor,
+        environment.instruments,
+    )
     _log_order_activity("history_list", count=len(enriched), source="history_endpoint")
-    return jsonify({**result, "Data": enriched} if isinstance(result, dict) else {"Data": enriched})
+    return jsonify({"Data": enriched})
 
 
-@app.route("/positionstable")
+@bp.route("/positionstable")
 def positionstable():
+    state = _state()
     client = _require_client()
     return render_template(
         "positions.html",
-        positions=_positions(client),
-        secret=request.args.get("secret", ""),
-        dev_mode=dev_mode,
+        positions=[
+            _position_json(p)
+            for p in _positions(client, None, state.executor, _environment().instruments)
+        ],
+        query=_query(),
+        dev_mode=state.dev_mode,
         trading_enabled=getattr(client, "trading_enabled", False),
     )
 
 
-def startSaxoServer(client, runtime_config, host=None, port=None, dev=False, secret=None):
-    configured_secret = configure(client, runtime_config, secret=secret, dev=dev)
+def startSaxoServer(
+    client,
+    runtime_config,
+    host=None,
+    port=None,
+    dev=False,
+    secret=None,
+    manager=None,
+    trace_file=None,
+    snapshot_interval=None,
+):
+    app = create_app(
+        client, runtime_config, secret=secret, dev=dev, manager=manager, trace_file=trace_file
+    )
+    state = app.extensions["saxo"]
+    if snapshot_interval is None:
+        snapshot_interval = float(os.getenv("SAXO_SNAPSHOT_INTERVAL", SNAPSHOT_INTERVAL_SECONDS))
+    # With the reloader only the serving child (WERKZEUG_RUN_MAIN) records snapshots.
+    if snapshot_interval > 0 and (not dev or os.getenv("WERKZEUG_RUN_MAIN")):
+        state.start_snapshots(snapshot_interval)
     address = f"http://{host or os.getenv('SAXO_HOST', '127.0.0.1')}:{port or int(os.getenv('PORT', '5000'))}"
-    if configured_secret:
-        logger.info("Web dashboard: %s?secret=%s", address, configured_secret)
+    if state.web_secret:
+        logger.info("Web dashboard: %s?secret=%s", address, state.web_secret)
     else:
         logger.info("Web dashboard (development mode): %s", address)
     # The reloader intentionally belongs to --dev only. Flask starts a
     # second process when it is enabled, so production serve must remain
     # single-process and deterministic for the authentication session.
-    return app.run(
-        host=host or os.getenv("SAXO_HOST", "0.0.0.0"),
-        port=port or int(os.getenv("PORT", "5000")),
-        debug=dev,
-        use_reloader=dev,
-    )
+    try:
+        return app.run(
+            host=host or os.getenv("SAXO_HOST", "0.0.0.0"),
+            port=port or int(os.getenv("PORT", "5000")),
+            debug=dev,
+            use_reloader=dev,
+        )
+    finally:
+        state.close()